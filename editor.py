@@ -5,18 +5,21 @@ import pygame
 
 from scripts.utils import load_images, load_image
 from scripts.tilemap import Tilemap
+from scripts.presenter import get_presenter
+from scripts.pixelformat import optimise_assets
 
 class Editor:
     def __init__(self):
         pygame.init()
 
         pygame.display.set_caption('editor')
-        self.screen = pygame.display.set_mode((960, 640))
-        self.display = pygame.Surface((540, 380))
+        self.presenter = get_presenter((960, 640))  # The window (see scripts/presenter.py)
+        frame = pygame.Surface((540, 380))
+        self.display = self.presenter.frame_canvas(frame)  # See scripts/presenter.py
         
         # Calculate scale factors for mouse position conversion
-        self.scale_x = self.screen.get_width() / self.display.get_width()
-        self.scale_y = self.screen.get_height() / self.display.get_height()
+        self.scale_x = self.presenter.size[0] / self.display.get_width()
+        self.scale_y = self.presenter.size[1] / self.display.get_height()
 
         self.clock = pygame.time.Clock()
         
@@ -56,6 +59,10 @@ class Editor:
             'door': [door],
             'key': [key],
         }
+
+        # Same pixels, fastest blit path: grid tiles are drawn into the tilemap's per-pixel
+        # alpha chunks (see Tilemap.render_chunk), boxes and springs straight onto the display
+        optimise_assets(self.assets, {'box': frame, 'spring': frame}, pygame.Surface((1, 1), pygame.SRCALPHA))
         
         self.movement = [False, False, False, False]
         
@@ -170,7 +177,7 @@ class Editor:
                     self.tilemap.offgrid_tiles.append({'type': 'spawners', 'variant': 3, 'pos': (tile_pos[0] * self.tilemap.tile_size, tile_pos[1] * self.tilemap.tile_size)})
                 elif self.tile_list[self.tile_group] == 'spikes':
                     # Spikes tile with rotation
-                    self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': 'spikes', 'variant': 0, 'pos': tile_pos, 'rotation': self.tile_rotation}
+                    self.tilemap.set_tile(tile_pos, {'type': 'spikes', 'variant': 0, 'pos': tile_pos, 'rotation': self.tile_rotation})
                 elif self.tile_list[self.tile_group] in ['door', 'key']:
                     # Door and key are placed as offgrid tiles, centered on the tile
                     tile_img = self.assets[self.tile_list[self.tile_group]][0]
@@ -182,11 +189,10 @@ class Editor:
                     centered_pos = (tile_x + offset_x, tile_y + offset_y)
                     self.tilemap.offgrid_tiles.append({'type': self.tile_list[self.tile_group], 'variant': 0, 'pos': centered_pos})
                 else:
-                    self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos}
+                    self.tilemap.set_tile(tile_pos, {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos})
             if self.right_clicking:
                 tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
+                self.tilemap.remove_tile(tile_loc)
                 for tile in self.tilemap.offgrid_tiles.copy():
                     # Handle box and spring rendering
                     if tile['type'] == 'spawners':
@@ -290,8 +296,8 @@ class Editor:
                     if event.key == pygame.K_LSHIFT:
                         self.shift = False
             
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
+            self.presenter.draw_frame(self.display)
+            self.presenter.present()
             self.clock.tick(60)
 
 Editor().run()
\ No newline at end of file
@@ -1,22 +1,69 @@
 import os
 import sys
 import math
+import itertools
+import numpy as np
 import pygame
 
-from scripts.utils import load_image, load_images, Animation
-from scripts.entities import PhysicsEntity, Player, Crate, Spring
-from scripts.tilemap import Tilemap, PHYSICS_TILES
-from scripts.portal import Portal
+from scripts.utils import load_image, load_images, Animation, asset_images
+from scripts.entities import PhysicsEntity, Player, Crate, Spring, LAUNCHER_SPEED
+from scripts.tilemap import Tilemap, PHYSICS_TILES, TILE_SOLID, TILE_NOPORTAL
+from scripts.portal import Portal, teleport_pair
+from scripts.rewind import RewindBuffer
+from scripts.broadphase import SpatialHash
+from scripts.ecs import World, Button, KIND_CRATE
+from scripts.hitbox import build_game_hitboxes
+from scripts.preview import TrajectoryPreview
+from scripts.camera import Camera, SIMULATION_MARGIN
+from scripts.chunkstore import ChunkStreamer, manifest_path, LOAD_MARGIN
+from scripts.pixelformat import optimise_assets
+from scripts.presenter import get_presenter, draw_rect
+from scripts import fixedpoint, systems
+
+PORTAL_COLORS = (None, 'red', 'white')
+DEATH_CAUSES = (None, 'fall', 'spikes')
+TRANSITION_TYPES = (None, 'death', 'win')
+
+# Fixed timestep: the simulation always steps at SIM_HZ, whatever the render rate
+SIM_HZ = 60
+SIM_STEP = 1.0 / SIM_HZ
+MAX_CATCH_UP_STEPS = 5  # Steps per rendered frame (at 1x) before falling behind is accepted
+FAST_FORWARD_SPEED = 4.0  # Simulation speed while F is held
+INTERPOLATION_SNAP = 24  # Moves longer than this in one step (teleports, respawns) are not interpolated
+SPRING_QUERY_MARGIN = 16  # Extra pixels around a spring searched for entities landing on it
 
 
 class Game:
-    def __init__(self, level_path=None):
+    def __init__(self, level_path=None, headless=False, fixed_point=False, optimise_formats=None):
+        """
+        Args:
+            level_path: Map id or path of the level to load (defaults to level 0)
+            headless: Run without a window or audio (for scripts/env.py); only
+                      update() is used, render() and run() are not
+            fixed_point: Snap positions and velocities to whole subpixels every frame
+                         so runs are bit-for-bit reproducible; this rounds the physics
+                         constants too, so the game plays slightly differently than in the
+                         default mode (see scripts/fixedpoint.py)
+            optimise_formats: Convert the assets to the pixel formats that blit fastest
+                              (see scripts/pixelformat.py); defaults to not headless
+        """
+        self.headless = headless
+        self.fixed_point = fixed_point
+        if headless:
+            # Dummy drivers still allow convert_alpha() on the loaded images
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         pygame.init()
 
         pygame.display.set_caption('The Time I Reincarnated as a Teleporting Goat in a 2D Puzzle Platformer')
-        self.screen = pygame.display.set_mode((960, 640))
+        self.presenter = get_presenter((960, 640))  # The window (see scripts/presenter.py)
         self.display = pygame.Surface((540, 380), pygame.SRCALPHA)
         self.display_2 = pygame.Surface((540, 380))
+        # What frames are drawn on (display_2, and the transparent sprite layer display):
+        # the Surfaces themselves in software, else GPU canvases (see scripts/presenter.py)
+        self.canvas = self.presenter.frame_canvas(self.display_2)
+        self.layer = self.presenter.frame_canvas(self.display)
+        self.black_overlay = pygame.Surface(self.display_2.get_size())  # Fades and pause, by set_alpha
 
         self.clock = pygame.time.Clock()
 
@@ -61,6 +108,9 @@ class Game:
         
         self.control_images = [left_mouse_img, right_mouse_img]
 
+        # Load spring image (shared by every Spring)
+        spring_img = pygame.image.load(os.path.join(game_dir, 'data', 'images', 'spring.png')).convert_alpha()
+
         # Load portal sprites
         portal_red_images = load_images('portal_red')
         portal_white_images = load_images('portal_white')
@@ -82,6 +132,7 @@ class Game:
             'player/jump': Animation(load_images('entities/player/jump')),
             'player/wall_slide': Animation(load_images('entities/player/wall_slide')),
             'box': load_image('entities/box.png'),
+            'spring': spring_img,
             'background': pygame.transform.scale(load_image('background2.png'), (self.display_2.get_width(), self.display_2.get_height())),
             'door': [door],
             'key': [key],
@@ -92,6 +143,16 @@ class Game:
             'right_mouse_img': [right_mouse_img]
         }
 
+        # Same pixels, fastest blit path onto the surface each asset is drawn on
+        if optimise_formats is None:
+            optimise_formats = not headless
+        if optimise_formats:
+            on_display_2 = {'background': self.display_2, 'left_mouse_img': self.display_2, 'right_mouse_img': self.display_2}
+            optimise_assets(self.assets, on_display_2, self.display)
+            self.control_images = [self.assets['left_mouse_img'][0], self.assets['right_mouse_img'][0]]
+        if not headless:
+            self.presenter.preload(itertools.chain(asset_images(self.assets), [cursor_img, no_cursor_img]))
+
         # Load audio files
         audio_dir = os.path.join(game_dir, 'data', 'audio')
         try:
@@ -161,6 +222,9 @@ class Game:
 
         self.tilemap = Tilemap(self, tile_size=16)
 
+        # Collision shapes of keys, doors and spikes, worked out once from the assets
+        self.hitboxes = build_game_hitboxes(self.assets)
+
         # Store cursor image and hide default cursor
         self.cursor_img = cursor_img
         self.no_cursor_img = no_cursor_img
@@ -170,13 +234,20 @@ class Game:
         self.player_portal = Portal(self, size=64)
         self.cursor_portal = Portal(self, size=64)
         self.mouse_pos = [0, 0]
+        self.cursor_in_noportalzone = False
+        self.cursor_portal_in_noportalzone = False
+        self.cursor_portal_encompassed_by_solid = False
+        self.cursor_over_solid = False
+        self.portal_placement_blocked = False
         self.portal_mode = False  # Track if shift is held (portal mode active)
         self.current_portal_color = None  # 'red' or 'white' when locked
 
-        # Game elements
+        # Game elements (crates, springs and buttons keep their data in the world, see scripts/ecs.py)
+        self.world = World()
         self.crates = []
         self.buttons = []
         self.springs = []
+        self.button_images = {}  # (size, pressed) -> solid button image (see button_image)
         self.exit_door = None
         self.exit_open = False
         self.keys = []  # List of key positions (offgrid tiles)
@@ -187,6 +258,30 @@ class Game:
         self.has_key = False  # Whether player has collected the key
         self.room_has_key = False  # Whether the current room has a key
 
+        # Spawners and tiles of the current level right after loading (see load_level)
+        self.level_snapshot = None
+
+        # Spatial hash of the player, crates and springs (see scripts/broadphase.py)
+        self.broadphase = SpatialHash()
+        # Scratch rects for check_portal_teleport (runs for the player every frame)
+        self.teleport_rects = (pygame.Rect(0, 0, 0, 0), pygame.Rect(0, 0, 0, 0))
+        # Predicted paths drawn while shift is held (see scripts/preview.py)
+        self.preview = TrajectoryPreview(self)
+        # Follows the player through levels larger than the screen (see scripts/camera.py)
+        self.camera = Camera(self.display.get_size())
+        self.scroll = self.camera.scroll
+        self.render_scroll = (0, 0)  # Whole-pixel scroll of the last frame drawn (the mouse is over it)
+
+        # Rewind: one state per frame while playing, stepped back while Q is held
+        self.rewind = RewindBuffer()
+        self.rewinding = False
+
+        # Fixed timestep (see advance)
+        self.speed = 1.0  # Simulated seconds per real second
+        self.sim_accumulator = 0.0
+        self.previous_positions = []  # (object, x, y) before the last step, for interpolation
+        self.previous_world_pos = None  # World positions before the last step, likewise
+
         # Load level from path if provided, otherwise default to level 0
         if level_path is not None:
             self.level = level_path
@@ -194,9 +289,9 @@ class Game:
             self.level = 0
         self.load_level(self.level)
 
-        self.scroll = [0, 0]
         self.dead = 0
         self.won = False
+        self.death_cause = None  # 'fall' or 'spikes' once the player dies
 
         # Transition system
         self.transition_active = False
@@ -207,11 +302,15 @@ class Game:
         # Win screen system
         self.win_screen_time = 0.0  # Time since win screen appeared
         self.win_screen_duration = 2.0  # Show win screen for 2 seconds
+        self.win_fade_alpha = 0
+        self.win_screen_cache = None  # (window size, draws) (see win_screen_draws)
+        self.win_fade_overlay = None  # Black, faded in by set_alpha
 
         # Pause system
         self.paused = False
         font_path = os.path.join(game_dir, 'data', 'fonts', 'PressStart2P-vaV7.ttf')
         self.pause_font = pygame.font.Font(font_path, 12)  # Font for pause menu
+        self.pause_texts = {}  # Text -> its image in pause_font (see pause_text)
         
         # Pause menu buttons
         menu_x = self.display.get_width() // 2 - 70
@@ -234,7 +333,33 @@ class Game:
             # It's already a path
             map_path = map_id_or_path
 
-        self.tilemap.load(map_path)
+        # Restarting (death or R) restores the snapshot taken when the level was first
+        # loaded instead of re-reading the JSON and re-extracting the spawners
+        if self.level_snapshot is None or self.level_snapshot['path'] != map_path:
+            self.rewind.clear()
+            if manifest_path(map_path):
+                # Chunked map: only the pinned tiles now, the rest streams in (see stream_chunks)
+                self.tilemap.load_chunked(ChunkStreamer(map_path))
+            else:
+                self.tilemap.load(map_path)
+            spawners = self.tilemap.extract([('spawners', 0), ('spawners', 1), ('spawners', 2),
+                                             ('spawners', 3), ('spawners', 6), ('spawners', 7)])
+            # Tile dicts are never modified during play (keys are removed, not edited),
+            # so the snapshot can share them with the live tilemap
+            self.level_snapshot = {
+                'path': map_path,
+                'tilemap': dict(self.tilemap.tilemap),
+                'offgrid': tuple(self.tilemap.offgrid_tiles),
+                # Key tiles can be collected (removed) from the tilemap, see get_state
+                'key_locs': tuple(loc for loc, tile in self.tilemap.tilemap.items() if tile['type'] == 'key'),
+                'spawners': tuple((spawner['variant'], tuple(spawner['pos'])) for spawner in spawners),
+                # Check if room has a key (in tilemap or offgrid)
+                'room_has_key': any(tile['type'] == 'key' for tile in self.tilemap.tilemap.values()) or
+                                any(tile['type'] == 'key' for tile in self.tilemap.offgrid_tiles),
+            }
+        else:
+            self.tilemap.replace_tiles(dict(self.level_snapshot['tilemap']))
+            self.tilemap.offgrid_tiles = list(self.level_snapshot['offgrid'])
 
         # Reset portals
         self.player_portal.unlock()
@@ -243,6 +368,9 @@ class Game:
         self.current_portal_color = None
 
         # Extract spawners
+        self.world.clear()
+        self.previous_positions = []
+        self.previous_world_pos = None
         self.crates = []
         self.buttons = []
         self.springs = []
@@ -254,26 +382,10 @@ class Game:
 
         # Reset key system
         self.has_key = False
-        self.room_has_key = False
-
-        # Check if room has a key (in tilemap or offgrid)
-        for loc in self.tilemap.tilemap:
-            tile = self.tilemap.tilemap[loc]
-            if tile['type'] == 'key':
-                self.room_has_key = True
-                break
-
-        if not self.room_has_key:
-            for tile in self.tilemap.offgrid_tiles:
-                if tile['type'] == 'key':
-                    self.room_has_key = True
-                    break
-
-        for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1), ('spawners', 2), 
-                                             ('spawners', 3), ('spawners', 6), ('spawners', 7)]):
-            variant = spawner['variant']
-            pos = spawner['pos']
+        self.room_has_key = self.level_snapshot['room_has_key']
 
+        for variant, pos in self.level_snapshot['spawners']:
+            pos = list(pos)
             if variant == 0:  # Player spawn
                 self.player.pos = pos
                 self.player.air_time = 0
@@ -281,7 +393,7 @@ class Game:
             elif variant == 1:  # Crate spawn
                 self.crates.append(Crate(self, pos))
             elif variant == 2:  # Button
-                self.buttons.append({'pos': pos, 'size': (16, 8), 'pressed': False})
+                self.buttons.append(Button(self.world, pos))
             elif variant == 3:  # Spring (bottom attached, launches upward)
                 self.springs.append(Spring(self, pos))
             elif variant == 7:  # Exit door
@@ -295,9 +407,16 @@ class Game:
             elif tile['type'] == 'door':
                 self.doors.append(tile)  # Store the tile directly
 
-        self.scroll = [0, 0]
+        self.camera.set_bounds(self.tilemap.extent())
+        self.camera.snap(self.player.rect())
+        self.render_scroll = self.camera.render_scroll()
+        self.stream_chunks()
         self.dead = 0
         self.won = False
+        self.death_cause = None  # 'fall' or 'spikes' once the player dies
+
+        self.broadphase.rebuild([self.player] + self.crates + self.springs)
+        self.preview.clear()
 
         self.tutorial_hints = []
         if (isinstance(map_id_or_path, int) and map_id_or_path == 1) or \
@@ -313,13 +432,156 @@ class Game:
                 {'image': 'right_mouse_img', 'pos': (468, 20)},
             ]
 
+    def get_state(self):
+        """
+        Save the simulation state of the current level (for rewind, save states and debugging).
+
+        Covers the camera (it decides which bodies are parked, see systems.park_system),
+        the player, crates, springs, portals, buttons, key/door progress and the
+        tiles removed since the level was loaded. Input (movement, mouse) is not included;
+        portal mode is, so a rewind replays it until Q is released (see sync_portal_mode).
+
+        Returns:
+            tuple: Flat tuple of numbers; its layout depends on the level's entity counts,
+                so it can only be restored into the same level (see set_state)
+        """
+        entities = [self.player] + self.crates
+        # Joined once at the end: adding to one growing tuple is quadratic in the entity count
+        parts = [(int(self.portal_mode), PORTAL_COLORS.index(self.current_portal_color),
+                  int(self.has_key), int(self.dead), int(self.won), DEATH_CAUSES.index(self.death_cause),
+                  int(self.exit_open), int(self.transition_active),
+                  TRANSITION_TYPES.index(self.transition_type), self.transition_progress)]
+        parts += [self.camera.get_state(), self.player.get_state(), self.player_portal.get_state(),
+                  self.cursor_portal.get_state()]
+        parts.append(Crate.get_states(self.crates))
+        positions = {id(entity): i for i, entity in enumerate(entities)}
+        parts += [spring.get_state(entities, positions) for spring in self.springs]
+        parts.append(tuple(int(button.pressed) for button in self.buttons))
+        # Tiles still present, relative to the snapshot taken when the level was loaded
+        tilemap = self.tilemap.tilemap
+        parts.append(tuple(int(loc in tilemap) for loc in self.level_snapshot['key_locs']))
+        offgrid = {id(tile) for tile in self.tilemap.offgrid_tiles}
+        parts.append(tuple(int(id(tile) in offgrid) for tile in self.level_snapshot['offgrid']))
+        return tuple(itertools.chain.from_iterable(parts))
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state for the current level.
+
+        Args:
+            state: Sequence of numbers from get_state
+        """
+        (portal_mode, portal_color, has_key, dead, won, death_cause,
+         exit_open, transition_active, transition_type, self.transition_progress) = state[:10]
+        self.portal_mode = bool(portal_mode)
+        self.current_portal_color = PORTAL_COLORS[int(portal_color)]
+        self.has_key = bool(has_key)
+        self.dead = int(dead)
+        self.won = bool(won)
+        self.death_cause = DEATH_CAUSES[int(death_cause)]
+        self.exit_open = bool(exit_open)
+        self.transition_active = bool(transition_active)
+        self.transition_type = TRANSITION_TYPES[int(transition_type)]
+
+        # Entity states have fixed lengths, so the layout can be walked in order
+        i = 10
+        camera_width = len(self.camera.get_state())
+        self.camera.set_state(state[i:i + camera_width])
+        i += camera_width
+        player_width = len(self.player.get_state())
+        self.player.set_state(state[i:i + player_width])
+        i += player_width
+        portal_width = len(self.player_portal.get_state())
+        self.player_portal.set_state(state[i:i + portal_width])
+        i += portal_width
+        self.cursor_portal.set_state(state[i:i + portal_width])
+        i += portal_width
+        if self.crates:
+            width = len(self.crates[0].get_state()) * len(self.crates)
+            Crate.set_states(self.crates, state[i:i + width])
+            i += width
+        entities = [self.player] + self.crates
+        for spring in self.springs:
+            width = len(spring.get_state(entities))
+            spring.set_state(state[i:i + width], entities)
+            i += width
+        for button in self.buttons:
+            button.pressed = bool(state[i])
+            i += 1
+
+        # Put back tiles that were removed after this state (and remove the ones removed before)
+        snapshot = self.level_snapshot
+        key_flags = state[i:i + len(snapshot['key_locs'])]
+        i += len(snapshot['key_locs'])
+        tilemap = self.tilemap.tilemap
+        if any(bool(flag) != (loc in tilemap) for loc, flag in zip(snapshot['key_locs'], key_flags)):
+            self.tilemap.replace_tiles(dict(snapshot['tilemap']))
+            for loc, flag in zip(snapshot['key_locs'], key_flags):
+                if not flag:
+                    del self.tilemap.tilemap[loc]
+        offgrid_flags = state[i:i + len(snapshot['offgrid'])]
+        self.tilemap.offgrid_tiles = [tile for tile, flag in zip(snapshot['offgrid'], offgrid_flags) if flag]
+        self.keys = [tile for tile in self.tilemap.offgrid_tiles if tile['type'] == 'key']
+        self.doors = [tile for tile in self.tilemap.offgrid_tiles if tile['type'] == 'door']
+        self.broadphase.rebuild([self.player] + self.crates + self.springs)
+
+    def step_back(self):
+        """
+        Rewind one frame.
+
+        Returns:
+            bool: False when there is no history left
+        """
+        state = self.rewind.pop()
+        if state is None:
+            return False
+        self.set_state(state)
+        self.update_cursor_state()
+        return True
+
+    def step(self):
+        """Run one fixed simulation step: one frame of logic, or one frame of rewind."""
+        self.previous_positions = [(obj, obj.pos[0], obj.pos[1]) for obj in (self.player, self.player_portal)]
+        self.previous_world_pos = self.world.pos[:self.world.count].copy()
+        # Step back through the history while Q is held (not once the level is won)
+        if self.rewinding and not self.won:
+            self.step_back()
+        else:
+            self.update()
+            self.rewind.record(self.get_state())
+
+    def advance(self, dt):
+        """
+        Advance the simulation by dt seconds of real time, in fixed SIM_STEP steps.
+
+        Leftover time carries over to the next call, so the game runs at the same
+        speed whatever the frame rate; self.speed scales it (fast-forward, tests).
+        When too far behind, the backlog is dropped rather than stepped through.
+
+        Args:
+            dt: Real seconds since the last call
+
+        Returns:
+            int: Number of steps run
+        """
+        self.sim_accumulator += dt * self.speed
+        max_steps = MAX_CATCH_UP_STEPS * max(1, math.ceil(self.speed))
+        steps = 0
+        while self.sim_accumulator >= SIM_STEP and steps < max_steps:
+            self.step()
+            self.sim_accumulator -= SIM_STEP
+            steps += 1
+        if steps == max_steps:
+            self.sim_accumulator = min(self.sim_accumulator, SIM_STEP)
+        return steps
+
+    def interpolation_alpha(self):
+        """How far the render time is between the last two simulation steps (0 to 1)."""
+        return min(1.0, self.sim_accumulator / SIM_STEP)
+
     def is_in_noportalzone(self, pos):
         """Check if a position is over a noportalzone tile"""
-        tile_loc = str(int(pos[0] // self.tilemap.tile_size)) + ';' + str(int(pos[1] // self.tilemap.tile_size))
-        if tile_loc in self.tilemap.tilemap:
-            if self.tilemap.tilemap[tile_loc]['type'] == 'noportalzone':
-                return True
-        return False
+        return self.tilemap.segment_query(pos, pos, TILE_NOPORTAL) is not None
 
     def portal_overlaps_noportalzone(self, portal_rect):
         """Check if any part of a portal rectangle overlaps with any noportalzone tile"""
@@ -381,817 +643,858 @@ class Game:
 
     def cursor_over_solid_tile(self, pos):
         """Check if the cursor position is directly over a grass or stone tile"""
-        tile_loc = str(int(pos[0] // self.tilemap.tile_size)) + ';' + str(int(pos[1] // self.tilemap.tile_size))
-        if tile_loc in self.tilemap.tilemap:
-            tile_type = self.tilemap.tilemap[tile_loc]['type']
-            if tile_type in PHYSICS_TILES:  # PHYSICS_TILES contains 'grass' and 'stone'
-                return True
-        return False
+        return self.tilemap.segment_query(pos, pos, TILE_SOLID) is not None
 
     def check_portal_teleport(self, entity):
         """Check if entity should be teleported through portals"""
         if not hasattr(entity, 'last_pos'):
             entity.last_pos = entity.pos.copy()
 
-        entity_rect = entity.rect()
-        last_rect = pygame.Rect(entity.last_pos[0], entity.last_pos[1], entity.size[0], entity.size[1])
-
-        # Check player portal
-        if self.player_portal.locked and self.cursor_portal.locked:
-            collision_result = self.player_portal.check_collision(entity_rect, last_rect)
-            if collision_result:
-                edge, relative_position = collision_result
-                if self.player_portal.teleport_entity(entity, self.cursor_portal, edge, relative_position):
-                    # Play portal travel sound
-                    if self.portal_travel_sound:
-                        self.portal_travel_sound.play()
-                    # last_pos is updated inside teleport_entity to prevent immediate re-teleport
-                    return True
-
-            # Check cursor portal
-            collision_result = self.cursor_portal.check_collision(entity_rect, last_rect)
-            if collision_result:
-                edge, relative_position = collision_result
-                if self.cursor_portal.teleport_entity(entity, self.player_portal, edge, relative_position):
-                    # Play portal travel sound
-                    if self.portal_travel_sound:
-                        self.portal_travel_sound.play()
-                    # last_pos is updated inside teleport_entity to prevent immediate re-teleport
-                    return True
-
-        entity.last_pos = entity.pos.copy()
+        if teleport_pair(entity, self.player_portal, self.cursor_portal, self.teleport_rects):
+            # Play portal travel sound
+            if self.portal_travel_sound:
+                self.portal_travel_sound.play()
+            return True
         return False
 
-    def run(self):
-        try:
-            game_dir = os.path.dirname(os.path.abspath(__file__))
-            music_path = os.path.join(game_dir, 'data', 'audio', 'level_music.mp3')
-            if os.path.exists(music_path):
-                pygame.mixer.music.load(music_path)
-                pygame.mixer.music.set_volume(0.5)
-                pygame.mixer.music.play(-1)
-        except:
-            pass  # Music file might not exist
+    def jump(self):
+        """Make the player jump (if it can) and play the jump sound."""
+        if self.player.jump():
+            # Play jump sound effect
+            if self.jump_sound:
+                self.jump_sound.play()
+            return True
+        return False
 
-        dt = 0.0  # Delta time for frame updates
-        while True:
-            dt = self.clock.tick(60) / 1000.0  # Get dt from tick
-            
-            self.display.fill((0, 0, 0, 0))
-            self.display_2.blit(self.assets['background'], (0, 0))
-
-            # Update mouse position (scaled to display size)
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            self.mouse_pos[0] = (mouse_x / self.screen.get_width()) * self.display.get_width() + self.scroll[0]
-            self.mouse_pos[1] = (mouse_y / self.screen.get_height()) * self.display.get_height() + self.scroll[1]
-
-            # Only update game logic if not paused
-            if not self.paused:
-                # Update portals
-                self.player_portal.update(self.player.rect().center)
-                self.cursor_portal.update(self.mouse_pos)
-
-                # Check if cursor or cursor portal overlaps with any noportalzone tile
-                cursor_in_noportalzone = self.is_in_noportalzone(self.mouse_pos)
-                cursor_portal_rect = self.cursor_portal.get_rect()
-                cursor_portal_in_noportalzone = self.portal_overlaps_noportalzone(cursor_portal_rect)
-                cursor_portal_encompassed_by_solid = self.portal_fully_encompassed_by_solid(cursor_portal_rect)
-                cursor_over_solid = self.cursor_over_solid_tile(self.mouse_pos)
-                portal_placement_blocked = cursor_in_noportalzone or cursor_portal_in_noportalzone or cursor_portal_encompassed_by_solid or cursor_over_solid
-            else:
-                # When paused, use previous values for rendering
-                cursor_portal_rect = self.cursor_portal.get_rect()
-                cursor_in_noportalzone = self.is_in_noportalzone(self.mouse_pos)
-                cursor_portal_in_noportalzone = False
-                cursor_portal_encompassed_by_solid = False
-                cursor_over_solid = self.cursor_over_solid_tile(self.mouse_pos)
-                portal_placement_blocked = False
-
-            if not self.paused:
-                # Check button presses
-                for button in self.buttons:
-                    button['pressed'] = False
-                    button_rect = pygame.Rect(button['pos'][0], button['pos'][1], button['size'][0], button['size'][1])
-
-                    # Check player
-                    if button_rect.colliderect(self.player.rect()):
-                        button['pressed'] = True
-
-                # Check if all buttons are pressed (open exit)
-                self.exit_open = all(button['pressed'] for button in self.buttons) if self.buttons else False
-
-                # Update springs (check for pushing before updating)
-            for spring in self.springs:
-                # Check if player is pushing the spring horizontally
-                if not self.dead:
-                    player_rect = self.player.rect()
-                    spring_rect = spring.rect()
-
-                    # Check if player is colliding with spring and moving horizontally
-                    if player_rect.colliderect(spring_rect):
-                        player_horizontal_movement = (self.movement[1] - self.movement[0])
-
-                        # Simple pushing: if player is moving left/right and colliding, move spring directly
-                        # But check for wall collisions first
-                        push_amount = abs(player_horizontal_movement) * 2
-                        if player_horizontal_movement > 0:  # Player moving right
-                            # Check if player is on the left side of spring
-                            if player_rect.centerx < spring_rect.centerx:
-                                # Test if pushing right would cause a wall collision
-                                test_pos_x = spring.pos[0] + push_amount
-                                test_rect = pygame.Rect(test_pos_x, spring.pos[1], spring.size[0], spring.size[1])
-                                wall_collision = False
-                                for rect in self.tilemap.physics_rects_around((test_pos_x, spring.pos[1])):
-                                    if test_rect.colliderect(rect):
-                                        wall_collision = True
-                                        break
-                                if not wall_collision:
-                                    spring.velocity[0] = push_amount  # Use velocity instead of direct position change
-                        elif player_horizontal_movement < 0:  # Player moving left
-                            # Check if player is on the right side of spring
-                            if player_rect.centerx > spring_rect.centerx:
-                                # Test if pushing left would cause a wall collision
-                                test_pos_x = spring.pos[0] - push_amount
-                                test_rect = pygame.Rect(test_pos_x, spring.pos[1], spring.size[0], spring.size[1])
-                                wall_collision = False
-                                for rect in self.tilemap.physics_rects_around((test_pos_x, spring.pos[1])):
-                                    if test_rect.colliderect(rect):
-                                        wall_collision = True
-                                        break
-                                if not wall_collision:
-                                    spring.velocity[0] = -push_amount  # Use velocity instead of direct position change
-
-                # Update spring with physics and collision detection
-                entities_to_check = [self.player] + self.crates
-                if not spring.teleported_this_frame:
-                    spring.update(self.tilemap, entities_to_check)
-                    # Check portal teleport for springs
-                    if self.check_portal_teleport(spring):
-                        spring.teleported_this_frame = True
-                else:
-                    spring.teleported_this_frame = False
-            
-            # Check if player fell off the screen
-            if not self.dead and not self.transition_active:
-                # Player falls off if they go below the display height (with some margin)
-                if self.player.pos[1] > self.display.get_height() + 100:
+    def enter_portal_mode(self):
+        """Lock both portals in red mode (shift pressed), unless placement is blocked."""
+        if not self.portal_placement_blocked and not self.paused:
+            self.portal_mode = True
+            if self.portal_place_sound:
+                self.portal_place_sound.play()
+            # Automatically lock portals in red mode
+            self.player_portal.lock('left')  # 'left' = red
+            self.cursor_portal.lock('left')
+            self.current_portal_color = 'red'
+
+    def exit_portal_mode(self):
+        """Unlock both portals (shift released)."""
+        self.portal_mode = False
+        self.player_portal.unlock()
+        self.cursor_portal.unlock()
+        self.current_portal_color = None
+
+    def sync_portal_mode(self):
+        """
+        Match portal mode to whether shift is held now. Rewound states restore the
+        portal mode of their frame, which may no longer match the keyboard.
+        """
+        shift_held = bool(pygame.key.get_mods() & pygame.KMOD_SHIFT)
+        if self.portal_mode and not shift_held:
+            self.exit_portal_mode()
+        elif shift_held and not self.portal_mode:
+            self.enter_portal_mode()
+
+    def set_portal_color(self, color):
+        """Switch locked portals to 'red' or 'white' while in portal mode."""
+        # Block portal placement if cursor or cursor portal is over noportalzone
+        if not self.portal_mode or self.portal_placement_blocked or self.current_portal_color == color:
+            return
+        self.player_portal.unlock()
+        self.cursor_portal.unlock()
+        lock_type = 'left' if color == 'red' else 'right'  # 'left' = red, 'right' = white
+        self.player_portal.lock(lock_type)
+        self.cursor_portal.lock(lock_type)
+        self.current_portal_color = color
+        # Play portal shift sound
+        if self.portal_shift_sound:
+            self.portal_shift_sound.play()
+
+    def update_cursor_state(self):
+        """Check if cursor or cursor portal overlaps with any noportalzone / solid tile."""
+        self.cursor_in_noportalzone = self.is_in_noportalzone(self.mouse_pos)
+        cursor_portal_rect = self.cursor_portal.get_rect()
+        self.cursor_portal_in_noportalzone = self.portal_overlaps_noportalzone(cursor_portal_rect)
+        self.cursor_portal_encompassed_by_solid = self.portal_fully_encompassed_by_solid(cursor_portal_rect)
+        self.cursor_over_solid = self.cursor_over_solid_tile(self.mouse_pos)
+        self.portal_placement_blocked = self.cursor_in_noportalzone or self.cursor_portal_in_noportalzone or \
+            self.cursor_portal_encompassed_by_solid or self.cursor_over_solid
+
+    def update(self):
+        """
+        Advance the game logic by one frame (no rendering, no input polling).
+
+        Input comes from self.movement, self.mouse_pos and the jump / portal methods,
+        so the same update runs in the windowed game loop and headless (see scripts/env.py).
+        """
+        # Update portals
+        self.player_portal.update(self.player.rect().center)
+        self.cursor_portal.update(self.mouse_pos)
+        self.update_cursor_state()
+
+        self.stream_chunks()
+        # Crates and springs far from the camera stand still until it comes back
+        systems.park_system(self.world, self.camera.view_rect(SIMULATION_MARGIN))
+
+        # Check button presses (the player stands on them); all pressed opens the exit
+        self.exit_open = systems.button_system(self.world, self.player.rect())
+
+        # Locked portals wake the bodies under them so they can teleport
+        for portal in (self.player_portal, self.cursor_portal):
+            if portal.locked:
+                self.wake_bodies(portal.get_rect())
+
+        # Springs and crates the player is touching: woken up, and candidates for pushing
+        contact_rect = self.player.rect().inflate(2, 2)
+        near_player = self.broadphase.query(contact_rect)
+        for body in near_player:
+            if body.sleeping and contact_rect.colliderect(body.rect()):
+                body.wake()
+        direction = self.movement[1] - self.movement[0]
+        objects = self.world.objects
+
+        # Update springs: pushed by the player, stepped all at once (see scripts/systems.py),
+        # then launching what lands on them
+        if not self.dead:
+            systems.push_system(self.world, self.tilemap, [body.index for body in near_player if isinstance(body, Spring)],
+                                self.player.rect(), direction)
+        stepped, active = systems.spring_system(self.world, self.tilemap)
+
+        # Contacts are only checked for springs something could be landing on: the ones
+        # that moved, the ones touching something last frame and the ones near a moving
+        # entity (nothing changes between a sleeping spring and a sleeping crate)
+        contact_springs = set(active.tolist())
+        resting = stepped[self.world.sleeping[stepped]]
+        if len(resting):
+            crate_rows = self.world.indices(KIND_CRATE)
+            movers = crate_rows[~self.world.sleeping[crate_rows]]
+            pos = np.trunc(self.world.pos[movers]).astype(np.int64)
+            size = self.world.size[movers]
+            reach = SPRING_QUERY_MARGIN + np.abs(self.world.velocity[movers]).sum(axis=1).astype(np.int64)
+            player_rect = self.player.rect()
+            player_reach = SPRING_QUERY_MARGIN + int(abs(self.player.velocity[0]) + abs(self.player.velocity[1]))
+            boxes = (np.append(pos[:, 0] - reach, player_rect.x - player_reach),
+                     np.append(pos[:, 1] - reach, player_rect.y - player_reach),
+                     np.append(pos[:, 0] + size[:, 0] + reach, player_rect.right + player_reach),
+                     np.append(pos[:, 1] + size[:, 1] + reach, player_rect.bottom + player_reach))
+            contact_springs.update(resting[systems.rows_near(self.world, resting, boxes)].tolist())
+        for index in stepped.tolist():
+            spring = objects[index]
+            if index in contact_springs or spring.touching_entities:
+                # Against the entities it can reach this frame
+                margin = SPRING_QUERY_MARGIN + int(abs(spring.velocity[0]) + abs(spring.velocity[1]))
+                area = spring.rect().inflate(2 * margin, 2 * margin)
+                spring.update_contacts(self.tilemap, self.broadphase.query(area, (Player, Crate)))
+
+        # Check portal teleport for springs (sleeping ones are never under a locked portal)
+        systems.teleport_system(self, self.world, active[~self.world.sleeping[active]])
+        for index in active.tolist():
+            self.broadphase.move(objects[index])
+
+        # Check if player fell out of the level
+        if not self.dead and not self.transition_active:
+            # Player falls off if they go below the level's bounds (with some margin)
+            if self.player.pos[1] > self.camera.fall_limit():
+                self.dead = 1
+                self.death_cause = 'fall'
+                # Play death sound
+                if self.death_sound:
+                    self.death_sound.play()
+
+        # Check spike collisions
+        if not self.dead and not self.transition_active:
+            player_rect = self.player.rect()
+            # Check the spike tiles around the player
+            for tile in self.tilemap.tiles_near(self.player_tile_area(), ('spikes',)):
+                tile_x = tile['pos'][0] * self.tilemap.tile_size
+                tile_y = tile['pos'][1] * self.tilemap.tile_size
+                # The half of the tile the spikes fill depends on the rotation (default 0)
+                hitbox = self.hitboxes.spikes(tile.get('rotation', 0))
+                if hitbox.collides(tile_x, tile_y, player_rect):
                     self.dead = 1
+                    self.death_cause = 'spikes'
                     # Play death sound
                     if self.death_sound:
                         self.death_sound.play()
+                    break
 
-            # Check spike collisions
-            if not self.dead and not self.transition_active:
-                player_rect = self.player.rect()
-                # Check all spike tiles
-                for loc in self.tilemap.tilemap:
-                    tile = self.tilemap.tilemap[loc]
-                    if tile['type'] == 'spikes':
-                        tile_x = tile['pos'][0] * self.tilemap.tile_size
-                        tile_y = tile['pos'][1] * self.tilemap.tile_size
-                        # Get rotation angle (default 0 if not set)
-                        rotation = tile.get('rotation', 0)
-
-                        # Calculate spike hitbox based on rotation
-                        # Spikes fill full width (16) and half height (8)
-                        spike_width = 16  # Full tile width
-                        spike_height = 8  # Half tile height
-                        if rotation == 0:  # Pointing up (bottom half)
-                            spike_rect = pygame.Rect(tile_x, tile_y + 8, spike_width, spike_height)
-                        elif rotation == 90:  # Pointing right (left half) - rotated, so full height on left
-                            spike_rect = pygame.Rect(tile_x, tile_y, 8, 16)
-                        elif rotation == 180:  # Pointing down (top half)
-                            spike_rect = pygame.Rect(tile_x, tile_y, spike_width, spike_height)
-                        elif rotation == 270:  # Pointing left (right half) - rotated, so full height on right
-                            spike_rect = pygame.Rect(tile_x + 8, tile_y, 8, 16)
-                        else:
-                            # Default to bottom half
-                            spike_rect = pygame.Rect(tile_x, tile_y + 8, spike_width, spike_height)
-
-                        if player_rect.colliderect(spike_rect):
-                            self.dead = 1
-                            # Play death sound
-                            if self.death_sound:
-                                self.death_sound.play()
-                            break
+        # Check key collection
+        if not self.dead and not self.transition_active and not self.has_key:
+            player_rect = self.player.rect()
+            # Tight bounds of the key image's non-transparent pixels
+            key_hitbox = self.hitboxes['key']
+
+            # Check key tiles in tilemap (around the player)
+            for tile in self.tilemap.tiles_near(self.player_tile_area(), ('key',)):
+                tile_x = tile['pos'][0] * self.tilemap.tile_size
+                tile_y = tile['pos'][1] * self.tilemap.tile_size
+                # Key is 48x48, centered on 16x16 tile
+                if self.hitboxes.on_tile('key', self.tilemap.tile_size).collides(tile_x, tile_y, player_rect):
+                    # Collect the key
+                    self.has_key = True
+                    # Play key sound
+                    if self.key_sound:
+                        self.key_sound.play()
+                    # Remove key from tilemap
+                    self.tilemap.remove_tile(str(int(tile['pos'][0])) + ';' + str(int(tile['pos'][1])))
+                    size = self.tilemap.tile_size
+                    self.wake_bodies(pygame.Rect(tile_x - size, tile_y - size, size * 3, size * 3))
+                    break
 
-            # Check key collection
-            if not self.dead and not self.transition_active and not self.has_key:
-                player_rect = self.player.rect()
-                key_img = self.assets['key'][0]
-                # Get tight bounding rect around non-transparent pixels
-                bounding_rect = key_img.get_bounding_rect()
-                
-                # Check key tiles in tilemap
-                for loc in list(self.tilemap.tilemap.keys()):
-                    tile = self.tilemap.tilemap[loc]
+            # Check key tiles in offgrid_tiles
+            if not self.has_key:
+                for tile in self.tilemap.offgrid_tiles[:]:  # Use slice copy to safely remove during iteration
                     if tile['type'] == 'key':
-                        tile_x = tile['pos'][0] * self.tilemap.tile_size
-                        tile_y = tile['pos'][1] * self.tilemap.tile_size
-                        # Key is 48x48, centered on 16x16 tile
-                        # Calculate centered position on tile
-                        offset_x = (self.tilemap.tile_size - key_img.get_width()) // 2
-                        offset_y = (self.tilemap.tile_size - key_img.get_height()) // 2
-                        # Create collision rect using bounding rect
-                        key_rect = pygame.Rect(
-                            tile_x + offset_x + bounding_rect.x,
-                            tile_y + offset_y + bounding_rect.y,
-                            bounding_rect.width,
-                            bounding_rect.height
-                        )
-                        if player_rect.colliderect(key_rect):
+                        # Keys in offgrid_tiles have their pos already centered
+                        if key_hitbox.collides(tile['pos'][0], tile['pos'][1], player_rect):
                             # Collect the key
                             self.has_key = True
                             # Play key sound
                             if self.key_sound:
                                 self.key_sound.play()
-                            # Remove key from tilemap
-                            del self.tilemap.tilemap[loc]
+                            # Remove key from offgrid_tiles
+                            self.tilemap.offgrid_tiles.remove(tile)
                             break
 
-                # Check key tiles in offgrid_tiles
-                if not self.has_key:
-                    for tile in self.tilemap.offgrid_tiles[:]:  # Use slice copy to safely remove during iteration
-                        if tile['type'] == 'key':
-                            # Keys in offgrid_tiles have their pos already centered
-                            # Create collision rect using bounding rect
-                            key_rect = pygame.Rect(
-                                tile['pos'][0] + bounding_rect.x,
-                                tile['pos'][1] + bounding_rect.y,
-                                bounding_rect.width,
-                                bounding_rect.height
-                            )
-                            if player_rect.colliderect(key_rect):
-                                # Collect the key
-                                self.has_key = True
-                                # Play key sound
-                                if self.key_sound:
-                                    self.key_sound.play()
-                                # Remove key from offgrid_tiles
-                                self.tilemap.offgrid_tiles.remove(tile)
-                                break
-
-            # Check door collisions
-            if not self.dead and not self.transition_active:
-                player_rect = self.player.rect()
-                # Check if door can be used (no key required OR key collected)
-                can_use_door = not self.room_has_key or self.has_key
-
-                if can_use_door:
-                    door_img = self.assets['door'][0]
-                    # Get tight bounding rect around non-transparent pixels
-                    bounding_rect = door_img.get_bounding_rect()
-                    
-                    # Check door tiles in tilemap
-                    for loc in self.tilemap.tilemap:
-                        tile = self.tilemap.tilemap[loc]
-                        if tile['type'] == 'door':
-                            tile_x = tile['pos'][0] * self.tilemap.tile_size
-                            tile_y = tile['pos'][1] * self.tilemap.tile_size
-                            # Use bounding rect to match image exactly
-                            # Center the door on the tile (same as rendering), then apply bounding rect offset
-                            offset_x = (self.tilemap.tile_size - door_img.get_width()) // 2
-                            offset_y = (self.tilemap.tile_size - door_img.get_height()) // 2
-                            door_rect = pygame.Rect(
-                                tile_x + offset_x + bounding_rect.x,
-                                tile_y + offset_y + bounding_rect.y,
-                                bounding_rect.width,
-                                bounding_rect.height
-                            )
-                            if player_rect.colliderect(door_rect):
-                                # Trigger win condition
-                                self.won = True
-                                break
-
-                    # Check door tiles in offgrid_tiles
-                    for tile in self.tilemap.offgrid_tiles:
-                        if tile['type'] == 'door':
-                            # Use bounding rect to match image exactly
-                            door_rect = pygame.Rect(
-                                tile['pos'][0] + bounding_rect.x,
-                                tile['pos'][1] + bounding_rect.y,
-                                bounding_rect.width,
-                                bounding_rect.height
-                            )
-                            if player_rect.colliderect(door_rect):
-                                # Trigger win condition
-                                self.won = True
-                                break
-
-            # Check spring_horizontal (horizontal launcher) collisions
-            if not self.dead and not self.transition_active:
-                player_rect = self.player.rect()
-                # Check all spring_horizontal tiles (also handle old red_box tiles for backwards compatibility)
-                for loc in self.tilemap.tilemap:
-                    tile = self.tilemap.tilemap[loc]
-                    if tile['type'] == 'spring_horizontal' or tile['type'] == 'red_box':
-                        # Convert old red_box to spring_horizontal
-                        if tile['type'] == 'red_box':
-                            tile['type'] = 'spring_horizontal'
-                        tile_x = tile['pos'][0] * self.tilemap.tile_size
-                        tile_y = tile['pos'][1] * self.tilemap.tile_size
-                        spring_horizontal_rect = pygame.Rect(tile_x, tile_y, self.tilemap.tile_size, self.tilemap.tile_size)
-
-                        if player_rect.colliderect(spring_horizontal_rect):
-                            # Play spring sound
-                            if self.spring_sound:
-                                self.spring_sound.play()
-                            # Determine launch direction based on which side the player is on
-                            player_center_x = player_rect.centerx
-                            player_center_y = player_rect.centery
-                            spring_center_x = spring_horizontal_rect.centerx
-                            spring_center_y = spring_horizontal_rect.centery
-
-                            # Calculate horizontal and vertical distances
-                            dx = player_center_x - spring_center_x
-                            dy = player_center_y - spring_center_y
-
-                            # Launch horizontally based on which side player is on
-                            # Use larger horizontal velocity if player is more to the side
-                            launch_power = 6.5  # Base launch power
-                            if abs(dx) > abs(dy):  # Player is more to the side
-                                if dx > 0:  # Player is to the right, launch right
-                                    self.player.velocity[0] = launch_power
-                                else:  # Player is to the left, launch left
-                                    self.player.velocity[0] = -launch_power
-                            else:  # Player is more above/below, launch based on horizontal position
-                                if dx > 0:  # Player is to the right, launch right
-                                    self.player.velocity[0] = launch_power
-                                else:  # Player is to the left, launch left
-                                    self.player.velocity[0] = -launch_power
-
-            # Camera is static (no player tracking)
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            # Render tilemap
-            self.tilemap.render(self.display, offset=render_scroll)
-
-            # Render tutorial hints
-            for hint in self.tutorial_hints:
-                img = self.assets[hint['image']][0]
-                self.display.blit(img, (hint['pos'][0] - render_scroll[0], hint['pos'][1] - render_scroll[1]))
-
-            if not self.paused:
-                # Update crates (check for pushing before updating)
-                for crate in self.crates:
-                    # Check if player is pushing the crate
-                    if not self.dead:
-                        player_rect = self.player.rect()
-                        crate_rect = crate.rect()
-
-                    # Check if player is colliding with crate and moving horizontally
-                    if player_rect.colliderect(crate_rect):
-                        player_horizontal_movement = (self.movement[1] - self.movement[0])
-
-                        # Simple pushing: if player is moving left/right and colliding, move crate directly
-                        # But first check if the crate would collide with a wall
-                        if player_horizontal_movement > 0:  # Player moving right
-                            # Check if player is on the left side of crate
-                            if player_rect.centerx < crate_rect.centerx:
-                                # Check if moving right would cause a wall collision
-                                test_pos = crate.pos[0] + abs(player_horizontal_movement) * 2
-                                test_rect = pygame.Rect(test_pos, crate.pos[1], crate.size[0], crate.size[1])
-                                wall_collision = False
-                                for rect in self.tilemap.physics_rects_around((test_pos, crate.pos[1])):
-                                    if test_rect.colliderect(rect):
-                                        wall_collision = True
-                                        break
-                                if not wall_collision:
-                                    crate.pos[0] += abs(player_horizontal_movement) * 2  # Move crate right
-                                else:
-                                    crate.velocity[0] = 0  # Stop crate if it would hit a wall
-                        elif player_horizontal_movement < 0:  # Player moving left
-                            # Check if player is on the right side of crate
-                            if player_rect.centerx > crate_rect.centerx:
-                                # Check if moving left would cause a wall collision
-                                test_pos = crate.pos[0] - abs(player_horizontal_movement) * 2
-                                test_rect = pygame.Rect(test_pos, crate.pos[1], crate.size[0], crate.size[1])
-                                wall_collision = False
-                                for rect in self.tilemap.physics_rects_around((test_pos, crate.pos[1])):
-                                    if test_rect.colliderect(rect):
-                                        wall_collision = True
-                                        break
-                                if not wall_collision:
-                                    crate.pos[0] -= abs(player_horizontal_movement) * 2  # Move crate left
-                                else:
-                                    crate.velocity[0] = 0  # Stop crate if it would hit a wall
-
-                    # Update crate with gravity (but no movement input)
-                    if not crate.teleported_this_frame:
-                        crate.update(self.tilemap, movement=(0, 0))
-                        # Check portal teleport for crates
-                        if self.check_portal_teleport(crate):
-                            crate.teleported_this_frame = True
-                    else:
-                        crate.teleported_this_frame = False
-
-                # Update player (with crates as colliders for collision detection)
-                if not self.dead:
-                    if not self.player.teleported_this_frame:
-                        self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0), additional_colliders=self.crates)
-                        # Check portal teleport for player
-                        if self.check_portal_teleport(self.player):
-                            self.player.teleported_this_frame = True
-                    else:
-                        self.player.teleported_this_frame = False
-
-            # Render crates
-            for crate in self.crates:
-                crate.render(self.display, offset=render_scroll)
-
-            # Render player
-            if not self.dead:
-                self.player.render(self.display, offset=render_scroll)
-
-            # Check key collection
-            if not self.dead and not self.transition_active:
-                player_rect = self.player.rect()
-                for key_tile in self.keys[:]:  # Use slice to iterate over copy
-                    key_img = self.assets['key'][0]
-                    # Get tight bounding rect around non-transparent pixels
-                    bounding_rect = key_img.get_bounding_rect()
-                    # Create collision rect at the key's position with the bounding rect size
-                    key_rect = pygame.Rect(
-                        key_tile['pos'][0] + bounding_rect.x,
-                        key_tile['pos'][1] + bounding_rect.y,
-                        bounding_rect.width,
-                        bounding_rect.height
-                    )
-                    if player_rect.colliderect(key_rect):
-                        self.has_key = True
-                        # Play key sound
-                        if self.key_sound:
-                            self.key_sound.play()
-                        self.keys.remove(key_tile)
-                        # Also remove from tilemap
-                        if key_tile in self.tilemap.offgrid_tiles:
-                            self.tilemap.offgrid_tiles.remove(key_tile)
-
-            # Check door unlocking
-            if not self.dead and not self.transition_active:
-                player_rect = self.player.rect()
-                for door_tile in self.doors[:]:  # Use slice to iterate over copy
-                    door_img = self.assets['door'][0]
-                    # Get tight bounding rect around non-transparent pixels
-                    bounding_rect = door_img.get_bounding_rect()
-                    # Create collision rect at the door's position with the bounding rect size
-                    door_rect = pygame.Rect(
-                        door_tile['pos'][0] + bounding_rect.x,
-                        door_tile['pos'][1] + bounding_rect.y,
-                        bounding_rect.width,
-                        bounding_rect.height
-                    )
-                    if player_rect.colliderect(door_rect) and self.has_key:
-                        # Unlock door (remove it) and trigger win condition
-                        self.doors.remove(door_tile)
-                        # Also remove from tilemap
-                        if door_tile in self.tilemap.offgrid_tiles:
-                            self.tilemap.offgrid_tiles.remove(door_tile)
-                        self.has_key = False  # Key is consumed
-                        self.won = True  # Trigger win condition
-
-            # Buttons
-            for button in self.buttons:
-                button_rect = pygame.Rect(button['pos'][0] - render_scroll[0], 
-                                         button['pos'][1] - render_scroll[1], 
-                                         button['size'][0], button['size'][1])
-                color = (0, 255, 0) if button['pressed'] else (255, 0, 0)
-                pygame.draw.rect(self.display, color, button_rect)
-
-            # Springs
-            for spring in self.springs:
-                spring.render(self.display, offset=render_scroll)
-                        
-            # Exit door
-            if self.exit_door:
-                exit_rect = pygame.Rect(self.exit_door['pos'][0] - render_scroll[0], 
-                                      self.exit_door['pos'][1] - render_scroll[1], 
-                                      self.exit_door['size'][0], self.exit_door['size'][1])
-                color = (0, 255, 0) if self.exit_open else (100, 100, 100)
-                pygame.draw.rect(self.display, color, exit_rect)
-
-                # Check if player reached exit
-                if self.exit_open and exit_rect.colliderect(self.player.rect()):
-                    self.won = True
-
-            # Render portals - always show both portals (squares around player and cursor)
-            self.player_portal.render(self.display, offset=render_scroll)
-            # Only render cursor portal if it's not in a noportalzone and not fully encompassed by solid tiles
-            if not cursor_portal_in_noportalzone and not cursor_portal_encompassed_by_solid and not cursor_over_solid:
-                self.cursor_portal.render(self.display, offset=render_scroll)
-
-            # Handle events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return "QUIT"
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        # Escape key returns to level selection
-                        return "BACK_TO_SELECT"
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        self.movement[0] = True
-                    if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        self.movement[1] = True
-                    if event.key == pygame.K_UP or event.key == pygame.K_w or event.key == pygame.K_SPACE:
-                        if self.player.jump():
-                            # Play jump sound effect
-                            if self.jump_sound:
-                                self.jump_sound.play()
-                    if event.key == pygame.K_r:
-                        # Restart level
-                        self.load_level(self.level)
-                    if event.key == pygame.K_p:
-                        # Toggle pause
-                        self.paused = not self.paused
-                    # Enter portal mode when shift is pressed - automatically enters red mode
-                    # Only if cursor is not in a blocked zone
-                    if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
-                        if not portal_placement_blocked and not self.paused:
-                            self.portal_mode = True
-                            if self.portal_place_sound:
-                                self.portal_place_sound.play()
-                            # Automatically lock portals in red mode
-                            self.player_portal.lock('left')  # 'left' = red
-                            self.cursor_portal.lock('left')
-                            self.current_portal_color = 'red'
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        self.movement[0] = False
-                    if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        self.movement[1] = False
-                    # Exit portal mode when shift is released
-                    if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
-                        self.portal_mode = False
-                        # Unlock portals when exiting portal mode
-                        self.player_portal.unlock()
-                        self.cursor_portal.unlock()
-                        self.current_portal_color = None
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    # Handle pause menu clicks
-                    if self.paused and event.button == 1:  # Left click
-                        # Convert screen coordinates to display coordinates
-                        mouse_x, mouse_y = pygame.mouse.get_pos()
-                        display_x = int((mouse_x / self.screen.get_width()) * self.display.get_width())
-                        display_y = int((mouse_y / self.screen.get_height()) * self.display.get_height())
-                        display_pos = (display_x, display_y)
-                        
-                        if self.resume_button_rect.collidepoint(display_pos):
-                            self.paused = False
-                        elif self.quit_button_rect.collidepoint(display_pos):
-                            # Return to level selection
-                            return "BACK_TO_SELECT"
-                    # Only handle portal color cycling if in portal mode (shift held)
-                    elif self.portal_mode:
-                        # Block portal placement if cursor or cursor portal is over noportalzone
-                        if portal_placement_blocked:
-                            pass  # Do nothing, portal placement is disabled
-                        elif event.button == 1:  # Left click - switch to red portal (only if in white mode)
-                            if self.current_portal_color == 'white':
-                                self.player_portal.unlock()
-                                self.cursor_portal.unlock()
-                                self.player_portal.lock('left')  # 'left' = red
-                                self.cursor_portal.lock('left')
-                                self.current_portal_color = 'red'
-                                # Play portal shift sound
-                                if self.portal_shift_sound:
-                                    self.portal_shift_sound.play()
-                        elif event.button == 3:  # Right click - switch to white portal
-                            if self.current_portal_color == 'red':
-                                self.player_portal.unlock()
-                                self.cursor_portal.unlock()
-                                self.player_portal.lock('right')  # 'right' = white
-                                self.cursor_portal.lock('right')
-                                self.current_portal_color = 'white'
-                                # Play portal shift sound
-                                if self.portal_shift_sound:
-                                    self.portal_shift_sound.play()
-
-            # Update transition
-            if self.transition_active:
-                self.transition_progress += 1.0 / self.transition_duration
-                if self.transition_progress >= 1.0:
-                    # Transition complete, perform the action
-                    self.transition_active = False
-                    self.transition_progress = 0
-
-                    if self.transition_type == 'death':
-                        self.load_level(self.level)
-                        self.dead = 0
-                    self.transition_type = None
-
-            # Handle death - start transition if not already active
-            if self.dead and not self.transition_active:
-                self.transition_active = True
-                self.transition_type = 'death'
+        # Check door collisions
+        if not self.dead and not self.transition_active:
+            player_rect = self.player.rect()
+            # Check if door can be used (no key required OR key collected)
+            can_use_door = not self.room_has_key or self.has_key
+
+            if can_use_door:
+                # Tight bounds of the door image's non-transparent pixels
+                door_hitbox = self.hitboxes['door']
+                door_tile_hitbox = self.hitboxes.on_tile('door', self.tilemap.tile_size)
+
+                # Check door tiles in tilemap (around the player)
+                for tile in self.tilemap.tiles_near(self.player_tile_area(), ('door',)):
+                    tile_x = tile['pos'][0] * self.tilemap.tile_size
+                    tile_y = tile['pos'][1] * self.tilemap.tile_size
+                    # The door is centered on the tile (same as rendering)
+                    if door_tile_hitbox.collides(tile_x, tile_y, player_rect):
+                        # Trigger win condition
+                        self.won = True
+                        break
+
+                # Check door tiles in offgrid_tiles
+                for tile in self.tilemap.offgrid_tiles:
+                    if tile['type'] == 'door':
+                        if door_hitbox.collides(tile['pos'][0], tile['pos'][1], player_rect):
+                            # Trigger win condition
+                            self.won = True
+                            break
+
+        # Check spring_horizontal (horizontal launcher) collisions
+        if not self.dead and not self.transition_active:
+            player_rect = self.player.rect()
+            # Check the spring_horizontal tiles around the player (also handle old red_box tiles for backwards compatibility)
+            for tile in self.tilemap.tiles_near(self.player_tile_area(), ('spring_horizontal', 'red_box')):
+                # Convert old red_box to spring_horizontal
+                if tile['type'] == 'red_box':
+                    tile['type'] = 'spring_horizontal'
+                    self.tilemap.invalidate_grid()
+                tile_x = tile['pos'][0] * self.tilemap.tile_size
+                tile_y = tile['pos'][1] * self.tilemap.tile_size
+                spring_horizontal_rect = pygame.Rect(tile_x, tile_y, self.tilemap.tile_size, self.tilemap.tile_size)
+
+                if player_rect.colliderect(spring_horizontal_rect):
+                    # Play spring sound
+                    if self.spring_sound:
+                        self.spring_sound.play()
+                    # Determine launch direction based on which side the player is on
+                    player_center_x = player_rect.centerx
+                    player_center_y = player_rect.centery
+                    spring_center_x = spring_horizontal_rect.centerx
+                    spring_center_y = spring_horizontal_rect.centery
+
+                    # Calculate horizontal and vertical distances
+                    dx = player_center_x - spring_center_x
+                    dy = player_center_y - spring_center_y
+
+                    # Launch horizontally based on which side player is on
+                    # Use larger horizontal velocity if player is more to the side
+                    launch_power = LAUNCHER_SPEED  # Base launch power
+                    if abs(dx) > abs(dy):  # Player is more to the side
+                        if dx > 0:  # Player is to the right, launch right
+                            self.player.velocity[0] = launch_power
+                        else:  # Player is to the left, launch left
+                            self.player.velocity[0] = -launch_power
+                    else:  # Player is more above/below, launch based on horizontal position
+                        if dx > 0:  # Player is to the right, launch right
+                            self.player.velocity[0] = launch_power
+                        else:  # Player is to the left, launch left
+                            self.player.velocity[0] = -launch_power
+
+        # Update crates: pushed by the player, then stepped all at once (see scripts/systems.py)
+        pushed = []
+        if not self.dead:
+            pushed = systems.push_system(self.world, self.tilemap, [body.index for body in near_player if isinstance(body, Crate)],
+                                         self.player.rect(), direction).tolist()
+        stepped, active = systems.crate_system(self.world, self.tilemap)
+        # Check portal teleport for crates (sleeping ones are never under a locked portal)
+        systems.teleport_system(self, self.world, active[~self.world.sleeping[active]])
+        for index in set(active.tolist()).union(pushed):
+            self.broadphase.move(objects[index])
+
+        # Update player (with the crates it can reach this frame as colliders)
+        if not self.dead:
+            if not self.player.teleported_this_frame:
+                movement = (self.movement[1] - self.movement[0], 0)
+                margin = 2 + int(abs(movement[0] + self.player.velocity[0]) + abs(self.player.velocity[1]))
+                crates = self.broadphase.query(self.player.rect().inflate(2 * margin, 2 * margin), Crate)
+                self.player.update(self.tilemap, movement, additional_colliders=crates)
+                # Check portal teleport for player
+                if self.check_portal_teleport(self.player):
+                    self.player.teleported_this_frame = True
+            else:
+                self.player.teleported_this_frame = False
+            self.broadphase.move(self.player)
+
+        # Check key collection
+        if not self.dead and not self.transition_active:
+            player_rect = self.player.rect()
+            key_hitbox = self.hitboxes['key']
+            for key_tile in self.keys[:]:  # Use slice to iterate over copy
+                if key_hitbox.collides(key_tile['pos'][0], key_tile['pos'][1], player_rect):
+                    self.has_key = True
+                    # Play key sound
+                    if self.key_sound:
+                        self.key_sound.play()
+                    self.keys.remove(key_tile)
+                    # Also remove from tilemap
+                    if key_tile in self.tilemap.offgrid_tiles:
+                        self.tilemap.offgrid_tiles.remove(key_tile)
+
+        # Check door unlocking
+        if not self.dead and not self.transition_active:
+            player_rect = self.player.rect()
+            door_hitbox = self.hitboxes['door']
+            for door_tile in self.doors[:]:  # Use slice to iterate over copy
+                if door_hitbox.collides(door_tile['pos'][0], door_tile['pos'][1], player_rect) and self.has_key:
+                    # Unlock door (remove it) and trigger win condition
+                    self.doors.remove(door_tile)
+                    # Also remove from tilemap
+                    if door_tile in self.tilemap.offgrid_tiles:
+                        self.tilemap.offgrid_tiles.remove(door_tile)
+                    self.has_key = False  # Key is consumed
+                    self.won = True  # Trigger win condition
+
+        # Check if player reached exit
+        if self.exit_door and self.exit_open:
+            exit_rect = pygame.Rect(self.exit_door['pos'][0], self.exit_door['pos'][1],
+                                    self.exit_door['size'][0], self.exit_door['size'][1])
+            if exit_rect.colliderect(self.player.rect()):
+                self.won = True
+
+        # Update transition
+        if self.transition_active:
+            self.transition_progress += 1.0 / self.transition_duration
+            if self.transition_progress >= 1.0:
+                # Transition complete, perform the action
+                self.transition_active = False
                 self.transition_progress = 0
 
-            # Handle win - show win screen
-            win_fade_alpha = 0
-            if self.won:
-                # Update win screen timer
-                self.win_screen_time += dt
-                
-                # Calculate fade-out: start fading in last 0.3 seconds
-                fade_start_time = self.win_screen_duration - 0.3
-                if self.win_screen_time >= fade_start_time:
-                    fade_progress = min((self.win_screen_time - fade_start_time) / 0.3, 1.0)
-                    win_fade_alpha = int(fade_progress * 255)
-                
-                # Auto-return after win screen duration (and fully faded)
-                if self.win_screen_time >= self.win_screen_duration and win_fade_alpha >= 255:
+                if self.transition_type == 'death':
+                    self.load_level(self.level)
+                    self.dead = 0
+                self.transition_type = None
+
+        # Handle death - start transition if not already active
+        if self.dead and not self.transition_active:
+            self.transition_active = True
+            self.transition_type = 'death'
+            self.transition_progress = 0
+
+        self.camera.follow(self.player.rect())
+
+        if self.fixed_point:
+            self.snap_to_subpixels()
+
+    def stream_chunks(self):
+        """Keep the chunks around the camera of a streamed map loaded (see scripts/chunkstore.py)."""
+        streamer = self.tilemap.streamer
+        if streamer is not None:
+            streamer.update(self.tilemap, self.camera.view_rect(LOAD_MARGIN))
+            # Normally already loaded ahead of time; waits only if the thread fell behind
+            streamer.ensure(self.tilemap, self.camera.view_rect(SIMULATION_MARGIN))
+
+    def player_tile_area(self):
+        """The area around the player searched for spikes, keys, doors and launchers."""
+        # Two tiles of margin covers the key and door images centered on their tiles
+        margin = 4 * self.tilemap.tile_size
+        return self.player.rect().inflate(margin, margin)
+
+    def wake_bodies(self, rect):
+        """Wake the sleeping crates and springs overlapping a rect (see Sleepable)."""
+        for body in self.broadphase.query(rect):
+            if body.sleeping and rect.colliderect(body.rect()):
+                body.wake()
+
+    def snap_to_subpixels(self):
+        """Round everything that moves to whole subpixels (fixed-point mode)."""
+        fixedpoint.snap_entity(self.player)
+        count = self.world.count
+        for array in (self.world.pos, self.world.last_pos, self.world.velocity):
+            fixedpoint.snap_array(array[:count])
+        for portal in (self.player_portal, self.cursor_portal):
+            fixedpoint.snap_vector(portal.pos)
+            fixedpoint.snap_vector(portal.locked_pos)
+        self.transition_progress = fixedpoint.snap(self.transition_progress)
+
+    def state_hash(self):
+        """Platform-independent digest of get_state() (see scripts/fixedpoint.py)."""
+        return fixedpoint.state_hash(self.get_state())
+
+    def pause_text(self, text):
+        """A pause menu text in white, rendered once."""
+        image = self.pause_texts.get(text)
+        if image is None:
+            image = self.pause_font.render(text, False, (255, 255, 255))
+            self.pause_texts[text] = image
+        return image
+
+    def win_screen_draws(self, size):
+        """
+        The win screen's images and positions at window resolution, made on the
+        first call (they never change, so a GPU presenter uploads them once).
+
+        Args:
+            size: (width, height) of the window
+
+        Returns:
+            list: (Surface, position) to draw in order
+        """
+        if self.win_screen_cache is not None and self.win_screen_cache[0] == size:
+            return self.win_screen_cache[1]
+        draws = []
+        # Load winning background image
+        game_dir = os.path.dirname(os.path.abspath(__file__))
+        winning_bg_path = os.path.join(game_dir, 'data', 'homepage-assets', 'winning_bg.png')
+        try:
+            winning_bg = pygame.image.load(winning_bg_path).convert()
+            winning_bg = pygame.transform.scale(winning_bg, size)
+            # Draw winning background to cover the screen
+            draws.append((winning_bg, (0, 0)))
+        except:
+            # Fallback if image not found - show semi-transparent overlay
+            overlay = pygame.Surface(size, pygame.SRCALPHA)
+            overlay.fill((0, 0, 0, 180))
+            draws.append((overlay, (0, 0)))
+
+        # Load fonts for text
+        font_path = os.path.join(game_dir, 'data', 'fonts', 'PressStart2P-vaV7.ttf')
+        try:
+            title_font = pygame.font.Font(font_path, 32)  # Increased from 24 to 32
+            message_font = pygame.font.Font(font_path, 16)  # Increased from 8 to 16 (doubled)
+        except:
+            title_font = pygame.font.Font(None, 64)
+            message_font = pygame.font.Font(None, 48)
+
+        # Helper function to render outlined text
+        def render_outlined(text, font, fg, outline, thickness=2):
+            base = font.render(text, False, fg).convert_alpha()
+            w, h = base.get_size()
+            surf = pygame.Surface((w + thickness * 2, h + thickness * 2), pygame.SRCALPHA)
+            # Outline
+            for ox in range(-thickness, thickness + 1):
+                for oy in range(-thickness, thickness + 1):
+                    if ox * ox + oy * oy <= thickness * thickness:
+                        if ox != 0 or oy != 0:
+                            s = font.render(text, False, outline).convert_alpha()
+                            surf.blit(s, (ox + thickness, oy + thickness))
+            surf.blit(base, (thickness, thickness))
+            return surf
+
+        # Render both texts with outline to get their sizes
+        title_text = "The Goat Prevails!"
+        title_color = (255, 215, 0)  # Gold color for winning
+        title_outline = (0, 0, 0)  # Black outline
+        title_surf = render_outlined(title_text, title_font, title_color, title_outline, thickness=3)
+
+        # Split message into multiple lines to fit on page
+        message_line1 = "You have completed the level!"
+        message_line2 = ""
+        message_color = (255, 215, 0)  # Gold color for winning
+        message_outline = (0, 0, 0)  # Black outline
+        message_surf1 = render_outlined(message_line1, message_font, message_color, message_outline, thickness=2)
+        message_surf2 = render_outlined(message_line2, message_font, message_color, message_outline, thickness=2)
+
+        # Calculate combined message height
+        line_spacing = 10
+        message_total_width = max(message_surf1.get_width(), message_surf2.get_width())
+        message_total_height = message_surf1.get_height() + message_surf2.get_height() + line_spacing
+
+        # Calculate rectangle dimensions to fit both title and message with bigger padding
+        padding = 50  # Increased padding for bigger rectangle
+        spacing = 30  # Space between title and message
+        rect_width = max(title_surf.get_width(), message_total_width) + (padding * 2)
+        rect_height = title_surf.get_height() + message_total_height + spacing + (padding * 2)
+        rect_x = (size[0] - rect_width) // 2
+        rect_y = (size[1] - rect_height) // 2
+
+        # Draw semi-transparent light gray rounded rectangle
+        rect_surf = pygame.Surface((rect_width, rect_height), pygame.SRCALPHA)
+        gray_color = (220, 220, 220)  # Light gray
+        pygame.draw.rect(rect_surf, gray_color, (0, 0, rect_width, rect_height), border_radius=15)
+        rect_surf.set_alpha(220)  # Slightly opaque (about 86% opacity)
+        draws.append((rect_surf, (rect_x, rect_y)))
+
+        # Calculate vertical positions inside the rectangle
+        content_start_y = rect_y + padding
+        title_y = content_start_y
+        message_start_y = title_y + title_surf.get_height() - 6 + spacing  # Adjust for outline offset
+
+        # Render title centered in the rectangle
+        title_x = rect_x + (rect_width - title_surf.get_width()) // 2
+        draws.append((title_surf, (title_x, title_y)))
+
+        # Render message lines centered in the rectangle
+        message_line1_x = rect_x + (rect_width - message_surf1.get_width()) // 2
+        message_line1_y = message_start_y
+        draws.append((message_surf1, (message_line1_x, message_line1_y)))
+
+        message_line2_x = rect_x + (rect_width - message_surf2.get_width()) // 2
+        message_line2_y = message_line1_y + message_surf1.get_height() + line_spacing
+        draws.append((message_surf2, (message_line2_x, message_line2_y)))
+        self.win_screen_cache = (size, draws)
+        return draws
+
+    def update_win_screen(self, dt):
+        """
+        Advance the win screen timer.
+
+        Returns:
+            bool: True once the win screen has fully faded out
+        """
+        # Calculate fade-out: start fading in last 0.3 seconds
+        self.win_screen_time += dt
+        fade_start_time = self.win_screen_duration - 0.3
+        if self.win_screen_time >= fade_start_time:
+            fade_progress = min((self.win_screen_time - fade_start_time) / 0.3, 1.0)
+            self.win_fade_alpha = int(fade_progress * 255)
+
+        # Auto-return after win screen duration (and fully faded)
+        return self.win_screen_time >= self.win_screen_duration and self.win_fade_alpha >= 255
+
+    def handle_event(self, event):
+        """
+        Apply a pygame event to the game.
+
+        Returns:
+            str: "QUIT" or "BACK_TO_SELECT" when the event ends the game, otherwise None
+        """
+        if event.type == pygame.QUIT:
+            return "QUIT"
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                # Escape key returns to level selection
+                return "BACK_TO_SELECT"
+            if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                self.movement[0] = True
+            if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                self.movement[1] = True
+            if event.key == pygame.K_UP or event.key == pygame.K_w or event.key == pygame.K_SPACE:
+                self.jump()
+            if event.key == pygame.K_r:
+                # Restart level
+                self.load_level(self.level)
+            if event.key == pygame.K_p:
+                # Toggle pause
+                self.paused = not self.paused
+            if event.key == pygame.K_q:
+                # Rewind while held
+                self.rewinding = True
+            if event.key == pygame.K_f:
+                # Fast-forward while held
+                self.speed = FAST_FORWARD_SPEED
+            # Enter portal mode when shift is pressed - automatically enters red mode
+            # Only if cursor is not in a blocked zone
+            if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
+                self.enter_portal_mode()
+        if event.type == pygame.KEYUP:
+            if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                self.movement[0] = False
+            if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                self.movement[1] = False
+            if event.key == pygame.K_q:
+                self.rewinding = False
+                self.sync_portal_mode()
+            if event.key == pygame.K_f:
+                self.speed = 1.0
+            # Exit portal mode when shift is released
+            if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
+                self.exit_portal_mode()
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            # Handle pause menu clicks
+            if self.paused and event.button == 1:  # Left click
+                # Convert screen coordinates to display coordinates
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+                display_x = int((mouse_x / self.presenter.size[0]) * self.display.get_width())
+                display_y = int((mouse_y / self.presenter.size[1]) * self.display.get_height())
+                display_pos = (display_x, display_y)
+
+                if self.resume_button_rect.collidepoint(display_pos):
+                    self.paused = False
+                elif self.quit_button_rect.collidepoint(display_pos):
+                    # Return to level selection
                     return "BACK_TO_SELECT"
+            # Only handle portal color cycling if in portal mode (shift held)
+            elif event.button == 1:  # Left click - switch to red portal
+                self.set_portal_color('red')
+            elif event.button == 3:  # Right click - switch to white portal
+                self.set_portal_color('white')
+        return None
+
+    def button_image(self, size, pressed):
+        """A button drawn as a solid image (green when pressed, red otherwise), made once per size."""
+        key = (tuple(size), bool(pressed))
+        img = self.button_images.get(key)
+        if img is None:
+            img = pygame.Surface(key[0])
+            img.fill((0, 255, 0) if pressed else (255, 0, 0))
+            self.button_images[key] = img
+        return img
+
+    def render(self, alpha=1.0):
+        """
+        Draw the current frame to the window.
+
+        Args:
+            alpha: Where to draw moving objects between their previous and current
+                simulation step (see interpolation_alpha); 1.0 draws the current state
+        """
+        # Predicted paths while the portals are locked, from the simulation state
+        # (before the positions are interpolated below)
+        trajectories = self.preview.trajectories() if self.portal_mode else []
+
+        # Temporarily move entities to their interpolated positions for drawing
+        real_positions = []
+        if alpha < 1.0:
+            for obj, x, y in self.previous_positions:
+                if abs(obj.pos[0] - x) <= INTERPOLATION_SNAP and abs(obj.pos[1] - y) <= INTERPOLATION_SNAP:
+                    real_positions.append((obj, obj.pos))
+                    obj.pos = [x + (obj.pos[0] - x) * alpha, y + (obj.pos[1] - y) * alpha]
+        # Crates and springs: the whole world at once (its positions are restored below)
+        real_world_pos = None
+        count = self.world.count
+        if alpha < 1.0 and self.previous_world_pos is not None and len(self.previous_world_pos) == count:
+            real_world_pos = self.world.pos[:count].copy()
+            previous = self.previous_world_pos
+            moved = real_world_pos - previous
+            near = (np.abs(moved) <= INTERPOLATION_SNAP).all(axis=1)
+            self.world.pos[:count][near] = previous[near] + moved[near] * alpha
+
+        canvas = self.canvas
+        display = self.layer  # Sprites, drawn onto the frame below
+        display.fill((0, 0, 0, 0))
+        canvas.blit(self.assets['background'], (0, 0))
+
+        render_scroll = self.camera.render_scroll(alpha)
+        self.render_scroll = render_scroll
+        # Only what is in view is drawn (moving bodies are looked up in the broadphase,
+        # whose cells lag their interpolated positions by up to INTERPOLATION_SNAP)
+        view = pygame.Rect(render_scroll, display.get_size())
+        nearby = self.broadphase.query(view.inflate(2 * INTERPOLATION_SNAP, 2 * INTERPOLATION_SNAP), (Crate, Spring))
+
+        # Render tilemap
+        self.tilemap.render(display, offset=render_scroll)
+
+        ox, oy = render_scroll
+
+        # Render tutorial hints
+        hints = []
+        for hint in self.tutorial_hints:
+            img = self.assets[hint['image']][0]
+            if view.colliderect((hint['pos'][0], hint['pos'][1], img.get_width(), img.get_height())):
+                hints.append((img, (hint['pos'][0] - ox, hint['pos'][1] - oy)))
+        display.blits(hints, doreturn=False)
+
+        # Render crates (the box image Crate.render draws)
+        box_img = self.assets['box']
+        display.blits([(box_img, (body.pos[0] - ox, body.pos[1] - oy)) for body in nearby if isinstance(body, Crate)], doreturn=False)
+
+        # Render player
+        if not self.dead:
+            self.player.render(display, offset=render_scroll)
+
+        # Buttons (solid images of the color pygame.draw.rect used to fill them with)
+        display.blits([(self.button_image(button.size, button.pressed), (button.pos[0] - ox, button.pos[1] - oy))
+                       for button in self.buttons
+                       if view.colliderect((button.pos[0], button.pos[1], button.size[0], button.size[1]))], doreturn=False)
+
+        # Springs (the base image Spring.render draws)
+        display.blits([(body.base_image, (body.pos[0] - ox, body.pos[1] - oy)) for body in nearby if isinstance(body, Spring)], doreturn=False)
+
+        # Exit door
+        if self.exit_door:
+            exit_rect = pygame.Rect(self.exit_door['pos'][0] - render_scroll[0], 
+                                  self.exit_door['pos'][1] - render_scroll[1], 
+                                  self.exit_door['size'][0], self.exit_door['size'][1])
+            color = (0, 255, 0) if self.exit_open else (100, 100, 100)
+            draw_rect(display, color, exit_rect)
+
+        # Render portals - always show both portals (squares around player and cursor)
+        self.player_portal.render(display, offset=render_scroll)
+        # Only render cursor portal if it's not in a noportalzone and not fully encompassed by solid tiles
+        if not self.cursor_portal_in_noportalzone and not self.cursor_portal_encompassed_by_solid and not self.cursor_over_solid:
+            self.cursor_portal.render(display, offset=render_scroll)
+        self.preview.render(display, trajectories, offset=render_scroll)
+
+        canvas.blit(display, (0, 0))
+
+        is_level_1 = (isinstance(self.level, int) and self.level == 1) or \
+                     (isinstance(self.level, str) and self.level.endswith('level1.json'))
+
+        if not is_level_1:
+            # Render control images in top right corner
+            control_spacing = 5  # Spacing between control images
+            control_y = 5  # Top margin
+
+            # Calculate total width of all control images + spacing
+            total_width = sum(img.get_width() for img in self.control_images) + (control_spacing * (len(self.control_images) - 1))
+            control_start_x = canvas.get_width() - total_width - 5  # 5px margin from right edge
+
+            # Draw control images from left to right
+            current_x = control_start_x
+            for img in self.control_images:
+                canvas.blit(img, (current_x, control_y))
+                current_x += img.get_width() + control_spacing
+
+        # Render transition overlay (only for death, not win)
+        if self.transition_active and self.transition_type != 'win':
+            # Calculate fade alpha: fade in to black (0 -> 255) in first half, stay black in second half
+            if self.transition_progress < 0.5:
+                # Fade in: 0 to 1 (0% to 50% of transition)
+                fade_alpha = int((self.transition_progress / 0.5) * 255)
+            else:
+                # Stay black: 1 (50% to 100% of transition)
+                fade_alpha = 255
+
+            # Black overlay surface (one, so a GPU canvas keeps its texture)
+            self.black_overlay.set_alpha(fade_alpha)
+            canvas.blit(self.black_overlay, (0, 0))
+
+        # Render pause menu overlay
+        if self.paused:
+            # Semi-transparent dark overlay
+            self.black_overlay.set_alpha(180)
+            canvas.blit(self.black_overlay, (0, 0))
+
+            # Draw pause menu buttons
+            def draw_pause_button(rect, text):
+                # Draw button background
+                draw_rect(canvas, (50, 50, 50), rect)
+                draw_rect(canvas, (255, 255, 255), rect, 2)
+                # Draw button text
+                button_text = self.pause_text(text)
+                text_x = rect.centerx - button_text.get_width() // 2
+                text_y = rect.centery - button_text.get_height() // 2
+                canvas.blit(button_text, (text_x, text_y))
+
+            # Draw "PAUSED" title
+            paused_text = self.pause_text("PAUSED")
+            paused_x = canvas.get_width() // 2 - paused_text.get_width() // 2
+            paused_y = self.resume_button_rect.y - 40
+            canvas.blit(paused_text, (paused_x, paused_y))
+
+            # Scale button rects to display_2 coordinates
+            resume_rect = pygame.Rect(
+                int(self.resume_button_rect.x * (canvas.get_width() / self.display.get_width())),
+                int(self.resume_button_rect.y * (canvas.get_height() / self.display.get_height())),
+                int(self.resume_button_rect.width * (canvas.get_width() / self.display.get_width())),
+                int(self.resume_button_rect.height * (canvas.get_height() / self.display.get_height()))
+            )
+            quit_rect = pygame.Rect(
+                int(self.quit_button_rect.x * (canvas.get_width() / self.display.get_width())),
+                int(self.quit_button_rect.y * (canvas.get_height() / self.display.get_height())),
+                int(self.quit_button_rect.width * (canvas.get_width() / self.display.get_width())),
+                int(self.quit_button_rect.height * (canvas.get_height() / self.display.get_height()))
+            )
+
+            draw_pause_button(resume_rect, "RESUME")
+            draw_pause_button(quit_rect, "QUIT")
+
+        self.presenter.draw_frame(canvas)
+
+        # Render win screen overlay
+        if self.won:
+            screen = self.presenter.overlay()
+            screen.blits(self.win_screen_draws(screen.get_size()), doreturn=False)
+
+            # Apply fade-out overlay if fading
+            if self.win_fade_alpha > 0:
+                if self.win_fade_overlay is None or self.win_fade_overlay.get_size() != screen.get_size():
+                    self.win_fade_overlay = pygame.Surface(screen.get_size())
+                self.win_fade_overlay.set_alpha(self.win_fade_alpha)
+                screen.blit(self.win_fade_overlay, (0, 0))
+
+
+        # Render custom cursor at mouse position (centered)
+        # Use no_cursor image if portal placement is blocked
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        if self.cursor_over_solid or self.cursor_in_noportalzone or self.cursor_portal_in_noportalzone:
+            current_cursor = self.no_cursor_img
+        else:
+            current_cursor = self.cursor_img
+        cursor_x = mouse_x - current_cursor.get_width() // 2
+        cursor_y = mouse_y - current_cursor.get_height() // 2
+        self.presenter.draw_image(current_cursor, (cursor_x, cursor_y))
 
-            self.display_2.blit(self.display, (0, 0))
+        for obj, pos in real_positions:
+            obj.pos = pos
+        if real_world_pos is not None:
+            self.world.pos[:len(real_world_pos)] = real_world_pos
 
-            is_level_1 = (isinstance(self.level, int) and self.level == 1) or \
-                         (isinstance(self.level, str) and self.level.endswith('level1.json'))
+    def run(self):
+        try:
+            game_dir = os.path.dirname(os.path.abspath(__file__))
+            music_path = os.path.join(game_dir, 'data', 'audio', 'level_music.mp3')
+            if os.path.exists(music_path):
+                pygame.mixer.music.load(music_path)
+                pygame.mixer.music.set_volume(0.5)
+                pygame.mixer.music.play(-1)
+        except:
+            pass  # Music file might not exist
 
-            if not is_level_1:
-                # Render control images in top right corner
-                control_spacing = 5  # Spacing between control images
-                control_y = 5  # Top margin
-                
-                # Calculate total width of all control images + spacing
-                total_width = sum(img.get_width() for img in self.control_images) + (control_spacing * (len(self.control_images) - 1))
-                control_start_x = self.display_2.get_width() - total_width - 5  # 5px margin from right edge
-                
-                # Draw control images from left to right
-                current_x = control_start_x
-                for img in self.control_images:
-                    self.display_2.blit(img, (current_x, control_y))
-                    current_x += img.get_width() + control_spacing
-
-            # Render transition overlay (only for death, not win)
-            if self.transition_active and self.transition_type != 'win':
-                # Calculate fade alpha: fade in to black (0 -> 255) in first half, stay black in second half
-                if self.transition_progress < 0.5:
-                    # Fade in: 0 to 1 (0% to 50% of transition)
-                    fade_alpha = int((self.transition_progress / 0.5) * 255)
+        # The loop only ends by returning; a streamed map's loading thread stops with it
+        try:
+            dt = 0.0  # Delta time for frame updates
+            while True:
+                dt = self.clock.tick(60) / 1000.0  # Get dt from tick
+
+                # Update mouse position (scaled to display size), in the world as last drawn
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+                self.mouse_pos[0] = (mouse_x / self.presenter.size[0]) * self.display.get_width() + self.render_scroll[0]
+                self.mouse_pos[1] = (mouse_y / self.presenter.size[1]) * self.display.get_height() + self.render_scroll[1]
+
+                # Only update game logic if not paused
+                if not self.paused:
+                    # Fixed-timestep simulation, however long this frame took
+                    self.advance(dt)
                 else:
-                    # Stay black: 1 (50% to 100% of transition)
-                    fade_alpha = 255
-
-                # Create overlay surface
-                overlay = pygame.Surface(self.display_2.get_size())
-                overlay.fill((0, 0, 0))
-                overlay.set_alpha(fade_alpha)
-                self.display_2.blit(overlay, (0, 0))
-
-            # Render pause menu overlay
-            if self.paused:
-                # Semi-transparent dark overlay
-                pause_overlay = pygame.Surface(self.display_2.get_size())
-                pause_overlay.fill((0, 0, 0))
-                pause_overlay.set_alpha(180)
-                self.display_2.blit(pause_overlay, (0, 0))
-                
-                # Draw pause menu buttons
-                def draw_pause_button(rect, text):
-                    # Draw button background
-                    pygame.draw.rect(self.display_2, (50, 50, 50), rect)
-                    pygame.draw.rect(self.display_2, (255, 255, 255), rect, 2)
-                    # Draw button text
-                    button_text = self.pause_font.render(text, False, (255, 255, 255))
-                    text_x = rect.centerx - button_text.get_width() // 2
-                    text_y = rect.centery - button_text.get_height() // 2
-                    self.display_2.blit(button_text, (text_x, text_y))
-                
-                # Draw "PAUSED" title
-                paused_text = self.pause_font.render("PAUSED", False, (255, 255, 255))
-                paused_x = self.display_2.get_width() // 2 - paused_text.get_width() // 2
-                paused_y = self.resume_button_rect.y - 40
-                self.display_2.blit(paused_text, (paused_x, paused_y))
-                
-                # Scale button rects to display_2 coordinates
-                resume_rect = pygame.Rect(
-                    int(self.resume_button_rect.x * (self.display_2.get_width() / self.display.get_width())),
-                    int(self.resume_button_rect.y * (self.display_2.get_height() / self.display.get_height())),
-                    int(self.resume_button_rect.width * (self.display_2.get_width() / self.display.get_width())),
-                    int(self.resume_button_rect.height * (self.display_2.get_height() / self.display.get_height()))
-                )
-                quit_rect = pygame.Rect(
-                    int(self.quit_button_rect.x * (self.display_2.get_width() / self.display.get_width())),
-                    int(self.quit_button_rect.y * (self.display_2.get_height() / self.display.get_height())),
-                    int(self.quit_button_rect.width * (self.display_2.get_width() / self.display.get_width())),
-                    int(self.quit_button_rect.height * (self.display_2.get_height() / self.display.get_height()))
-                )
-                
-                draw_pause_button(resume_rect, "RESUME")
-                draw_pause_button(quit_rect, "QUIT")
-
-            self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), (0, 0))
-            
-            # Render win screen overlay
-            if self.won:
-                # Load winning background image
-                game_dir = os.path.dirname(os.path.abspath(__file__))
-                winning_bg_path = os.path.join(game_dir, 'data', 'homepage-assets', 'winning_bg.png')
-                try:
-                    winning_bg = pygame.image.load(winning_bg_path).convert()
-                    winning_bg = pygame.transform.scale(winning_bg, self.screen.get_size())
-                    # Draw winning background to cover the screen
-                    self.screen.blit(winning_bg, (0, 0))
-                except:
-                    # Fallback if image not found - show semi-transparent overlay
-                    overlay = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
-                    overlay.fill((0, 0, 0, 180))
-                    self.screen.blit(overlay, (0, 0))
-                
-                # Load fonts for text
-                font_path = os.path.join(game_dir, 'data', 'fonts', 'PressStart2P-vaV7.ttf')
-                try:
-                    title_font = pygame.font.Font(font_path, 32)  # Increased from 24 to 32
-                    message_font = pygame.font.Font(font_path, 16)  # Increased from 8 to 16 (doubled)
-                except:
-                    title_font = pygame.font.Font(None, 64)
-                    message_font = pygame.font.Font(None, 48)
-                
-                # Helper function to render outlined text
-                def render_outlined(text, font, fg, outline, thickness=2):
-                    base = font.render(text, False, fg).convert_alpha()
-                    w, h = base.get_size()
-                    surf = pygame.Surface((w + thickness * 2, h + thickness * 2), pygame.SRCALPHA)
-                    # Outline
-                    for ox in range(-thickness, thickness + 1):
-                        for oy in range(-thickness, thickness + 1):
-                            if ox * ox + oy * oy <= thickness * thickness:
-                                if ox != 0 or oy != 0:
-                                    s = font.render(text, False, outline).convert_alpha()
-                                    surf.blit(s, (ox + thickness, oy + thickness))
-                    surf.blit(base, (thickness, thickness))
-                    return surf
-                
-                # Render both texts with outline to get their sizes
-                title_text = "The Goat Prevails!"
-                title_color = (255, 215, 0)  # Gold color for winning
-                title_outline = (0, 0, 0)  # Black outline
-                title_surf = render_outlined(title_text, title_font, title_color, title_outline, thickness=3)
-                
-                # Split message into multiple lines to fit on page
-                message_line1 = "You have completed the level!"
-                message_line2 = ""
-                message_color = (255, 215, 0)  # Gold color for winning
-                message_outline = (0, 0, 0)  # Black outline
-                message_surf1 = render_outlined(message_line1, message_font, message_color, message_outline, thickness=2)
-                message_surf2 = render_outlined(message_line2, message_font, message_color, message_outline, thickness=2)
-                
-                # Calculate combined message height
-                line_spacing = 10
-                message_total_width = max(message_surf1.get_width(), message_surf2.get_width())
-                message_total_height = message_surf1.get_height() + message_surf2.get_height() + line_spacing
-                
-                # Calculate rectangle dimensions to fit both title and message with bigger padding
-                padding = 50  # Increased padding for bigger rectangle
-                spacing = 30  # Space between title and message
-                rect_width = max(title_surf.get_width(), message_total_width) + (padding * 2)
-                rect_height = title_surf.get_height() + message_total_height + spacing + (padding * 2)
-                rect_x = (self.screen.get_width() - rect_width) // 2
-                rect_y = (self.screen.get_height() - rect_height) // 2
-                
-                # Draw semi-transparent light gray rounded rectangle
-                rect_surf = pygame.Surface((rect_width, rect_height), pygame.SRCALPHA)
-                gray_color = (220, 220, 220)  # Light gray
-                pygame.draw.rect(rect_surf, gray_color, (0, 0, rect_width, rect_height), border_radius=15)
-                rect_surf.set_alpha(220)  # Slightly opaque (about 86% opacity)
-                self.screen.blit(rect_surf, (rect_x, rect_y))
-                
-                # Calculate vertical positions inside the rectangle
-                content_start_y = rect_y + padding
-                title_y = content_start_y
-                message_start_y = title_y + title_surf.get_height() - 6 + spacing  # Adjust for outline offset
-                
-                # Render title centered in the rectangle
-                title_x = rect_x + (rect_width - title_surf.get_width()) // 2
-                self.screen.blit(title_surf, (title_x, title_y))
-                
-                # Render message lines centered in the rectangle
-                message_line1_x = rect_x + (rect_width - message_surf1.get_width()) // 2
-                message_line1_y = message_start_y
-                self.screen.blit(message_surf1, (message_line1_x, message_line1_y))
-                
-                message_line2_x = rect_x + (rect_width - message_surf2.get_width()) // 2
-                message_line2_y = message_line1_y + message_surf1.get_height() + line_spacing
-                self.screen.blit(message_surf2, (message_line2_x, message_line2_y))
-                
-                # Apply fade-out overlay if fading
-                if win_fade_alpha > 0:
-                    fade_overlay = pygame.Surface(self.screen.get_size())
-                    fade_overlay.fill((0, 0, 0))
-                    fade_overlay.set_alpha(win_fade_alpha)
-                    self.screen.blit(fade_overlay, (0, 0))
-            
-            # Render custom cursor at mouse position (centered)
-            # Use no_cursor image if portal placement is blocked
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            if cursor_over_solid or cursor_in_noportalzone or cursor_portal_in_noportalzone:
-                current_cursor = self.no_cursor_img
-            else:
-                current_cursor = self.cursor_img
-            cursor_x = mouse_x - current_cursor.get_width() // 2
-            cursor_y = mouse_y - current_cursor.get_height() // 2
-            self.screen.blit(current_cursor, (cursor_x, cursor_y))
-            
-            pygame.display.update()
+                    # When paused, portals can't be placed
+                    self.sim_accumulator = 0.0
+                    self.update_cursor_state()
+                    self.cursor_portal_in_noportalzone = False
+                    self.cursor_portal_encompassed_by_solid = False
+                    self.portal_placement_blocked = False
+
+                self.render(self.interpolation_alpha() if not self.paused else 1.0)
+
+                # Handle events
+                for event in pygame.event.get():
+                    result = self.handle_event(event)
+                    if result:
+                        return result
+
+                # Handle win - show win screen
+                if self.won and self.update_win_screen(dt):
+                    return "BACK_TO_SELECT"
+
+                self.presenter.present()
+        finally:
+            self.tilemap.stop_streaming()
 
 
 if __name__ == "__main__":
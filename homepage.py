@@ -20,12 +20,23 @@ import json
 import random
 from google import genai
 
+from scripts.streaming import LevelStreamParser, LevelStreamError
+from scripts.reachability import analyze_level
+from scripts.validation import validate_level, LevelValidationError
+from scripts import procgen
+from scripts.presenter import get_presenter, draw_rect
+from scripts.pixelformat import optimise_assets
+
 try:
     from dotenv import load_dotenv
     load_dotenv()  # Load .env file if it exists
 except ImportError:
     pass
 
+# Level generator used by the "Generate level" buttons: "gemini" or "procedural"
+LEVEL_GENERATOR = os.environ.get('LEVEL_GENERATOR', 'gemini')
+PROCEDURAL_CANDIDATES = 64  # Candidates generated per procedural level
+
 
 class Homepage:
     def __init__(self):
@@ -33,8 +44,13 @@ class Homepage:
 
         # Window and display configuration (matching game.py style)
         pygame.display.set_caption('The Time I Reincarnated as a Teleporting Goat in a 2D Puzzle Platformer')
-        self.screen = pygame.display.set_mode((960, 640))
-        self.display = pygame.Surface((540, 380), pygame.SRCALPHA)
+        self.presenter = get_presenter((960, 640))  # The window (see scripts/presenter.py)
+        # The pixel canvas: the Surface itself in software, a GPU canvas with the same drawing methods otherwise
+        frame = pygame.Surface((540, 380), pygame.SRCALPHA)
+        self.display = self.presenter.frame_canvas(frame)
+        # Kept rather than rebuilt each frame so the renderer backend uploads it once
+        self.loading_overlay = pygame.Surface(self.display.get_size())
+        self.loading_overlay.set_alpha(200)
 
         self.clock = pygame.time.Clock()
 
@@ -86,6 +102,15 @@ class Homepage:
         bubble_height = int(speech_bubble_raw.get_height() * bubble_scale)
         self.speech_bubble = pygame.transform.scale(speech_bubble_raw, (bubble_width, bubble_height))
 
+        # Same pixels, fastest blit path onto the display (see scripts/pixelformat.py)
+        images = {'background': self.background, 'shocked_goat': self.shocked_goat,
+                  'surprised_goat': self.surprised_goat, 'speech_bubble': self.speech_bubble}
+        optimise_assets(images, {}, frame)
+        self.background = images['background']
+        self.shocked_goat = images['shocked_goat']
+        self.surprised_goat = images['surprised_goat']
+        self.speech_bubble = images['speech_bubble']
+
         # Fonts - Using Press Start 2P for title and buttons
         font_path_press_start = os.path.join(game_dir, 'data', 'fonts', 'PressStart2P-vaV7.ttf')
         self.font = pygame.font.Font(font_path_press_start, 8)          # buttons / small text
@@ -284,7 +309,7 @@ class Homepage:
 
     def _draw_particles(self):
         for p in self.particles:
-            pygame.draw.rect(self.display, (255, 255, 255), (int(p["x"]), int(p["y"]), 3, 3))
+            draw_rect(self.display, (255, 255, 255), (int(p["x"]), int(p["y"]), 3, 3))
 
     # -----------------------------
     # Update / Render
@@ -571,10 +596,7 @@ class Homepage:
 
         # Loading overlay
         if self.is_loading:
-            overlay = pygame.Surface(self.display.get_size())
-            overlay.fill((0, 0, 0))
-            overlay.set_alpha(200)
-            self.display.blit(overlay, (0, 0))
+            self.display.blit(self.loading_overlay, (0, 0))
 
             loading_surface = self.font.render(self.loading_text, False, (255, 255, 255))
             loading_x = self.display.get_width() // 2 - loading_surface.get_width() // 2
@@ -589,8 +611,8 @@ class Homepage:
             return
 
         self.mouse_pos = mouse_pos
-        display_x = int((mouse_pos[0] / self.screen.get_width()) * self.display.get_width())
-        display_y = int((mouse_pos[1] / self.screen.get_height()) * self.display.get_height())
+        display_x = int((mouse_pos[0] / self.presenter.size[0]) * self.display.get_width())
+        display_y = int((mouse_pos[1] / self.presenter.size[1]) * self.display.get_height())
         display_pos = (display_x, display_y)
 
         self.hovered_button = None
@@ -608,8 +630,8 @@ class Homepage:
         if not title_complete:
             return None
 
-        display_x = int((mouse_pos[0] / self.screen.get_width()) * self.display.get_width())
-        display_y = int((mouse_pos[1] / self.screen.get_height()) * self.display.get_height())
+        display_x = int((mouse_pos[0] / self.presenter.size[0]) * self.display.get_width())
+        display_y = int((mouse_pos[1] / self.presenter.size[1]) * self.display.get_height())
         display_pos = (display_x, display_y)
 
         self.clicked_button = self.hovered_button
@@ -631,13 +653,88 @@ class Homepage:
         return None
 
 
-def generate_level_with_gemini(difficulty="medium", theme="classic puzzle"):
+def save_generated_level(map_data, prefix):
+    """
+    Save a generated level as data/maps/<prefix><N>.json with the next free number.
+
+    Returns:
+        str: Path to the saved level
+    """
+    game_dir = os.path.dirname(os.path.abspath(__file__))
+    maps_dir = os.path.join(game_dir, 'data', 'maps')
+
+    # Find the next available numbered filename
+    counter = 1
+    while True:
+        filename = f'{prefix}{counter}.json'
+        generated_map_path = os.path.join(maps_dir, filename)
+        if not os.path.exists(generated_map_path):
+            break
+        counter += 1
+
+    with open(generated_map_path, 'w', encoding='utf-8') as f:
+        json.dump(map_data, f)
+    return generated_map_path
+
+
+def generate_level(difficulty="medium", theme="classic puzzle", on_progress=None, backend=None):
+    """
+    Generate a level with the selected backend.
+
+    Args:
+        difficulty: "easy", "medium", or "hard"
+        theme: A theme description for the level (Gemini only)
+        on_progress: Optional progress callback (Gemini only, see generate_level_with_gemini)
+        backend: "gemini" or "procedural" (defaults to the LEVEL_GENERATOR environment variable)
+
+    Returns:
+        str: Path to the generated level JSON file, or None if generation failed
+    """
+    backend = backend or LEVEL_GENERATOR
+    if backend == "procedural":
+        return generate_level_procedurally(difficulty)
+    return generate_level_with_gemini(difficulty, theme, on_progress=on_progress)
+
+
+def generate_level_procedurally(difficulty="medium", candidates=PROCEDURAL_CANDIDATES):
+    """
+    Generate a level offline with scripts/procgen.py.
+
+    Args:
+        difficulty: "easy", "medium", or "hard"
+        candidates: Number of candidates to generate (across a process pool) before picking one
+
+    Returns:
+        str: Path to the generated level JSON file, or None if generation failed
+    """
+    try:
+        levels = procgen.generate_candidates(candidates, difficulty, seed=procgen.random_seed())
+        if not levels:
+            print(f"None of the {candidates} procedural candidates were solvable")
+            return None
+        map_data = procgen.pick_level(levels, difficulty)
+        generated_map_path = save_generated_level(map_data, 'procgen')
+        print(f"Procedural level (seed {map_data['validation']['generator']['seed']}) saved to: {generated_map_path}")
+        return generated_map_path
+
+    except Exception as e:
+        print(f"Error generating level procedurally: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def generate_level_with_gemini(difficulty="medium", theme="classic puzzle", stream=True, on_progress=None):
     """
     Generate a level using the Gemini API.
 
     Args:
         difficulty: "easy", "medium", or "hard"
         theme: A theme description for the level
+        stream: Consume the response in chunks and parse it as it arrives, aborting
+                as soon as the output is malformed
+        on_progress: Optional callback(parser) called after every streamed chunk, used by
+                     the loading screens to draw a partial preview
 
     Returns:
         str: Path to the generated level JSON file, or None if generation failed
@@ -697,38 +794,48 @@ Generate a [DIFFICULTY: {difficulty}] puzzle map with the theme: {theme}
 Return ONLY the JSON object, no markdown formatting, no code blocks, just the raw JSON starting with {{ and ending with }}.
 Increase the door's x and y position by one."""
 
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=prompt
-        )
-
-        response_text = response.text.strip()
-
-        if response_text.startswith("```"):
-            lines = response_text.split('\n')
-            response_text = '\n'.join(lines[1:-1])
+        parser = LevelStreamParser()
+        if stream:
+            response_stream = client.models.generate_content_stream(
+                model="gemini-3-flash-preview",
+                contents=prompt
+            )
+            try:
+                for chunk in response_stream:
+                    if chunk.text:
+                        parser.feed(chunk.text)
+                        if on_progress:
+                            on_progress(parser)
+            finally:
+                # Stop reading the response as soon as parsing fails
+                if hasattr(response_stream, 'close'):
+                    response_stream.close()
+        else:
+            response = client.models.generate_content(
+                model="gemini-3-flash-preview",
+                contents=prompt
+            )
+            parser.feed(response.text)
 
-        response_text = response_text.strip()
+        map_data, report = validate_level(parser.finish())
+        if report['repairs']:
+            print(f"Repaired generated level ({len(report['repairs'])} fixes)")
 
-        game_dir = os.path.dirname(os.path.abspath(__file__))
-        maps_dir = os.path.join(game_dir, 'data', 'maps')
-        
-        # Find the next available numbered filename
-        counter = 1
-        while True:
-            filename = f'gemini{counter}.json'
-            generated_map_path = os.path.join(maps_dir, filename)
-            if not os.path.exists(generated_map_path):
-                break
-            counter += 1
-        
-        # Save the raw JSON response to file
-        with open(generated_map_path, 'w', encoding='utf-8') as f:
-            f.write(response_text)
+        # Cheaply reject levels that cannot be finished
+        report['reachability'] = analyze_level(map_data)
+        if not report['reachability']['solvable']:
+            print("Gemini returned a level that cannot be finished, discarding it")
+            return None
 
+        # Save the parsed level (only reached if the whole response was valid)
+        generated_map_path = save_generated_level(map_data, 'gemini')
         print(f"Level JSON response saved to: {generated_map_path}")
         return generated_map_path
 
+    except (LevelStreamError, LevelValidationError) as e:
+        print(f"Gemini returned a malformed level, discarding it: {e}")
+        return None
+
     except Exception as e:
         print(f"Error generating level with Gemini API: {e}")
         import traceback
@@ -767,13 +874,21 @@ def run_homepage():
                     homepage.is_loading = True
 
                     homepage.render()
-                    scaled_display = pygame.transform.scale(homepage.display, homepage.screen.get_size())
-                    homepage.screen.blit(scaled_display, (0, 0))
-                    pygame.display.update()
+                    homepage.presenter.draw_frame(homepage.display)
+                    homepage.presenter.present()
+
+                    def show_progress(parser):
+                        tile_count = len(parser.tilemap) + len(parser.offgrid)
+                        homepage.loading_text = f"Generating level... {tile_count} tiles"
+                        pygame.event.pump()  # Keep the window responsive while streaming
+                        homepage.render()
+                        homepage.presenter.draw_frame(homepage.display)
+                        homepage.presenter.present()
 
-                    generated_path = generate_level_with_gemini()
+                    generated_path = generate_level(on_progress=show_progress)
 
                     homepage.is_loading = False
+                    homepage.loading_text = "Generating level..."
 
                     if generated_path:
                         return "GENERATE_LEVEL"
@@ -788,9 +903,8 @@ def run_homepage():
                     return choice
 
         homepage.render()
-        scaled_display = pygame.transform.scale(homepage.display, homepage.screen.get_size())
-        homepage.screen.blit(scaled_display, (0, 0))
-        pygame.display.update()
+        homepage.presenter.draw_frame(homepage.display)
+        homepage.presenter.present()
 
 
 if __name__ == "__main__":
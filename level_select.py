@@ -2,7 +2,7 @@
 Level selection screen with:
 - Toggle between Developer and Gemini maps
 - Level grid with circular buttons ("Level 01", etc.)
-- Level preview panel on the right
+- Level preview panel on the right, with a difficulty badge from scripts/reachability.py
 - Play, Exit, Back options (homepage style, smaller)
 """
 import os
@@ -10,11 +10,23 @@ import json
 import pygame
 import glob
 from scripts.utils import load_image, load_images, Animation
-from homepage import generate_level_with_gemini
+from scripts.pixelformat import optimise_assets, optimise_image
+from scripts.reachability import analyze_level, ANALYSIS_VERSION
+from scripts.presenter import get_presenter, draw_rect
+from homepage import generate_level
 
+PREVIEW_LEVEL_SIZE = (544, 384)  # What _render_level_data draws, before scaling (34x24 tiles)
 
-def _load_level_preview_assets(game_dir):
-    """Load minimal assets needed for level preview rendering."""
+
+def _load_level_preview_assets(game_dir, optimise_formats=True):
+    """
+    Load minimal assets needed for level preview rendering.
+
+    Args:
+        game_dir: Directory of the game
+        optimise_formats: Convert the images to the pixel formats that blit fastest
+                          onto the previews (see scripts/pixelformat.py)
+    """
     assets = {
         'decor': load_images('tiles/decor'),
         'grass': load_images('tiles/grass'),
@@ -37,6 +49,9 @@ def _load_level_preview_assets(game_dir):
     assets['door'] = [door_img]
     key_img = pygame.transform.scale(load_image('tiles/key.png'), (48, 48))
     assets['key'] = [key_img]
+    if optimise_formats:
+        # Same pixels, fastest blit path onto the opaque surface _render_level_data draws on
+        optimise_assets(assets, {}, pygame.Surface(PREVIEW_LEVEL_SIZE))
     return assets
 
 
@@ -47,18 +62,35 @@ def _render_level_preview(level_path, width, height, assets, game_dir):
             data = json.load(f)
     except Exception:
         return None
+    return _render_level_data(data, width, height, assets)
+
+
+def _analyze_level_file(level_path):
+    """Reachability report of a level (the one saved at generation time, if it is current)."""
+    try:
+        with open(level_path, 'r') as f:
+            data = json.load(f)
+        reachability = data.get('validation', {}).get('reachability')
+        if reachability and reachability.get('version') == ANALYSIS_VERSION:
+            return reachability
+        return analyze_level(data)
+    except Exception as e:
+        print(f"Error analysing level {level_path}: {e}")
+        return None
+
 
+def _render_level_data(data, width, height, assets):
+    """Render already-parsed level data (possibly still partial) to a preview surface."""
     tilemap = data.get('tilemap', {})
     offgrid = data.get('offgrid', [])
     tile_size = data.get('tile_size', 16)
 
-    # Level is typically 34x24 tiles = 544x384
-    level_w = 544
-    level_h = 384
-    preview = pygame.Surface((level_w, level_h))
+    preview = pygame.Surface(PREVIEW_LEVEL_SIZE)
     preview.blit(assets['background'], (0, 0))
 
-    # Render tilemap tiles
+    # Render tilemap tiles, collected into one blits call
+    blits = []
+    rotated_spikes = {}  # rotation -> spike image
     for loc, tile in tilemap.items():
         pos = tile['pos']
         x, y = pos[0] * tile_size, pos[1] * tile_size
@@ -69,27 +101,32 @@ def _render_level_preview(level_path, width, height, assets, game_dir):
 
         if tile_type in assets and tile_type not in ('spikes', 'spring_horizontal', 'red_box', 'door', 'key', 'noportalzone'):
             img = assets[tile_type][min(variant, len(assets[tile_type]) - 1)]
-            preview.blit(img, (x, y))
+            blits.append((img, (x, y)))
         elif tile_type == 'noportalzone':
-            preview.blit(assets['noportalzone'][0], (x, y))
+            blits.append((assets['noportalzone'][0], (x, y)))
         elif tile_type == 'spikes':
-            img = assets['spikes'][0].copy()
             rot = tile.get('rotation', 0)
-            if rot != 0:
-                img = pygame.transform.rotate(img, -rot)
+            img = rotated_spikes.get(rot)
+            if img is None:
+                img = assets['spikes'][0]
+                if rot != 0:
+                    img = pygame.transform.rotate(img, -rot)
+                rotated_spikes[rot] = img
             if rot == 0:
-                preview.blit(img, (x, y + 8))
+                blits.append((img, (x, y + 8)))
             else:
-                preview.blit(img, (x, y))
+                blits.append((img, (x, y)))
         elif tile_type in ('spring_horizontal', 'red_box'):
-            preview.blit(assets['spring_horizontal'][0], (x, y))
+            blits.append((assets['spring_horizontal'][0], (x, y)))
         elif tile_type in ('door', 'key'):
             img = assets[tile_type][0]
             ox = (tile_size - img.get_width()) // 2
             oy = (tile_size - img.get_height()) // 2
-            preview.blit(img, (x + ox, y + oy))
+            blits.append((img, (x + ox, y + oy)))
+    preview.blits(blits, doreturn=False)
 
     # Render offgrid
+    blits = []
     for tile in offgrid:
         if tile['type'] == 'spawners' and tile['variant'] in (1, 3):
             continue
@@ -101,18 +138,36 @@ def _render_level_preview(level_path, width, height, assets, game_dir):
         variant = tile.get('variant', 0)
         if tile_type in assets:
             img = assets[tile_type][min(variant, len(assets[tile_type]) - 1)]
-            preview.blit(img, (x, y))
+            blits.append((img, (x, y)))
+    preview.blits(blits, doreturn=False)
 
     # Scale to preview size
     scaled = pygame.transform.scale(preview, (width, height))
     return scaled
 
 
+def _discover_generated_levels(maps_dir):
+    """Find generated levels (gemini*.json and procgen*.json) numbered 1, 2, ... in creation order."""
+    paths = []
+    for prefix in ('gemini', 'procgen'):
+        for f in glob.glob(os.path.join(maps_dir, prefix + '*.json')):
+            num = os.path.basename(f)[len(prefix):-5]
+            if num.isdigit():
+                paths.append((os.path.getmtime(f), prefix, int(num), f))
+    paths.sort()
+    return [(i + 1, f) for i, (_, _, _, f) in enumerate(paths)]
+
+
 class LevelSelect:
     def __init__(self):
         pygame.init()
-        self.display = pygame.Surface((540, 380), pygame.SRCALPHA)
-        self.screen = pygame.display.set_mode((960, 640))
+        self.presenter = get_presenter((960, 640))  # The window (see scripts/presenter.py)
+        # The pixel canvas: the Surface itself in software, a GPU canvas with the same drawing methods otherwise
+        frame = pygame.Surface((540, 380), pygame.SRCALPHA)
+        self.display = self.presenter.frame_canvas(frame)
+        # Kept rather than rebuilt each frame so the renderer backend uploads it once
+        self.loading_overlay = pygame.Surface(self.display.get_size())
+        self.loading_overlay.set_alpha(200)
         self.clock = pygame.time.Clock()
         pygame.mouse.set_visible(True)
 
@@ -125,10 +180,12 @@ class LevelSelect:
             pygame.image.load(bg_path).convert(),
             self.display.get_size()
         )
+        self.background = optimise_image(self.background, frame)  # See scripts/pixelformat.py
 
         # Level preview assets (cached)
         self._preview_assets = _load_level_preview_assets(game_dir)
         self._preview_cache = {}  # level_path -> surface
+        self._analysis_cache = {}  # level_path -> reachability report
 
         # Fonts
         font_path = os.path.join(game_dir, 'data', 'fonts', 'PressStart2P-vaV7.ttf')
@@ -136,7 +193,6 @@ class LevelSelect:
 
         # Discover levels
         self.standard_levels = []
-        self.gemini_levels = []
         for f in sorted(glob.glob(os.path.join(maps_dir, 'level*.json'))):
             name = os.path.basename(f)
             if name.startswith('level') and name.endswith('.json'):
@@ -145,13 +201,7 @@ class LevelSelect:
                     self.standard_levels.append((int(num), f))
         self.standard_levels.sort(key=lambda x: x[0])
 
-        for f in sorted(glob.glob(os.path.join(maps_dir, 'gemini*.json'))):
-            name = os.path.basename(f)
-            if name.startswith('gemini') and name.endswith('.json'):
-                num = name[6:-5]
-                if num.isdigit():
-                    self.gemini_levels.append((int(num), f))
-        self.gemini_levels.sort(key=lambda x: x[0])
+        self.gemini_levels = _discover_generated_levels(maps_dir)
 
         # Margins (consistent on all sides)
         self.margin = 18
@@ -191,6 +241,8 @@ class LevelSelect:
         self.cell_h = 55
         self.square_size = 44
         self.level_font = pygame.font.Font(font_path, 9)
+        self._card_cache = {}  # (level number, state) -> square image (see _get_level_card)
+        self._grid_cache = None  # (signature, draw list, selected rect) of the level grid
         self.generate_height = 24
         self.generate_grid_gap = 8
 
@@ -223,6 +275,7 @@ class LevelSelect:
         self.click_anim_time = 0.0
         self.elapsed_time = 0.0
         self.is_loading = False
+        self.generation_parser = None  # Streaming parser while a Gemini level is generating
 
         # Portal sizzle effect (red/white alternating)
         portal_red_imgs = load_images('portal_red')
@@ -271,6 +324,16 @@ class LevelSelect:
             self._preview_cache[level_path] = surf
         return self._preview_cache.get(level_path)
 
+    def _analyze(self, level_path):
+        """Analyse a level once, when it is selected (it takes tens of ms, too long for a frame)."""
+        if level_path not in self._analysis_cache:
+            self._analysis_cache[level_path] = _analyze_level_file(level_path)
+
+    def _get_difficulty(self, level_path):
+        """Difficulty label of an analysed level ("easy", "medium", "hard" or "unsolvable"), or None."""
+        report = self._analysis_cache.get(level_path)
+        return report['difficulty'] if report else None
+
     def update(self, dt):
         self.elapsed_time += dt
         if self.click_anim_time > 0:
@@ -305,36 +368,62 @@ class LevelSelect:
             c = (255, 220, 100) if active else (220, 220, 220)
             if is_hovered and not active:
                 c = (240, 240, 240)
-            pygame.draw.rect(self.display, c, rect, border_radius=4)
-            pygame.draw.rect(self.display, (0, 50, 120), rect, 2, border_radius=4)
+            draw_rect(self.display, c, rect, border_radius=4)
+            draw_rect(self.display, (0, 50, 120), rect, 2, border_radius=4)
             txt = self.font.render(label, False, (0, 50, 120) if active else (120, 120, 120))
             self.display.blit(txt, (rect.centerx - txt.get_width() // 2, rect.centery - txt.get_height() // 2))
 
-    def _draw_level_grid(self):
-        levels = self._get_levels()
-        selected_rect = None
-        selected_index = None
-        for i, (num, path) in enumerate(levels):
-            rect = self._get_level_rect(i)
-
-            # Square with rounded corners: gray when not selected, yellow when selected (like developer toggle)
-            is_hovered = self.hovered == ("level", path)
-            is_selected = self.selected_level_path == path
-            if is_selected:
-                selected_rect = rect
-                selected_index = i
+    def _get_level_card(self, num, state):
+        """
+        Image of a level square (fill, outline and 2-digit number), made once per level and state.
+
+        Args:
+            num: Level number
+            state: "selected", "hovered" or None
+        """
+        key = (num, state)
+        card = self._card_cache.get(key)
+        if card is None:
+            is_selected = state == "selected"
+            # Square: gray when not selected, yellow when selected (like developer toggle)
             color = (135, 206, 235) if is_selected else (220, 220, 220)  # Sky blue when selected, light gray otherwise
-            if is_hovered and not is_selected:
+            if state == "hovered":
                 color = (100, 150, 220)  # Blue on hover
-            pygame.draw.rect(self.display, color, rect)
+            card = pygame.Surface((self.square_size, self.square_size))
+            rect = card.get_rect()
+            pygame.draw.rect(card, color, rect)
             outline_color = (0, 100, 200) if is_selected else (0, 50, 120)  # Blue when selected
-            pygame.draw.rect(self.display, outline_color, rect, 2)
+            pygame.draw.rect(card, outline_color, rect, 2)
 
             # Level number (2 digits)
             num_str = f"{num:02d}"
             txt_color = (0, 80, 160) if is_selected else (130, 130, 130)  # Blue text when selected
             txt = self.level_font.render(num_str, False, txt_color)
-            self.display.blit(txt, (rect.centerx - txt.get_width() // 2, rect.centery - txt.get_height() // 2))
+            card.blit(txt, (rect.centerx - txt.get_width() // 2, rect.centery - txt.get_height() // 2))
+            self._card_cache[key] = card
+        return card
+
+    def _draw_level_grid(self):
+        levels = self._get_levels()
+        # The grid only changes with the level list, hover and selection, so its
+        # draw list is kept between frames and drawn with one blits call
+        signature = (self.map_type, tuple(levels), self.hovered, self.selected_level_path)
+        if self._grid_cache is None or self._grid_cache[0] != signature:
+            draws = []
+            selected_rect = None
+            for i, (num, path) in enumerate(levels):
+                rect = self._get_level_rect(i)
+                if self.selected_level_path == path:
+                    selected_rect = rect
+                    state = "selected"
+                elif self.hovered == ("level", path):
+                    state = "hovered"
+                else:
+                    state = None
+                draws.append((self._get_level_card(num, state), rect.topleft))
+            self._grid_cache = (signature, draws, selected_rect)
+        _, draws, selected_rect = self._grid_cache
+        self.display.blits(draws, doreturn=False)
 
         # Draw portal sizzle and goat on selected level square
         if selected_rect and self.selected_level_path:
@@ -386,14 +475,22 @@ class LevelSelect:
                 pygame.draw.rect(mask, (255, 255, 255, 255), (0, 0, w, h), border_radius=corner_radius)
                 clipped.blit(mask, (0, 0), special_flags=pygame.BLEND_RGBA_MIN)
                 self.display.blit(clipped, (self.preview_left, self.preview_top))
+
+            # Difficulty badge in the top-right corner
+            difficulty = self._get_difficulty(self.selected_level_path)
+            if difficulty:
+                colors = {'easy': (90, 200, 90), 'medium': (240, 190, 60), 'hard': (230, 90, 60)}
+                badge = self._render_outlined(difficulty.upper(), self.font, fg=colors.get(difficulty, (160, 160, 160)))
+                self.display.blit(badge, (self.preview_left + self.preview_width - badge.get_width() - 8,
+                                          self.preview_top + 8))
         else:
-            pygame.draw.rect(self.display, (220, 220, 220), preview_rect, border_radius=corner_radius)
+            draw_rect(self.display, (220, 220, 220), preview_rect, border_radius=corner_radius)
             placeholder = self.font.render("Select a level", False, (100, 100, 100))
             self.display.blit(placeholder, (self.preview_left + (self.preview_width - placeholder.get_width()) // 2,
                                            self.preview_top + (self.preview_height - placeholder.get_height()) // 2))
 
         # Blue outline (same as level buttons)
-        pygame.draw.rect(self.display, (0, 50, 120), preview_rect, 3, border_radius=corner_radius)
+        draw_rect(self.display, (0, 50, 120), preview_rect, 3, border_radius=corner_radius)
 
     def _get_action_y(self):
         """Y position for action menu - below preview."""
@@ -404,8 +501,8 @@ class LevelSelect:
         gen_rect = self.generate_rect
         is_hovered = self.hovered == "generate"
         c = (130, 180, 255) if is_hovered else (100, 150, 255)
-        pygame.draw.rect(self.display, c, gen_rect, border_radius=4)
-        pygame.draw.rect(self.display, (0, 50, 120), gen_rect, 2, border_radius=4)
+        draw_rect(self.display, c, gen_rect, border_radius=4)
+        draw_rect(self.display, (0, 50, 120), gen_rect, 2, border_radius=4)
         t = self.action_font.render("Generate Level", False, (255, 255, 255))
         self.display.blit(t, (gen_rect.centerx - t.get_width() // 2, gen_rect.centery - t.get_height() // 2))
 
@@ -458,17 +555,31 @@ class LevelSelect:
         self._draw_action_menu()
 
         if self.is_loading:
-            overlay = pygame.Surface(self.display.get_size())
-            overlay.fill((0, 0, 0))
-            overlay.set_alpha(200)
-            self.display.blit(overlay, (0, 0))
-            s = self.font.render("Generating level...", False, (255, 255, 255))
-            self.display.blit(s, (self.display.get_width() // 2 - s.get_width() // 2,
-                                 self.display.get_height() // 2 - s.get_height() // 2))
+            self.display.blit(self.loading_overlay, (0, 0))
+            if self.generation_parser is not None:
+                self._draw_generation_progress()
+            else:
+                s = self.font.render("Generating level...", False, (255, 255, 255))
+                self.display.blit(s, (self.display.get_width() // 2 - s.get_width() // 2,
+                                     self.display.get_height() // 2 - s.get_height() // 2))
+
+    def _draw_generation_progress(self):
+        """Live preview of the level Gemini is still streaming."""
+        parser = self.generation_parser
+        data = {'tilemap': parser.tilemap, 'offgrid': parser.offgrid, 'tile_size': 16}
+        w, h = self.preview_width, self.preview_height
+        surf = _render_level_data(data, w, h, self._preview_assets)
+        x = self.display.get_width() // 2 - w // 2
+        y = self.display.get_height() // 2 - h // 2
+        self.display.blit(surf, (x, y))
+        draw_rect(self.display, (0, 50, 120), (x, y, w, h), 3)
+        text = f"Generating level... {len(parser.tilemap) + len(parser.offgrid)} tiles"
+        s = self.font.render(text, False, (255, 255, 255))
+        self.display.blit(s, (self.display.get_width() // 2 - s.get_width() // 2, y + h + 10))
 
     def update_hover(self, mouse_pos):
-        dx = int((mouse_pos[0] / self.screen.get_width()) * self.display.get_width())
-        dy = int((mouse_pos[1] / self.screen.get_height()) * self.display.get_height())
+        dx = int((mouse_pos[0] / self.presenter.size[0]) * self.display.get_width())
+        dy = int((mouse_pos[1] / self.presenter.size[1]) * self.display.get_height())
         pos = (dx, dy)
         self.hovered = None
 
@@ -490,8 +601,8 @@ class LevelSelect:
                     return
 
     def handle_click(self, mouse_pos):
-        dx = int((mouse_pos[0] / self.screen.get_width()) * self.display.get_width())
-        dy = int((mouse_pos[1] / self.screen.get_height()) * self.display.get_height())
+        dx = int((mouse_pos[0] / self.presenter.size[0]) * self.display.get_width())
+        dy = int((mouse_pos[1] / self.presenter.size[1]) * self.display.get_height())
         pos = (dx, dy)
         self.clicked = self.hovered
         self.click_anim_time = 0.12
@@ -520,6 +631,7 @@ class LevelSelect:
             if self._get_level_rect(i).collidepoint(pos):
                 self.selected_level_path = path
                 self.selection_time = self.elapsed_time
+                self._analyze(path)
                 return None
 
         return None
@@ -544,23 +656,23 @@ def run_level_select():
                 if choice == "GENERATE_GEMINI":
                     level_select.is_loading = True
                     level_select.render()
-                    scaled = pygame.transform.scale(level_select.display, level_select.screen.get_size())
-                    level_select.screen.blit(scaled, (0, 0))
-                    pygame.display.update()
+                    level_select.presenter.draw_frame(level_select.display)
+                    level_select.presenter.present()
+
+                    def show_progress(parser):
+                        level_select.generation_parser = parser
+                        pygame.event.pump()  # Keep the window responsive while streaming
+                        level_select.render()
+                        level_select.presenter.draw_frame(level_select.display)
+                        level_select.presenter.present()
 
-                    generated = generate_level_with_gemini()
+                    generated = generate_level(on_progress=show_progress)
                     level_select.is_loading = False
+                    level_select.generation_parser = None
 
                     if generated:
                         maps_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'maps')
-                        level_select.gemini_levels = []
-                        for f in sorted(glob.glob(os.path.join(maps_dir, 'gemini*.json'))):
-                            name = os.path.basename(f)
-                            if name.startswith('gemini') and name.endswith('.json'):
-                                num = name[6:-5]
-                                if num.isdigit():
-                                    level_select.gemini_levels.append((int(num), f))
-                        level_select.gemini_levels.sort(key=lambda x: x[0])
+                        level_select.gemini_levels = _discover_generated_levels(maps_dir)
                         level_select._preview_cache.clear()
                     else:
                         print("Failed to generate level.")
@@ -574,9 +686,8 @@ def run_level_select():
                     return choice
 
         level_select.render()
-        scaled = pygame.transform.scale(level_select.display, level_select.screen.get_size())
-        level_select.screen.blit(scaled, (0, 0))
-        pygame.display.update()
+        level_select.presenter.draw_frame(level_select.display)
+        level_select.presenter.present()
 
 
 if __name__ == "__main__":
@@ -15,13 +15,14 @@ import pygame
 from homepage import run_homepage
 from level_select import run_level_select
 from game import Game
+from scripts.presenter import get_presenter, current_presenter
 
-def run_logo(screen):
+def run_logo(presenter):
     """
     Show the logo screen.
     
     Args:
-        screen: pygame screen surface
+        presenter: The window (see scripts/presenter.py)
     Returns:
         None (when logo is skipped or completes)
     """
@@ -45,7 +46,7 @@ def run_logo(screen):
         logo_sfx.set_volume(0.3)
 
     # Get screen dimensions
-    screen_width, screen_height = screen.get_size()
+    screen_width, screen_height = presenter.size
     
     # Scale image with zoom out (smaller than screen width for black bars)
     image_width = logo_image.get_width()
@@ -66,20 +67,21 @@ def run_logo(screen):
             if event.type == pygame.QUIT:
                 sys.exit(0)
                 
+        screen = presenter.overlay()
         screen.fill((0, 0, 0))
         screen.blit(logo_image, (x_offset, 0))
         if logo_sfx:
             logo_sfx.play()
-        pygame.display.update()
+        presenter.present()
         pygame.time.delay(2250)
         return
 
-def run_credits(screen):
+def run_credits(presenter):
     """
     Show the credits screen when credits button is clicked in menu, return to menu when any button is pressed.
     
     Args:
-        screen: pygame screen surface
+        presenter: The window (see scripts/presenter.py)
     Returns:
         None (when credits is skipped or completes)
     """
@@ -100,7 +102,7 @@ def run_credits(screen):
         pass
         
     # Get screen dimensions
-    screen_width, screen_height = screen.get_size()
+    screen_width, screen_height = presenter.size
     
     # Scale image with zoom out (smaller than screen width for black bars)
     image_width = credits_image.get_width()
@@ -123,17 +125,18 @@ def run_credits(screen):
             if event.type == pygame.KEYDOWN:
                 return  # Skip on any key press
         
+        screen = presenter.overlay()
         screen.fill((0, 0, 0))
         screen.blit(credits_image, (x_offset, y_offset))
-        pygame.display.update()
+        presenter.present()
         clock.tick(60)
 
-def run_introduction(screen):
+def run_introduction(presenter):
     """
     Show the introduction screen with panning animation.
     
     Args:
-        screen: pygame screen surface
+        presenter: The window (see scripts/presenter.py)
         
     Returns:
         None (when introduction is skipped or completes)
@@ -164,7 +167,7 @@ def run_introduction(screen):
         return
     
     # Get screen dimensions
-    screen_width, screen_height = screen.get_size()
+    screen_width, screen_height = presenter.size
     
     # Scale image with zoom out (smaller than screen width for black bars)
     image_width = intro_image.get_width()
@@ -214,12 +217,13 @@ def run_introduction(screen):
                             pygame.mixer.music.stop()
                         return  
             
+            screen = presenter.overlay()
             screen.fill((0, 0, 0))
             y_offset = (screen_height - scaled_height) // 2
             screen.blit(intro_image, (x_offset, y_offset))
             # Draw skip text in bottom right
             screen.blit(skip_text, (skip_text_x, skip_text_y))
-            pygame.display.update()
+            presenter.present()
             clock.tick(60)
     else:
         # Pan down through the image
@@ -229,6 +233,7 @@ def run_introduction(screen):
         fade_duration = 2  # Duration of fade in seconds
         fade_started = False
         fade_start_time = 0
+        fade_overlay = pygame.Surface(presenter.size)  # Faded in by set_alpha
         
         while True:
             for event in pygame.event.get():
@@ -243,6 +248,7 @@ def run_introduction(screen):
                         return  
             
             # Clear screen
+            screen = presenter.overlay()
             screen.fill((0, 0, 0))
             
             # Draw the portion of the image at current scroll position, centered horizontally
@@ -269,8 +275,6 @@ def run_introduction(screen):
                     pygame.mixer.music.set_volume(music_volume)
                 
                 if fade_alpha > 0:
-                    fade_overlay = pygame.Surface(screen.get_size())
-                    fade_overlay.fill((0, 0, 0))
                     fade_overlay.set_alpha(fade_alpha)
                     screen.blit(fade_overlay, (0, 0))
                 
@@ -280,30 +284,32 @@ def run_introduction(screen):
                         pygame.mixer.music.stop()
                     return  # Goes to homepage
             
-            pygame.display.update()
+            presenter.present()
             
             # Continue scrolling even during fade
             scroll_y += pan_speed
             
             clock.tick(60)
 
-def fade_transition(screen=None, duration=0.25, fade_out=True):
+def fade_transition(presenter=None, duration=0.25, fade_out=True):
     """
     Perform a fade transition on the screen.
     
     Args:
-        screen: pygame screen surface (if None, uses display.get_surface())
+        presenter: The window (if None, uses the one the screens share)
         duration: Duration of fade in seconds
         fade_out: True for fade out (to black), False for fade in (from black)
     
     Returns:
         None
     """
-    if screen is None:
-        screen = pygame.display.get_surface()
+    if presenter is None:
+        presenter = current_presenter()
     
     clock = pygame.time.Clock()
     start_time = pygame.time.get_ticks()
+    # Black overlay, made once and faded by set_alpha so the renderer backend uploads it once
+    overlay = pygame.Surface(presenter.size)
     
     while True:
         # Handle events to prevent window freezing
@@ -323,12 +329,10 @@ def fade_transition(screen=None, duration=0.25, fade_out=True):
             # Fade in: 255 -> 0
             alpha = int((1.0 - progress) * 255)
         
-        # Create black overlay
-        overlay = pygame.Surface(screen.get_size())
-        overlay.fill((0, 0, 0))
+        screen = presenter.overlay()
         overlay.set_alpha(alpha)
         screen.blit(overlay, (0, 0))
-        pygame.display.update()
+        presenter.present()
         
         if progress >= 1.0:
             break
@@ -352,21 +356,21 @@ def main():
     pygame.init()
     
     # Set up screen (matching homepage/game dimensions)
-    screen = pygame.display.set_mode((960, 640))
     pygame.display.set_caption('The Time I Reincarnated as a Teleporting Goat in a 2D Puzzle Platformer')
+    presenter = get_presenter((960, 640))
     
     game_dir = os.path.dirname(os.path.abspath(__file__))
     favicon_path = os.path.join(game_dir, 'data', 'homepage-assets', 'shocked_goat.png')
     try:
         icon = pygame.image.load(favicon_path)
-        pygame.display.set_icon(icon)
+        presenter.set_icon(icon)
     except:
         pass 
 
     # Show logo and introduction screen first (only on first run)
     fade_transition(duration=1, fade_out=True)
-    run_logo(screen)
-    run_introduction(screen)
+    run_logo(presenter)
+    run_introduction(presenter)
     
     while True:
         # Start at homepage
@@ -381,7 +385,7 @@ def main():
             pygame.mixer.music.stop()
             # Fade out from homepage
             fade_transition(duration=0.25, fade_out=True)
-            run_credits(screen)
+            run_credits(presenter)
             # Fade in to homepage after credits
             fade_transition(duration=0.25, fade_out=False)
         elif choice == "SELECT_LEVEL":
@@ -0,0 +1,108 @@
+"""
+Broadphase for entity-vs-entity interactions.
+
+A uniform grid (spatial hash) of the level's moving objects - player, crates,
+springs. Game rebuilds it when a level is loaded or a state is restored and
+moves each object in it as soon as that object has moved, so during a step
+the grid always matches the current positions. Interaction code then only
+checks the handful of objects returned by query() instead of every crate and
+spring in the level.
+
+query() returns objects in the order they were given to rebuild(), so
+collision resolution happens in the same order as a plain loop over the
+entity lists (this keeps fixed-point runs identical with or without it).
+"""
+
+CELL_SIZE = 64  # Pixels; about the size of the largest object (portal-sized launches)
+
+
+class SpatialHash:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> list of objects
+        self.entries = {}  # id(obj) -> [obj, insertion order, (cx0, cy0, cx1, cy1)]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.cells = {}
+        self.entries = {}
+
+    def cell_range(self, x, y, w, h):
+        size = self.cell_size
+        return int(x // size), int(y // size), int((x + w) // size), int((y + h) // size)
+
+    def _bounds(self, obj):
+        return self.cell_range(obj.pos[0], obj.pos[1], obj.size[0], obj.size[1])
+
+    def rebuild(self, objects):
+        """Index `objects` from scratch (their order is the order queries return)."""
+        self.clear()
+        for order, obj in enumerate(objects):
+            bounds = self._bounds(obj)
+            self.entries[id(obj)] = [obj, order, bounds]
+            self._add(obj, bounds)
+
+    def move(self, obj):
+        """Update the cells of an object after it moved (cheap when it stayed in its cells)."""
+        entry = self.entries.get(id(obj))
+        if entry is None:
+            return
+        bounds = self._bounds(obj)
+        if bounds != entry[2]:
+            self._remove(obj, entry[2])
+            self._add(obj, bounds)
+            entry[2] = bounds
+
+    def query(self, rect, cls=None):
+        """
+        Objects whose cells overlap a rect.
+
+        This is a broadphase: results may not actually overlap the rect, callers
+        still do their exact checks.
+
+        Args:
+            rect: pygame.Rect (or anything with x, y, w, h) to search
+            cls: Only return instances of this class (or tuple of classes)
+
+        Returns:
+            list: Matching objects, in rebuild order
+        """
+        cx0, cy0, cx1, cy1 = self.cell_range(rect.x, rect.y, rect.w, rect.h)
+        cells = self.cells
+        found = {}
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    for obj in cell:
+                        found[id(obj)] = obj
+        if cls is not None:
+            found = {key: obj for key, obj in found.items() if isinstance(obj, cls)}
+        if len(found) > 1:
+            entries = self.entries
+            return sorted(found.values(), key=lambda obj: entries[id(obj)][1])
+        return list(found.values())
+
+    def _add(self, obj, bounds):
+        cx0, cy0, cx1, cy1 = bounds
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = [obj]
+                else:
+                    cell.append(obj)
+
+    def _remove(self, obj, bounds):
+        cx0, cy0, cx1, cy1 = bounds
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is not None:
+                    cell.remove(obj)
+                    if not cell:
+                        del cells[(cx, cy)]
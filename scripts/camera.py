@@ -0,0 +1,97 @@
+"""
+Scrolling camera for levels larger than the screen.
+
+The camera eases towards the player every simulation step and stays inside
+the level's bounds: the tiles' extent, minus a CAMERA_BORDER the view may
+leave off-screen (levels hide their border walls just outside the view), and
+never smaller than the view itself. A level that fits on one screen therefore
+keeps the camera at (0, 0), as before the camera existed.
+
+The view also decides what the game spends time on: rendering culls against
+view_rect(), and Game.update parks crates and springs outside
+view_rect(SIMULATION_MARGIN) (see systems.park_system), so the cost of a frame
+follows what is on or near the screen rather than the size of the level.
+"""
+import pygame
+
+CAMERA_LAG = 30  # The camera closes 1/CAMERA_LAG of the distance to its target per step
+CAMERA_BORDER = 32  # Pixels of the level's outer edge the camera may leave off-screen
+FALL_MARGIN = 100  # Pixels below the level's bounds where a falling player dies
+SIMULATION_MARGIN = 256  # Pixels around the view in which crates and springs keep moving
+
+
+class Camera:
+    __slots__ = ('size', 'scroll', 'previous', 'bounds')
+
+    def __init__(self, size):
+        """
+        Args:
+            size: (width, height) of the view in pixels
+        """
+        self.size = tuple(size)
+        self.scroll = [0.0, 0.0]  # Top-left corner of the view, in world pixels
+        self.previous = (0.0, 0.0)  # scroll before the last step, for interpolation
+        self.bounds = pygame.Rect((0, 0), self.size)
+
+    def set_bounds(self, extent):
+        """
+        Set the area the camera may show from a level's extent.
+
+        Args:
+            extent: pygame.Rect around every tile of the level (see Tilemap.extent)
+        """
+        inner = extent.inflate(-2 * CAMERA_BORDER, -2 * CAMERA_BORDER)
+        self.bounds = pygame.Rect((0, 0), self.size).union(inner)
+
+    def target(self, rect):
+        """The clamped scroll that centers the view on a rect."""
+        bounds = self.bounds
+        x = min(max(rect.centerx - self.size[0] / 2, bounds.left), bounds.right - self.size[0])
+        y = min(max(rect.centery - self.size[1] / 2, bounds.top), bounds.bottom - self.size[1])
+        return x, y
+
+    def snap(self, rect):
+        """Center the view on a rect immediately (level load, respawn)."""
+        x, y = self.target(rect)
+        self.scroll[0] = x
+        self.scroll[1] = y
+        self.previous = (x, y)
+
+    def follow(self, rect):
+        """Ease the view towards a rect by one simulation step."""
+        x, y = self.target(rect)
+        scroll = self.scroll
+        self.previous = (scroll[0], scroll[1])
+        scroll[0] += (x - scroll[0]) / CAMERA_LAG
+        scroll[1] += (y - scroll[1]) / CAMERA_LAG
+
+    def get_state(self):
+        """The camera's simulation state: its scroll (see Game.get_state)."""
+        return (self.scroll[0], self.scroll[1])
+
+    def set_state(self, state):
+        """Restore a get_state() scroll, easing the drawn view from the current one."""
+        self.previous = (self.scroll[0], self.scroll[1])
+        self.scroll[0] = state[0]
+        self.scroll[1] = state[1]
+
+    def render_scroll(self, alpha=1.0):
+        """
+        The whole-pixel scroll to draw with.
+
+        Args:
+            alpha: Interpolation between the previous and the current step (see
+                Game.interpolation_alpha)
+        """
+        x = self.previous[0] + (self.scroll[0] - self.previous[0]) * alpha
+        y = self.previous[1] + (self.scroll[1] - self.previous[1]) * alpha
+        return int(x), int(y)
+
+    def view_rect(self, margin=0):
+        """The world area in view, grown by margin pixels on every side."""
+        return pygame.Rect(int(self.scroll[0]) - margin, int(self.scroll[1]) - margin,
+                           self.size[0] + 2 * margin, self.size[1] + 2 * margin)
+
+    def fall_limit(self):
+        """The y below which a falling player is dead."""
+        return self.bounds.bottom + FALL_MARGIN
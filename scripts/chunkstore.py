@@ -0,0 +1,241 @@
+"""
+Chunk files for very large maps, streamed in around the camera.
+
+split_map() turns a level JSON into a directory of chunk files:
+
+    manifest.json   tile size, chunk size, the level's extent, the offgrid tiles,
+                    the pinned grid tiles and the list of chunks that have tiles
+    <cx>_<cy>.json  the grid tiles of one CHUNK_SIZE x CHUNK_SIZE chunk
+
+Pinned tiles (PINNED_TYPES: spawners, keys, doors) stay in the manifest and are
+always loaded, since Game.load_level extracts, snapshots and tracks them for the
+whole level. Everything else is loaded by a ChunkStreamer as the camera gets
+near: a background thread reads and parses the chunk files, and the main loop
+merges what is ready into the Tilemap (Tilemap.add_chunk) at the start of a
+step, so neither the thread nor a slow disk stalls a frame. Chunks beyond
+MAX_RESIDENT_CHUNKS are dropped again, least recently wanted first.
+
+While a chunk is not loaded, Tilemap.tile_at() returns NOT_LOADED for its tiles
+and Tilemap.chunk_loaded() is False, and its flag grid cells are marked
+TILE_NOT_LOADED: raycasts stop there, and the physics (physics_rects_in,
+systems.solid_grid, the preview's ghosts) takes it as solid. tiles_around and
+tiles_near only see loaded tiles and assert they are called in a loaded area. The game keeps the loaded area ahead of the
+camera (LOAD_MARGIN) and wider than the area where bodies are simulated
+(camera.SIMULATION_MARGIN); if a body does reach a chunk the thread has not
+delivered yet, ensure() loads it on the spot.
+
+Usage:
+    python -m scripts.chunkstore data/maps/big.json data/maps/big.chunks
+Game.load_level accepts the directory (or its manifest.json) like a map path.
+"""
+import json
+import os
+import queue
+import sys
+import threading
+from collections import OrderedDict
+
+from scripts.camera import SIMULATION_MARGIN
+from scripts.tilemap import Tilemap, CHUNK_SIZE
+
+MANIFEST = 'manifest.json'
+CHUNK_FORMAT = 1
+PINNED_TYPES = ('spawners', 'key', 'door')
+MAX_RESIDENT_CHUNKS = 128  # A 540x380 view plus LOAD_MARGIN needs about 56
+LOAD_MARGIN = SIMULATION_MARGIN + 256  # Pixels around the view kept loaded
+
+
+def chunk_filename(key):
+    return str(key[0]) + '_' + str(key[1]) + '.json'
+
+
+def manifest_path(path):
+    """The manifest of a chunked map (given its directory or the manifest), or None."""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST)
+    if os.path.basename(path) == MANIFEST and os.path.isfile(path):
+        return path
+    return None
+
+
+def split_map(map_path, out_dir):
+    """
+    Write a level JSON as a chunked map, in chunks of CHUNK_SIZE x CHUNK_SIZE tiles
+    (the chunks Tilemap.render caches, so a streamed chunk redraws only itself).
+
+    Args:
+        map_path: Level JSON (the format Tilemap.load reads)
+        out_dir: Directory to write the manifest and chunk files to (created if needed)
+
+    Returns:
+        dict: The manifest
+    """
+    tilemap = Tilemap(None)
+    tilemap.load(map_path)  # Normalises old tiles (red_box) like a game load would
+
+    pinned = {}
+    chunks = {}
+    for loc, tile in tilemap.tilemap.items():
+        if tile['type'] in PINNED_TYPES:
+            pinned[loc] = tile
+        else:
+            chunks.setdefault(tilemap.chunk_key((int(tile['pos'][0]), int(tile['pos'][1]))), {})[loc] = tile
+    extent = tilemap.extent()
+
+    os.makedirs(out_dir, exist_ok=True)
+    for key, tiles in chunks.items():
+        with open(os.path.join(out_dir, chunk_filename(key)), 'w') as f:
+            json.dump(tiles, f)
+    manifest = {
+        'format': CHUNK_FORMAT,
+        'tile_size': tilemap.tile_size,
+        'chunk_size': CHUNK_SIZE,
+        'extent': [extent.x, extent.y, extent.w, extent.h],
+        'chunks': sorted([list(key) for key in chunks]),
+        'tilemap': pinned,
+        'offgrid': tilemap.offgrid_tiles,
+    }
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def read_chunk(directory, key):
+    with open(os.path.join(directory, chunk_filename(key)), 'r') as f:
+        return json.load(f)
+
+
+class ChunkStreamer:
+    """Loads the chunks of a chunked map on a background thread (see the module docstring)."""
+
+    def __init__(self, path, capacity=MAX_RESIDENT_CHUNKS):
+        """
+        Args:
+            path: Directory of a chunked map, or its manifest.json
+            capacity: Chunks kept loaded at most
+        """
+        path = manifest_path(path)
+        if path is None:
+            raise FileNotFoundError('No ' + MANIFEST + ' for chunked map')
+        self.directory = os.path.dirname(path)
+        with open(path, 'r') as f:
+            self.manifest = json.load(f)
+        if self.manifest['chunk_size'] != CHUNK_SIZE:
+            raise ValueError('Chunked map uses ' + str(self.manifest['chunk_size']) + '-tile chunks, expected ' + str(CHUNK_SIZE))
+        self.capacity = capacity
+        self.available = {tuple(key) for key in self.manifest['chunks']}  # Chunks that have a file
+        self.resident = OrderedDict()  # key -> tiles dict merged into the tilemap, least recently wanted first
+        self.pending = set()  # Requested from the thread, not merged yet
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._worker, name='chunk-loader', daemon=True)
+        self.thread.start()
+
+    def _worker(self):
+        while True:
+            key = self.requests.get()
+            if key is None:
+                return
+            try:
+                tiles = read_chunk(self.directory, key)
+            except (OSError, ValueError) as e:
+                tiles = e
+            self.results.put((key, tiles))
+
+    def close(self):
+        """Stop the loading thread and wait for it (chunks already merged stay in the tilemap)."""
+        # Requests not started yet are dropped, so this only waits for the chunk being read
+        try:
+            while True:
+                self.requests.get_nowait()
+        except queue.Empty:
+            pass
+        self.requests.put(None)
+        self.thread.join()
+
+    def is_loaded(self, key):
+        """Whether a chunk's tiles are in the tilemap (chunks without a file count as loaded)."""
+        return key in self.resident or key not in self.available
+
+    def keys_in(self, tilemap, rect):
+        """Chunk keys overlapping a pixel rect."""
+        chunk_px = CHUNK_SIZE * tilemap.tile_size
+        return [(cx, cy)
+                for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1)
+                for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1)]
+
+    def update(self, tilemap, rect):
+        """
+        Stream the chunks overlapping a rect: request the missing ones, merge the ones
+        the thread has finished and drop the least recently wanted beyond capacity.
+
+        Args:
+            tilemap: Tilemap to merge into
+            rect: pygame.Rect of the area to keep loaded (the view plus LOAD_MARGIN)
+        """
+        wanted = self.keys_in(tilemap, rect)
+        for key in wanted:
+            if key in self.resident:
+                self.resident.move_to_end(key)
+            elif key in self.available and key not in self.pending:
+                self.pending.add(key)
+                self.requests.put(key)
+        self.merge_finished(tilemap)
+        self.evict(tilemap, set(wanted))
+
+    def merge_finished(self, tilemap, block_for=None):
+        """
+        Merge the chunks the thread has loaded.
+
+        Args:
+            tilemap: Tilemap to merge into
+            block_for: Chunk keys to wait for (see ensure); others are merged if ready
+        """
+        waiting = set(block_for) if block_for else set()
+        while True:
+            try:
+                key, tiles = self.results.get(block=bool(waiting & self.pending))
+            except queue.Empty:
+                return
+            self.pending.discard(key)
+            waiting.discard(key)
+            if isinstance(tiles, Exception):
+                # A missing or broken chunk file stays empty rather than stopping the game
+                print('Could not load chunk', key, '-', tiles, file=sys.stderr)
+                tiles = {}
+            if key not in self.resident:
+                self.resident[key] = tiles
+                tilemap.add_chunk(key, tiles)
+
+    def ensure(self, tilemap, rect):
+        """Load the chunks overlapping a rect now, waiting for the thread if needed."""
+        missing = [key for key in self.keys_in(tilemap, rect) if not self.is_loaded(key)]
+        if not missing:
+            return
+        for key in missing:
+            if key not in self.pending:
+                self.pending.add(key)
+                self.requests.put(key)
+        self.merge_finished(tilemap, block_for=missing)
+
+    def evict(self, tilemap, keep=()):
+        """Drop least recently wanted chunks until at most capacity are loaded."""
+        while len(self.resident) > self.capacity:
+            key = next(iter(self.resident))
+            if key in keep:
+                break  # Everything older is wanted too (capacity is below one view's worth)
+            tiles = self.resident.pop(key)
+            tilemap.drop_chunk(key, tiles)
+
+    def restore(self, tilemap):
+        """Merge every loaded chunk back after the tilemap dict was replaced (see Tilemap.replace_tiles)."""
+        for key, tiles in self.resident.items():
+            tilemap.add_chunk(key, tiles)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python -m scripts.chunkstore <level.json> <output directory>')
+        sys.exit(2)
+    manifest = split_map(sys.argv[1], sys.argv[2])
+    print(len(manifest['chunks']), 'chunks,', len(manifest['tilemap']), 'pinned tiles, written to', sys.argv[2])
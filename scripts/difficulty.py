@@ -0,0 +1,370 @@
+"""
+Monte Carlo difficulty estimation.
+
+Plays a level thousands of times on headless Games (scripts/env.py) with
+randomised and heuristic input policies, spread over a process pool, and
+aggregates:
+- completion rate, with a Wilson confidence interval
+- median frames to the key and to the door (over completed runs)
+- death causes ('spikes' or 'fall', see Game.death_cause)
+
+Episodes run in batches and a snapshot is yielded after each one, so callers
+can show progress; estimation stops early once the confidence interval is
+narrower than the requested tolerance. Final results are cached in
+data/difficulty_cache.json by the SHA-256 of the level file and the estimation
+settings, so an unchanged level is never simulated twice with the same ones.
+
+Usage:
+    python -m scripts.difficulty data/maps/level1.json [more levels...]
+"""
+import os
+import sys
+import json
+import math
+import random
+import hashlib
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.reachability import TileGrid, ReachabilityAnalyzer
+
+GAME_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(GAME_DIR, 'data', 'difficulty_cache.json')
+CACHE_VERSION = 3  # 3: portal placements over the level's whole extent (see scripts/reachability.py)
+
+POLICIES = ('random', 'heuristic')
+FRAME_SKIP = 4  # Frames each policy decision is held for
+MAX_FRAMES = 60 * 60  # One minute of play per episode
+Z_95 = 1.96
+
+# Difficulty labels by score (see difficulty_score)
+DIFFICULTY_LABELS = ((0.5, 'easy'), (0.8, 'medium'), (0.95, 'hard'))
+
+
+def level_hash(level_path):
+    with open(level_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    """
+    Wilson score interval for a binomial proportion.
+
+    Returns:
+        tuple: (low, high), (0.0, 1.0) when there are no trials
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def difficulty_score(completion_rate, median_frames_to_door, max_frames=MAX_FRAMES):
+    """
+    Difficulty in [0, 1]: mostly how rarely the policies finish, plus how long finishing takes.
+    """
+    slowness = 1.0 if median_frames_to_door is None else min(1.0, median_frames_to_door / max_frames)
+    return round(0.8 * (1 - completion_rate) + 0.2 * slowness, 4)
+
+
+def difficulty_label(score):
+    for threshold, label in DIFFICULTY_LABELS:
+        if score < threshold:
+            return label
+    return 'very hard'
+
+
+# -----------------------------
+# Policies
+# Each policy is built from a random.Random, the tiles the cursor portal can be
+# locked on (see ReachabilityAnalyzer.portal_placements) and the level tile at the
+# top-left of the env's window (cursor actions count from it, see scripts/env.py),
+# and returns an action for scripts/env.GameEnv from the game state.
+# -----------------------------
+class RandomPolicy:
+    """Random movement and jumps, with the odd portal lock on a random valid spot."""
+
+    def __init__(self, rng, placements=(), origin=(0, 0)):
+        self.rng = rng
+        self.placements = placements
+        self.origin = origin
+        self.portal = 0
+        self.cursor = (0, 0)
+
+    def act(self, game):
+        rng = self.rng
+        if self.portal == 0 and rng.random() < 0.03:
+            self.portal = rng.choice((1, 2))
+            if self.placements:
+                x, y = rng.choice(self.placements)
+                self.cursor = (x - self.origin[0], y - self.origin[1])
+            else:
+                self.cursor = (rng.randrange(34), rng.randrange(24))
+        elif self.portal and rng.random() < 0.1:
+            self.portal = 0
+        return (rng.randrange(3), int(rng.random() < 0.2), self.portal) + self.cursor
+
+
+class HeuristicPolicy:
+    """Walk toward the key (then the door), jumping at walls, and portal toward the target."""
+
+    def __init__(self, rng, placements=(), origin=(0, 0)):
+        self.rng = rng
+        self.placements = placements
+        self.origin = origin
+        self.portal = 0
+        self.portal_frames = 0
+        self.cursor = (0, 0)
+
+    def target(self, game):
+        """Pixel center of the key while it is still needed, otherwise of a door."""
+        wanted = ('key',) if game.room_has_key and not game.has_key else ('door',)
+        for tile in game.tilemap.offgrid_tiles:
+            if tile['type'] in wanted:
+                offset = (24, 24) if tile['type'] == 'key' else (8, 16)
+                return tile['pos'][0] + offset[0], tile['pos'][1] + offset[1]
+        if game.exit_door:
+            return game.exit_door['pos'][0] + 8, game.exit_door['pos'][1] + 16
+        return None
+
+    def act(self, game):
+        rng = self.rng
+        player = game.player.rect()
+        target = self.target(game) or (rng.randrange(544), rng.randrange(384))
+        dx = target[0] - player.centerx
+
+        # Mostly walk toward the target, sometimes wander to get unstuck
+        if rng.random() < 0.2:
+            move = rng.randrange(3)
+        else:
+            move = 2 if dx > 4 else 1 if dx < -4 else 0
+        blocked = game.player.collisions['left'] or game.player.collisions['right']
+        jump = int(blocked or target[1] < player.top or rng.random() < 0.1)
+
+        # Hold a portal aimed near the target for a few decisions
+        if self.portal_frames > 0:
+            self.portal_frames -= 1
+        elif self.portal:
+            self.portal = 0
+        elif rng.random() < 0.05 and self.placements:
+            # Lock the cursor portal on one of the valid spots closest to the target
+            self.portal = rng.choice((1, 2))
+            self.portal_frames = rng.randrange(2, 12)
+            tile = game.tilemap.tile_size
+            tx, ty = target[0] / tile, target[1] / tile
+            nearest = sorted(self.placements, key=lambda cell: (cell[0] - tx) ** 2 + (cell[1] - ty) ** 2)
+            x, y = nearest[min(int(rng.expovariate(0.3)), len(nearest) - 1)]
+            self.cursor = (x - self.origin[0], y - self.origin[1])
+        return (move, jump, self.portal) + self.cursor
+
+
+POLICY_CLASSES = {'random': RandomPolicy, 'heuristic': HeuristicPolicy}
+
+
+# -----------------------------
+# Episodes (run in worker processes)
+# -----------------------------
+_envs = {}  # level path -> GameEnv, reused across episodes in a worker
+_placements = {}  # level path -> valid cursor portal tiles
+
+
+def _get_env(level_path):
+    if level_path not in _envs:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        from scripts.env import GameEnv
+        _envs[level_path] = GameEnv(level_path, max_steps=MAX_FRAMES // FRAME_SKIP, frame_skip=FRAME_SKIP,
+                                    observe=False)
+        with open(level_path, 'r') as f:
+            grid = TileGrid.from_level(json.load(f))
+        _placements[level_path] = ReachabilityAnalyzer(grid).portal_placements()
+    return _envs[level_path]
+
+
+def run_episode(args):
+    """
+    Play one episode.
+
+    Args:
+        args: (level_path, policy name, seed)
+
+    Returns:
+        dict: {'completed', 'frames', 'frames_to_key', 'frames_to_door', 'death_cause'}
+    """
+    level_path, policy_name, seed = args
+    env = _get_env(level_path)
+    area = env.areas[level_path]
+    policy = POLICY_CLASSES[policy_name](random.Random(seed), _placements[level_path], area.topleft)
+    env.reset(level_path)
+    frames_to_key = None
+    while True:
+        _, _, terminated, truncated, info = env.step(policy.act(env.game))
+        if frames_to_key is None and info['has_key']:
+            frames_to_key = info['frames']
+        if terminated or truncated:
+            break
+    return {
+        'completed': info['won'],
+        'frames': info['frames'],
+        'frames_to_key': frames_to_key,
+        'frames_to_door': info['frames'] if info['won'] else None,
+        'death_cause': info['death_cause'],
+    }
+
+
+def _run_batch(jobs):
+    return [run_episode(job) for job in jobs]
+
+
+# -----------------------------
+# Aggregation
+# -----------------------------
+def summarize(results, tolerance=None):
+    """Aggregate episode results into a difficulty report."""
+    episodes = len(results)
+    completed = sum(1 for result in results if result['completed'])
+    frames_to_key = [result['frames_to_key'] for result in results if result['frames_to_key'] is not None]
+    frames_to_door = [result['frames_to_door'] for result in results if result['frames_to_door'] is not None]
+    deaths = {'spikes': 0, 'fall': 0}
+    for result in results:
+        if result['death_cause'] in deaths:
+            deaths[result['death_cause']] += 1
+    timeouts = sum(1 for result in results if not result['completed'] and result['death_cause'] is None)
+
+    rate = completed / episodes if episodes else 0.0
+    low, high = wilson_interval(completed, episodes)
+    median_door = statistics.median(frames_to_door) if frames_to_door else None
+    score = difficulty_score(rate, median_door)
+    return {
+        'episodes': episodes,
+        'completion_rate': round(rate, 4),
+        'confidence_interval': [round(low, 4), round(high, 4)],
+        'median_frames_to_key': statistics.median(frames_to_key) if frames_to_key else None,
+        'median_frames_to_door': median_door,
+        'death_causes': deaths,
+        'timeouts': timeouts,
+        'score': score,
+        'difficulty': difficulty_label(score),
+        'converged': tolerance is not None and (high - low) / 2 <= tolerance,
+    }
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH, 'r') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'levels': {}}
+
+
+def cache_key(level_path, settings):
+    """Cache key of a level file's contents and the estimation settings (see iter_estimates)."""
+    return level_hash(level_path) + ' ' + json.dumps(settings, sort_keys=True)
+
+
+def _finished(report, settings):
+    """Whether a report is the final one of a run with these settings."""
+    return report['episodes'] >= settings['max_episodes'] or \
+        (report['converged'] and report['episodes'] >= settings['min_episodes'])
+
+
+def cached_estimate(level_path, settings):
+    """Cached final report for the current contents of a level file and these settings, or None."""
+    report = _load_cache()['levels'].get(cache_key(level_path, settings))
+    return report if report is not None and _finished(report, settings) else None
+
+
+def _store(level_path, settings, report):
+    cache = _load_cache()
+    cache['levels'][cache_key(level_path, settings)] = dict(report, level=os.path.basename(level_path))
+    try:
+        with open(CACHE_PATH, 'w') as f:
+            json.dump(cache, f, indent=1)
+    except OSError as e:
+        print(f"Could not save difficulty cache: {e}")
+
+
+def iter_estimates(level_path, max_episodes=4000, min_episodes=200, batch_size=200, tolerance=0.02,
+                   policies=POLICIES, processes=None, seed=0, use_cache=True):
+    """
+    Estimate a level's difficulty, yielding a report after every batch of episodes.
+
+    Episodes alternate between the given policies. Stops once the 95% confidence
+    interval of the completion rate has a half-width under `tolerance` (after at
+    least `min_episodes`) or after `max_episodes`; the last report is cached.
+
+    Args:
+        level_path: Level JSON file
+        max_episodes: Episode budget
+        min_episodes: Episodes to play before stopping early
+        batch_size: Episodes per batch (one report per batch)
+        tolerance: Confidence interval half-width to stop at
+        policies: Policy names (see POLICY_CLASSES)
+        processes: Worker processes (defaults to the CPU count); 1 runs in this process
+        seed: Base seed for the policies
+        use_cache: Return the cached report of a run with the same settings (if any) instead of simulating
+
+    Yields:
+        dict: Reports as returned by summarize(), with 'cached' set on a cache hit
+    """
+    # Everything the final report depends on (processes only spread the same episodes)
+    settings = {'max_episodes': max_episodes, 'min_episodes': min_episodes, 'batch_size': batch_size,
+                'tolerance': tolerance, 'policies': list(policies), 'seed': seed}
+    if use_cache:
+        cached = cached_estimate(level_path, settings)
+        if cached is not None:
+            yield dict(cached, cached=True)
+            return
+
+    level_path = os.path.abspath(level_path)
+    workers = processes or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    results = []
+    report = None
+    try:
+        while len(results) < max_episodes:
+            count = min(batch_size, max_episodes - len(results))
+            jobs = [(level_path, policies[(len(results) + i) % len(policies)], seed + len(results) + i)
+                    for i in range(count)]
+            if pool:
+                # One chunk of jobs per worker
+                chunks = [jobs[i::workers] for i in range(workers)]
+                for batch in pool.map(_run_batch, [chunk for chunk in chunks if chunk]):
+                    results.extend(batch)
+            else:
+                results.extend(_run_batch(jobs))
+            report = summarize(results, tolerance)
+            report['cached'] = False
+            yield report
+            if report['converged'] and len(results) >= min_episodes:
+                break
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if report is not None:
+        _store(level_path, settings, {key: value for key, value in report.items() if key != 'cached'})
+
+
+def estimate_difficulty(level_path, **kwargs):
+    """Run iter_estimates to the end and return the final report."""
+    report = None
+    for report in iter_estimates(level_path, **kwargs):
+        pass
+    return report
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        print(path)
+        for report in iter_estimates(path):
+            low, high = report['confidence_interval']
+            print(f"  {report['episodes']} episodes: completion {report['completion_rate']:.1%} "
+                  f"[{low:.1%}, {high:.1%}], score {report['score']} ({report['difficulty']})"
+                  f"{' (cached)' if report['cached'] else ''}")
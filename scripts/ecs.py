@@ -0,0 +1,287 @@
+"""
+Entity-component storage for crates, springs and buttons.
+
+A World keeps the simulation data of every body in a level as columns of NumPy
+arrays (struct of arrays): one row per body, one array per component. The
+systems in scripts/systems.py update whole columns at once (gravity, friction,
+tile collision), so the per-frame cost of the bodies no longer grows with one
+Python update call per object.
+
+Crate, Spring and Button objects stay the public API. They hold no simulation
+data of their own: their pos, velocity, collisions, ... are views of their row
+(see StoredBody), so code that does crate.pos[0] += 2 or reads
+spring.velocity[1] works unchanged and sees what the systems wrote.
+
+Rows are only added (spawn) or all dropped at once (clear, on level load), so
+an object's index never changes. Arrays grow by doubling, which replaces them
+(the objects are re-bound to the new arrays): keep the object around, not a
+pos/velocity view, across a spawn.
+"""
+import numpy as np
+
+# Body kinds (the 'kind' component)
+KIND_CRATE = 1
+KIND_SPRING = 2
+KIND_BUTTON = 3
+
+# Order of the 'collisions' component columns
+COLLISION_SIDES = ('up', 'down', 'right', 'left')
+SIDE_INDEX = {side: i for i, side in enumerate(COLLISION_SIDES)}
+
+INITIAL_CAPACITY = 64
+
+# Instance attributes of a StoredBody. The mixin itself has empty __slots__ (so it
+# can be combined with PhysicsEntity's); classes using it add these to their own.
+STORED_BODY_SLOTS = ('world', 'index', '_size', '_pos', '_velocity', '_last_pos', '_collisions')
+
+
+class World:
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        """
+        Args:
+            capacity: Rows allocated up front (grows as needed)
+        """
+        self.count = 0
+        self.objects = []  # Row -> the Crate/Spring/Button it belongs to
+        self.capacity = 0
+        self.kind_indices = {}  # Cached indices() results, dropped on spawn/clear
+        self.tile_cache = None  # Solid tile mask used by the systems (see systems.solid_grid)
+        self.allocate(max(1, capacity))
+
+    def __len__(self):
+        return self.count
+
+    def allocate(self, capacity):
+        """Resize the component arrays to `capacity` rows, keeping the existing rows."""
+        count = self.count
+
+        def grow(old, shape, dtype):
+            new = np.zeros((capacity,) + shape, dtype)
+            if old is not None:
+                new[:count] = old[:count]
+            return new
+
+        self.pos = grow(getattr(self, 'pos', None), (2,), np.float64)
+        self.velocity = grow(getattr(self, 'velocity', None), (2,), np.float64)
+        self.last_pos = grow(getattr(self, 'last_pos', None), (2,), np.float64)
+        self.size = grow(getattr(self, 'size', None), (2,), np.int64)
+        self.kind = grow(getattr(self, 'kind', None), (), np.int8)
+        self.collisions = grow(getattr(self, 'collisions', None), (len(COLLISION_SIDES),), np.bool_)
+        self.sleeping = grow(getattr(self, 'sleeping', None), (), np.bool_)
+        self.rest_frames = grow(getattr(self, 'rest_frames', None), (), np.int64)
+        self.teleported = grow(getattr(self, 'teleported', None), (), np.bool_)
+        self.pressed = grow(getattr(self, 'pressed', None), (), np.bool_)
+        self.parked = grow(getattr(self, 'parked', None), (), np.bool_)  # Far from the camera (see systems.park_system)
+        self.capacity = capacity
+        # The bodies' views point into the old arrays
+        for obj in self.objects:
+            if isinstance(obj, StoredBody):
+                obj.bind()
+
+    def clear(self):
+        """Drop every body (the arrays are kept and zeroed for reuse)."""
+        for array in (self.pos, self.velocity, self.last_pos, self.size, self.kind, self.collisions,
+                      self.sleeping, self.rest_frames, self.teleported, self.pressed, self.parked):
+            array[:self.count] = 0
+        self.count = 0
+        self.objects = []
+        self.kind_indices = {}
+
+    def spawn(self, kind, obj, pos=(0, 0), size=(0, 0)):
+        """
+        Add a row for a body.
+
+        Args:
+            kind: KIND_CRATE, KIND_SPRING or KIND_BUTTON
+            obj: The object the row belongs to
+            pos: Initial position (also its last position)
+            size: Collision size in pixels
+
+        Returns:
+            int: The new row's index
+        """
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+        index = self.count
+        self.count += 1
+        self.objects.append(obj)
+        self.kind[index] = kind
+        self.pos[index] = pos
+        self.last_pos[index] = pos
+        self.size[index] = size
+        self.kind_indices = {}
+        return index
+
+    def indices(self, kind):
+        """Rows of one kind, in spawn order (the order of Game.crates / Game.springs)."""
+        indices = self.kind_indices.get(kind)
+        if indices is None:
+            indices = np.flatnonzero(self.kind[:self.count] == kind)
+            self.kind_indices[kind] = indices
+        return indices
+
+    def objects_at(self, indices):
+        objects = self.objects
+        return [objects[i] for i in indices]
+
+
+class CollisionFlags:
+    """Dict-like view of a body's 'collisions' row ({'up': bool, 'down': ..., ...})."""
+    __slots__ = ('row',)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __getitem__(self, side):
+        return bool(self.row[SIDE_INDEX[side]])
+
+    def __setitem__(self, side, value):
+        self.row[SIDE_INDEX[side]] = value
+
+    def get(self, side, default=None):
+        if side in SIDE_INDEX:
+            return bool(self.row[SIDE_INDEX[side]])
+        return default
+
+    def items(self):
+        return [(side, bool(flag)) for side, flag in zip(COLLISION_SIDES, self.row)]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class StoredBody:
+    """
+    Mixin that keeps a body's simulation data in a World row.
+
+    pos, velocity and last_pos are NumPy views of the row (index and assign them like
+    the lists they replace; assigning a whole new list copies it into the row), size
+    is a tuple, collisions a CollisionFlags view. Call attach() before anything sets
+    these attributes, and add STORED_BODY_SLOTS to the __slots__ of the class.
+    """
+    __slots__ = ()
+
+    def attach(self, game, kind):
+        """
+        Allocate this body's row in the game's world.
+
+        Args:
+            game: Game instance; a body made without one (tools, tests) gets a world of its own
+            kind: KIND_CRATE or KIND_SPRING
+        """
+        world = getattr(game, 'world', None)
+        if world is None:
+            world = World(capacity=1)
+        self.world = world
+        self.index = world.spawn(kind, self)
+        self._size = (0, 0)
+        self.bind()
+
+    def bind(self):
+        """(Re)create the row views (the world calls this when it reallocates)."""
+        world = self.world
+        self._pos = world.pos[self.index]
+        self._velocity = world.velocity[self.index]
+        self._last_pos = world.last_pos[self.index]
+        self._collisions = world.collisions[self.index]
+
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        self._pos[:] = value
+
+    @property
+    def velocity(self):
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value):
+        self._velocity[:] = value
+
+    @property
+    def last_pos(self):
+        return self._last_pos
+
+    @last_pos.setter
+    def last_pos(self, value):
+        self._last_pos[:] = value
+
+    @property
+    def size(self):
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        self._size = (int(value[0]), int(value[1]))
+        self.world.size[self.index] = self._size
+
+    @property
+    def collisions(self):
+        return CollisionFlags(self._collisions)
+
+    @collisions.setter
+    def collisions(self, value):
+        row = self._collisions
+        for side, flag in value.items():
+            row[SIDE_INDEX[side]] = flag
+
+    @property
+    def sleeping(self):
+        return bool(self.world.sleeping[self.index])
+
+    @sleeping.setter
+    def sleeping(self, value):
+        self.world.sleeping[self.index] = value
+
+    @property
+    def rest_frames(self):
+        return int(self.world.rest_frames[self.index])
+
+    @rest_frames.setter
+    def rest_frames(self, value):
+        self.world.rest_frames[self.index] = value
+
+    @property
+    def teleported_this_frame(self):
+        return bool(self.world.teleported[self.index])
+
+    @teleported_this_frame.setter
+    def teleported_this_frame(self, value):
+        self.world.teleported[self.index] = value
+
+
+class Button:
+    """
+    A pressure button, stored in a World row.
+
+    Buttons used to be plain dicts, so button['pos'], button['size'] and
+    button['pressed'] still work alongside the attributes.
+    """
+    __slots__ = ('world', 'index', 'pos', 'size')
+
+    def __init__(self, world, pos, size=(16, 8)):
+        self.world = world
+        self.index = world.spawn(KIND_BUTTON, self, pos, size)
+        self.pos = tuple(pos)
+        self.size = tuple(size)
+
+    @property
+    def pressed(self):
+        return bool(self.world.pressed[self.index])
+
+    @pressed.setter
+    def pressed(self, value):
+        self.world.pressed[self.index] = value
+
+    def __getitem__(self, key):
+        if key not in ('pos', 'size', 'pressed'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key != 'pressed':
+            raise KeyError(key)
+        self.pressed = value
@@ -1,7 +1,99 @@
 import math
+import numpy as np
 import pygame
 
-class PhysicsEntity:
+from scripts.ecs import StoredBody, STORED_BODY_SLOTS, KIND_CRATE, KIND_SPRING
+from scripts.presenter import draw_rect
+
+# Movement constants (also used by scripts/reachability.py to precompute jump arcs)
+GRAVITY = 0.1
+MAX_FALL_SPEED = 10
+PLAYER_FRICTION = 0.1
+JUMP_VELOCITY = -3
+WALL_JUMP_VELOCITY = (3.5, -2.5)  # (away from the wall, up)
+CRATE_FRICTION = 0.15
+SPRING_FRICTION = 0.1
+PUSH_SPEED = 2  # Pixels per frame the player pushes crates and springs
+LAUNCHER_SPEED = 6.5  # Horizontal speed a spring_horizontal tile launches the player with
+
+# Animation actions by index, so entity state can be stored as plain numbers (see get_state)
+ACTIONS = ('', 'idle', 'run', 'jump', 'wall_slide')
+
+# Frames a body has to stay at rest before it goes to sleep
+SLEEP_FRAMES = 30
+
+# Entity flags packed into each number of a spring's state (exact as a double, also
+# after the x256 of fixed-point state hashes)
+FLAG_BITS = 48
+
+# Scratch rects for the collision code, so a physics step builds no new Rects.
+# Only valid during one call: nothing keeps them.
+_start_rect = pygame.Rect(0, 0, 0, 0)
+_moved_rect = pygame.Rect(0, 0, 0, 0)
+_swept_rect = pygame.Rect(0, 0, 0, 0)
+_other_rect = pygame.Rect(0, 0, 0, 0)
+_spring_rect = pygame.Rect(0, 0, 0, 0)
+
+
+def _swept(start_rect, moved_rect):
+    """The area covered moving from start_rect to moved_rect (in the _swept_rect scratch rect)."""
+    _swept_rect.update(moved_rect)
+    _swept_rect.union_ip(start_rect)
+    return _swept_rect
+
+
+class Sleepable:
+    """
+    Sleep/wake bookkeeping for bodies that spend most of their time at rest (crates, springs).
+
+    A body resting on the floor never quite stops: gravity pulls it a fraction of a
+    pixel down every frame until the integer collision rect snaps it back. So "at rest"
+    means its whole-pixel position did not change, it has no horizontal velocity and
+    less than a pixel per frame of vertical velocity. After SLEEP_FRAMES such frames the
+    body sleeps and skips its physics until something wakes it: the player touching
+    it, a locked portal over it, a tile change nearby, or any velocity given to it
+    (pushes and spring launches).
+
+    Subclasses provide the sleeping and rest_frames attributes.
+    """
+    __slots__ = ()
+
+    def wake(self):
+        self.sleeping = False
+        self.rest_frames = 0
+
+    def update_sleep(self):
+        """Count frames at rest after a physics update and fall asleep after SLEEP_FRAMES."""
+        if (int(self.pos[0]) == int(self.last_pos[0]) and int(self.pos[1]) == int(self.last_pos[1])
+                and self.velocity[0] == 0 and abs(self.velocity[1]) < 1):
+            self.rest_frames += 1
+            if self.rest_frames >= SLEEP_FRAMES:
+                self.sleeping = True
+                self.velocity[0] = 0
+                self.velocity[1] = 0
+                self.last_pos[0] = self.pos[0]
+                self.last_pos[1] = self.pos[1]
+        else:
+            self.rest_frames = 0
+
+    def woken_by_velocity(self):
+        """
+        Wake a sleeping body that was given velocity since it fell asleep.
+
+        Returns:
+            bool: True if the body is (still) asleep and its physics can be skipped
+        """
+        if self.sleeping and (self.velocity[0] or self.velocity[1]):
+            self.wake()
+        return self.sleeping
+
+
+class PhysicsEntity(Sleepable):
+    # Slots instead of a __dict__: smaller entities, and update() only changes them in place
+    __slots__ = ('game', 'type', 'pos', 'size', 'velocity', 'collisions', 'action', 'anim_offset',
+                 'flip', 'animation', 'last_movement', 'last_pos', 'teleported_this_frame',
+                 'sleeping', 'rest_frames')
+
     def __init__(self, game, e_type, pos, size):
         self.game = game
         self.type = e_type
@@ -16,97 +108,155 @@ class PhysicsEntity:
         if hasattr(game, 'assets') and e_type + '/idle' in game.assets:
             self.set_action('idle')
         
-        self.last_movement = [0, 0]
+        self.last_movement = (0, 0)
         self.last_pos = list(pos)
         self.teleported_this_frame = False
+        self.sleeping = False
+        self.rest_frames = 0
     
     def rect(self):
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
+
+    def rect_into(self, rect):
+        """Set an existing Rect to the entity's collision rect (rect() without a new Rect)."""
+        rect.update(self.pos[0], self.pos[1], self.size[0], self.size[1])
+        return rect
     
     def set_action(self, action):
         if action != self.action and hasattr(self.game, 'assets'):
             if self.type + '/' + action in self.game.assets:
                 self.action = action
                 self.animation = self.game.assets[self.type + '/' + self.action].copy()
+
+    def get_state(self):
+        """
+        Save the entity's simulation state (used for rewind and save states).
+
+        Returns:
+            tuple: Flat tuple of numbers, restored by set_state
+        """
+        collisions = self.collisions
+        return (self.pos[0], self.pos[1], self.velocity[0], self.velocity[1],
+                self.last_pos[0], self.last_pos[1], self.last_movement[0], self.last_movement[1],
+                int(self.flip), int(self.teleported_this_frame),
+                int(collisions['up']), int(collisions['down']), int(collisions['right']), int(collisions['left']),
+                ACTIONS.index(self.action), self.animation.frame if hasattr(self, 'animation') else 0,
+                int(self.sleeping), self.rest_frames)
+
+    def set_state(self, state):
+        """Restore a state returned by get_state."""
+        (self.pos[0], self.pos[1], self.velocity[0], self.velocity[1],
+         self.last_pos[0], self.last_pos[1], move_x, move_y,
+         flip, teleported, up, down, right, left, action, frame, sleeping, rest_frames) = state[:18]
+        self.last_movement = [move_x, move_y]
+        self.flip = bool(flip)
+        self.teleported_this_frame = bool(teleported)
+        collisions = self.collisions
+        collisions['up'], collisions['down'] = bool(up), bool(down)
+        collisions['right'], collisions['left'] = bool(right), bool(left)
+        self.set_action(ACTIONS[int(action)])
+        if hasattr(self, 'animation'):
+            self.animation.frame = int(frame)
+        self.sleeping = bool(sleeping)
+        self.rest_frames = int(rest_frames)
         
     def update(self, tilemap, movement=(0, 0), additional_colliders=None):
-        self.last_pos = self.pos.copy()
-        self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
-        
-        frame_movement = (movement[0] + self.velocity[0], movement[1] + self.velocity[1])
-        
-        self.pos[0] += frame_movement[0]
-        entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entity_rect.colliderect(rect):
-                if frame_movement[0] > 0:
-                    entity_rect.right = rect.left
-                    self.collisions['right'] = True
-                if frame_movement[0] < 0:
-                    entity_rect.left = rect.right
-                    self.collisions['left'] = True
-                self.pos[0] = entity_rect.x
+        # State is updated in place and the rects are module scratch rects, so a
+        # steady-state step allocates (almost) nothing
+        pos = self.pos
+        self.last_pos[0] = pos[0]
+        self.last_pos[1] = pos[1]
+        collisions = self.collisions
+        collisions['up'] = collisions['down'] = collisions['right'] = collisions['left'] = False
+        
+        dx = movement[0] + self.velocity[0]
+        dy = movement[1] + self.velocity[1]
+
+        # Each axis is swept: everything overlapping the area between the old and new
+        # rect is a hit, not just what overlaps the new rect, so fast entities cannot
+        # tunnel through tiles or crates. Every hit pulls the rect back (shrinking the
+        # swept area), so the nearest obstacle is the one that ends up resolved.
+        start_rect = self.rect_into(_start_rect)
+        pos[0] += dx
+        entity_rect = self.rect_into(_moved_rect)
+        swept = _swept(start_rect, entity_rect)
+        if dx:
+            for rect in tilemap.physics_rects_in(swept):
+                if swept.colliderect(rect):
+                    if dx > 0:
+                        entity_rect.right = rect.left
+                        collisions['right'] = True
+                    if dx < 0:
+                        entity_rect.left = rect.right
+                        collisions['left'] = True
+                    pos[0] = entity_rect.x
+                    swept = _swept(start_rect, entity_rect)
         
         # Check collisions with additional colliders (like crates) for horizontal movement
         # Crates don't block horizontal movement - player passes through sides
-        if additional_colliders:
-            entity_rect = self.rect()
+        if additional_colliders and dx:
             for collider in additional_colliders:
                 if collider == self:  # Don't collide with self
                     continue
                 # Skip horizontal collision with crates - player can pass through sides
                 if hasattr(self, 'type') and self.type == 'player' and hasattr(collider, 'type') and collider.type == 'crate':
                     continue
-                collider_rect = collider.rect()
-                if entity_rect.colliderect(collider_rect):
+                collider_rect = collider.rect_into(_other_rect)
+                if swept.colliderect(collider_rect):
                     # Normal collision handling for non-crates
-                    if frame_movement[0] > 0:
+                    if dx > 0:
                         entity_rect.right = collider_rect.left
-                        self.collisions['right'] = True
-                    if frame_movement[0] < 0:
+                        collisions['right'] = True
+                    if dx < 0:
                         entity_rect.left = collider_rect.right
-                        self.collisions['left'] = True
-                    self.pos[0] = entity_rect.x
-        
-        self.pos[1] += frame_movement[1]
-        entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entity_rect.colliderect(rect):
-                if frame_movement[1] > 0:
-                    entity_rect.bottom = rect.top
-                    self.collisions['down'] = True
-                if frame_movement[1] < 0:
-                    entity_rect.top = rect.bottom
-                    self.collisions['up'] = True
-                self.pos[1] = entity_rect.y
+                        collisions['left'] = True
+                    pos[0] = entity_rect.x
+                    swept = _swept(start_rect, entity_rect)
+        
+        start_rect = self.rect_into(_start_rect)
+        pos[1] += dy
+        entity_rect = self.rect_into(_moved_rect)
+        swept = _swept(start_rect, entity_rect)
+        if dy:
+            for rect in tilemap.physics_rects_in(swept):
+                if swept.colliderect(rect):
+                    if dy > 0:
+                        entity_rect.bottom = rect.top
+                        collisions['down'] = True
+                    if dy < 0:
+                        entity_rect.top = rect.bottom
+                        collisions['up'] = True
+                    pos[1] = entity_rect.y
+                    swept = _swept(start_rect, entity_rect)
         
         # Check collisions with additional colliders (like crates) for vertical movement
-        if additional_colliders:
-            entity_rect = self.rect()
+        if additional_colliders and dy:
             for collider in additional_colliders:
                 if collider == self:  # Don't collide with self
                     continue
-                collider_rect = collider.rect()
-                if entity_rect.colliderect(collider_rect):
+                collider_rect = collider.rect_into(_other_rect)
+                if swept.colliderect(collider_rect):
                     # For crates, only check top edge collision (when player is landing from above)
                     if hasattr(self, 'type') and self.type == 'player' and hasattr(collider, 'type') and collider.type == 'crate':
                         # Only handle top edge - player landing on crate (moving down)
-                        if frame_movement[1] > 0:  # Player moving down
-                            # Check if player is above the crate (player's bottom should be at crate's top)
-                            if entity_rect.bottom <= collider_rect.top + 5:  # Small tolerance for landing
+                        if dy > 0:  # Player moving down
+                            # Check the player started above the crate (small tolerance for landing)
+                            if start_rect.bottom <= collider_rect.top + 5:
                                 entity_rect.bottom = collider_rect.top
-                                self.collisions['down'] = True
-                                self.pos[1] = entity_rect.y
+                                collisions['down'] = True
+                                pos[1] = entity_rect.y
+                                swept = _swept(start_rect, entity_rect)
                         # Don't handle bottom collision (player can pass through bottom)
                     else:
                         # Normal collision handling for non-crates
-                        if frame_movement[1] > 0:
+                        if dy > 0:
                             entity_rect.bottom = collider_rect.top
-                            self.collisions['down'] = True
-                        if frame_movement[1] < 0:
+                            collisions['down'] = True
+                        if dy < 0:
                             entity_rect.top = collider_rect.bottom
-                            self.collisions['up'] = True
-                        self.pos[1] = entity_rect.y
+                            collisions['up'] = True
+                        pos[1] = entity_rect.y
+                        swept = _swept(start_rect, entity_rect)
                 
         if movement[0] > 0:
             self.flip = False
@@ -115,9 +265,9 @@ class PhysicsEntity:
             
         self.last_movement = movement
         
-        self.velocity[1] = min(10, self.velocity[1] + 0.1)
+        self.velocity[1] = min(MAX_FALL_SPEED, self.velocity[1] + GRAVITY)
         
-        if self.collisions['down'] or self.collisions['up']:
+        if collisions['down'] or collisions['up']:
             self.velocity[1] = 0
             
         if hasattr(self, 'animation'):
@@ -125,16 +275,18 @@ class PhysicsEntity:
     
     def render(self, surf, offset=(0, 0)):
         if hasattr(self, 'animation'):
-            surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), 
+            surf.blit(self.animation.img(self.flip), 
                      (self.pos[0] - offset[0] + self.anim_offset[0], 
                       self.pos[1] - offset[1] + self.anim_offset[1]))
         else:
             # Fallback rendering
-            pygame.draw.rect(surf, (255, 0, 0), 
+            draw_rect(surf, (255, 0, 0), 
                            (self.pos[0] - offset[0], self.pos[1] - offset[1], 
                             self.size[0], self.size[1]))
 
 class Player(PhysicsEntity):
+    __slots__ = ('air_time', 'jumps', 'wall_slide')
+
     def __init__(self, game, pos, size):
         super().__init__(game, 'player', pos, size)
         self.air_time = 0
@@ -169,34 +321,48 @@ class Player(PhysicsEntity):
                 self.set_action('idle')
                 
         if self.velocity[0] > 0:
-            self.velocity[0] = max(self.velocity[0] - 0.1, 0)
+            self.velocity[0] = max(self.velocity[0] - PLAYER_FRICTION, 0)
         else:
-            self.velocity[0] = min(self.velocity[0] + 0.1, 0)
+            self.velocity[0] = min(self.velocity[0] + PLAYER_FRICTION, 0)
+
+    def get_state(self):
+        return super().get_state() + (self.air_time, self.jumps, int(self.wall_slide))
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.air_time, self.jumps, wall_slide = state[18:21]
+        self.air_time = int(self.air_time)
+        self.jumps = int(self.jumps)
+        self.wall_slide = bool(wall_slide)
     
     def jump(self):
         if self.wall_slide:
             if self.flip and self.last_movement[0] < 0:
-                self.velocity[0] = 3.5
-                self.velocity[1] = -2.5
+                self.velocity[0] = WALL_JUMP_VELOCITY[0]
+                self.velocity[1] = WALL_JUMP_VELOCITY[1]
                 self.air_time = 5
                 self.jumps = max(0, self.jumps - 1)
                 return True
             elif not self.flip and self.last_movement[0] > 0:
-                self.velocity[0] = -3.5
-                self.velocity[1] = -2.5
+                self.velocity[0] = -WALL_JUMP_VELOCITY[0]
+                self.velocity[1] = WALL_JUMP_VELOCITY[1]
                 self.air_time = 5
                 self.jumps = max(0, self.jumps - 1)
                 return True
                 
         elif self.jumps and self.air_time < 5:
-            self.velocity[1] = -3
+            self.velocity[1] = JUMP_VELOCITY
             self.jumps -= 1
             self.air_time = 5
             return True
         return False
 
-class Crate(PhysicsEntity):
+class Crate(StoredBody, PhysicsEntity):
+    __slots__ = STORED_BODY_SLOTS + ('being_pushed',)
+
     def __init__(self, game, pos, size=(16, 16)):
+        # Simulation data lives in the game's World (see scripts/ecs.py)
+        self.attach(game, KIND_CRATE)
         # Use the actual box image size for the collision box if available
         if hasattr(game, 'assets') and 'box' in game.assets:
             box_img = game.assets['box']
@@ -204,8 +370,67 @@ class Crate(PhysicsEntity):
             size = (box_img.get_width(), box_img.get_height())
         super().__init__(game, 'crate', pos, size)
         self.being_pushed = False
-        
+
+    @staticmethod
+    def get_states(crates):
+        """
+        get_state() of many crates at once, concatenated in order.
+
+        Args:
+            crates: Crates stored in the same World
+
+        Returns:
+            tuple: The same numbers as joining each crate's get_state()
+        """
+        if not crates:
+            return ()
+        world = crates[0].world
+        indices = np.array([crate.index for crate in crates])
+        states = np.empty((len(crates), 18))
+        states[:, 0:2] = world.pos[indices]
+        states[:, 2:4] = world.velocity[indices]
+        states[:, 4:6] = world.last_pos[indices]
+        # Not part of the world: last movement, flip, action and animation frame
+        states[:, [6, 7, 8, 14, 15]] = [(crate.last_movement[0], crate.last_movement[1], crate.flip,
+                                         ACTIONS.index(crate.action),
+                                         crate.animation.frame if hasattr(crate, 'animation') else 0)
+                                        for crate in crates]
+        states[:, 9] = world.teleported[indices]
+        states[:, 10:14] = world.collisions[indices]
+        states[:, 16] = world.sleeping[indices]
+        states[:, 17] = world.rest_frames[indices]
+        return tuple(states.ravel().tolist())
+
+    @staticmethod
+    def set_states(crates, states):
+        """Restore the crates from a get_states() result."""
+        if not crates:
+            return
+        world = crates[0].world
+        indices = np.array([crate.index for crate in crates])
+        states = np.asarray(states, np.float64).reshape(len(crates), 18)
+        world.pos[indices] = states[:, 0:2]
+        world.velocity[indices] = states[:, 2:4]
+        world.last_pos[indices] = states[:, 4:6]
+        world.teleported[indices] = states[:, 9] != 0
+        world.collisions[indices] = states[:, 10:14] != 0
+        world.sleeping[indices] = states[:, 16] != 0
+        world.rest_frames[indices] = states[:, 17]
+        for crate, (move_x, move_y, flip, action, frame) in zip(crates, states[:, [6, 7, 8, 14, 15]].tolist()):
+            crate.last_movement = [move_x, move_y]
+            crate.flip = bool(flip)
+            crate.set_action(ACTIONS[int(action)])
+            if hasattr(crate, 'animation'):
+                crate.animation.frame = int(frame)
+
     def update(self, tilemap, movement=(0, 0)):
+        """
+        Step this crate alone. The game steps all of its crates at once with
+        systems.crate_system, which gives the same result.
+        """
+        # Resting crates sleep until pushed, launched or touched (see Sleepable)
+        if self.woken_by_velocity():
+            return
         super().update(tilemap, movement=movement)
         
         # If crate collided with a wall horizontally, stop horizontal movement immediately
@@ -214,9 +439,11 @@ class Crate(PhysicsEntity):
         
         # Crates have friction (gravity is handled by PhysicsEntity parent class)
         if self.velocity[0] > 0:
-            self.velocity[0] = max(self.velocity[0] - 0.15, 0)
+            self.velocity[0] = max(self.velocity[0] - CRATE_FRICTION, 0)
         else:
-            self.velocity[0] = min(self.velocity[0] + 0.15, 0)
+            self.velocity[0] = min(self.velocity[0] + CRATE_FRICTION, 0)
+
+        self.update_sleep()
     
     def render(self, surf, offset=(0, 0)):
         # Render box image if available
@@ -225,14 +452,23 @@ class Crate(PhysicsEntity):
             surf.blit(box_img, (self.pos[0] - offset[0], self.pos[1] - offset[1]))
         else:
             # Fallback: Draw brown crate
-            pygame.draw.rect(surf, (139, 69, 19), 
+            draw_rect(surf, (139, 69, 19), 
                             (self.pos[0] - offset[0], self.pos[1] - offset[1], 
                              self.size[0], self.size[1]))
-            pygame.draw.rect(surf, (101, 50, 14), 
+            draw_rect(surf, (101, 50, 14), 
                             (self.pos[0] - offset[0], self.pos[1] - offset[1], 
                              self.size[0], self.size[1]), 2)
 
-class Spring:
+class Spring(StoredBody, Sleepable):
+    __slots__ = STORED_BODY_SLOTS + ('game', 'base_image', 'image', 'touching_entities', 'launched_entities',
+                                     'bounced_entities', 'cooldown_timer', 'is_active', 'entity_bounce_heights')
+
+    # Constants for bounce behavior
+    BASE_BOUNCE_POWER = 3.0  # Base constant bounce height (normal bounce)
+    MIN_HIGH_JUMP_VELOCITY = 5.0  # Minimum impact velocity to trigger high bounce
+    HIGH_BOUNCE_MULTIPLIER = 0.6  # Multiplier for high jumps (reduced from 0.8)
+    MAX_BOUNCE_POWER = 6.0  # Absolute maximum launch power
+
     def __init__(self, game, pos):
         """
         Bottom-attached spring entity that can be pushed left/right and launches entities upward.
@@ -241,18 +477,23 @@ class Spring:
             game: Game instance
             pos: Position tuple (x, y)
         """
+        # Simulation data lives in the game's World (see scripts/ecs.py)
+        self.attach(game, KIND_SPRING)
         self.game = game
         self.pos = list(pos)
         self.velocity = [0, 0]  # For physics-based pushing
         
-        # Load spring image as-is without scaling, with alpha transparency
-        import os
-        game_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        spring_path = os.path.join(game_dir, 'data', 'images', 'spring.png')
-        spring_img = pygame.image.load(spring_path).convert_alpha()  # Preserve alpha channel
+        # Spring image as-is without scaling, with alpha transparency (loaded once by the game)
+        if hasattr(game, 'assets') and 'spring' in game.assets:
+            spring_img = game.assets['spring']
+        else:
+            import os
+            game_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            spring_path = os.path.join(game_dir, 'data', 'images', 'spring.png')
+            spring_img = pygame.image.load(spring_path).convert_alpha()  # Preserve alpha channel
         # Use original image size
         self.base_image = spring_img
-        self.image = self.base_image.copy()
+        self.image = self.base_image
         
         # Size for collision detection - use actual image size
         self.size = (spring_img.get_width(), spring_img.get_height())
@@ -271,12 +512,6 @@ class Spring:
         # NEW: Track the current bounce height for each entity to maintain constant bounces
         self.entity_bounce_heights = {}  # {entity_id: launch_power}
         
-        # Constants for bounce behavior
-        self.BASE_BOUNCE_POWER = 3.0  # Base constant bounce height (normal bounce)
-        self.MIN_HIGH_JUMP_VELOCITY = 5.0  # Minimum impact velocity to trigger high bounce
-        self.HIGH_BOUNCE_MULTIPLIER = 0.6  # Multiplier for high jumps (reduced from 0.8)
-        self.MAX_BOUNCE_POWER = 6.0  # Absolute maximum launch power
-        
         # For portal teleport tracking
         self.last_pos = list(pos)
         self.teleported_this_frame = False
@@ -284,68 +519,143 @@ class Spring:
     def rect(self):
         """Get collision rect for the spring"""
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
+
+    def rect_into(self, rect):
+        """Set an existing Rect to the spring's collision rect (rect() without a new Rect)."""
+        rect.update(self.pos[0], self.pos[1], self.size[0], self.size[1])
+        return rect
+
+    def get_state(self, entities, positions=None):
+        """
+        Save the spring's simulation state (used for rewind and save states).
+
+        Entities are tracked by id() while playing, which does not survive a save, so
+        the touching/launched sets are stored as flags by entity position instead,
+        FLAG_BITS to a number (a level with thousands of crates would otherwise
+        need thousands of numbers per spring).
+
+        Args:
+            entities: The entities passed to update(), in the same order
+            positions: {id(entity): position in entities}, to share between springs
+
+        Returns:
+            tuple: Flat tuple of numbers, restored by set_state
+        """
+        state = (self.pos[0], self.pos[1], self.velocity[0], self.velocity[1],
+                 self.last_pos[0], self.last_pos[1], int(self.teleported_this_frame),
+                 int(self.sleeping), self.rest_frames)
+        words = -(-len(entities) // FLAG_BITS)
+        if not self.touching_entities and not self.launched_entities:
+            return state + (0,) * (2 * words)
+        if positions is None:
+            positions = {id(entity): i for i, entity in enumerate(entities)}
+        flags = [0] * (2 * words)
+        for offset, tracked in ((0, self.touching_entities), (words, self.launched_entities)):
+            for entity_id in tracked:
+                i = positions.get(entity_id)
+                if i is not None:
+                    flags[offset + i // FLAG_BITS] |= 1 << (i % FLAG_BITS)
+        return state + tuple(flags)
+
+    def set_state(self, state, entities):
+        """Restore a state returned by get_state (with the same entities)."""
+        (self.pos[0], self.pos[1], self.velocity[0], self.velocity[1],
+         self.last_pos[0], self.last_pos[1], teleported, sleeping, rest_frames) = state[:9]
+        self.teleported_this_frame = bool(teleported)
+        self.sleeping = bool(sleeping)
+        self.rest_frames = int(rest_frames)
+        words = -(-len(entities) // FLAG_BITS)
+        tracked = ([], [])
+        for k, word in enumerate(state[9:9 + 2 * words]):
+            word = int(word)
+            while word:
+                bit = word & -word
+                tracked[k >= words].append(id(entities[(k % words) * FLAG_BITS + bit.bit_length() - 1]))
+                word ^= bit
+        self.touching_entities = set(tracked[0])
+        self.launched_entities = dict.fromkeys(tracked[1], 0)
     
-    def update(self, tilemap, entities):
+    def apply_physics(self, tilemap):
         """
-        Update spring physics (pushing, gravity), animation, and check for collisions with entities.
-        
+        Move the spring under gravity and friction and resolve tile collisions.
+
         Args:
             tilemap: Tilemap instance for physics
-            entities: List of entities to check collisions with (like player, crates)
         """
-        self.last_pos = self.pos.copy()
+        self.last_pos[0] = self.pos[0]
+        self.last_pos[1] = self.pos[1]
         
         # Cooldown removed - spring is always active
         self.is_active = True
         
         # Apply gravity (like other entities)
-        self.velocity[1] = min(10, self.velocity[1] + 0.1)
+        self.velocity[1] = min(MAX_FALL_SPEED, self.velocity[1] + GRAVITY)
         
         # Apply physics (friction for horizontal movement)
         if self.velocity[0] > 0:
-            self.velocity[0] = max(self.velocity[0] - 0.1, 0)
+            self.velocity[0] = max(self.velocity[0] - SPRING_FRICTION, 0)
         else:
-            self.velocity[0] = min(self.velocity[0] + 0.1, 0)
-        
-        # Move spring horizontally
-        self.pos[0] += self.velocity[0]
-        
-        # Check horizontal collisions with tilemap
-        spring_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if spring_rect.colliderect(rect):
-                # Only handle horizontal collision if we're moving horizontally
-                if self.velocity[0] > 0:
-                    spring_rect.right = rect.left
-                    self.pos[0] = spring_rect.x
-                    self.velocity[0] = 0
-                elif self.velocity[0] < 0:
-                    spring_rect.left = rect.right
+            self.velocity[0] = min(self.velocity[0] + SPRING_FRICTION, 0)
+        
+        # Move spring horizontally, swept against the tiles it passes (see PhysicsEntity.update)
+        dx = self.velocity[0]
+        start_rect = self.rect_into(_start_rect)
+        self.pos[0] += dx
+        spring_rect = self.rect_into(_moved_rect)
+        if dx:
+            swept = _swept(start_rect, spring_rect)
+            for rect in tilemap.physics_rects_in(swept):
+                if swept.colliderect(rect):
+                    if dx > 0:
+                        spring_rect.right = rect.left
+                    else:
+                        spring_rect.left = rect.right
                     self.pos[0] = spring_rect.x
                     self.velocity[0] = 0
+                    swept = _swept(start_rect, spring_rect)
         
         # Move spring vertically
-        self.pos[1] += self.velocity[1]
-        
-        # Check vertical collisions with tilemap
-        spring_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if spring_rect.colliderect(rect):
-                # Only handle vertical collision based on vertical movement
-                if self.velocity[1] > 0:  # Falling
-                    spring_rect.bottom = rect.top
+        dy = self.velocity[1]
+        start_rect = self.rect_into(_start_rect)
+        self.pos[1] += dy
+        spring_rect = self.rect_into(_moved_rect)
+        if dy:
+            swept = _swept(start_rect, spring_rect)
+            for rect in tilemap.physics_rects_in(swept):
+                if swept.colliderect(rect):
+                    if dy > 0:  # Falling
+                        spring_rect.bottom = rect.top
+                    else:  # Moving up
+                        spring_rect.top = rect.bottom
                     self.pos[1] = spring_rect.y
                     self.velocity[1] = 0
-                elif self.velocity[1] < 0:  # Moving up
-                    spring_rect.top = rect.bottom
-                    self.pos[1] = spring_rect.y
-                    self.velocity[1] = 0
-                # If velocity is 0, don't adjust position (spring is resting)
-        
-        spring_rect = self.rect()
+                    swept = _swept(start_rect, spring_rect)
+
+    def update(self, tilemap, entities):
+        """
+        Update spring physics (pushing, gravity), animation, and check for collisions with entities.
         
+        Args:
+            tilemap: Tilemap instance for physics
+            entities: List of entities to check collisions with (like player, crates)
+        """
+        # Resting springs sleep (skip their own physics) but still launch entities landing on them
+        if not self.woken_by_velocity():
+            self.apply_physics(tilemap)
+            self.update_sleep()
+        self.update_contacts(tilemap, entities)
+
+    def update_contacts(self, tilemap, entities):
+        """
+        Launch the entities landing on the spring (the part of update after its physics,
+        which the game runs for all springs at once with systems.spring_system).
+
+        Args:
+            tilemap: Tilemap instance, to tell the ground from the spring
+            entities: List of entities to check collisions with (like player, crates)
+        """
         # Reset bounce tracking for entities that have hit the ground (not just the spring)
-        for entity in entities:
+        for entity in (entities if self.bounced_entities or self.entity_bounce_heights else ()):
             if hasattr(entity, 'collisions') and hasattr(entity, 'rect'):
                 entity_id = id(entity)
                 # If entity is on the ground (tilemap collision, not spring), they can be bounced again
@@ -370,83 +680,102 @@ class Spring:
         
         # Check collisions with entities
         for entity in entities:
-            if not hasattr(entity, 'rect'):
+            if not hasattr(entity, 'rect_into'):
+                continue
+            launch_power = self.contact(entity)
+            if launch_power is None:
                 continue
-            entity_rect = entity.rect()
             entity_id = id(entity)  # Unique ID for each entity
-            
-            # Check current collision
-            is_colliding = spring_rect.colliderect(entity_rect)
-            
-            # Also check if entity passed through spring (for fast-moving entities)
-            # Check if entity's previous position and current position create a line that intersects spring
-            if not is_colliding and hasattr(entity, 'last_pos'):
-                # Create a larger detection area above the spring for fast-falling entities
-                detection_rect = pygame.Rect(spring_rect.x - 2, spring_rect.y - 8, spring_rect.width + 4, spring_rect.height + 8)
-                if detection_rect.colliderect(entity_rect):
-                    # Check if entity is moving down and would have passed through spring
-                    if hasattr(entity, 'velocity') and entity.velocity[1] > 0:
-                        # Entity is falling and in detection area - treat as collision
-                        is_colliding = True
-            
-            if is_colliding:
-                currently_touching.add(entity_id)
-                
-                # Only launch if:
-                # - Entity just started touching from above (wasn't touching last frame)
-                # - Entity is landing on spring (moving downward)
-                # Check if entity is landing on spring (entity bottom touching spring top)
-                if entity_id not in self.touching_entities and entity.velocity[1] >= 0:
-                    if hasattr(entity, 'velocity'):
-                        # Check if entity is landing on top of spring (moving down)
-                        # More lenient check for fast-moving entities
-                        if entity_rect.bottom <= spring_rect.top + 6:
-                            # Calculate impact velocity - only use downward motion
-                            # Velocity[1] is positive when falling (downward in pygame)
-                            # Only count downward velocity (ignore upward velocity)
-                            velocity_based = max(0, entity.velocity[1])  # Positive = downward, ignore negative
-                            
-                            # Also check position change for fast entities that might have passed through
-                            position_based = 0
-                            if hasattr(entity, 'last_pos'):
-                                # Calculate actual distance fallen this frame (only if moving down)
-                                distance_fallen = entity.pos[1] - entity.last_pos[1]
-                                position_based = max(0, distance_fallen)  # Only positive (downward) movement
-                            
-                            # Use the larger value to catch fast-moving entities
-                            impact_velocity = max(velocity_based, position_based)
-                            
-                            # Determine launch power based on impact velocity:
-                            # - Higher impact velocity (falling from higher) = higher bounce
-                            # - Base bounce power + velocity multiplier
-                            
-                            if impact_velocity >= self.MIN_HIGH_JUMP_VELOCITY:
-                                # High impact - calculate proportional bounce
-                                launch_power = self.BASE_BOUNCE_POWER + impact_velocity * self.HIGH_BOUNCE_MULTIPLIER
-                                launch_power = min(launch_power, self.MAX_BOUNCE_POWER)
-                            else:
-                                # Normal bounce - use base power
-                                launch_power = self.BASE_BOUNCE_POWER
-                            
-                            # Launch entity UP - REPLACE velocity (don't add to existing upward velocity)
-                            entity.velocity[1] = -launch_power
-                            
-                            # Play spring sound if entity is player
-                            if hasattr(entity, 'type') and entity.type == 'player':
-                                if hasattr(self.game, 'spring_sound') and self.game.spring_sound:
-                                    self.game.spring_sound.play()
-                            
-                            # No animation - removed
-                            self.launched_entities[entity_id] = 0
+            currently_touching.add(entity_id)
+
+            # Only launch if the entity just started touching from above (wasn't touching last frame)
+            if launch_power and entity_id not in self.touching_entities:
+                # Launch entity UP - REPLACE velocity (don't add to existing upward velocity)
+                self.launch(entity, launch_power)
+
+                # Play spring sound if entity is player
+                if hasattr(entity, 'type') and entity.type == 'player':
+                    if hasattr(self.game, 'spring_sound') and self.game.spring_sound:
+                        self.game.spring_sound.play()
+
+                # No animation - removed
+                self.launched_entities[entity_id] = 0
         
         # Update touching entities for next frame
         self.touching_entities = currently_touching
         
         # No animation update - removed animations
     
+    def launch(self, entity, launch_power):
+        """
+        Launch an entity up from the spring's top. An entity caught by contact()'s
+        look-ahead is moved down onto the spring first, so it never bounces off the air.
+        """
+        if entity.pos[1] + entity.size[1] < self.pos[1]:
+            entity.pos[1] = self.pos[1] - entity.size[1]
+        entity.velocity[1] = -launch_power
+
+    def contact(self, entity):
+        """
+        Check one entity against the spring without changing anything (the test behind
+        update_contacts, also used to predict trajectories, see scripts/preview.py).
+
+        Args:
+            entity: Anything with pos, size, velocity and rect_into (last_pos optional)
+
+        Returns:
+            None if the entity does not touch the spring, else the power it is launched
+            up with if it is landing on top (0 if it is not)
+        """
+        spring_rect = self.rect_into(_spring_rect)
+        entity_rect = entity.rect_into(_moved_rect)
+
+        # A falling entity also collides if its next move reaches the spring, so fast
+        # fallers are caught before they can pass through it in one frame (last_pos is
+        # no help here: the portal check resets it to pos after every move). Such an
+        # entity can still be up to one velocity step above the spring; launch() puts
+        # it on the spring's top first.
+        is_colliding = spring_rect.colliderect(entity_rect)
+        if not is_colliding and entity.velocity[1] > 0:
+            next_rect = _other_rect
+            next_rect.update(entity.pos[0], entity.pos[1] + entity.velocity[1],
+                             entity_rect.width, entity_rect.height)
+            is_colliding = spring_rect.colliderect(_swept(entity_rect, next_rect))
+        if not is_colliding:
+            return None
+
+        # Landing: moving down, with its bottom at the spring's top
+        # (lenient, for fast-moving entities)
+        if entity.velocity[1] < 0 or entity_rect.bottom > spring_rect.top + 6:
+            return 0
+
+        # Calculate impact velocity - only use downward motion
+        # Velocity[1] is positive when falling (downward in pygame)
+        velocity_based = max(0, entity.velocity[1])
+
+        # Also check position change for fast entities that might have passed through
+        position_based = 0
+        if hasattr(entity, 'last_pos'):
+            # Calculate actual distance fallen this frame (only if moving down)
+            distance_fallen = entity.pos[1] - entity.last_pos[1]
+            position_based = max(0, distance_fallen)  # Only positive (downward) movement
+
+        # Use the larger value to catch fast-moving entities
+        impact_velocity = max(velocity_based, position_based)
+
+        # Determine launch power based on impact velocity:
+        # - Higher impact velocity (falling from higher) = higher bounce
+        # - Base bounce power + velocity multiplier
+        if impact_velocity >= self.MIN_HIGH_JUMP_VELOCITY:
+            # High impact - calculate proportional bounce
+            launch_power = self.BASE_BOUNCE_POWER + impact_velocity * self.HIGH_BOUNCE_MULTIPLIER
+            return min(launch_power, self.MAX_BOUNCE_POWER)
+        # Normal bounce - use base power
+        return self.BASE_BOUNCE_POWER
+
     def render(self, surf, offset=(0, 0)):
         """Render the spring without any animation or effects"""
-        spring_img = self.base_image.copy()
+        spring_img = self.base_image
         
         # Render at position without any scaling or animation
         render_x = self.pos[0] - offset[0]
@@ -0,0 +1,480 @@
+"""
+Gym-style environment over a headless Game, for training and evaluating agents offline.
+
+GameEnv wraps one Game (see Game.update) with the usual reset() / step() API:
+- reset() -> (observation, info)
+- step(action) -> (observation, reward, terminated, truncated, info)
+
+An action is five ints: [move, jump, portal, cursor_x, cursor_y]
+- move: 0 = none, 1 = left, 2 = right
+- jump: 1 presses jump this step
+- portal: 0 = released (shift up), 1 = red, 2 = white
+- cursor_x, cursor_y: tile the mouse is over, counted from the level's top-left
+  (the cursor portal follows it while unlocked)
+
+An observation is a dict of float32 arrays:
+- 'tiles': (len(TILE_CHANNELS), rows, cols) tile grid downsampled by grid_scale
+  (each value is the fraction of the block covered by that kind of tile). The
+  window is the size of the largest level (see level_area) so observations of
+  different levels stack; each level is drawn from its own top-left corner
+- 'player': x, y, vx, vy, on ground, touching wall left, touching wall right
+- 'portals': mode (0 none, 1 red, 2 white), player portal x/y, cursor portal x/y,
+  placement blocked
+- 'key': room has key, has key, x, y of the first remaining key (-1 when none)
+
+VectorEnv steps many independent GameEnvs across worker processes and returns
+batched NumPy arrays, resetting finished environments automatically.
+
+Throughput scales with cores, not within one: a step costs about 0.4-2.3 ms
+depending on the level, so one process runs roughly 25,000-75,000 steps per
+minute with observations on. Hundreds of thousands of steps per minute need
+a VectorEnv spread over 4-10 or more processes. Measure a machine with:
+    python -m scripts.env [--envs 8] [--processes 1] [--steps 500]
+"""
+import os
+import math
+import time
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+import pygame
+
+from scripts.tilemap import PHYSICS_TILES
+
+# Smallest observation window, in tiles: one 540x380 screen
+MAP_WIDTH = 34
+MAP_HEIGHT = 24
+
+TILE_CHANNELS = ('solid', 'spikes', 'noportalzone', 'spring_horizontal', 'key', 'door', 'crate', 'spring')
+STATIC_CHANNELS = ('solid', 'spikes', 'noportalzone', 'spring_horizontal')  # Never change during a level
+PLAYER_FEATURES = 7
+PORTAL_FEATURES = 6
+KEY_FEATURES = 4
+
+# Rewards
+REWARD_WIN = 1.0
+REWARD_DEATH = -1.0
+REWARD_KEY = 0.5
+
+NOOP_ACTION = (0, 0, 0, 0, 0)
+
+
+def default_levels():
+    """Developer levels in data/maps (level1.json, level2.json, ...)."""
+    game_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    maps_dir = os.path.join(game_dir, 'data', 'maps')
+    levels = []
+    for name in os.listdir(maps_dir):
+        if name.startswith('level') and name.endswith('.json') and name[5:-5].isdigit():
+            levels.append((int(name[5:-5]), os.path.join(maps_dir, name)))
+    return [path for _, path in sorted(levels)]
+
+
+def level_area(tilemap):
+    """
+    Tile rect a level's observation covers: its tiles' extent (Tilemap.extent) and at
+    least MAP_WIDTH x MAP_HEIGHT from (0, 0).
+    """
+    size = tilemap.tile_size
+    area = pygame.Rect(0, 0, MAP_WIDTH, MAP_HEIGHT)
+    extent = tilemap.extent()
+    if extent.width:
+        left, top = extent.left // size, extent.top // size
+        area.union_ip(pygame.Rect(left, top, math.ceil(extent.right / size) - left, math.ceil(extent.bottom / size) - top))
+    return area
+
+
+class GameEnv:
+    def __init__(self, levels=None, max_steps=3000, frame_skip=1, grid_scale=2, seed=None, observe=True,
+                 fixed_point=False):
+        """
+        Args:
+            levels: Level path or list of level paths (one is picked at random on every
+                    reset); defaults to the developer levels
+            max_steps: Steps before an episode is truncated
+            frame_skip: Game frames each action is repeated for
+            grid_scale: Downsampling factor of the 'tiles' observation
+            seed: Seed for the level choice
+            observe: Build observations (reset/step return None instead when False,
+                     for callers that only read self.game)
+            fixed_point: Run the game in fixed-point mode, so episodes replay exactly
+                         and can be compared with game.state_hash() (episodes only replay
+                         in the mode they were recorded in)
+        """
+        # Imported here so worker processes set up pygame themselves (see VectorEnv)
+        from game import Game
+
+        if levels is None:
+            levels = default_levels()
+        elif isinstance(levels, str):
+            levels = [levels]
+        self.levels = list(levels)
+        self.max_steps = max_steps
+        self.frame_skip = frame_skip
+        self.grid_scale = grid_scale
+        self.observe = observe
+        self.rng = np.random.default_rng(seed)
+
+        self.game = Game(self.levels[0], headless=True, fixed_point=fixed_point)
+        self.tile_size = self.game.tilemap.tile_size
+        # Level path -> level_area; the window fits the largest
+        self.areas = {}
+        for level in self.levels:
+            self.game.load_level(level)
+            self.areas[level] = level_area(self.game.tilemap)
+        self.rows = -(-max(area.height for area in self.areas.values()) // grid_scale)
+        self.cols = -(-max(area.width for area in self.areas.values()) // grid_scale)
+        self.grid = np.zeros((len(TILE_CHANNELS), self.rows * grid_scale, self.cols * grid_scale), dtype=np.float32)
+        self.static_grids = {}  # level path -> static channels of the full-resolution grid
+        self.level = None
+        self.area = None  # level_area of the current level
+        self.steps = 0
+        self.frames = 0
+
+    def reset(self, level=None):
+        """
+        Start a new episode.
+
+        Args:
+            level: Level path to play (defaults to a random one from self.levels)
+
+        Returns:
+            tuple: (observation, info)
+
+        Raises:
+            ValueError: If the level is larger than the observation window
+        """
+        if level is None:
+            level = self.levels[self.rng.integers(len(self.levels))]
+        self.level = level
+        game = self.game
+        game.level = level
+        game.load_level(level)
+        if level not in self.areas:
+            area = level_area(game.tilemap)
+            if area.width > self.grid.shape[2] or area.height > self.grid.shape[1]:
+                raise ValueError(f"{level} is {area.width}x{area.height} tiles, larger than the "
+                                 f"{self.grid.shape[2]}x{self.grid.shape[1]} observation window of this env's levels")
+            self.areas[level] = area
+        self.area = self.areas[level]
+        game.dead = 0
+        game.won = False
+        game.paused = False
+        game.transition_active = False
+        game.transition_type = None
+        game.transition_progress = 0
+        game.movement = [False, False]
+        game.exit_portal_mode()
+        game.player.last_pos = list(game.player.pos)
+        self.steps = 0
+        self.frames = 0
+
+        if level not in self.static_grids:
+            self.static_grids[level] = self._static_grid()
+        return self.observation(), self._info()
+
+    def step(self, action):
+        """
+        Apply an action for frame_skip frames.
+
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info)
+        """
+        game = self.game
+        move, jump, portal, cursor_x, cursor_y = (int(value) for value in action)
+        game.movement = [move == 1, move == 2]
+        game.mouse_pos = [(self.area.left + cursor_x + 0.5) * self.tile_size, (self.area.top + cursor_y + 0.5) * self.tile_size]
+
+        had_key = game.has_key
+        reward = 0.0
+        for frame in range(self.frame_skip):
+            if frame == 0:
+                if jump:
+                    game.jump()
+                self._apply_portal(portal)
+            game.update()
+            self.frames += 1
+            if game.dead or game.won:
+                break
+
+        if game.has_key and not had_key:
+            reward += REWARD_KEY
+        terminated = bool(game.dead or game.won)
+        if game.won:
+            reward += REWARD_WIN
+        elif game.dead:
+            reward += REWARD_DEATH
+        self.steps += 1
+        truncated = not terminated and self.steps >= self.max_steps
+        return self.observation(), reward, terminated, truncated, self._info()
+
+    def _apply_portal(self, portal):
+        game = self.game
+        if portal == 0:
+            if game.portal_mode:
+                game.exit_portal_mode()
+            return
+        if not game.portal_mode:
+            # Portals are placed where the cursor was last frame (like pressing shift)
+            game.update_cursor_state()
+            game.enter_portal_mode()
+        game.set_portal_color('red' if portal == 1 else 'white')
+
+    def _static_grid(self):
+        """Full-resolution channels for tiles that never change during the level."""
+        grid = np.zeros((len(STATIC_CHANNELS),) + self.grid.shape[1:], dtype=np.float32)
+        for tile in self.game.tilemap.tilemap.values():
+            # Inside the window: the level's area fits it
+            x, y = tile['pos'][0] - self.area.left, tile['pos'][1] - self.area.top
+            tile_type = tile['type']
+            if tile_type in PHYSICS_TILES:
+                grid[0, y, x] = 1
+            elif tile_type == 'spikes':
+                grid[1, y, x] = 1
+            elif tile_type == 'noportalzone':
+                grid[2, y, x] = 1
+            elif tile_type in ('spring_horizontal', 'red_box'):
+                grid[3, y, x] = 1
+        return grid
+
+    def _mark(self, channel, pos):
+        # Bodies that fell off the level are not in the window
+        x = int(pos[0] // self.tile_size) - self.area.left
+        y = int(pos[1] // self.tile_size) - self.area.top
+        if 0 <= x < self.grid.shape[2] and 0 <= y < self.grid.shape[1]:
+            self.grid[channel, y, x] = 1
+
+    def observation(self):
+        if not self.observe:
+            return None
+        game = self.game
+        grid = self.grid
+        static = self.static_grids[self.level]
+        grid[:len(STATIC_CHANNELS)] = static
+        grid[len(STATIC_CHANNELS):] = 0
+
+        # Dynamic channels: keys, doors (offgrid positions are sprite top-lefts), crates, springs
+        key, door, crate, spring = (TILE_CHANNELS.index(name) for name in ('key', 'door', 'crate', 'spring'))
+        key_pos = None
+        for tile in game.tilemap.offgrid_tiles:
+            if tile['type'] == 'key':
+                center = (tile['pos'][0] + 24, tile['pos'][1] + 24)
+                self._mark(key, center)
+                key_pos = key_pos or center
+            elif tile['type'] == 'door':
+                self._mark(door, (tile['pos'][0] + 8, tile['pos'][1] + 16))
+        for tile in game.tilemap.tilemap.values():
+            if tile['type'] in ('key', 'door'):
+                center = ((tile['pos'][0] + 0.5) * self.tile_size, (tile['pos'][1] + 0.5) * self.tile_size)
+                self._mark(key if tile['type'] == 'key' else door, center)
+                if tile['type'] == 'key':
+                    key_pos = key_pos or center
+        if game.exit_door:
+            self._mark(door, (game.exit_door['pos'][0] + 8, game.exit_door['pos'][1] + 16))
+        for entity in game.crates:
+            self._mark(crate, entity.rect().center)
+        for entity in game.springs:
+            self._mark(spring, entity.rect().center)
+
+        scale = self.grid_scale
+        tiles = grid.reshape(len(TILE_CHANNELS), self.rows, scale, self.cols, scale).mean(axis=(2, 4))
+
+        player = game.player
+        player_obs = np.array([player.pos[0], player.pos[1], player.velocity[0], player.velocity[1],
+                               player.collisions['down'], player.collisions['left'], player.collisions['right']],
+                              dtype=np.float32)
+        mode = {'red': 1, 'white': 2}.get(game.current_portal_color, 0)
+        portal_obs = np.array([mode, game.player_portal.pos[0], game.player_portal.pos[1],
+                               game.cursor_portal.pos[0], game.cursor_portal.pos[1],
+                               game.portal_placement_blocked], dtype=np.float32)
+        key_obs = np.array([game.room_has_key, game.has_key,
+                            key_pos[0] if key_pos else -1, key_pos[1] if key_pos else -1], dtype=np.float32)
+        return {'tiles': tiles, 'player': player_obs, 'portals': portal_obs, 'key': key_obs}
+
+    def _info(self):
+        game = self.game
+        return {'level': self.level, 'steps': self.steps, 'frames': self.frames, 'won': game.won, 'dead': bool(game.dead),
+                'death_cause': game.death_cause, 'has_key': game.has_key}
+
+
+# -----------------------------
+# Vectorised runner
+# -----------------------------
+def _stack(observations):
+    return {name: np.stack([obs[name] for obs in observations]) for name in observations[0]}
+
+
+class _EnvGroup:
+    """Several GameEnvs stepped together, resetting finished ones (runs inside a worker)."""
+
+    def __init__(self, count, levels, seed, env_kwargs):
+        self.envs = [GameEnv(levels, seed=None if seed is None else seed + i, **env_kwargs) for i in range(count)]
+
+    def reset(self):
+        return _stack([env.reset()[0] for env in self.envs])
+
+    def step(self, actions):
+        observations, infos = [], []
+        rewards = np.zeros(len(self.envs), dtype=np.float32)
+        terminated = np.zeros(len(self.envs), dtype=bool)
+        truncated = np.zeros(len(self.envs), dtype=bool)
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            obs, rewards[i], terminated[i], truncated[i], info = env.step(action)
+            if terminated[i] or truncated[i]:
+                # Auto-reset: the returned observation starts the next episode
+                info['final_observation'] = obs
+                obs, _ = env.reset()
+            observations.append(obs)
+            infos.append(info)
+        return _stack(observations), rewards, terminated, truncated, infos
+
+
+def _worker(conn, count, levels, seed, env_kwargs):
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    group = _EnvGroup(count, levels, seed, env_kwargs)
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == 'reset':
+                conn.send(group.reset())
+            elif command == 'step':
+                conn.send(group.step(data))
+            elif command == 'close':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        conn.close()
+
+
+class VectorEnv:
+    def __init__(self, num_envs=8, levels=None, processes=None, seed=None, **env_kwargs):
+        """
+        Args:
+            num_envs: Number of independent environments
+            levels: Level paths (see GameEnv)
+            processes: Worker processes (defaults to the CPU count); 1 steps everything in this process
+            seed: Base seed (environment i uses seed + i)
+            env_kwargs: Passed to every GameEnv (max_steps, frame_skip, grid_scale, fixed_point)
+        """
+        self.num_envs = num_envs
+        processes = min(num_envs, processes or os.cpu_count() or 1)
+        self.local = None
+        self.pipes = []
+        self.workers = []
+        # Split the environments as evenly as possible across the workers
+        counts = [num_envs // processes + (1 if i < num_envs % processes else 0) for i in range(processes)]
+        self.counts = counts
+        if processes == 1:
+            self.local = _EnvGroup(num_envs, levels, seed, env_kwargs)
+            return
+        first = 0
+        for count in counts:
+            parent, child = mp.Pipe()
+            worker_seed = None if seed is None else seed + first
+            process = mp.Process(target=_worker, args=(child, count, levels, worker_seed, env_kwargs), daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.workers.append(process)
+            first += count
+
+    def reset(self):
+        """
+        Returns:
+            dict: Batched observations (arrays with a leading num_envs axis)
+        """
+        if self.local:
+            return self.local.reset()
+        for pipe in self.pipes:
+            pipe.send(('reset', None))
+        return self._concat([pipe.recv() for pipe in self.pipes])
+
+    def step(self, actions):
+        """
+        Step every environment.
+
+        Args:
+            actions: (num_envs, 5) int array of actions
+
+        Returns:
+            tuple: (observations, rewards, terminated, truncated, infos) as batched arrays
+                   (infos is a list of dicts)
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if self.local:
+            return self.local.step(actions)
+        first = 0
+        for pipe, count in zip(self.pipes, self.counts):
+            pipe.send(('step', actions[first:first + count]))
+            first += count
+        results = [pipe.recv() for pipe in self.pipes]
+        observations = self._concat([result[0] for result in results])
+        rewards = np.concatenate([result[1] for result in results])
+        terminated = np.concatenate([result[2] for result in results])
+        truncated = np.concatenate([result[3] for result in results])
+        infos = [info for result in results for info in result[4]]
+        return observations, rewards, terminated, truncated, infos
+
+    @staticmethod
+    def _concat(batches):
+        return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+    def close(self):
+        for pipe in self.pipes:
+            try:
+                pipe.send(('close', None))
+                pipe.close()
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.workers:
+            process.join(timeout=5)
+        self.pipes = []
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def measure_throughput(num_envs=8, processes=1, steps=500, seed=0, **env_kwargs):
+    """
+    Environment steps per minute of a VectorEnv stepped with random actions.
+
+    Args:
+        num_envs: Environments stepped together
+        processes: Worker processes (1 measures a single core)
+        steps: Batched steps to time (after one warm-up step)
+        seed: Seed for the levels and the actions
+        env_kwargs: Passed to every GameEnv
+
+    Returns:
+        float: Environment steps per minute (num_envs per batched step)
+    """
+    rng = np.random.default_rng(seed)
+    high = np.array([3, 2, 3, MAP_WIDTH, MAP_HEIGHT])  # Cursor within the smallest window
+    with VectorEnv(num_envs, processes=processes, seed=seed, **env_kwargs) as envs:
+        envs.reset()
+        envs.step(rng.integers(0, high, size=(num_envs, 5)))
+        start = time.perf_counter()
+        for _ in range(steps):
+            envs.step(rng.integers(0, high, size=(num_envs, 5)))
+        elapsed = time.perf_counter() - start
+    return num_envs * steps / elapsed * 60
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Steps per minute of the headless environment')
+    parser.add_argument('--envs', type=int, default=8, help='environments stepped together')
+    parser.add_argument('--processes', type=int, default=1, help='worker processes (default: one core)')
+    parser.add_argument('--steps', type=int, default=500, help='batched steps to time')
+    args = parser.parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    rate = measure_throughput(args.envs, args.processes, args.steps)
+    print(f"{rate:,.0f} steps/min with {args.envs} envs on {args.processes} process(es)"
+          f" ({rate / args.processes:,.0f} per process)")
@@ -0,0 +1,165 @@
+"""
+Fixed-point physics mode.
+
+Positions and velocities are plain floats that pick up rounding noise from
+every += and from pygame.Rect's integer truncation, so two long runs of the
+same inputs can drift apart on a different machine or Python build. In
+fixed-point mode (Game(fixed_point=True)) every dynamic value is snapped to an
+integer number of subpixels (1/SUBPIXELS of a pixel) at the end of each step.
+
+Snapped values are exact binary fractions far below 2**53, so all the adds,
+compares and truncations in the next step are exact and the result of a step
+depends only on the integer state it started from. This is not integer
+physics: velocities and portal teleports are still computed in floats, and
+only their results are snapped.
+
+The mode changes how the game plays. Per-step constants round to the nearest
+subpixel as a side effect (gravity 0.1 becomes 26/256), so jumps and falls
+differ slightly from the default float mode. A replay, solver result or
+difficulty report only holds in the mode it was recorded in.
+
+state_hash() digests the integer form of Game.get_state(), which is what
+replays, solvers and multi-process runs compare. replay_hashes() plays an
+input log and hashes every step. To check that a log replays identically in
+this process and in a fresh one, in both modes, run:
+    python -m scripts.fixedpoint [level.json] [--steps N] [--seed S]
+"""
+import os
+import sys
+import hashlib
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+
+import numpy as np
+
+SUBPIXELS = 256  # Subpixels per pixel
+
+
+def to_fixed(value):
+    """Pixels (float) to whole subpixels (int), rounding half to even."""
+    return round(value * SUBPIXELS)
+
+
+def from_fixed(units):
+    """Whole subpixels to pixels; exact for any value the game produces."""
+    return units / SUBPIXELS
+
+
+def snap(value):
+    """Round a pixel value to the nearest subpixel."""
+    return round(value * SUBPIXELS) / SUBPIXELS
+
+
+def snap_vector(vector):
+    """Snap a 2-element position/velocity list in place."""
+    vector[0] = round(vector[0] * SUBPIXELS) / SUBPIXELS
+    vector[1] = round(vector[1] * SUBPIXELS) / SUBPIXELS
+
+
+def snap_entity(entity):
+    """Snap an entity's position, last position and velocity to the subpixel grid."""
+    snap_vector(entity.pos)
+    snap_vector(entity.last_pos)
+    snap_vector(entity.velocity)
+
+
+def snap_array(values):
+    """Snap a NumPy array in place (np.round rounds half to even, like round())."""
+    np.round(values * SUBPIXELS, out=values)
+    values /= SUBPIXELS
+
+
+def fixed_state(state):
+    """Game.get_state() as a tuple of ints (subpixels; flags and counts are scaled too)."""
+    return tuple(round(value * SUBPIXELS) for value in state)
+
+
+def state_hash(state):
+    """
+    Digest of a game state that is identical on every platform.
+
+    Args:
+        state: Sequence of numbers from Game.get_state
+
+    Returns:
+        str: 32 hex characters
+    """
+    values = array('q', fixed_state(state))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+
+def replay_hashes(level_path, actions, fixed_point=True):
+    """
+    Play a log of GameEnv actions from the start of a level.
+
+    Args:
+        level_path: Level to play
+        actions: Sequence of GameEnv actions ([move, jump, portal, cursor_x, cursor_y])
+        fixed_point: Run the game in fixed-point mode
+
+    Returns:
+        list: state_hash() after every step, up to the end of the episode
+    """
+    from scripts.env import GameEnv  # scripts.env imports game, which imports this module
+
+    env = GameEnv(level_path, observe=False, fixed_point=fixed_point)
+    env.reset(level_path)
+    hashes = []
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        hashes.append(env.game.state_hash())
+        if terminated or truncated:
+            break
+    return hashes
+
+
+def random_actions(steps, seed=0):
+    """A reproducible log of random GameEnv actions."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, (3, 2, 3, 34, 24), size=(steps, 5)).tolist()
+
+
+def _replay_in_child(args):
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    return replay_hashes(*args)
+
+
+def check_replay(level_path, actions, fixed_point=True):
+    """
+    Play an action log twice in this process and once in a fresh one.
+
+    Returns:
+        tuple: (hashes of the first run, whether all three runs match)
+    """
+    first = replay_hashes(level_path, actions, fixed_point)
+    second = replay_hashes(level_path, actions, fixed_point)
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+        child = pool.submit(_replay_in_child, (level_path, actions, fixed_point)).result()
+    return first, first == second == child
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that an input log replays to the same state hashes')
+    parser.add_argument('level', nargs='?', default=os.path.join('data', 'maps', 'level1.json'))
+    parser.add_argument('--steps', type=int, default=600, help='random actions in the log')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the action log')
+    args = parser.parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    # Through the imported module, so the child process can find _replay_in_child
+    from scripts import fixedpoint
+
+    actions = random_actions(args.steps, args.seed)
+    results = {}
+    for mode, fixed_point in (('fixed', True), ('float', False)):
+        hashes, repeatable = fixedpoint.check_replay(args.level, actions, fixed_point)
+        results[mode] = hashes
+        print(f"{mode:5} mode: {len(hashes)} steps, final hash {hashes[-1] if hashes else '-'},",
+              'replays identically' if repeatable else 'REPLAYS DIFFER')
+    same = results['fixed'] == results['float']
+    print('fixed and float modes', 'agree' if same else 'differ (expected: the modes play differently)')
@@ -0,0 +1,166 @@
+"""
+Hitboxes of sprites and hazard tiles, computed once per asset.
+
+Keys and doors collide with the opaque part of their 48x48 images, spikes with
+the half of their tile the spikes fill (which half depends on the rotation).
+A HitboxRegistry works these shapes out when the assets are loaded; gameplay
+code then only places a precomputed shape at a sprite's or tile's position
+instead of scanning image pixels (Surface.get_bounding_rect) or rebuilding
+rects per tile every frame.
+
+Each Hitbox has a bounding rect and, optionally, a pygame.mask.Mask of the
+opaque pixels inside it for pixel-perfect tests.
+"""
+import pygame
+
+# Spike hitboxes by rotation, relative to the tile: (x, y, w, h) of the half
+# tile the spikes fill. Any other rotation uses the rotation 0 shape.
+SPIKE_HITBOXES = {
+    0: (0, 8, 16, 8),  # Pointing up (bottom half)
+    90: (0, 0, 8, 16),  # Pointing right (left half)
+    180: (0, 0, 16, 8),  # Pointing down (top half)
+    270: (8, 0, 8, 16),  # Pointing left (right half)
+}
+
+_filled_masks = {}  # (w, h) -> fully set Mask, for rect-vs-mask tests
+
+
+def filled_mask(size):
+    """A Mask with every bit set, shared between callers (do not modify it)."""
+    mask = _filled_masks.get(size)
+    if mask is None:
+        mask = pygame.mask.Mask(size, fill=True)
+        _filled_masks[size] = mask
+    return mask
+
+
+class Hitbox:
+    """A collision shape relative to its sprite's (or tile's) top-left corner."""
+    __slots__ = ('rect', 'mask', 'placed')
+
+    def __init__(self, rect, mask=None):
+        """
+        Args:
+            rect: Bounding rect, relative to the sprite's top-left corner
+            mask: Mask of the opaque pixels, the size of rect (None for rect-only tests)
+        """
+        self.rect = pygame.Rect(rect)
+        self.mask = mask
+        self.placed = pygame.Rect(self.rect)  # Scratch rect reused by at()
+
+    def at(self, x, y):
+        """
+        The bounding rect with the sprite at (x, y).
+
+        The rect is reused by the next call; copy it to keep it.
+        """
+        rect = self.rect
+        self.placed.update(x + rect.x, y + rect.y, rect.w, rect.h)
+        return self.placed
+
+    def collides(self, x, y, rect, pixel_perfect=False):
+        """
+        Whether the hitbox, with the sprite at (x, y), overlaps a rect.
+
+        Args:
+            x, y: Position of the sprite's top-left corner
+            rect: pygame.Rect to test against
+            pixel_perfect: Also require an opaque pixel inside the rect (needs a mask)
+
+        Returns:
+            bool: True on overlap
+        """
+        placed = self.at(x, y)
+        if not placed.colliderect(rect):
+            return False
+        if pixel_perfect and self.mask is not None:
+            overlap = placed.clip(rect)
+            return self.mask.overlap(filled_mask(overlap.size), (overlap.x - placed.x, overlap.y - placed.y)) is not None
+        return True
+
+
+class HitboxRegistry:
+    """Hitboxes by name (any hashable: 'key', ('spikes', 90), ...)."""
+
+    def __init__(self):
+        self.hitboxes = {}
+        self.sprites = {}  # name -> (surface, mask) given to add_sprite, for on_tile()
+
+    def __getitem__(self, name):
+        return self.hitboxes[name]
+
+    def __contains__(self, name):
+        return name in self.hitboxes
+
+    def get(self, name, default=None):
+        return self.hitboxes.get(name, default)
+
+    def add_rect(self, name, rect):
+        """Register a plain rect hitbox (relative to the sprite's top-left corner)."""
+        hitbox = Hitbox(rect)
+        self.hitboxes[name] = hitbox
+        return hitbox
+
+    def add_sprite(self, name, surface, offset=(0, 0), mask=False):
+        """
+        Register the opaque part of an image.
+
+        Args:
+            name: Registry key
+            surface: Image with per-pixel alpha (or a colorkey)
+            offset: Where the image is drawn relative to the position the hitbox
+                will be placed at (e.g. to center a large image on its tile)
+            mask: Also build a pixel mask for pixel-perfect tests
+
+        Returns:
+            Hitbox: The registered hitbox
+        """
+        bounds = surface.get_bounding_rect()
+        hitbox_mask = None
+        if mask:
+            hitbox_mask = pygame.mask.Mask(bounds.size)
+            hitbox_mask.draw(pygame.mask.from_surface(surface), (-bounds.x, -bounds.y))
+        hitbox = Hitbox(bounds.move(offset), hitbox_mask)
+        self.hitboxes[name] = hitbox
+        self.sprites[name] = (surface, mask)
+        return hitbox
+
+    def on_tile(self, name, tile_size):
+        """
+        A sprite's hitbox when its image is centered on a grid tile (as Tilemap.render
+        draws keys and doors), relative to the tile's top-left corner.
+
+        Made from the add_sprite() image on first use for each tile size.
+        """
+        hitbox = self.hitboxes.get((name, tile_size))
+        if hitbox is None:
+            surface, mask = self.sprites[name]
+            offset = ((tile_size - surface.get_width()) // 2, (tile_size - surface.get_height()) // 2)
+            hitbox = self.add_sprite((name, tile_size), surface, offset, mask)
+        return hitbox
+
+    def spikes(self, rotation):
+        """The spike hitbox for a tile rotation (relative to the tile)."""
+        hitbox = self.hitboxes.get(('spikes', rotation))
+        if hitbox is None:
+            hitbox = self.hitboxes[('spikes', 0)]
+        return hitbox
+
+
+def build_game_hitboxes(assets):
+    """
+    The hitboxes gameplay needs, from the game's assets: 'key' and 'door' (with
+    masks; see HitboxRegistry.on_tile for grid tiles) and the spike rotations.
+
+    Args:
+        assets: Game.assets
+
+    Returns:
+        HitboxRegistry: The registry
+    """
+    registry = HitboxRegistry()
+    for name in ('key', 'door'):
+        registry.add_sprite(name, assets[name][0], mask=True)
+    for rotation, rect in SPIKE_HITBOXES.items():
+        registry.add_rect(('spikes', rotation), rect)
+    return registry
@@ -0,0 +1,294 @@
+"""
+Pixel formats of the game's images, and what blitting them costs.
+
+Images reach the game in several formats: load_image() converts to the
+display format with a black colorkey, springs, the cursor and the control
+images keep per-pixel alpha (convert_alpha), noportalzone adds a surface
+alpha on top of its colorkey, and Tilemap.render's chunks are per-pixel alpha
+surfaces made at runtime. Each combination of source format and target
+surface (the SRCALPHA game layer Game.display, the opaque Game.display_2) is
+a different SDL blit path, and they differ a lot in cost.
+
+optimise_image() converts one image for the surface it is drawn on: it
+tries the formats PREFERRED_FORMATS lists for that kind of target, fastest
+first, and keeps the first that draws exactly the same pixels as the image
+as loaded (checked on a test pattern in the target's format). optimise_assets()
+does this for Game.assets at load time. RLE acceleration is only used for
+images that are never locked afterwards (static=True): an RLE surface is
+decoded on every lock, which transform.flip / transform.scale and pixel
+access do, so animation frames keep their unencoded formats.
+
+The preferences come from this module's benchmark:
+    python -m scripts.pixelformat [level.json] [--count N]
+prints the blit cost of every asset and of a tilemap chunk onto both game
+surfaces, as loaded and in each candidate format that draws the same pixels,
+marking the one optimise_image picks.
+"""
+import argparse
+import os
+import timeit
+
+import pygame
+
+from scripts.utils import Animation
+
+# Formats an image can be converted to (see candidates), in report order
+CANDIDATES = ('as loaded', 'no colorkey', 'rle', 'opaque', 'converted alpha', 'rle alpha')
+# Formats tried by optimise_image, fastest first, by whether the target has per-pixel alpha.
+# Measured with the benchmark below (SDL 2.32, 32-bit surfaces):
+# - onto the opaque display_2, RLE colorkey blits the 540x380 background in ~28 us
+#   instead of ~110 us, keys and doors ~4x and tiles ~20% faster; RLE alpha saves
+#   ~20% on the control images
+# - onto the SRCALPHA display, RLE colorkey is no faster and RLE alpha does not
+#   draw the same pixels; dropping the colorkey of an image with no keyed pixels is a plain copy
+#   (~80 us instead of ~130 us for the background), and so is drawing a per-pixel
+#   alpha image that is fully opaque without its alpha
+PREFERRED_FORMATS = {
+    False: ('rle', 'rle alpha'),
+    True: ('no colorkey', 'opaque'),
+}
+BENCH_BLITS = 1000  # Blits per timing run of the benchmark
+BENCH_REPEATS = 3  # Timing runs per format (the fastest counts)
+PATTERN_SIZE = (96, 96)  # Test pattern for the pixel comparison (larger images are compared on their own size)
+
+
+def describe(image):
+    """Short description of an image's format, e.g. '32 bit colorkey alpha=128 RLE'."""
+    flags = image.get_flags()
+    parts = [str(image.get_bitsize()) + ' bit']
+    if flags & pygame.SRCALPHA:
+        parts.append('per-pixel alpha')
+    if image.get_colorkey() is not None:
+        parts.append('colorkey')
+    if image.get_alpha() is not None and not flags & pygame.SRCALPHA:
+        parts.append('alpha=' + str(image.get_alpha()))
+    if flags & pygame.RLEACCELOK:
+        parts.append('RLE')
+    return ' '.join(parts)
+
+
+def candidates(image, static=True):
+    """
+    Formats an image could be drawn from, by name (see CANDIDATES). Not all of
+    them draw the same pixels; optimise_image checks that.
+
+    Args:
+        image: Surface as loaded
+        static: Whether the image is only ever blitted (allows RLE formats)
+
+    Returns:
+        dict: name -> Surface
+    """
+    result = {'as loaded': image}
+    colorkey = image.get_colorkey()
+    per_pixel = image.get_flags() & pygame.SRCALPHA
+    if colorkey is not None:
+        plain = image.copy()
+        plain.set_colorkey(None)
+        result['no colorkey'] = plain
+        if static:
+            rle = image.copy()
+            rle.set_colorkey(colorkey, pygame.RLEACCEL)
+            result['rle'] = rle
+    if per_pixel:
+        if image.get_alpha() in (None, 255):
+            result['opaque'] = image.convert()
+        if static:
+            rle = image.copy()
+            rle.set_alpha(image.get_alpha(), pygame.RLEACCEL)
+            result['rle alpha'] = rle
+    elif image.get_alpha() is None:
+        result['converted alpha'] = image.convert_alpha()
+    return result
+
+
+_patterns = {}  # (per-pixel alpha, bits, masks, size) -> test pattern surface
+
+
+def test_pattern(target, size):
+    """
+    A surface in the target's format, filled with colors (and alphas) that expose
+    blending differences. Shared between callers (copy it before drawing on it).
+    """
+    key = (bool(target.get_flags() & pygame.SRCALPHA), target.get_bitsize(), target.get_masks(), size)
+    pattern = _patterns.get(key)
+    if pattern is None:
+        pattern = pygame.Surface(size, target.get_flags() & pygame.SRCALPHA, target)
+        w, h = size
+        for y in range(0, h, 4):
+            for x in range(0, w, 4):
+                pattern.fill(((x * 37) % 256, (y * 59) % 256, ((x + y) * 23) % 256, ((x * y) * 11) % 256), (x, y, 4, 4))
+        _patterns[key] = pattern
+    return pattern
+
+
+def same_pixels(a, b, target):
+    """Whether images a and b draw identical pixels onto a surface in the target's format."""
+    size = (max(PATTERN_SIZE[0], a.get_width()), max(PATTERN_SIZE[1], a.get_height()))
+    pattern = test_pattern(target, size)
+    drawn_a = pattern.copy()
+    drawn_b = pattern.copy()
+    drawn_a.blit(a, (0, 0))
+    drawn_b.blit(b, (0, 0))
+    # A layout (RGBA) that includes the alpha of per-pixel alpha targets
+    return pygame.image.tobytes(drawn_a, 'RGBA') == pygame.image.tobytes(drawn_b, 'RGBA')
+
+
+def blit_cost(image, target, count=BENCH_BLITS, repeats=BENCH_REPEATS):
+    """
+    Microseconds per blit of an image onto a copy of a target surface.
+
+    Args:
+        image: Surface to draw
+        target: Surface to draw onto (copied, so its contents are kept)
+        count: Blits per timing run, in one Surface.blits call
+        repeats: Timing runs (the fastest counts)
+
+    Returns:
+        float: Microseconds per blit
+    """
+    surf = target.copy()
+    w = max(1, surf.get_width() - image.get_width())
+    h = max(1, surf.get_height() - image.get_height())
+    blits = [(image, ((i * 37) % w, (i * 53) % h)) for i in range(count)]
+    surf.blits(blits, doreturn=False)  # Warms up (RLE surfaces encode on their first blit)
+    best = min(timeit.repeat(lambda: surf.blits(blits, doreturn=False), number=1, repeat=repeats))
+    return best / count * 1e6
+
+
+def pick_format(image, target, static=True):
+    """
+    The fastest format of an image that draws the same pixels onto the target
+    (the first match in PREFERRED_FORMATS).
+
+    Args:
+        image: Surface as loaded
+        target: Surface the image is drawn onto (only its format matters)
+        static: Whether the image is only ever blitted (allows RLE formats)
+
+    Returns:
+        tuple: (candidate name, Surface); ('as loaded', image) if none matches
+    """
+    options = candidates(image, static)
+    for name in PREFERRED_FORMATS[bool(target.get_flags() & pygame.SRCALPHA)]:
+        if name in options and same_pixels(image, options[name], target):
+            return name, options[name]
+    return 'as loaded', image
+
+
+def optimise_image(image, target, static=True):
+    """image, or an equivalent surface that blits faster onto the target (see pick_format)."""
+    return pick_format(image, target, static)[1]
+
+
+def measure_formats(image, target, static=True, count=BENCH_BLITS):
+    """
+    Blit costs of an image onto the target in each candidate format that draws
+    the same pixels.
+
+    Args:
+        image: Surface as loaded
+        target: Surface the image is drawn onto
+        static: Whether the image is only ever blitted (allows RLE formats)
+        count: Blits per timing run for sprite-sized images (large ones use a tenth)
+
+    Returns:
+        dict: candidate name -> microseconds per blit
+    """
+    if image.get_width() * image.get_height() > 64 * 64:
+        count = max(1, count // 10)
+    costs = {}
+    for name, candidate in candidates(image, static).items():
+        if candidate is image or same_pixels(image, candidate, target):
+            costs[name] = blit_cost(candidate, target, count)
+    return costs
+
+
+def optimise_assets(assets, targets, default_target, animations=True):
+    """
+    Replace the images in an assets dict with optimise_image() results, in place.
+
+    Surfaces and lists of surfaces are treated as static images; Animation
+    frames are optimised without RLE formats (they are flipped and scaled
+    while drawing).
+
+    Args:
+        assets: Dict of Surface, list of Surface or Animation (Game.assets)
+        targets: Dict of asset name -> Surface the asset is drawn onto
+        default_target: Surface for assets not in targets
+        animations: Also optimise Animation frames
+
+    Returns:
+        dict: asset name -> list of (old description, new description) of the
+        images that changed format
+    """
+    changes = {}
+    for name, value in assets.items():
+        target = targets.get(name, default_target)
+        if isinstance(value, pygame.Surface):
+            images, static = [value], True
+        elif isinstance(value, list):
+            images, static = value, True
+        elif isinstance(value, Animation) and animations:
+            images, static = value.images, False
+        else:
+            continue
+        for i, image in enumerate(images):
+            if not isinstance(image, pygame.Surface):
+                continue
+            optimised = optimise_image(image, target, static)
+            if optimised is not image:
+                changes.setdefault(name, []).append((describe(image), describe(optimised)))
+                images[i] = optimised
+        if isinstance(value, pygame.Surface):
+            assets[name] = images[0]
+    return changes
+
+
+def asset_report(game, count=BENCH_BLITS):
+    """
+    Blit costs of every image in game.assets (the first frame of animations)
+    and of one of the tilemap's cached chunks onto Game.display and
+    Game.display_2, as loaded and in each matching candidate format.
+
+    Returns:
+        list: (asset name, index, description, target name, {candidate: microseconds}, picked candidate)
+    """
+    rows = []
+    sources = dict(game.assets)
+    chunk = next((chunk[0] for chunk in game.tilemap.chunks.values() if chunk and chunk[0]), None)
+    if chunk is not None:
+        sources['tilemap chunk'] = chunk
+    for name, value in sources.items():
+        if isinstance(value, pygame.Surface):
+            images = [value]
+        elif isinstance(value, list):
+            images = value
+        elif isinstance(value, Animation):
+            images = value.images[:1]
+        else:
+            continue
+        static = not isinstance(value, Animation)
+        for i, image in enumerate(images):
+            for target_name in ('display', 'display_2'):
+                target = getattr(game, target_name)
+                costs = measure_formats(image, target, static, count)
+                rows.append((name, i, describe(image), target_name, costs, pick_format(image, target, static)[0]))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Blit cost of the game assets per pixel format and target surface')
+    parser.add_argument('level', nargs='?', default=os.path.join('data', 'maps', 'level1.json'), help='level whose tilemap chunks are measured')
+    parser.add_argument('--count', type=int, default=BENCH_BLITS, help='blits per timing run')
+    args = parser.parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    from game import Game
+
+    game = Game(args.level, headless=True, optimise_formats=False)
+    game.render()  # Fills the tilemap's chunk cache
+    print('%-16s %-30s %-10s %s' % ('asset', 'format as loaded', 'target', 'us per blit (* = picked)'))
+    for name, i, description, target_name, costs, picked in asset_report(game, args.count):
+        cells = ['%s%s %.2f' % ('*' if n == picked else '', n, c) for n, c in sorted(costs.items(), key=lambda item: CANDIDATES.index(item[0]))]
+        print('%-16s %-30s %-10s %s' % (name + '[' + str(i) + ']', description, target_name, '  '.join(cells)))
@@ -1,28 +1,198 @@
 import pygame
 import math
+import numpy as np
+
+from scripts.utils import Animation
+from scripts.presenter import draw_rect
+
+LOCK_TYPES = (None, 'left', 'right')
+EDGES = ('left', 'right', 'top', 'bottom')  # In the order check_collision tests them
+
+EDGE_THRESHOLD = 8  # Pixels past an edge that count as crossing it
+INSIDE_OFFSET = 4  # How far inside the exit portal teleported entities appear
+MIN_LAUNCH_SPEED = 2.0  # Exit speed of an entity that crossed without any speed
+
+# Teleports by (lock type, edge of the entry portal the entity exits through): the
+# edge of the exit portal it comes in through, then how its exit velocity (vx, vy) is
+# made from its entry velocity. Each velocity rule is (sign, mode, component):
+#   keep      the component as it is
+#   abs       its magnitude
+#   launch    its magnitude, else the other component's, else MIN_LAUNCH_SPEED
+#   positive  its magnitude if it is positive (moving right/down), else 0
+#   zero      0
+# Red portals ('left') bring entities in through the opposite edge, moving the same
+# way; white portals ('right') through the adjacent edge, turning their motion.
+TRANSFORMS = {
+    ('left', 'left'): ('right', (-1, 'abs', 0), (1, 'keep', 1)),
+    ('left', 'right'): ('left', (1, 'launch', 0), (1, 'keep', 1)),
+    ('left', 'top'): ('bottom', (1, 'keep', 0), (-1, 'abs', 1)),
+    ('left', 'bottom'): ('top', (1, 'keep', 0), (1, 'abs', 1)),
+    ('right', 'right'): ('bottom', (1, 'zero', 0), (-1, 'launch', 0)),  # Moving right -> up
+    ('right', 'bottom'): ('right', (-1, 'positive', 1), (1, 'zero', 1)),  # Falling -> left
+    ('right', 'left'): ('top', (1, 'zero', 0), (1, 'launch', 0)),  # Moving left -> down
+    ('right', 'top'): ('left', (1, 'launch', 1), (1, 'zero', 1)),  # Rising -> right
+}
+
+# Placement by the edge of the exit portal an entity comes in through: (axis, side of
+# the portal). On that axis the entity is put INSIDE_OFFSET inside the edge and its
+# last position just outside it, so it is not teleported straight back; on the other
+# axis it keeps where along the edge it crossed, clamped into the portal.
+ENTRY_PLACEMENT = {
+    'left': (0, -1),
+    'right': (0, 1),
+    'top': (1, -1),
+    'bottom': (1, 1),
+}
+
+
+def exit_velocity(rule, velocity):
+    """
+    One component of an entity's velocity after a teleport.
+
+    Args:
+        rule: A velocity rule from TRANSFORMS
+        velocity: The entity's (vx, vy) before the teleport
+
+    Returns:
+        The new value of the component
+    """
+    sign, mode, component = rule
+    value = velocity[component]
+    if mode == 'abs':
+        value = abs(value)
+    elif mode == 'launch':
+        value = abs(value) or abs(velocity[1 - component]) or MIN_LAUNCH_SPEED
+    elif mode == 'positive':
+        value = abs(value) if value > 0 else 0
+    elif mode == 'zero':
+        value = 0
+    return value if sign > 0 else -value
+
+
+def exit_velocities(rule, velocities):
+    """exit_velocity for an (n, 2) array of velocities (same results, value for value)."""
+    sign, mode, component = rule
+    values = velocities[:, component]
+    if mode == 'abs':
+        values = np.abs(values)
+    elif mode == 'launch':
+        values = np.abs(values)
+        values = np.where(values != 0, values, np.abs(velocities[:, 1 - component]))
+        values = np.where(values != 0, values, MIN_LAUNCH_SPEED)
+    elif mode == 'positive':
+        # Not negated where it is 0 (no -0.0, like the int 0 of exit_velocity)
+        return np.where(values > 0, np.abs(values) if sign > 0 else -np.abs(values), 0.0)
+    elif mode == 'zero':
+        return np.zeros(len(values))
+    return values if sign > 0 else -values
+
+
+def teleport_between(portal, other, pos, velocity, last_pos, size):
+    """
+    Check and teleport many entities against a pair of linked portals in one pass
+    (Game.check_portal_teleport for arrays): entities exiting `portal` come out of
+    `other`, then the remaining ones are checked against `other`.
+
+    Args:
+        portal, other: The two portals (nothing happens unless both are locked)
+        pos: (n, 2) float array of positions, changed in place for teleported rows
+        velocity: (n, 2) float array, changed in place for teleported rows
+        last_pos: (n, 2) float array of last frame's positions, changed in place
+            for teleported rows (the teleport's anti-retrigger position)
+        size: (n, 2) int array of collision sizes
+
+    Returns:
+        np.ndarray: Bool mask of the teleported rows
+    """
+    teleported = np.zeros(len(pos), np.bool_)
+    if not (portal.locked and other.locked):
+        return teleported
+    for entry, exit_portal in ((portal, other), (other, portal)):
+        edges, relative = entry.check_collisions(pos, last_pos, size)
+        edges[teleported] = -1
+        entry.teleport_arrays(exit_portal, edges, relative, pos, velocity, last_pos, size)
+        teleported |= edges >= 0
+    return teleported
+
+
+def teleport_pair(entity, portal, other, rects):
+    """
+    Teleport one entity through a pair of linked portals (Game.check_portal_teleport
+    without the sound): an entity exiting `portal` comes out of `other` and one
+    exiting `other` out of `portal`. An entity that is not teleported has its
+    last_pos caught up with pos.
+
+    Args:
+        entity: Anything with pos, velocity, last_pos and size
+        portal, other: The two portals (nothing happens unless both are locked)
+        rects: Two scratch Rects, for the entity's current and last rect
+
+    Returns:
+        bool: True if the entity was teleported
+    """
+    entity_rect, last_rect = rects
+    entity_rect.update(entity.pos[0], entity.pos[1], entity.size[0], entity.size[1])
+    last_rect.update(entity.last_pos[0], entity.last_pos[1], entity.size[0], entity.size[1])
+    if portal.locked and other.locked:
+        for entry, exit_portal in ((portal, other), (other, portal)):
+            collision_result = entry.check_collision(entity_rect, last_rect)
+            if collision_result:
+                edge, relative_position = collision_result
+                # last_pos is updated inside teleport_entity to prevent immediate re-teleport
+                if entry.teleport_entity(entity, exit_portal, edge, relative_position):
+                    return True
+    entity.last_pos[0] = entity.pos[0]
+    entity.last_pos[1] = entity.pos[1]
+    return False
+
+
+def sized_animation(animation, size, alpha=None):
+    """
+    A copy of a portal animation with its frames scaled to size x size.
+
+    Args:
+        animation: Animation from the game's assets, or None
+        size: Side of the portal in pixels
+        alpha: Surface alpha to give the frames (None keeps them opaque)
+
+    Returns:
+        Animation: The copy (None if animation is None)
+    """
+    if animation is None:
+        return None
+    frames = []
+    for img in animation.images:
+        if img.get_width() != size or img.get_height() != size:
+            img = pygame.transform.scale(img, (size, size))
+        elif alpha is not None:
+            img = img.copy()  # Leave the shared asset's alpha alone
+        if alpha is not None:
+            img.set_alpha(alpha)
+        frames.append(img)
+    return Animation(frames, animation.img_duration, animation.loop)
+
 
 class Portal:
+    __slots__ = ('game', 'size', 'pos', 'locked', 'lock_type', 'locked_pos', 'color', 'thickness',
+                 'red_animation', 'white_animation', 'grey_animation', 'bounds')
+
     def __init__(self, game, size=64):
         self.game = game
         self.size = size
         self.pos = [0, 0]
+        self.bounds = pygame.Rect(0, 0, size, size)  # Scratch rect for the per-frame checks (see get_bounds)
         self.locked = False
         self.lock_type = None  # 'left' for opposite edge (red), 'right' for adjacent edge (white)
         self.locked_pos = [0, 0]
         self.color = (200, 200, 200)  # Default gray
         self.thickness = 2
         
-        # Portal animations
+        # Portal animations, with their frames scaled to the portal once here rather than per draw
         if hasattr(game, 'assets'):
-            self.red_animation = game.assets.get('portal/red', None)
-            self.white_animation = game.assets.get('portal/white', None)
-            self.grey_animation = game.assets.get('portal/grey', None)
-            if self.red_animation:
-                self.red_animation = self.red_animation.copy()
-            if self.white_animation:
-                self.white_animation = self.white_animation.copy()
-            if self.grey_animation:
-                self.grey_animation = self.grey_animation.copy()
+            self.red_animation = sized_animation(game.assets.get('portal/red', None), size)
+            self.white_animation = sized_animation(game.assets.get('portal/white', None), size)
+            # Unlocked portals are drawn slightly transparent
+            self.grey_animation = sized_animation(game.assets.get('portal/grey', None), size, alpha=100)
         else:
             self.red_animation = None
             self.white_animation = None
@@ -35,7 +205,8 @@ class Portal:
             self.pos[1] = follow_pos[1] - self.size // 2
         else:
             # Keep locked position
-            self.pos = self.locked_pos.copy()
+            self.pos[0] = self.locked_pos[0]
+            self.pos[1] = self.locked_pos[1]
         
         # Update animations
         if self.red_animation:
@@ -62,13 +233,38 @@ class Portal:
         self.lock_type = None
         self.color = (200, 200, 200)  # Gray
         self.thickness = 2
+
+    def get_state(self):
+        """
+        Save the portal's position and lock (used for rewind and save states).
+
+        Returns:
+            tuple: (x, y, lock type index, locked x, locked y)
+        """
+        return (self.pos[0], self.pos[1], LOCK_TYPES.index(self.lock_type) if self.locked else 0,
+                self.locked_pos[0], self.locked_pos[1])
+
+    def set_state(self, state):
+        """Restore a state returned by get_state."""
+        self.pos = [state[0], state[1]]
+        lock_type = LOCK_TYPES[int(state[2])]
+        if lock_type:
+            self.lock(lock_type)
+        else:
+            self.unlock()
+        self.locked_pos = [state[3], state[4]]
     
     def get_rect(self):
         return pygame.Rect(self.pos[0], self.pos[1], self.size, self.size)
+
+    def get_bounds(self):
+        """get_rect() in a Rect owned by the portal (reused: valid until the next call)."""
+        self.bounds.update(self.pos[0], self.pos[1], self.size, self.size)
+        return self.bounds
     
     def is_inside(self, rect):
         """Check if a rectangle is inside the portal (overlaps significantly)"""
-        portal_rect = self.get_rect()
+        portal_rect = self.get_bounds()
         # Check if the entity's center is inside the portal
         center_x = rect.centerx
         center_y = rect.centery
@@ -91,7 +287,7 @@ class Portal:
         - We determine which edge it's crossing based on position
         - We calculate the relative position along that edge
         """
-        portal_rect = self.get_rect()
+        portal_rect = self.get_bounds()
         
         # Check if entity was inside the portal last frame (center was inside)
         was_inside = self.is_inside(last_rect)
@@ -102,7 +298,7 @@ class Portal:
         
         # Check if entity is now crossing an edge to exit
         # Use a threshold to determine edge crossing
-        threshold = 8
+        threshold = EDGE_THRESHOLD
         
         # Check if crossing left edge (entity's right side is past portal's left edge)
         if last_rect.right > portal_rect.left and entity_rect.right <= portal_rect.left + threshold:
@@ -137,209 +333,141 @@ class Portal:
         
         return None
     
+    def check_collisions(self, pos, last_pos, size):
+        """
+        check_collision for many entities at once.
+
+        Args:
+            pos: (n, 2) array of positions
+            last_pos: (n, 2) array of last frame's positions
+            size: (n, 2) int array of collision sizes
+
+        Returns:
+            tuple: (edges, relative positions) - per entity the index in EDGES of the
+                edge it is exiting through (-1 if none) and where along it
+        """
+        portal_rect = self.get_bounds()
+        left, top, right, bottom = portal_rect.left, portal_rect.top, portal_rect.right, portal_rect.bottom
+        # Integer rects, truncated like pygame.Rect
+        x, y = np.trunc(pos).astype(np.int64).T
+        last_x, last_y = np.trunc(last_pos).astype(np.int64).T
+        width, height = np.asarray(size).T
+        center_x = last_x + width // 2
+        center_y = last_y + height // 2
+
+        # The first edge crossed, in EDGES order (like the if/elif chain of check_collision)
+        crossing = [
+            (last_x + width > left) & (x + width <= left + EDGE_THRESHOLD),
+            (last_x < right) & (x >= right - EDGE_THRESHOLD),
+            (last_y + height > top) & (y + height <= top + EDGE_THRESHOLD),
+            (last_y < bottom) & (y >= bottom - EDGE_THRESHOLD),
+        ]
+        edges = np.select(crossing, range(len(EDGES)), -1)
+        was_inside = (center_x >= left) & (center_x <= right) & (center_y >= top) & (center_y <= bottom)
+        edges[~was_inside] = -1
+
+        # Along the left/right edges by the centre's y, along the top/bottom ones by its x
+        relative = np.where(edges < 2, (center_y - top) / portal_rect.height, (center_x - left) / portal_rect.width)
+        return edges, relative.clip(0, 1)
+
     def teleport_entity(self, entity, exit_portal, exit_edge, relative_position):
         """
         Teleport entity through portal and preserve/transform momentum.
-        
-        exit_edge: The edge of THIS portal that the entity is exiting from
-        exit_portal: The portal the entity will appear in
-        relative_position: A value between 0 and 1 representing where along the exit_edge
-                          the entity crossed (0 = start of edge, 1 = end of edge)
-        
-        Entities appear INSIDE the exit portal, near the entry edge, so they can
-        then exit from the opposite/adjacent edge.
-        
-        Momentum is preserved and transformed based on the edge transformation:
-        - red portals: Opposite direction (reverse velocity)
-        - white portals: Perpendicular direction (rotate velocity 90 degrees clockwise)
-        
-        For red portals (left click):
-        - Exit from right edge → Enter from left edge (inside, near left edge)
-        - Exit from left edge → Enter from right edge (inside, near right edge)
-        - Exit from top edge → Enter from bottom edge (inside, near bottom edge)
-        - Exit from bottom edge → Enter from top edge (inside, near top edge)
-        
-        For white portals (right click):
-        - Exit from right edge → Enter from bottom edge (inside, near bottom edge)
-        - Exit from bottom edge → Enter from right edge (inside, near right edge)
-        - Exit from left edge → Enter from top edge (inside, near top edge)
-        - Exit from top edge → Enter from left edge (inside, near left edge) - launches rightward
+
+        Entities appear INSIDE the exit portal, near the edge they come in through
+        (the opposite edge for red portals, the adjacent one for white portals), so
+        they can then exit from the other side; see TRANSFORMS and ENTRY_PLACEMENT.
+
+        Args:
+            entity: Anything with pos, velocity, last_pos and size
+            exit_portal: The portal the entity will appear in
+            exit_edge: The edge of THIS portal that the entity is exiting from
+            relative_position: Where along exit_edge it crossed, 0 (start) to 1 (end)
+
+        Returns:
+            bool: False if the portals are not both locked
         """
         if not self.locked or not exit_portal.locked:
             return False
-        
-        # Capture velocity before teleportation
-        old_velocity = entity.velocity.copy()
-        
-        exit_rect = exit_portal.get_rect()
-        
-        # Small offset to place entity just inside the portal (not at the exact edge)
-        offset = 4
-        
-        if self.lock_type == 'left':  # red portal - opposite edge
-            # Exit from one edge, enter from opposite edge going inside
-            # Momentum is preserved in the same direction as entry
-            if exit_edge == 'left':  # Exiting left edge, enter from right edge (inside, near right)
-                entity.pos[0] = exit_rect.right - entity.size[0] - offset
-                # Use relative_position to place entity at same position along the vertical edge
-                entity.pos[1] = exit_rect.top + (relative_position * exit_rect.height) - entity.size[1] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[1] = max(exit_rect.top, min(exit_rect.bottom - entity.size[1], entity.pos[1]))
-                # Entering from right (moving left), exit going left (preserve leftward motion)
-                # If was moving left (negative), keep moving left
-                entity.velocity[0] = old_velocity[0] if old_velocity[0] < 0 else -abs(old_velocity[0])
-                entity.velocity[1] = old_velocity[1]  # Keep vertical velocity
-            elif exit_edge == 'right':  # Exiting right edge, enter from left edge (inside, near left)
-                # Position entity at the inside left edge of the exit portal
-                # The entity's left edge starts at the left inside edge of the portal
-                entity.pos[0] = exit_rect.left + offset
-                # Use relative_position to place entity at same position along the vertical edge
-                entity.pos[1] = exit_rect.top + (relative_position * exit_rect.height) - entity.size[1] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[1] = max(exit_rect.top, min(exit_rect.bottom - entity.size[1], entity.pos[1]))
-                # Entering from left (moving right), exit going right (moving from left to right)
-                # Ensure positive horizontal velocity (moving right from left edge)
-                entity.velocity[0] = abs(old_velocity[0]) if old_velocity[0] != 0 else (abs(old_velocity[1]) if old_velocity[1] != 0 else 2.0)
-                entity.velocity[1] = old_velocity[1]  # Keep vertical velocity
-            elif exit_edge == 'top':  # Exiting top edge, enter from bottom edge (inside, near bottom)
-                # Use relative_position to place entity at same position along the horizontal edge
-                entity.pos[0] = exit_rect.left + (relative_position * exit_rect.width) - entity.size[0] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[0] = max(exit_rect.left, min(exit_rect.right - entity.size[0], entity.pos[0]))
-                entity.pos[1] = exit_rect.bottom - entity.size[1] - offset
-                # Entering from bottom (moving up), exit going up (preserve upward motion)
-                # If was moving up (negative), keep moving up
-                entity.velocity[0] = old_velocity[0]  # Keep horizontal velocity
-                entity.velocity[1] = old_velocity[1] if old_velocity[1] < 0 else -abs(old_velocity[1])
-            elif exit_edge == 'bottom':  # Exiting bottom edge, enter from top edge (inside, near top)
-                # Use relative_position to place entity at same position along the horizontal edge
-                entity.pos[0] = exit_rect.left + (relative_position * exit_rect.width) - entity.size[0] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[0] = max(exit_rect.left, min(exit_rect.right - entity.size[0], entity.pos[0]))
-                entity.pos[1] = exit_rect.top + offset
-                # Entering from top (moving down), exit going down (preserve downward motion)
-                # If was moving down (positive), keep moving down
-                entity.velocity[0] = old_velocity[0]  # Keep horizontal velocity
-                entity.velocity[1] = old_velocity[1] if old_velocity[1] > 0 else abs(old_velocity[1])
-                
-        elif self.lock_type == 'right':  # white portal - adjacent edge (counter-clockwise exit rotation)
-            # Enter right → Exit bottom (moving right → moving down)
-            # Enter bottom → Exit right (moving down → moving left)
-            # Enter left → Exit top (moving left → moving up)
-            # Enter top → Exit left (moving up → moving right)
-            if exit_edge == 'right':  # Exiting right edge, enter from bottom edge (inside, near bottom)
-                # Use relative_position to place entity at same position along the horizontal edge
-                entity.pos[0] = exit_rect.left + (relative_position * exit_rect.width) - entity.size[0] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[0] = max(exit_rect.left, min(exit_rect.right - entity.size[0], entity.pos[0]))
-                entity.pos[1] = exit_rect.bottom - entity.size[1] - offset
-                # Entering from right (moving right), exit going UP from bottom edge
-                # Take horizontal velocity magnitude, convert to vertical UP velocity (preserve momentum)
-                # Use the magnitude of horizontal velocity (whether left or right) to determine launch speed
-                horizontal_speed = abs(old_velocity[0])
-                # If no horizontal velocity, use a minimum launch speed based on vertical velocity or default
-                if horizontal_speed == 0:
-                    horizontal_speed = abs(old_velocity[1]) if abs(old_velocity[1]) > 0 else 2.0  # Fallback to vertical or minimum
-                entity.velocity[0] = 0
-                entity.velocity[1] = -horizontal_speed  # Upward (negative Y) - launch upward with conserved momentum
-            elif exit_edge == 'bottom':  # Exiting bottom edge, enter from RIGHT edge (inside, near right)
-                entity.pos[0] = exit_rect.right - entity.size[0] - offset
-                # Use relative_position to place entity at same position along the vertical edge
-                entity.pos[1] = exit_rect.top + (relative_position * exit_rect.height) - entity.size[1] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[1] = max(exit_rect.top, min(exit_rect.bottom - entity.size[1], entity.pos[1]))
-                # Entering from bottom (moving down), exit going left from right edge
-                # Take vertical down velocity, convert to horizontal left velocity
-                speed = abs(old_velocity[1]) if old_velocity[1] > 0 else 0
-                entity.velocity[0] = -speed  # Leftward (negative X)
-                entity.velocity[1] = 0
-            elif exit_edge == 'left':  # Exiting left edge (entering from left), exit from top edge going downward
-                # Use relative_position to place entity at same position along the horizontal edge
-                entity.pos[0] = exit_rect.left + (relative_position * exit_rect.width) - entity.size[0] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[0] = max(exit_rect.left, min(exit_rect.right - entity.size[0], entity.pos[0]))
-                entity.pos[1] = exit_rect.top + offset
-                # Entering from left (moving left), exit going DOWN from top edge
-                # Take horizontal left velocity magnitude, convert to vertical DOWN velocity (preserve momentum)
-                horizontal_speed = abs(old_velocity[0])
-                # If no horizontal velocity, use vertical velocity or minimum
-                if horizontal_speed == 0:
-                    horizontal_speed = abs(old_velocity[1]) if abs(old_velocity[1]) > 0 else 2.0
-                entity.velocity[0] = 0
-                entity.velocity[1] = horizontal_speed  # Downward (positive Y) - launch downward with conserved momentum
-            elif exit_edge == 'top':  # Exiting top edge (entering from top), exit from left edge going right
-                entity.pos[0] = exit_rect.left + offset
-                # Use relative_position to place entity at same position along the vertical edge
-                # relative_position is along the top edge (horizontal), so we use it for vertical position
-                entity.pos[1] = exit_rect.top + (relative_position * exit_rect.height) - entity.size[1] // 2
-                # Clamp to ensure entity stays within portal bounds
-                entity.pos[1] = max(exit_rect.top, min(exit_rect.bottom - entity.size[1], entity.pos[1]))
-                # Entering from top (moving up), exit going RIGHT from left edge
-                # Take vertical up velocity magnitude, convert to horizontal RIGHT velocity (preserve momentum)
-                vertical_speed = abs(old_velocity[1])
-                # If no vertical velocity, use horizontal velocity or minimum
-                if vertical_speed == 0:
-                    vertical_speed = abs(old_velocity[0]) if abs(old_velocity[0]) > 0 else 2.0
-                entity.velocity[0] = vertical_speed  # Rightward (positive X) - launch right with conserved momentum
-                entity.velocity[1] = 0
-        
-        # After teleportation, update last_pos to be outside the exit portal
-        # This prevents immediate re-teleportation detection
-        # We set it to a position just outside the entry edge
-        if self.lock_type == 'left':  # red portal
-            if exit_edge == 'left':  # Entered from right
-                entity.last_pos[0] = exit_rect.right + 1
-            elif exit_edge == 'right':  # Entered from left
-                entity.last_pos[0] = exit_rect.left - entity.size[0] - 1
-            elif exit_edge == 'top':  # Entered from bottom
-                entity.last_pos[1] = exit_rect.bottom + 1
-            elif exit_edge == 'bottom':  # Entered from top
-                entity.last_pos[1] = exit_rect.top - entity.size[1] - 1
-        elif self.lock_type == 'right':  # white portal
-            if exit_edge == 'right':  # Entered from bottom
-                entity.last_pos[1] = exit_rect.bottom + 1
-            elif exit_edge == 'bottom':  # Entered from right
-                entity.last_pos[0] = exit_rect.right + 1
-            elif exit_edge == 'left':  # Entered from left, exits from top going down
-                entity.last_pos[1] = exit_rect.top - entity.size[1] - 1
-            elif exit_edge == 'top':  # Entered from top, exits from left going right
-                entity.last_pos[0] = exit_rect.left - entity.size[0] - 1
-        
+        entry_edge, rule_x, rule_y = TRANSFORMS[(self.lock_type, exit_edge)]
+        axis, side = ENTRY_PLACEMENT[entry_edge]
+        along = 1 - axis
+        exit_rect = exit_portal.get_bounds()
+        lows = (exit_rect.left, exit_rect.top)
+        highs = (exit_rect.right, exit_rect.bottom)
+        size = entity.size
+        old_velocity = (entity.velocity[0], entity.velocity[1])
+
+        if side < 0:
+            entity.pos[axis] = lows[axis] + INSIDE_OFFSET
+        else:
+            entity.pos[axis] = highs[axis] - size[axis] - INSIDE_OFFSET
+        position = lows[along] + relative_position * (highs[along] - lows[along]) - size[along] // 2
+        entity.pos[along] = max(lows[along], min(highs[along] - size[along], position))
+
+        entity.velocity[0] = exit_velocity(rule_x, old_velocity)
+        entity.velocity[1] = exit_velocity(rule_y, old_velocity)
+
+        # Just outside the entry edge, so the exit portal does not send it straight back
+        entity.last_pos[axis] = highs[axis] + 1 if side > 0 else lows[axis] - size[axis] - 1
         return True
+
+    def teleport_arrays(self, exit_portal, edges, relative, pos, velocity, last_pos, size):
+        """
+        teleport_entity for many entities at once, on arrays changed in place.
+
+        Args:
+            exit_portal: The portal the entities will appear in
+            edges, relative: check_collisions() results (rows with edge -1 are left alone)
+            pos, velocity, last_pos: (n, 2) float arrays
+            size: (n, 2) int array of collision sizes
+        """
+        if not self.locked or not exit_portal.locked:
+            return
+        exit_rect = exit_portal.get_bounds()
+        lows = (exit_rect.left, exit_rect.top)
+        highs = (exit_rect.right, exit_rect.bottom)
+        old_velocity = velocity.copy()
+        for code, exit_edge in enumerate(EDGES):
+            rows = np.flatnonzero(edges == code)
+            if not len(rows):
+                continue
+            entry_edge, rule_x, rule_y = TRANSFORMS[(self.lock_type, exit_edge)]
+            axis, side = ENTRY_PLACEMENT[entry_edge]
+            along = 1 - axis
+            sizes = np.asarray(size)[rows]
+
+            if side < 0:
+                pos[rows, axis] = lows[axis] + INSIDE_OFFSET
+            else:
+                pos[rows, axis] = highs[axis] - sizes[:, axis] - INSIDE_OFFSET
+            position = lows[along] + relative[rows] * (highs[along] - lows[along]) - sizes[:, along] // 2
+            pos[rows, along] = np.maximum(lows[along], np.minimum(highs[along] - sizes[:, along], position))
+
+            velocity[rows, 0] = exit_velocities(rule_x, old_velocity[rows])
+            velocity[rows, 1] = exit_velocities(rule_y, old_velocity[rows])
+
+            last_pos[rows, axis] = highs[axis] + 1 if side > 0 else lows[axis] - sizes[:, axis] - 1
     
     def render(self, surf, offset=(0, 0)):
         x = self.pos[0] - offset[0]
         y = self.pos[1] - offset[1]
         
-        # Render portal sprite based on lock type
+        # Render portal sprite based on lock type (frames are already portal-sized, see sized_animation)
         if self.locked and self.lock_type:
             if self.lock_type == 'left' and self.red_animation:
                 # red portal for left click
-                portal_img = self.red_animation.img()
-                # Scale image to portal size if needed
-                if portal_img.get_width() != self.size or portal_img.get_height() != self.size:
-                    portal_img = pygame.transform.scale(portal_img, (self.size, self.size))
-                surf.blit(portal_img, (x, y))
+                surf.blit(self.red_animation.img(), (x, y))
             elif self.lock_type == 'right' and self.white_animation:
                 # white portal for right click
-                portal_img = self.white_animation.img()
-                # Scale image to portal size if needed
-                if portal_img.get_width() != self.size or portal_img.get_height() != self.size:
-                    portal_img = pygame.transform.scale(portal_img, (self.size, self.size))
-                surf.blit(portal_img, (x, y))
+                surf.blit(self.white_animation.img(), (x, y))
             else:
                 # Fallback to old rectangle drawing if sprites not available
-                pygame.draw.rect(surf, self.color, (x, y, self.size, self.size), self.thickness)
+                draw_rect(surf, self.color, (x, y, self.size, self.size), self.thickness)
         else:
             # Unlocked portal - use grey animation with transparency
             if self.grey_animation:
-                portal_img = self.grey_animation.img()
-                # Scale image to portal size if needed
-                if portal_img.get_width() != self.size or portal_img.get_height() != self.size:
-                    portal_img = pygame.transform.scale(portal_img, (self.size, self.size))
-                # Make grey portal slightly transparent (70% opacity)
-                portal_img.set_alpha(100)  # 178/255 ≈ 70% opacity
-                surf.blit(portal_img, (x, y))
+                surf.blit(self.grey_animation.img(), (x, y))
             else:
                 # Fallback to old rectangle drawing if sprites not available
-                pygame.draw.rect(surf, self.color, (x, y, self.size, self.size), self.thickness)
+                draw_rect(surf, self.color, (x, y, self.size, self.size), self.thickness)
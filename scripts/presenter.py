@@ -0,0 +1,478 @@
+"""
+Drawing frames and getting them onto the window.
+
+Every screen draws a low-resolution frame (Game.display_2, Homepage.display,
+...), which is scaled up to the window, and draws a few things at window
+resolution on top (the win screen, the cursor, the logo and introduction
+screens). A Presenter does the part that touches the window:
+
+    presenter = get_presenter((960, 640))
+    canvas = presenter.frame_canvas(frame)  # where to draw a frame of frame's size
+    canvas.blit(image, pos)                 # Surface drawing methods, see TextureCanvas
+    draw_rect(canvas, color, rect)          # pygame.draw.rect / lines for either kind
+    presenter.draw_frame(canvas)            # the frame, scaled to the window
+    screen = presenter.overlay()            # window-resolution canvas to draw on
+    presenter.draw_image(cursor, pos)       # an unchanging image, on top, this present only
+    presenter.present()
+
+The overlay keeps what was drawn on it until the next draw_frame, like the
+window surface it stands for (so fades that darken it step by step work).
+
+SoftwarePresenter is the window surface of pygame.display: its canvases are
+the Surfaces themselves, frames are scaled with transform.scale and shown with
+pygame.display.update(), as the screens always did. Headless games use it.
+
+RendererPresenter uses pygame._sdl2.video: a Window with a GPU Renderer. Its
+canvases (TextureCanvas) are render-target Textures with the Surface drawing
+methods the screens use, so tilemap chunks, sprites, portals and UI text are
+drawn by the GPU. Each source Surface is uploaded once into a Texture kept by
+the presenter (see RendererPresenter.texture): Game.assets are preloaded and
+kept, tilemap chunks and level previews are uploaded when first drawn, and
+Surfaces made for one frame only (text, fade overlays) are dropped again after
+EVICT_PRESENTS presents. A cached Texture is not updated when its Surface is
+drawn on afterwards, so Surfaces drawn onto a canvas must not change (make a
+new one instead, as Tilemap.render_chunk does). The frame canvas is scaled to
+the window by the renderer; a plain Surface given to draw_frame is still
+uploaded whole at present. pygame.display keeps a hidden 1x1 window so
+Surface.convert() still has a format.
+
+measure_present times both backends on what the screens draw
+(python -m scripts.presenter).
+
+The renderer is opt-in (RENDERER=sdl2 in the environment). get_presenter
+falls back to SoftwarePresenter, with a note on stderr, when pygame._sdl2 is
+missing, the video driver is a headless one (HEADLESS_DRIVERS) or SDL has no
+accelerated renderer (no GPU).
+"""
+import os
+import sys
+import time
+import argparse
+
+import pygame
+
+try:
+    from pygame._sdl2 import video as sdl2_video
+except ImportError:  # pygame builds without the SDL2 bindings
+    sdl2_video = None
+
+RENDERER_ENV = 'RENDERER'  # Environment variable choosing the backend: 'software' (default) or 'sdl2'
+HEADLESS_DRIVERS = ('dummy', 'offscreen')  # Video drivers without a screen to accelerate
+BLENDMODE_NONE = 0  # SDL_BLENDMODE_NONE
+BLENDMODE_BLEND = 1  # SDL_BLENDMODE_BLEND
+SCENES = ('game', 'win', 'screen')  # What measure_present draws (see there)
+BENCH_SPRITES = 200  # Sprites measure_present draws per frame
+EVICT_PRESENTS = 120  # Cached textures unused for this many presents are dropped (unless preloaded)
+
+_presenter = None  # The presenter every screen shares (see get_presenter)
+
+
+class SoftwarePresenter:
+    """Presents through the pygame.display window surface."""
+
+    def __init__(self, size):
+        """
+        Args:
+            size: (width, height) of the window
+        """
+        self.size = tuple(size)
+        self.screen = pygame.display.set_mode(self.size)
+
+    def reopen(self):
+        """Called when another screen asks for the presenter (see get_presenter)."""
+        self.screen = pygame.display.set_mode(self.size)
+
+    def set_icon(self, icon):
+        pygame.display.set_icon(icon)
+
+    def frame_canvas(self, frame):
+        """Where to draw a frame: the Surface itself."""
+        return frame
+
+    def preload(self, images):
+        """Nothing to upload: Surfaces are drawn as they are."""
+
+    def draw_frame(self, frame):
+        """Draw a frame scaled to cover the window."""
+        screen = self.screen
+        if frame.get_flags() & pygame.SRCALPHA or frame.get_bitsize() != screen.get_bitsize() \
+                or frame.get_masks() != screen.get_masks():
+            screen.blit(pygame.transform.scale(frame, self.size), (0, 0))
+        else:
+            # Same format as the window: scale straight into it, without a scaled copy
+            pygame.transform.scale(frame, self.size, screen)
+
+    def overlay(self):
+        """The window-resolution Surface to draw on top of the frame."""
+        return self.screen
+
+    def draw_image(self, image, dest):
+        """Draw an image at window resolution, on top of the overlay."""
+        self.screen.blit(image, dest)
+
+    def present(self):
+        pygame.display.update()
+
+
+class TextureCanvas:
+    """
+    A render-target Texture of a RendererPresenter, drawn on with the Surface
+    methods the screens use (get_size, get_width, get_height, get_rect, blit,
+    blits, fill); pygame.draw calls go through draw_rect / draw_lines.
+    """
+
+    def __init__(self, presenter, size, alpha=False):
+        """
+        Args:
+            presenter: The RendererPresenter that draws it
+            size: (width, height)
+            alpha: Whether it stands for a per-pixel alpha Surface (starts
+                transparent and is blended when drawn onto another canvas, as a
+                SRCALPHA Surface is blitted)
+        """
+        self.presenter = presenter
+        self.size = tuple(size)
+        self.texture = sdl2_video.Texture(presenter.renderer, self.size, target=True)
+        # Opaque canvases are drawn over whatever was there
+        self.texture.blend_mode = BLENDMODE_BLEND if alpha else BLENDMODE_NONE
+        self.fill((0, 0, 0, 0))
+
+    def get_size(self):
+        return self.size
+
+    def get_width(self):
+        return self.size[0]
+
+    def get_height(self):
+        return self.size[1]
+
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect((0, 0), self.size)
+        for name, value in kwargs.items():
+            setattr(rect, name, value)
+        return rect
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        """Surface.blit (positions truncate like it; special_flags are not supported)."""
+        if special_flags:
+            raise ValueError('TextureCanvas.blit does not support special_flags')
+        self.presenter.use_target(self)
+        texture = source.texture if isinstance(source, TextureCanvas) else self.presenter.texture(source)
+        if area is None:
+            width, height = source.get_size()
+            texture.draw(dstrect=(int(dest[0]), int(dest[1]), width, height))
+        else:
+            area = pygame.Rect(area)
+            texture.draw(srcrect=area, dstrect=(int(dest[0]), int(dest[1]), area.width, area.height))
+
+    def blits(self, blit_sequence, doreturn=True):
+        """Surface.blits (returns None)."""
+        for item in blit_sequence:
+            self.blit(*item)
+
+    def fill(self, color, rect=None):
+        """Surface.fill: sets the pixels, without blending."""
+        self.presenter.use_target(self)
+        renderer = self.presenter.renderer
+        renderer.draw_color = color
+        renderer.fill_rect(rect if rect is not None else (0, 0) + self.size)
+
+    def draw_rect(self, color, rect, width=0, border_radius=0):
+        """pygame.draw.rect (rounded rects are drawn once into a Surface, see RendererPresenter.shape)."""
+        rect = pygame.Rect(rect)
+        if border_radius > 0:
+            self.blit(self.presenter.shape(color, rect.size, width, border_radius), rect.topleft)
+        elif width <= 0 or 2 * width >= min(rect.width, rect.height):
+            self.fill(color, rect)
+        else:
+            self.fill(color, (rect.left, rect.top, rect.width, width))
+            self.fill(color, (rect.left, rect.bottom - width, rect.width, width))
+            self.fill(color, (rect.left, rect.top, width, rect.height))
+            self.fill(color, (rect.right - width, rect.top, width, rect.height))
+
+    def draw_lines(self, color, closed, points):
+        """pygame.draw.lines, one pixel wide."""
+        self.presenter.use_target(self)
+        renderer = self.presenter.renderer
+        renderer.draw_color = color
+        points = [(int(x), int(y)) for x, y in points]
+        for start, end in zip(points, points[1:]):
+            renderer.draw_line(start, end)
+        if closed and len(points) > 2:
+            renderer.draw_line(points[-1], points[0])
+
+    def to_surface(self):
+        """A Surface copy of what was drawn (reads the texture back, so slow)."""
+        self.presenter.use_target(self)
+        return self.presenter.renderer.to_surface()
+
+
+def draw_rect(target, color, rect, width=0, border_radius=0):
+    """pygame.draw.rect onto a Surface or a TextureCanvas."""
+    if isinstance(target, TextureCanvas):
+        target.draw_rect(color, rect, width, border_radius)
+    else:
+        pygame.draw.rect(target, color, rect, width, border_radius=border_radius)
+
+
+def draw_lines(target, color, closed, points):
+    """pygame.draw.lines (one pixel wide) onto a Surface or a TextureCanvas."""
+    if isinstance(target, TextureCanvas):
+        target.draw_lines(color, closed, points)
+    else:
+        pygame.draw.lines(target, color, closed, points)
+
+
+class RendererPresenter:
+    """Draws and presents through a pygame._sdl2.video Renderer (see the module docstring)."""
+
+    def __init__(self, size, accelerated=True):
+        """
+        Args:
+            size: (width, height) of the window
+            accelerated: Require a GPU renderer (False also accepts SDL's software one)
+
+        Raises:
+            pygame.error: If the window or renderer cannot be created
+        """
+        self.size = tuple(size)
+        # Hidden, but sets the format Surface.convert() / convert_alpha() convert to
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = sdl2_video.Window(pygame.display.get_caption()[0] or 'pygame', self.size)
+        try:
+            self.renderer = sdl2_video.Renderer(self.window, accelerated=1 if accelerated else -1)
+        except Exception:
+            self.window.destroy()
+            raise
+        self.target = None  # The TextureCanvas the renderer draws into (None: the window)
+        self.textures = {}  # id(Surface) -> [Surface, Texture, its alpha, last present used, preloaded]
+        self.shapes = {}  # (color, size, width, border_radius) -> Surface (see shape)
+        self.canvases = {}  # id(frame Surface) -> (Surface, TextureCanvas) (see frame_canvas)
+        self.presents = 0
+        self.frame = None  # The last frame given to draw_frame (a TextureCanvas or a Surface)
+        self.frame_texture = None  # Streaming texture for frames given as Surfaces
+        # The overlay, whether it is shown (else the frame is) and a new window's black
+        self.overlay_canvas = TextureCanvas(self, self.size)
+        self.overlay_canvas.fill((0, 0, 0))
+        self.overlay_shown = True
+        self.images = []  # (Texture, dest) to draw on top at the next present
+
+    def reopen(self):
+        """Called when another screen asks for the presenter: follow the caption it set."""
+        caption = pygame.display.get_caption()[0]
+        if caption:
+            self.window.title = caption
+
+    def set_icon(self, icon):
+        self.window.set_icon(icon)
+
+    def use_target(self, canvas):
+        """Point the renderer at a TextureCanvas, or at the window for None."""
+        if self.target is not canvas:
+            self.renderer.target = canvas.texture if canvas is not None else None
+            self.target = canvas
+
+    def texture(self, surface):
+        """
+        The Texture of a Surface, uploaded on first use and kept while it is drawn
+        (see the module docstring); follows changes of the Surface's set_alpha.
+        """
+        entry = self.textures.get(id(surface))
+        if entry is None:
+            entry = [surface, sdl2_video.Texture.from_surface(self.renderer, surface), surface.get_alpha(), 0, False]
+            self.textures[id(surface)] = entry
+        entry[3] = self.presents
+        alpha = surface.get_alpha()
+        if alpha != entry[2]:
+            texture = entry[1]
+            texture.alpha = 255 if alpha is None else alpha
+            if alpha is not None:
+                texture.blend_mode = BLENDMODE_BLEND
+            entry[2] = alpha
+        return entry[1]
+
+    def preload(self, images):
+        """Upload Surfaces now and keep their Textures for good (the game's assets)."""
+        for image in images:
+            self.texture(image)
+            self.textures[id(image)][4] = True
+
+    def shape(self, color, size, width, border_radius):
+        """A Surface with a rounded pygame.draw.rect on it, made once per shape."""
+        key = (tuple(pygame.Color(color)), tuple(size), width, border_radius)
+        surface = self.shapes.get(key)
+        if surface is None:
+            surface = pygame.Surface(size, pygame.SRCALPHA)
+            pygame.draw.rect(surface, color, surface.get_rect(), width, border_radius=border_radius)
+            self.shapes[key] = surface
+        return surface
+
+    def frame_canvas(self, frame):
+        """Where to draw a frame: a TextureCanvas of the Surface's size, one per Surface."""
+        entry = self.canvases.get(id(frame))
+        if entry is None:
+            entry = (frame, TextureCanvas(self, frame.get_size(), alpha=bool(frame.get_flags() & pygame.SRCALPHA)))
+            self.canvases[id(frame)] = entry
+        return entry[1]
+
+    def draw_frame(self, frame):
+        """Show a frame (a TextureCanvas, or a Surface read at the next present) scaled to cover the window."""
+        self.frame = frame
+        self.overlay_shown = False  # The frame covers what the overlay had
+
+    def _draw_frame_texture(self):
+        """Draw the frame scaled to the whole of the current target."""
+        frame = self.frame
+        if isinstance(frame, TextureCanvas):
+            frame.texture.draw(dstrect=(0, 0) + self.size)
+            return
+        texture = self.frame_texture
+        if texture is None or texture.width != frame.get_width() or texture.height != frame.get_height():
+            texture = sdl2_video.Texture(self.renderer, frame.get_size(), streaming=True)
+            self.frame_texture = texture
+        texture.blend_mode = BLENDMODE_BLEND if frame.get_flags() & pygame.SRCALPHA else BLENDMODE_NONE
+        texture.update(frame)
+        texture.draw(dstrect=(0, 0) + self.size)
+
+    def overlay(self):
+        """The window-resolution canvas to draw on top of the frame."""
+        if not self.overlay_shown:
+            # Like the window surface: the overlay starts as the scaled frame, and only it is shown
+            self.use_target(self.overlay_canvas)
+            self._draw_frame_texture()
+            self.overlay_shown = True
+        return self.overlay_canvas
+
+    def draw_image(self, image, dest):
+        """Draw an image at window resolution, on top of the overlay (uploaded on first use)."""
+        self.images.append((self.texture(image), pygame.Rect(dest, image.get_size())))
+
+    def present(self):
+        self.use_target(None)
+        renderer = self.renderer
+        renderer.draw_color = (0, 0, 0, 255)
+        renderer.clear()
+        if self.overlay_shown:
+            self.overlay_canvas.texture.draw(dstrect=(0, 0) + self.size)
+        elif self.frame is not None:
+            self._draw_frame_texture()
+        for texture, rect in self.images:
+            texture.draw(dstrect=rect)
+        self.images.clear()
+        renderer.present()
+        self.presents += 1
+        if self.presents % EVICT_PRESENTS == 0:
+            oldest = self.presents - EVICT_PRESENTS
+            self.textures = {key: entry for key, entry in self.textures.items() if entry[4] or entry[3] >= oldest}
+        # Closing this window leaves the hidden one open, so SDL sends no QUIT of its own
+        if pygame.event.peek(pygame.WINDOWCLOSE):
+            pygame.event.clear(pygame.WINDOWCLOSE)
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+
+def get_presenter(size=(960, 640)):
+    """
+    The presenter every screen shares, created on first use with the backend
+    RENDERER_ENV asks for (falling back to software, see the module docstring).
+
+    Args:
+        size: (width, height) of the window
+
+    Returns:
+        SoftwarePresenter or RendererPresenter
+    """
+    global _presenter
+    if _presenter is not None and _presenter.size == tuple(size):
+        _presenter.reopen()
+        return _presenter
+    pygame.init()
+    _presenter = None
+    # Read when the window is made, so a .env loaded after import still counts
+    if os.environ.get(RENDERER_ENV, 'software') == 'sdl2':
+        reason = None
+        if sdl2_video is None:
+            reason = 'pygame._sdl2 is not available'
+        elif pygame.display.get_driver() in HEADLESS_DRIVERS:
+            reason = 'video driver ' + pygame.display.get_driver() + ' has no screen'
+        else:
+            try:
+                _presenter = RendererPresenter(size)
+            except Exception as e:
+                reason = 'no accelerated renderer (' + str(e) + ')'
+        if reason:
+            print('Using the software renderer:', reason, file=sys.stderr)
+    if _presenter is None:
+        _presenter = SoftwarePresenter(size)
+    return _presenter
+
+
+def current_presenter():
+    """The shared presenter, creating one with the default size if no screen has yet."""
+    return _presenter if _presenter is not None else get_presenter()
+
+
+def measure_present(presenter, scene='game', frames=300, frame_size=(540, 380), sprites=BENCH_SPRITES):
+    """
+    Milliseconds per drawn and presented frame, drawing what the screens draw.
+
+    Args:
+        presenter: SoftwarePresenter or RendererPresenter
+        scene: 'game' (a background, tilemap-chunk-sized images, sprites and the
+            cursor on the frame canvas), 'win' (the same and a box drawn on the
+            overlay, like the win screen) or 'screen' (the whole overlay
+            redrawn and no frame, like the logo and introduction screens)
+        frames: Frames to time (after one warm-up frame)
+        frame_size: (width, height) of the frame
+        sprites: Sprites drawn per frame
+
+    Returns:
+        float: Milliseconds per frame
+    """
+    frame = pygame.Surface(frame_size)
+    canvas = presenter.frame_canvas(frame)
+    background = pygame.Surface(frame_size)
+    background.fill((40, 80, 120))
+    chunk = pygame.Surface((128, 128), pygame.SRCALPHA)
+    for x in range(0, 128, 16):
+        chunk.fill((90, 60, 30, 255), (x, 96, 16, 32))
+    sprite = pygame.Surface((16, 16))
+    sprite.fill((200, 200, 80))
+    sprite.fill((0, 0, 0), (4, 4, 8, 8))
+    sprite.set_colorkey((0, 0, 0))
+    cursor = pygame.Surface((16, 16), pygame.SRCALPHA)
+    cursor.fill((255, 255, 255, 200))
+    presenter.preload([background, chunk, sprite, cursor])
+    width, height = frame_size
+    start = None
+    for i in range(frames + 1):
+        if i == 1:
+            start = time.perf_counter()
+        if scene == 'screen':
+            presenter.overlay().fill((i % 256, 0, 0))
+        else:
+            canvas.blit(background, (0, 0))
+            canvas.blits([(chunk, (x - i % 128, y)) for x in range(0, width + 128, 128) for y in range(0, height, 128)])
+            canvas.blits([(sprite, ((n * 37 + i) % width, (n * 53) % height)) for n in range(sprites)])
+            presenter.draw_frame(canvas)
+            if scene == 'win':
+                presenter.overlay().fill((0, 0, 0), (280, 220, 400, 200))
+            presenter.draw_image(cursor, (100 + i % 50, 100))
+        presenter.present()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Milliseconds per frame of the software and sdl2 presenters')
+    parser.add_argument('--frames', type=int, default=300, help='frames to time per scene')
+    parser.add_argument('--any-renderer', action='store_true',
+                        help="also accept SDL's software renderer (for machines without a GPU)")
+    args = parser.parse_args()
+    pygame.init()
+    # One after the other: the renderer's hidden window replaces the software one
+    backends = [('software', lambda: SoftwarePresenter((960, 640)))]
+    if sdl2_video is not None:
+        backends.append(('sdl2', lambda: RendererPresenter((960, 640), accelerated=not args.any_renderer)))
+    for name, make_presenter in backends:
+        presenter = make_presenter()
+        print(name + ':', ', '.join(f"{scene} {measure_present(presenter, scene, args.frames):.2f} ms"
+                                    for scene in SCENES))
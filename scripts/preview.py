@@ -0,0 +1,499 @@
+"""
+Trajectory preview: where the player or a crate will go in the next frames.
+
+While portals are locked the game draws the predicted path of the player (and of
+the crates in a portal) through the portal pair. A prediction runs on a ghost: a
+copy of the body's simulation state in a Player or Crate made without a game, so
+stepping it touches nothing live. Each ghost frame follows Game.update for that
+body: spring launches (Spring.contact), horizontal launcher tiles (player only),
+the body's own update against the tiles (and, for the player, the crates), then
+the portal check (portal.teleport_pair).
+
+The rest of the level is taken as it is when the prediction starts: crates,
+springs and portals do not move during it, and the input held now is held for
+the whole preview.
+
+Predictions are cached per body, with the body's state before every predicted
+frame. While the scene (input, portals, tiles, and the crates and springs in the
+broadphase cells the path went through) is unchanged:
+- a body in the same state gets the same path back (standing still while aiming)
+- a body in the state predicted for a few frames later (it moved as predicted)
+  gets the rest of the path, extended by just the frames it played
+so a full prediction is only simulated when something else changes.
+
+A full prediction is kept near a millisecond:
+- once the whole ghost state comes back to an earlier one (a body at rest bobs by
+  a fraction of a pixel with a period of a few frames) the rest of the path
+  repeats, so whole periods are copied instead of simulated
+- a body that leaves the level (past its tiles and the camera's bounds) and
+  cannot come back ends its path there
+- ghosts collide with the tiles through GhostTiles, which reads the flag grid
+  as a bitmask of blocking rows per column, only look at the crates and
+  springs their next move can reach, and only check the portals' edges while
+  their center is inside one
+"""
+import pygame
+
+from scripts.entities import Player, Crate, Spring, LAUNCHER_SPEED
+from scripts.portal import teleport_pair, EDGE_THRESHOLD
+from scripts.presenter import draw_lines
+from scripts.tilemap import TILE_SOLID, TILE_NOT_LOADED
+
+PREVIEW_FRAMES = 120  # Two seconds at 60 fps
+MAX_CACHED = 16  # Predictions kept (one per body)
+MAX_PLAYED = 8  # Frames a body may have played along its prediction and still reuse it
+PATH_COLOR = (255, 255, 255)
+# bytes.translate table from flag grid cells to '1' where a ghost is blocked and '0' elsewhere
+BLOCKING_DIGITS = bytes(ord('1') if flag & (TILE_SOLID | TILE_NOT_LOADED) else ord('0') for flag in range(256))
+
+
+def body_state(body):
+    """The parts of a body's state a prediction starts from (to compare with predicted ones)."""
+    pos = body.pos
+    velocity = body.velocity
+    last_pos = body.last_pos
+    if isinstance(body, Player):
+        return (pos[0], pos[1], velocity[0], velocity[1], last_pos[0], last_pos[1],
+                body.teleported_this_frame, body.air_time, body.jumps)
+    return (pos[0], pos[1], velocity[0], velocity[1], last_pos[0], last_pos[1],
+            body.teleported_this_frame, body.sleeping, body.rest_frames)
+
+
+class GhostTiles:
+    """
+    The physics tiles of a flag grid, as a stand-in for the Tilemap in a ghost's
+    update: physics_rects_in gives the same rects in the same order as
+    Tilemap.physics_rects_in, but reads the grid a column at a time, as a bitmask
+    of its blocking rows, and skips the columns with nothing in the rect's rows at
+    once (a ghost spends most frames in the air). Like there, the cells of a
+    streamed chunk that is not loaded block.
+    """
+    __slots__ = ('grid', 'tile_size', 'rects', 'columns')
+
+    def __init__(self, grid, tile_size):
+        self.grid = grid  # Tilemap.flag_grid() (see TrajectoryPreview.ghost_tiles)
+        self.tile_size = tile_size
+        self.rects = {}  # (x, y) -> Rect of the blocking cell there, made on first use (never changed by the callers)
+        self.columns = {}  # x -> bit y - min_y set for each blocking cell in column x, made on first use
+
+    def column(self, x):
+        cells, width, height, min_x, min_y = self.grid
+        bits = 0
+        if 0 <= x - min_x < width and height:
+            # One '0'/'1' digit per row, top row last
+            bits = int(cells[x - min_x::width].translate(BLOCKING_DIGITS)[::-1], 2)
+        self.columns[x] = bits
+        return bits
+
+    def physics_rects_in(self, rect):
+        size = self.tile_size
+        top = self.grid[4]
+        y0 = rect.top // size
+        y1 = (rect.bottom - 1) // size
+        # The rows y0..y1 as bits of a column (rows above the grid hold nothing)
+        shift = y0 - top
+        rows = (1 << (y1 - y0 + 1)) - 1
+        if shift < 0:
+            rows >>= -shift
+            shift = 0
+        columns = self.columns
+        rects = []
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            bits = columns.get(x)
+            if bits is None:
+                bits = self.column(x)
+            bits = bits >> shift & rows
+            y = top + shift
+            while bits:
+                if bits & 1:
+                    tile = self.rects.get((x, y))
+                    if tile is None:
+                        tile = self.rects[x, y] = pygame.Rect(x * size, y * size, size, size)
+                    rects.append(tile)
+                bits >>= 1
+                y += 1
+        return rects
+
+
+class Prediction:
+    """A body's predicted path, with what is needed to check and extend it."""
+    __slots__ = ('key', 'cells', 'bodies', 'states', 'points', 'teleports', 'ghost_state', 'touching',
+                 'finished', 'segments')
+
+    def __init__(self, key, state):
+        self.key = key  # The scene it was made in (see TrajectoryPreview.scene_key)
+        self.cells = set()  # Broadphase cells searched for crates and springs
+        self.bodies = None  # Their crates' and springs' positions (see TrajectoryPreview.bodies_key)
+        self.states = [state]  # body_state before each frame, and after the last one
+        self.points = []  # Center of the body after each frame
+        self.teleports = []  # Frames the body was teleported in
+        self.ghost_state = None  # Ghost state after the last frame, to extend from
+        self.touching = set()  # Springs the ghost touches after the last frame
+        self.finished = False  # The body fell off the level or came to rest: nothing to extend
+        self.segments = None
+
+    def drop(self, frames):
+        """Forget the first `frames` frames (the body has played them)."""
+        del self.states[:frames]
+        del self.points[:frames]
+        self.teleports = [frame - frames for frame in self.teleports if frame >= frames]
+
+    def build_segments(self):
+        """Split the points into segments at the teleports (see TrajectoryPreview.predict)."""
+        points = self.points
+        segments = []
+        start = 0
+        for frame in self.teleports:
+            segments.append(points[start:frame])
+            start = frame
+        segments.append(points[start:])
+        self.segments = segments
+
+
+class TrajectoryPreview:
+    def __init__(self, game, frames=PREVIEW_FRAMES):
+        """
+        Args:
+            game: Game instance whose level is predicted
+            frames: Frames simulated ahead
+        """
+        self.game = game
+        self.frames = frames
+        self.cache = {}  # id(body) -> Prediction
+        self.ghosts = {}  # Ghost class -> reusable ghost of that class
+        self.rects = (pygame.Rect(0, 0, 0, 0), pygame.Rect(0, 0, 0, 0))  # For teleport_pair
+        self.launchers = (None, frozenset())  # (flag grid, tile locations of spring_horizontal tiles)
+        self.tiles = None  # GhostTiles of the current flag grid
+        self.extent = (None, None)  # (flag grid, the tilemap's extent)
+
+    def clear(self):
+        self.cache = {}
+
+    def predict(self, body, movement=(0, 0)):
+        """
+        The predicted path of a body, from the cache when possible.
+
+        Args:
+            body: The game's player or one of its crates
+            movement: Horizontal input held during the preview, as given to Player.update
+
+        Returns:
+            list: Segments of the path, each a list of (x, y) centers of the body, one
+                  per frame; a new segment starts after each teleport. Shared with
+                  the cache: do not modify it.
+        """
+        key = self.scene_key(movement)
+        state = body_state(body)
+        prediction = self.cache.get(id(body))
+        if prediction is not None and prediction.key == key and \
+                prediction.bodies == self.bodies_key(body, prediction.cells):
+            states = prediction.states
+            if states[0] == state:
+                return prediction.segments
+            # Moved as predicted: keep the rest of the path, simulate the frames played
+            for played in range(1, min(MAX_PLAYED + 1, len(states))):
+                if states[played] == state:
+                    prediction.drop(played)
+                    if not prediction.finished:
+                        ghost = self.ghost(body)
+                        ghost.set_state(prediction.ghost_state)
+                        self.run(prediction, ghost, body, movement, played)
+                        prediction.bodies = self.bodies_key(body, prediction.cells)
+                    prediction.build_segments()
+                    return prediction.segments
+
+        prediction = self.simulate(body, movement)
+        prediction.key = key
+        prediction.bodies = self.bodies_key(body, prediction.cells)
+        if len(self.cache) >= MAX_CACHED:
+            self.cache = {}
+        self.cache[id(body)] = prediction
+        return prediction.segments
+
+    def scene_key(self, movement):
+        """What a prediction depends on besides the body's state and the bodies near its path."""
+        game = self.game
+        portals = None
+        if game.player_portal.locked and game.cursor_portal.locked:
+            portals = game.player_portal.get_state() + game.cursor_portal.get_state()
+        return (tuple(movement), portals, game.tilemap.flag_grid())
+
+    def bodies_key(self, body, cells):
+        """
+        Positions of the crates and springs (other than `body`) in some broadphase cells.
+
+        Whole pixels: the ghost only meets them as collision rects, so a body
+        settling by a fraction of a pixel does not invalidate a prediction.
+        """
+        grid = self.game.broadphase.cells
+        positions = []
+        for cell in cells:
+            for obj in grid.get(cell, ()):
+                if obj is not body and not isinstance(obj, Player):
+                    positions.append((int(obj.pos[0]), int(obj.pos[1])))
+        return positions
+
+    def ghost(self, body):
+        """The reusable ghost for a body's class (Player or Crate), made without a game."""
+        cls = Player if isinstance(body, Player) else Crate
+        ghost = self.ghosts.get(cls)
+        if ghost is None:
+            ghost = cls(None, body.pos, body.size)
+            self.ghosts[cls] = ghost
+        ghost.size = body.size
+        return ghost
+
+    def snapshot(self, body):
+        """
+        A ghost copy of a body: the same class and simulation state, but no game.
+
+        Ghosts are reused, so the returned one is only valid until the next call.
+        """
+        ghost = self.ghost(body)
+        ghost.set_state(body.get_state())
+        return ghost
+
+    def simulate(self, body, movement=(0, 0)):
+        """
+        Predict a body `frames` frames ahead from scratch (uncached; see predict).
+
+        Args:
+            body: The game's player or one of its crates
+            movement: Horizontal input held during the preview
+
+        Returns:
+            Prediction: The prediction, with its segments built
+        """
+        game = self.game
+        portals = (game.player_portal, game.cursor_portal)
+        prediction = Prediction(None, body_state(body))
+        ghost = self.snapshot(body)
+        if not isinstance(body, Player) and ghost.sleeping and any(portal.locked for portal in portals) and \
+                any(portal.get_rect().colliderect(body.rect()) for portal in portals):
+            # Locked portals wake the bodies under them (see Game.update)
+            ghost.wake()
+        # Springs the body touches now (a spring only launches what lands on it anew)
+        prediction.touching = {id(spring) for spring in game.springs if id(body) in spring.touching_entities}
+        self.run(prediction, ghost, body, movement, self.frames)
+        prediction.build_segments()
+        return prediction
+
+    def launcher_tiles(self):
+        """Tile locations of the level's spring_horizontal tiles (cached until the tiles change)."""
+        grid = self.game.tilemap.flag_grid()
+        if self.launchers[0] is not grid:
+            tiles = self.game.tilemap.tilemap.values()
+            self.launchers = (grid, frozenset(tuple(tile['pos']) for tile in tiles
+                                              if tile['type'] in ('spring_horizontal', 'red_box')))
+        return self.launchers[1]
+
+    def level_bounds(self):
+        """Tilemap.extent() (cached until the tiles change) with the camera's bounds."""
+        grid = self.game.tilemap.flag_grid()
+        if self.extent[0] is not grid:
+            self.extent = (grid, self.game.tilemap.extent())
+        return self.extent[1].union(self.game.camera.bounds)
+
+    def ghost_tiles(self):
+        """What ghosts collide with: GhostTiles of the current flag grid."""
+        tilemap = self.game.tilemap
+        grid = tilemap.flag_grid()
+        if self.tiles is None or self.tiles.grid is not grid:
+            self.tiles = GhostTiles(grid, tilemap.tile_size)
+        return self.tiles
+
+    def run(self, prediction, ghost, body, movement, frames):
+        """
+        Step the ghost and append the frames to the prediction.
+
+        Args:
+            prediction: Prediction to extend (its touching set is the ghost's)
+            ghost: Ghost in the state after the prediction's last frame
+            body: The live body the ghost stands for (left out of its colliders)
+            movement: Horizontal input held
+            frames: Frames to simulate
+        """
+        game = self.game
+        tilemap = self.ghost_tiles()
+        tile_size = tilemap.tile_size
+        player_portal, cursor_portal = game.player_portal, game.cursor_portal
+        linked = player_portal.locked and cursor_portal.locked
+        w, h = ghost.size
+        # The portals do not move. Portal.check_collision only finds an exit when the
+        # body's center was inside the portal (is_inside) and the body is now within
+        # EDGE_THRESHOLD of being past one of its edges: per portal, the bounds of the
+        # center and the open ranges of the body's x and y that rule out an exit, so
+        # most frames need no teleport_pair
+        portals = []
+        for portal in (player_portal, cursor_portal):
+            left, top, right, bottom = portal.get_rect()
+            right += left
+            bottom += top
+            portals.append((left, top, right, bottom, left + EDGE_THRESHOLD - w, right - EDGE_THRESHOLD,
+                            top + EDGE_THRESHOLD - h, bottom - EDGE_THRESHOLD))
+        broadphase = game.broadphase
+        is_player = isinstance(body, Player)
+        has_springs = bool(game.springs)
+        # The broadphase only needs searching for springs, or crates in the player's way
+        search = has_springs or (is_player and bool(game.crates))
+        launchers = self.launcher_tiles() if is_player else ()
+        fall_y = game.camera.fall_limit()  # Paths end where the player would die
+        # Past the level's tiles and anything the camera shows (portals, bodies) a body
+        # only falls, or drifts away unless the input held brings it back
+        level = self.level_bounds()
+        drift = movement[0]
+        states = prediction.states
+        points = prediction.points
+        touching = prediction.touching
+        searched = prediction.cells
+        pos = ghost.pos
+        velocity = ghost.velocity
+        last_pos = ghost.last_pos
+
+        area = pygame.Rect(0, 0, 0, 0)
+        cells = None
+        springs = []
+        crates = []  # Crates in the player's way
+        colliders = ()
+        seen = {}  # body_state -> frame it was reached in
+        anchor = None  # (frame, period, (full ghost state, touching)) of a possible repeat
+        frame = 0
+        while frame < frames:
+            if search:
+                margin = 2 + int(abs(movement[0] + velocity[0]) + abs(velocity[1]))
+                area.update(pos[0] - margin, pos[1] - margin, w + 2 * margin, h + 2 * margin)
+                # Searched again only when the area reaches other broadphase cells
+                area_cells = broadphase.cell_range(area.x, area.y, area.w, area.h)
+                if area_cells != cells:
+                    cells = area_cells
+                    cx0, cy0, cx1, cy1 = cells
+                    searched.update((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1))
+                    near = broadphase.query(area, (Crate, Spring) if is_player else Spring)
+                    # Neither moves during the prediction: their rects are taken once, to
+                    # skip the ones out of the ghost's reach every frame
+                    springs = [other for other in near if isinstance(other, Spring)]
+                    spring_rects = [spring.rect() for spring in springs]
+                    crates = [other for other in near if isinstance(other, Crate) and other is not body]
+                    crate_rects = [crate.rect() for crate in crates]
+                    colliders = ()
+
+                # Springs launch what lands on them before it moves
+                in_reach = area.collidelistall(spring_rects) if springs else ()
+                if in_reach or touching:
+                    now_touching = set()
+                    for i in in_reach:
+                        spring = springs[i]
+                        launch_power = spring.contact(ghost)
+                        if launch_power is not None:
+                            now_touching.add(id(spring))
+                            if launch_power and id(spring) not in touching:
+                                spring.launch(ghost, launch_power)
+                    touching = now_touching
+
+            # Horizontal launchers push the player away from their center
+            if launchers:
+                x, y = int(pos[0]), int(pos[1])
+                for tx in range(x // tile_size, (x + w - 1) // tile_size + 1):
+                    for ty in range(y // tile_size, (y + h - 1) // tile_size + 1):
+                        if (tx, ty) in launchers:
+                            dx = x + w // 2 - (tx * tile_size + tile_size // 2)
+                            velocity[0] = LAUNCHER_SPEED if dx > 0 else -LAUNCHER_SPEED
+
+            # Bodies teleported last frame skip a frame
+            if ghost.teleported_this_frame:
+                ghost.teleported_this_frame = False
+            else:
+                if crates:
+                    # The player only meets crates landing on them (see PhysicsEntity.update):
+                    # the crates this frame's fall can reach (launches may have changed it)
+                    colliders = ()
+                    if movement[1] + velocity[1] > 0:
+                        margin = 2 + int(abs(movement[0] + velocity[0]) + velocity[1])
+                        area.update(pos[0] - margin, pos[1] - margin, w + 2 * margin, h + 2 * margin)
+                        colliders = [crates[i] for i in area.collidelistall(crate_rects)]
+                if is_player:
+                    ghost.update(tilemap, movement, additional_colliders=colliders)
+                else:
+                    ghost.update(tilemap)
+                may_exit = False
+                if linked:
+                    center_x = int(last_pos[0]) + w // 2
+                    center_y = int(last_pos[1]) + h // 2
+                    x, y = int(pos[0]), int(pos[1])
+                    for left, top, right, bottom, x_lo, x_hi, y_lo, y_hi in portals:
+                        if left <= center_x <= right and top <= center_y <= bottom and \
+                                not (x_lo < x < x_hi and y_lo < y < y_hi):
+                            may_exit = True
+                if may_exit:
+                    if teleport_pair(ghost, player_portal, cursor_portal, self.rects):
+                        ghost.teleported_this_frame = True
+                        prediction.teleports.append(len(points))
+                else:
+                    # Not inside a portal: no teleport, last_pos just catches up
+                    last_pos[0] = pos[0]
+                    last_pos[1] = pos[1]
+            points.append((pos[0] + w // 2, pos[1] + h // 2))
+            state = body_state(ghost)
+            if pos[1] > fall_y or (pos[1] >= level.bottom and velocity[1] >= 0) or \
+                    (pos[0] >= level.right and velocity[0] >= 0 and drift >= 0) or \
+                    (pos[0] + w <= level.left and velocity[0] <= 0 and drift <= 0):
+                states.append(state)
+                prediction.finished = True
+                break
+            states.append(state)
+            if anchor is not None:
+                if frame == anchor[0]:
+                    if (ghost.get_state(), touching) == anchor[2]:
+                        # The whole ghost state came back after `period` frames and the
+                        # scene is static, so the next frames repeat the last period:
+                        # copy whole periods instead of simulating them (the ghost ends
+                        # them in the state it is in now)
+                        period = anchor[1]
+                        repeats = (frames - frame - 1) // period
+                        start = len(points) - period
+                        teleports = [index for index in prediction.teleports if index >= start]
+                        for i in range(1, repeats + 1):
+                            prediction.teleports.extend(index + period * i for index in teleports)
+                        points.extend(points[start:] * repeats)
+                        states.extend(states[-period:] * repeats)
+                        frame += period * repeats
+                        seen = {}
+                    anchor = None
+            else:
+                earlier = seen.get(state)
+                if earlier is not None:
+                    # Back in an earlier state (a body resting on the ground bobs by a
+                    # fraction of a pixel): check the full state one period later
+                    anchor = (2 * frame - earlier, frame - earlier, (ghost.get_state(), touching))
+                seen[state] = frame
+            frame += 1
+
+        prediction.touching = touching
+        prediction.ghost_state = ghost.get_state()
+
+    def trajectories(self):
+        """
+        Predicted paths of the player (with the input held now) and of the crates in
+        a portal, as one list of segments.
+
+        Call it before render positions are interpolated (see Game.render): the
+        predictions start from the simulation state.
+        """
+        game = self.game
+        bodies = [] if game.dead else [game.player]
+        for portal in (game.player_portal, game.cursor_portal):
+            portal_rect = portal.get_rect()
+            for crate in game.broadphase.query(portal_rect, Crate):
+                if crate not in bodies and portal_rect.colliderect(crate.rect()):
+                    bodies.append(crate)
+        movement = (game.movement[1] - game.movement[0], 0)
+        segments = []
+        for body in bodies:
+            segments.extend(self.predict(body, movement if body is game.player else (0, 0)))
+        return segments
+
+    def render(self, surf, segments, offset=(0, 0)):
+        """Draw path segments (from trajectories) as lines."""
+        for segment in segments:
+            if len(segment) > 1:
+                draw_lines(surf, PATH_COLOR, False, [(x - offset[0], y - offset[1]) for x, y in segment])
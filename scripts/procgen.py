@@ -0,0 +1,295 @@
+"""
+Offline procedural level generator.
+
+Builds levels locally, without the network, in the same format Tilemap.load
+reads. A level is a bordered 34x24 room split into a row of rooms, and each
+room is filled by a template (gap, ledge, spring shaft, spike pit, crate
+step, noportalzone band...). Templates only write through LevelBuilder, so
+they compose freely; the key goes in one room and the door in the last one.
+The result goes through scripts/validation.py, which also autotiles it, and
+scripts/reachability.py, which checks it can be finished and rates it.
+
+Generation is seeded and deterministic, so candidates can be produced in
+bulk across a process pool and reproduced later from their seed.
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.reachability import analyze_level
+from scripts.validation import validate_level, door_pos_on_floor, key_pos_at, MAP_WIDTH, MAP_HEIGHT, TILE_SIZE
+
+FLOOR_Y = 21  # Top row of the default floor (rows 21-23 are ground)
+MIN_ROOM_WIDTH = 5
+
+DIFFICULTY_ROOMS = {
+    'easy': (2, 3),
+    'medium': (3, 4),
+    'hard': (4, 5),
+}
+
+
+class LevelBuilder:
+    def __init__(self, width=MAP_WIDTH, height=MAP_HEIGHT):
+        self.width = width
+        self.height = height
+        self.tilemap = {}
+        self.offgrid = []
+        self.floor = [FLOOR_Y] * width  # Top solid row of each column (height = no floor)
+        self.ledges = []  # (x0, x1, y) cells that can hold the key
+
+    def set(self, x, y, tile_type, **extra):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            tile = {'type': tile_type, 'variant': 0, 'pos': [x, y]}
+            tile.update(extra)
+            self.tilemap[str(x) + ';' + str(y)] = tile
+
+    def clear(self, x, y):
+        self.tilemap.pop(str(x) + ';' + str(y), None)
+
+    def get(self, x, y):
+        return self.tilemap.get(str(x) + ';' + str(y))
+
+    def fill(self, x0, y0, x1, y1, tile_type, **extra):
+        """Fill the inclusive tile rectangle (x0, y0)-(x1, y1)."""
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                self.set(x, y, tile_type, **extra)
+
+    def column_floor(self, x, top, tile_type='grass'):
+        """Make column x solid from row `top` down to the bottom of the map."""
+        for y in range(FLOOR_Y, self.height):
+            self.clear(x, y)
+        self.fill(x, top, x, self.height - 1, tile_type)
+        self.floor[x] = top
+
+    def pit(self, x):
+        """Remove the floor of column x (falling in is fatal)."""
+        for y in range(FLOOR_Y, self.height):
+            self.clear(x, y)
+        self.floor[x] = self.height
+
+    def spawner(self, variant, x, y):
+        self.offgrid.append({'type': 'spawners', 'variant': variant, 'pos': [x * TILE_SIZE, y * TILE_SIZE]})
+
+    def level(self):
+        return {'tilemap': self.tilemap, 'tile_size': TILE_SIZE, 'offgrid': self.offgrid}
+
+
+# -----------------------------
+# Room templates
+# Each template fills columns x0..x1 (inclusive) of the builder.
+# -----------------------------
+def room_flat(builder, x0, x1, rng):
+    top = FLOOR_Y - rng.randint(0, 2)
+    for x in range(x0, x1 + 1):
+        builder.column_floor(x, top)
+
+
+def room_gap(builder, x0, x1, rng):
+    """A pit too wide to jump; the player has to portal across."""
+    room_flat(builder, x0, x1, rng)
+    width = min(x1 - x0 - 1, rng.randint(5, 7))
+    start = x0 + (x1 - x0 + 1 - width) // 2
+    for x in range(start, start + width):
+        builder.pit(x)
+    if rng.random() < 0.5:
+        # Spiked bottom instead of an open pit
+        for x in range(start, start + width):
+            builder.set(x, builder.height - 1, 'stone')
+            builder.set(x, builder.height - 2, 'spikes', rotation=0)
+
+
+def room_ledge(builder, x0, x1, rng):
+    """A high platform that cannot be reached by jumping."""
+    room_flat(builder, x0, x1, rng)
+    floor_top = builder.floor[x0]
+    width = min(x1 - x0 + 1, rng.randint(3, 6))
+    start = rng.randint(x0, x1 - width + 1)
+    y = floor_top - rng.randint(5, 8)
+    builder.fill(start, y, start + width - 1, y, 'stone')
+    builder.ledges.append((start, start + width - 1, y - 1))
+
+
+def room_spring(builder, x0, x1, rng):
+    """A ledge with a spring underneath it."""
+    room_ledge(builder, x0, x1, rng)
+    start, end, _ = builder.ledges[-1]
+    x = start - 1 if start - 1 >= x0 else end + 1
+    if x <= x1:
+        builder.spawner(3, x, builder.floor[x] - 1)
+
+
+def room_spike_pit(builder, x0, x1, rng):
+    """Floor spikes with spikes on the ceiling and walls of a low tunnel."""
+    room_flat(builder, x0, x1, rng)
+    floor_top = builder.floor[x0]
+    width = min(x1 - x0 - 1, rng.randint(2, 4))
+    start = x0 + (x1 - x0 + 1 - width) // 2
+    for x in range(start, start + width):
+        builder.set(x, floor_top - 1, 'spikes', rotation=0)
+    if rng.random() < 0.5:
+        ceiling = floor_top - rng.randint(5, 6)
+        builder.fill(start - 1, ceiling, start + width, ceiling, 'stone')
+        for x in range(start, start + width):
+            builder.set(x, ceiling + 1, 'spikes', rotation=180)
+    if rng.random() < 0.5:
+        # Wall spikes on a pillar at the edge of the room
+        wall_x = x1
+        builder.fill(wall_x, floor_top - 4, wall_x, floor_top - 1, 'stone')
+        builder.set(wall_x - 1, floor_top - 3, 'spikes', rotation=270)
+
+
+def room_crate(builder, x0, x1, rng):
+    """A step up with crates to push around."""
+    room_flat(builder, x0, x1, rng)
+    step = rng.randint(x0 + 2, x1)
+    top = builder.floor[x0] - rng.randint(2, 4)
+    for x in range(step, x1 + 1):
+        builder.column_floor(x, top)
+    for _ in range(rng.randint(1, 2)):
+        x = rng.randint(x0, max(x0, step - 2))
+        builder.spawner(1, x, builder.floor[x] - 1)
+
+
+def room_noportal(builder, x0, x1, rng):
+    """A band of noportalzone tiles limiting where the cursor portal can go."""
+    template = rng.choice((room_gap, room_ledge, room_flat))
+    template(builder, x0, x1, rng)
+    band_width = rng.randint(2, max(2, (x1 - x0 + 1) // 2))
+    start = rng.randint(x0, x1 - band_width + 1)
+    if rng.random() < 0.5:
+        # Vertical band
+        for x in range(start, start + band_width):
+            for y in range(1, builder.height):
+                if builder.get(x, y) is None:
+                    builder.set(x, y, 'noportalzone')
+    else:
+        # Horizontal band across the room
+        y0 = rng.randint(2, 8)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y0 + rng.randint(2, 3)):
+                if builder.get(x, y) is None:
+                    builder.set(x, y, 'noportalzone')
+
+
+ROOM_TEMPLATES = [room_gap, room_ledge, room_spring, room_spike_pit, room_crate, room_noportal]
+
+
+def generate_level(seed, difficulty='medium'):
+    """
+    Generate one level.
+
+    Args:
+        seed: Random seed (the same seed always gives the same level)
+        difficulty: "easy", "medium", or "hard"
+
+    Returns:
+        dict: The validated level ({'tilemap', 'tile_size', 'offgrid', 'validation'})
+    """
+    rng = random.Random(seed)
+    builder = LevelBuilder()
+
+    # Borders: stone walls and ceiling, grass floor
+    builder.fill(0, 0, 0, builder.height - 1, 'stone')
+    builder.fill(builder.width - 1, 0, builder.width - 1, builder.height - 1, 'stone')
+    builder.fill(0, 0, builder.width - 1, 0, 'stone')
+    for x in range(1, builder.width - 1):
+        builder.column_floor(x, FLOOR_Y)
+
+    # Split the interior into rooms: a flat start room, then templated rooms
+    low, high = DIFFICULTY_ROOMS.get(difficulty, DIFFICULTY_ROOMS['medium'])
+    room_count = rng.randint(low, high)
+    start_width = 5
+    widths = [MIN_ROOM_WIDTH] * room_count
+    for _ in range(builder.width - 2 - start_width - MIN_ROOM_WIDTH * room_count):
+        widths[rng.randrange(room_count)] += 1
+    rooms = []
+    x = 1 + start_width
+    for width in widths:
+        rooms.append((x, x + width - 1))
+        x += width
+
+    room_flat(builder, 1, start_width, rng)
+    room_names = []
+    for x0, x1 in rooms:
+        template = rng.choice(ROOM_TEMPLATES)
+        template(builder, x0, x1, rng)
+        room_names.append(template.__name__[5:])
+
+    # Player spawn in the start room
+    spawn_x = rng.randint(1, start_width - 1)
+    builder.set(spawn_x, builder.floor[spawn_x] - 1, 'spawners')
+
+    # Key on a ledge when there is one, otherwise above the floor of a middle room
+    if builder.ledges:
+        kx0, kx1, ky = rng.choice(builder.ledges)
+        key_cell = (rng.randint(kx0, kx1), ky)
+    else:
+        x0, x1 = rooms[len(rooms) // 2]
+        kx = rng.randint(x0, x1)
+        key_cell = (kx, min(builder.floor[kx], FLOOR_Y) - 2)
+    builder.offgrid.append({'type': 'key', 'variant': 0, 'pos': key_pos_at(*key_cell)})
+
+    # Door on solid floor in the last room
+    x0, x1 = rooms[-1]
+    door_columns = [x for x in range(x0, x1 + 1) if builder.floor[x] < builder.height
+                    and builder.get(x, builder.floor[x] - 1) is None]
+    door_x = door_columns[-1] if door_columns else x1
+    if not door_columns:
+        builder.column_floor(door_x, FLOOR_Y)
+    builder.offgrid.append({'type': 'door', 'variant': 0, 'pos': door_pos_on_floor(door_x, builder.floor[door_x] - 1)})
+
+    level, report = validate_level(builder.level())
+    report['generator'] = {'backend': 'procedural', 'seed': seed, 'difficulty': difficulty, 'rooms': room_names}
+    report['reachability'] = analyze_level(level)
+    return level
+
+
+def _generate_seeded(args):
+    seed, difficulty = args
+    return generate_level(seed, difficulty)
+
+
+def iter_candidates(count, difficulty='medium', seed=0, processes=None, chunksize=64, solvable_only=True):
+    """
+    Generate `count` candidate levels across a process pool.
+
+    Yields levels in seed order (seed, seed + 1, ...) as they are produced. Levels
+    the reachability analysis cannot finish are skipped unless solvable_only is False.
+    """
+    jobs = [(seed + i, difficulty) for i in range(count)]
+    if processes == 1:
+        for job in jobs:
+            level = _generate_seeded(job)
+            if not solvable_only or level['validation']['reachability']['solvable']:
+                yield level
+        return
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for level in pool.map(_generate_seeded, jobs, chunksize=chunksize):
+            if not solvable_only or level['validation']['reachability']['solvable']:
+                yield level
+
+
+def generate_candidates(count, difficulty='medium', seed=0, processes=None, solvable_only=True):
+    """Generate `count` candidate levels across a process pool and return them as a list."""
+    return list(iter_candidates(count, difficulty, seed, processes, solvable_only=solvable_only))
+
+
+def random_seed():
+    return int.from_bytes(os.urandom(4), 'little')
+
+
+def pick_level(candidates, difficulty=None):
+    """
+    Pick the best candidate: solvable, rated at the requested difficulty, no validation
+    repairs, then the most distinct room templates.
+    """
+    def score(level):
+        report = level['validation']
+        reachability = report.get('reachability', {})
+        return (reachability.get('solvable', True),
+                difficulty is None or reachability.get('difficulty') == difficulty,
+                not report['repairs'],
+                len(set(report['generator']['rooms'])))
+    return max(candidates, key=score)
@@ -0,0 +1,229 @@
+"""
+Allocation profiling for the simulation step.
+
+Game.update is meant to run with few new Python objects once a level has
+settled: entities keep their state in __slots__ and update it in place, and
+the collision code reuses scratch rects (see scripts/entities.py). Anything that
+does allocate per frame feeds the garbage collector, whose gen-0 collections
+then show up as frame-time spikes. allocation_report measures a run of
+steady-state frames:
+- allocations per frame: small-object memory blocks allocated during the frame,
+  including the ones freed again before it ends (see count_allocations)
+- objects per frame: GC-tracked objects still alive after the frame (what
+  counts towards the next collection; objects freed in the same frame do not)
+- blocks per frame: small-object memory blocks still allocated after the frame
+- peak bytes per frame: how far the frame's temporaries (rects, tuples, NumPy
+  scratch arrays) push traced memory above where the frame started
+- collections: garbage collections triggered by the run
+
+Only the first counts per-frame garbage: temporaries freed within the frame
+never reach the net counts, and pygame.Rect is not GC-tracked at all.
+
+Rewind recording is left out: it keeps one state per frame by design.
+
+Usage:
+    python -m scripts.profiling data/maps/level1.json [more levels...]
+Exits with status 1 if a level allocates more than MAX_ALLOCATIONS_PER_FRAME
+or MAX_OBJECTS_PER_FRAME (tests/test_profiling.py checks the shipped levels).
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+WARMUP_FRAMES = 120  # Lets falling crates land and bodies fall asleep first
+# Under one object per frame, gen-0 collections (every 700 net objects by default)
+# come less than once every ~12 seconds at 60 fps
+MAX_OBJECTS_PER_FRAME = 1.0
+# Blocks allocated per frame, freed or not (the shipped levels take 5-35)
+MAX_ALLOCATIONS_PER_FRAME = 40.0
+
+# Code flags of generators and coroutines, whose frames outlive a call
+CO_RESUMABLE = 0x20 | 0x80 | 0x200
+MAX_TRACED_CALLS = 100000
+
+
+class AllocationCounter:
+    """
+    Counts the small-object blocks a function allocates, including the ones it
+    frees again before returning.
+
+    sys.getallocatedblocks() is sampled before every bytecode instruction (with
+    sys.settrace), and every rise between two samples is an allocation. An object
+    that lives across at least one instruction is counted, which covers the
+    temporaries Python code makes; allocations a single C call makes and frees
+    internally are not.
+
+    Tracing materialises a frame object per call; those are kept alive until the
+    call being measured returns, and their cost is calibrated away on a function
+    that allocates nothing.
+    """
+
+    def __init__(self):
+        self.frames = [None] * MAX_TRACED_CALLS
+        self.allocated = 0
+        self.calls = 0
+        self.last = 0
+        self.per_call = 0.0
+        self.overhead = 0.0
+        self.calibrate()
+
+    def trace(self, frame, event, arg):
+        blocks = sys.getallocatedblocks()
+        if blocks > self.last:
+            self.allocated += blocks - self.last
+        if event == 'call':
+            frame.f_trace_opcodes = True
+            if not frame.f_code.co_flags & CO_RESUMABLE and self.calls < MAX_TRACED_CALLS:
+                self.frames[self.calls] = frame
+                self.calls += 1
+        self.last = sys.getallocatedblocks()
+        return self.trace
+
+    def raw(self, function, *args):
+        """Blocks seen allocated and calls made by one call of function, before calibration."""
+        previous = sys.gettrace()
+        enabled = gc.isenabled()
+        gc.disable()
+        self.allocated = self.calls = 0
+        self.last = sys.getallocatedblocks()
+        sys.settrace(self.trace)
+        try:
+            function(*args)
+        finally:
+            sys.settrace(previous)
+            calls = self.calls
+            for i in range(calls):
+                self.frames[i] = None
+            if enabled:
+                gc.enable()
+        return self.allocated, calls
+
+    def calibrate(self, runs=50):
+        """Measure the tracing cost: per traced call, and per measurement."""
+        for _ in range(runs):
+            self.raw(_no_allocations, 0)
+        samples = {}
+        for depth in (0, 4):
+            blocks = calls = 0
+            for _ in range(runs):
+                run_blocks, run_calls = self.raw(_no_allocations, depth)
+                blocks += run_blocks
+                calls += run_calls
+            samples[depth] = (blocks / runs, calls / runs)
+        (blocks0, calls0), (blocks4, calls4) = samples[0], samples[4]
+        self.per_call = (blocks4 - blocks0) / (calls4 - calls0)
+        self.overhead = blocks0 - self.per_call * calls0
+
+    def count(self, function, *args):
+        """Blocks allocated by one call of function(*args), freed or not."""
+        blocks, calls = self.raw(function, *args)
+        return max(0.0, blocks - self.overhead - self.per_call * calls)
+
+
+def _no_allocations(depth):
+    """Calibration target: `depth` nested calls and nothing allocated."""
+    if depth:
+        _no_allocations(depth - 1)
+
+
+def count_allocations(game, frames=60):
+    """
+    Blocks allocated per steady-state frame of a game, freed within the frame or
+    not (see AllocationCounter). Frames run much slower while counted.
+
+    Returns:
+        float: Mean allocations per frame
+    """
+    counter = AllocationCounter()
+    total = 0.0
+    for _ in range(frames):
+        total += counter.count(game.update)
+    return total / frames
+
+
+def allocation_report(game, frames=600, warmup=WARMUP_FRAMES):
+    """
+    Measure what steady-state frames of a game allocate.
+
+    The game keeps its current input (game.movement, game.mouse_pos) for the
+    whole run, so a walking player and an idle one can be measured separately.
+
+    Args:
+        game: Game with a level loaded (headless is fine)
+        frames: Frames measured for each statistic
+        warmup: Frames run before measuring
+
+    Returns:
+        dict: allocations_per_frame, objects_per_frame, blocks_per_frame,
+              peak_bytes_per_frame, collections, frames
+    """
+    for _ in range(warmup):
+        game.update()
+
+    allocations = count_allocations(game, min(frames, 60))
+
+    # Net allocations, with the collector off so they are not collected away
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        objects = gc.get_count()[0]
+        blocks = sys.getallocatedblocks()
+        for _ in range(frames):
+            game.update()
+        objects = gc.get_count()[0] - objects
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        if enabled:
+            gc.enable()
+
+    # Collections the same frames trigger with the collector on
+    gc.collect()
+    collections = sum(stats['collections'] for stats in gc.get_stats())
+    for _ in range(frames):
+        game.update()
+    collections = sum(stats['collections'] for stats in gc.get_stats()) - collections
+
+    # Temporaries: traced memory above the frame's starting point
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            game.update()
+            peak += tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'frames': frames,
+        'allocations_per_frame': allocations,
+        'objects_per_frame': objects / frames,
+        'blocks_per_frame': blocks / frames,
+        'peak_bytes_per_frame': peak / frames,
+        'collections': collections,
+    }
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    from game import Game
+
+    failed = False
+    for path in sys.argv[1:]:
+        game = Game(path, headless=True)
+        print(path)
+        for label, movement in (('idle', [False, False]), ('walking', [False, True])):
+            game.movement = movement
+            report = allocation_report(game)
+            print(f"  {label}: {report['allocations_per_frame']:.1f} allocations/frame, "
+                  f"{report['objects_per_frame']:.2f} objects/frame, "
+                  f"{report['blocks_per_frame']:.2f} blocks/frame, "
+                  f"{report['peak_bytes_per_frame']:.0f} peak bytes/frame, "
+                  f"{report['collections']} collections in {report['frames']} frames")
+            failed = failed or report['objects_per_frame'] > MAX_OBJECTS_PER_FRAME or \
+                report['allocations_per_frame'] > MAX_ALLOCATIONS_PER_FRAME
+    sys.exit(1 if failed else 0)
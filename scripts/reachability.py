@@ -0,0 +1,843 @@
+"""
+Static reachability analysis for levels.
+
+Instead of simulating the game frame by frame, the level is turned into a
+graph over tile cells and searched:
+- ground nodes are empty cells with solid ground (or a crate) directly below
+- air nodes are cells the player falls from (walking off a ledge, leaving a portal)
+- wall nodes are cells where the player is sliding down a wall
+- spring / launcher nodes are springs and spring_horizontal tiles the player touched
+
+Edges come from arcs precomputed once with the same constants as Player.jump
+and PhysicsEntity.update (walk, jump, fall, wall jump, spring bounce,
+horizontal launch), and from portal hops. Portal destinations only depend on
+where the cursor portal can be locked (not over a solid tile, not overlapping
+a noportalzone, not fully inside solid tiles), so every node the player can
+leave its own portal from links to shared hub nodes: one for walking out,
+and one per exit speed for falling, jumping or being launched through the
+portal, since portals keep (red) or turn (white) the player's momentum.
+
+The grid covers the level's tile extent (at least one screen), and the cursor
+portal can go anywhere the camera can show. Arcs are made once per grid shape
+(arc_templates) and replayed over flat byte grids of per-cell flags, one lookup
+per step (box_flags); arcs from many cells at once (the portal hubs and air
+cells) find where they stop in one NumPy pass (first_stops). Nodes are plain
+ints and route counts are packed into one int. A shipped level takes 7-20 ms
+to analyse; what is left is resolving where each of a few thousand arcs ends
+and the search itself, in Python. Callers therefore analyse once (at
+generation time, or when a level is selected) and keep the report rather than
+calling this from a per-frame path. The analysis is approximate:
+crates are static one-way platforms where they come to rest, springs never
+move, spikes fill their whole tile and buttons are ignored.
+"""
+import heapq
+import math
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+import pygame
+
+from scripts.entities import GRAVITY, MAX_FALL_SPEED, PLAYER_FRICTION, JUMP_VELOCITY, WALL_JUMP_VELOCITY
+from scripts.tilemap import PHYSICS_TILES
+from scripts.camera import CAMERA_BORDER
+
+# Smallest map, in tiles: one 540x380 screen (the camera never shows less, see
+# Camera.set_bounds); larger levels get a grid the size of their tile extent
+MAP_WIDTH = 34
+MAP_HEIGHT = 24
+TILE_SIZE = 16
+
+PLAYER_SIZE = (8, 15)  # Matches the Player created in Game.__init__
+WALK_SPEED = 1
+SPRING_HIGH_BOUNCE = 6.0  # Spring.MAX_BOUNCE_POWER (the base bounce equals a normal jump)
+LAUNCH_SPEED = 6.5  # spring_horizontal launch power in Game.run
+PORTAL_SIZE = 64
+PORTAL_INSIDE_OFFSET = 4  # Portal.teleport_entity places entities 4px inside the exit portal
+JUMP_REACH = 4  # Furthest column offset a jump template aims for
+
+# Momentum portal hops: (edge of the cursor portal the player comes out at, direction
+# of travel, speed, what the player must be doing when leaving its own portal).
+# Red portals keep the direction, white portals turn it (see Portal.teleport_entity):
+# - falling out of the bottom (white) or moving left out of the side (red) -> right edge, moving left
+# - rising out of the top (white) or moving right out of the side (red) -> left edge, moving right
+# - rising out of the top (red) or moving right out of the side (white) -> bottom edge, moving up
+MOMENTUM_HUBS = (
+    ('right', (-1, 0), 2.5, ('fall', 'side')),
+    ('right', (-1, 0), 5.0, ('fall', 'side')),
+    ('right', (-1, 0), 7.5, ('fall', 'side')),
+    ('left', (1, 0), 2.0, ('rise', 'side')),
+    ('left', (1, 0), 5.0, ('rise', 'side')),
+    ('bottom', (0, -1), 5.0, ('rise', 'side')),
+    ('bottom', (0, -1), 6.0, ('side',)),
+)
+
+# Cell flags
+SOLID = 1
+DEADLY = 2  # Spikes, and the padding around the map (falling out of the level)
+SPRING = 4
+LAUNCHER = 8
+PLATFORM = 16  # Crates: only block the player from above
+KEY = 32
+GOAL = 64
+STOPS = SOLID | DEADLY | SPRING | LAUNCHER | PLATFORM
+MARKS = KEY | GOAL
+LANDS_ON_KEY = 128  # Edge flag only (see ReachabilityAnalyzer.edges): the edge ends on a key cell
+
+# Padding around the map in the flat grid (arcs never step more than one cell per frame)
+PAD_X = 2
+PAD_TOP = 14  # Open sky above the map, high enough for a full spring bounce
+PAD_BOTTOM = 2
+
+# Node kinds (a node is kind * grid size + cell index)
+GROUND = 0
+AIR = 1
+WALL_LEFT = 2
+WALL_RIGHT = 3
+SPRING_NODE = 4
+LAUNCH_LEFT = 5
+LAUNCH_RIGHT = 6
+HUB_WALK = 7
+HUB_MOMENTUM = 8  # + index into MOMENTUM_HUBS
+
+# Edge costs, in hundredths of a portal hop. They are also the difficulty score
+# (see rate_difficulty), so the search finds the easiest route; jumps only break ties
+COST_PORTAL = 100
+COST_MOMENTUM = 100  # Extra cost of carrying speed through a portal (timing the lock)
+COST_WALL_JUMP = 50
+COST_SPRING = 50
+COST_JUMP = 1
+
+# Difficulty labels by score in portal hops (upper bounds); checked against the shipped
+# levels: level2 scores 1 (one portal), level5-7 2, level3-4 3 (momentum hops),
+# level1 4 (two portals and a four wall jump chimney), level8 5 (six wall jumps)
+DIFFICULTY_LABELS = ((2, 'easy'), (4, 'medium'))
+ANALYSIS_VERSION = 2  # Stored in reports; saved reports of other versions are re-analysed
+
+# Route counts (portal hops, momentum hops, wall jumps, spring bounces, jumps), packed
+# into one int of COUNT_BITS per count, first count highest: adding packed counts adds
+# each count, and comparing them compares the tuples
+COUNT_BITS = 16
+
+
+def pack_counts(counts):
+    packed = 0
+    for count in counts:
+        packed = (packed << COUNT_BITS) + count
+    return packed
+
+
+def unpack_counts(packed):
+    mask = (1 << COUNT_BITS) - 1
+    return tuple((packed >> (COUNT_BITS * shift)) & mask for shift in range(4, -1, -1))
+
+
+NO_COUNTS = pack_counts((0, 0, 0, 0, 0))
+PORTAL_COUNTS = pack_counts((1, 0, 0, 0, 0))
+MOMENTUM_COUNTS = pack_counts((1, 1, 0, 0, 0))
+WALL_JUMP_COUNTS = pack_counts((0, 0, 1, 0, 0))
+SPRING_COUNTS = pack_counts((0, 0, 0, 1, 0))
+JUMP_COUNTS = pack_counts((0, 0, 0, 0, 1))
+
+
+def level_extent(map_data):
+    """
+    Tile rect around every grid and offgrid tile (each offgrid tile counted as one tile
+    in size, as in Tilemap.extent), or an empty rect at (0, 0) for an empty map.
+    """
+    tile_size = map_data.get('tile_size', TILE_SIZE)
+    xs = [int(tile['pos'][0]) for tile in map_data['tilemap'].values()]
+    ys = [int(tile['pos'][1]) for tile in map_data['tilemap'].values()]
+    for tile in map_data['offgrid']:
+        # Off the tile grid, an offgrid tile reaches into the next tile
+        xs += [int(tile['pos'][0] // tile_size), math.ceil(tile['pos'][0] / tile_size)]
+        ys += [int(tile['pos'][1] // tile_size), math.ceil(tile['pos'][1] / tile_size)]
+    if not xs:
+        return pygame.Rect(0, 0, 0, 0)
+    return pygame.Rect(min(xs), min(ys), max(xs) + 1 - min(xs), max(ys) + 1 - min(ys))
+
+
+def view_extent(extent):
+    """
+    Tiles the camera can show for a level's tile extent (see Camera.set_bounds): the
+    extent less CAMERA_BORDER, and at least one screen from (0, 0).
+    """
+    border = CAMERA_BORDER // TILE_SIZE
+    screen = pygame.Rect(0, 0, MAP_WIDTH, MAP_HEIGHT)
+    inner = extent.inflate(-2 * border, -2 * border)
+    return screen.union(inner) if inner.width > 0 and inner.height > 0 else screen
+
+
+class TileGrid:
+    def __init__(self, width=MAP_WIDTH, height=MAP_HEIGHT, left=0, top=0, view=None):
+        """
+        Array-backed grid of cell flags with DEADLY padding around the sides and bottom.
+        Cells are addressed by level tile (x, y) throughout.
+
+        Args:
+            width: Map width in tiles
+            height: Map height in tiles
+            left: Tile x of the map's left column
+            top: Tile y of the map's top row
+            view: Tile rect the cursor can point at (defaults to the whole map)
+        """
+        self.width = width
+        self.height = height
+        self.left = left
+        self.top = top
+        self.view = pygame.Rect(left, top, width, height).clip(view if view is not None else (left, top, width, height))
+        self.stride = width + 2 * PAD_X
+        self.cells = bytearray(self.stride * (height + PAD_TOP + PAD_BOTTOM))
+        self.noportal = bytearray(width * height)  # By (y - top) * width + x - left
+        self.spawn = None  # Player spawn (pixel top-left)
+        for y in range(-PAD_TOP, height + PAD_BOTTOM):
+            for x in range(-PAD_X, width + PAD_X):
+                if y >= height or x < 0 or x >= width:
+                    self.cells[(y + PAD_TOP) * self.stride + x + PAD_X] = DEADLY
+
+    def index(self, x, y):
+        return (y - self.top + PAD_TOP) * self.stride + x - self.left + PAD_X
+
+    def in_bounds(self, x, y):
+        return self.left <= x < self.left + self.width and self.top <= y < self.top + self.height
+
+    def get(self, x, y):
+        if self.left - PAD_X <= x < self.left + self.width + PAD_X and \
+                self.top - PAD_TOP <= y < self.top + self.height + PAD_BOTTOM:
+            return self.cells[self.index(x, y)]
+        return DEADLY
+
+    def mark(self, x, y, flag):
+        if self.in_bounds(x, y):
+            self.cells[self.index(x, y)] |= flag
+
+    def settle(self, x, y):
+        """Row an entity spawned at (x, y) comes to rest on."""
+        while y < self.top + self.height - 1 and not self.get(x, y + 1) & (SOLID | DEADLY | PLATFORM):
+            y += 1
+        return y
+
+    @classmethod
+    def from_level(cls, map_data):
+        """Build the grid from level data ({'tilemap', 'offgrid'})."""
+        tile_size = map_data.get('tile_size', TILE_SIZE)
+        # The level's tiles and at least one screen, so no tile is left out
+        extent = level_extent(map_data)
+        area = extent.union((0, 0, MAP_WIDTH, MAP_HEIGHT)) if extent.width else pygame.Rect(0, 0, MAP_WIDTH, MAP_HEIGHT)
+        grid = cls(area.width, area.height, area.left, area.top, view_extent(extent))
+        for tile in map_data['tilemap'].values():
+            x, y = int(tile['pos'][0]), int(tile['pos'][1])
+            if tile['type'] in PHYSICS_TILES:
+                grid.mark(x, y, SOLID)
+            elif tile['type'] == 'spikes':
+                grid.mark(x, y, DEADLY)
+            elif tile['type'] in ('spring_horizontal', 'red_box'):
+                grid.mark(x, y, LAUNCHER)
+            elif tile['type'] == 'noportalzone':
+                grid.noportal[(y - grid.top) * grid.width + x - grid.left] = 1
+            elif tile['type'] == 'key':
+                # The player is two cells tall, so it also reaches the key from below
+                grid.mark(x, y, KEY)
+                grid.mark(x, y + 1, KEY)
+            elif tile['type'] == 'door':
+                # Drawn 32px tall, centered on the tile
+                grid.mark(x, y, GOAL)
+                grid.mark(x, y - 1, GOAL)
+
+        # Spawners are stored on the grid (tile coordinates) or offgrid (pixels)
+        spawners = [(tile['variant'], int(tile['pos'][0]) * tile_size, int(tile['pos'][1]) * tile_size)
+                    for tile in map_data['tilemap'].values() if tile['type'] == 'spawners']
+        spawners += [(tile['variant'], tile['pos'][0], tile['pos'][1])
+                     for tile in map_data['offgrid'] if tile['type'] == 'spawners']
+        # Crates first, so springs and crates can rest on top of them
+        for variant, px, py in spawners:
+            cx, cy = int(px + 8) // tile_size, int(py + 8) // tile_size
+            if variant == 0 and grid.spawn is None:
+                grid.spawn = (px, py)
+            elif variant == 1:
+                grid.mark(cx, grid.settle(cx, cy), PLATFORM)
+        for variant, px, py in spawners:
+            cx, cy = int(px + 8) // tile_size, int(py + 8) // tile_size
+            if variant == 3:
+                grid.mark(cx, grid.settle(cx, cy), SPRING)
+            elif variant == 7:
+                # Exit door (16x32)
+                grid.mark(cx, cy, GOAL)
+                grid.mark(cx, cy + 1, GOAL)
+
+        for tile in map_data['offgrid']:
+            if tile['type'] == 'key':
+                # Sprite top-left of a 48x48 key centered on its tile
+                x, y = int(tile['pos'][0] + 24) // tile_size, int(tile['pos'][1] + 24) // tile_size
+                grid.mark(x, y, KEY)
+                grid.mark(x, y + 1, KEY)
+            elif tile['type'] == 'door':
+                # Sprite top-left of a 17x32 door
+                x = int(tile['pos'][0] + 8) // tile_size
+                for y in range(int(tile['pos'][1]) // tile_size, int(tile['pos'][1] + 31) // tile_size + 1):
+                    grid.mark(x, y, GOAL)
+        return grid
+
+
+# -----------------------------
+# Arc templates
+# -----------------------------
+def _cell_span(lo, size):
+    return int(lo // TILE_SIZE), int((lo + size - 0.001) // TILE_SIZE)
+
+
+def _template(stride, size, vx, vy, target=None, hold=0):
+    """
+    Precompute one arc as the sequence of cell rectangles the player's box passes through.
+
+    The player starts centered in cell (0, 0) with its feet on the bottom of the cell.
+    Each frame mirrors PhysicsEntity.update / Player.update without collisions: the
+    input (walk toward `target` column, or hold direction `hold`) is added to the
+    velocity, then gravity and friction are applied.
+
+    Args:
+        stride, size: Row length and cell count of the grid (see box_flags)
+
+    Returns:
+        tuple: Steps of (offset, (col_lo, col_hi, row_lo, row_hi, feet_col, dir_x, falling))
+               where offset is the flat offset into box_flags of the (at most 2x2) covered cells
+    """
+    rows = size // stride - PAD_TOP - PAD_BOTTOM
+    width, height = PLAYER_SIZE
+    x = (TILE_SIZE - width) / 2
+    y = TILE_SIZE - height
+    target_x = None if target is None else target * TILE_SIZE + (TILE_SIZE - width) / 2
+    steps = []
+    last = None
+    for _ in range(600):
+        if target_x is not None:
+            move = WALK_SPEED if target_x - x >= 1 else -WALK_SPEED if target_x - x <= -1 else 0
+        else:
+            move = hold * WALK_SPEED
+        dx = move + vx
+        x += dx
+        y += vy
+        falling = vy > 0
+        vy = min(MAX_FALL_SPEED, vy + GRAVITY)
+        vx = max(vx - PLAYER_FRICTION, 0) if vx > 0 else min(vx + PLAYER_FRICTION, 0)
+
+        c0, c1 = _cell_span(x, width)
+        r0, r1 = _cell_span(y, height)
+        if (c0, c1, r0, r1) != last:
+            # The player box covers at most 2x2 cells: one lookup in the box_flags block of its shape
+            shape = (c1 > c0) + 2 * (r1 > r0)
+            dir_x = (dx > 0) - (dx < 0)
+            steps.append((shape * size + r0 * stride + c0, (c0, c1, r0, r1, int((x + width / 2) // TILE_SIZE), dir_x, falling)))
+            last = (c0, c1, r0, r1)
+        if r0 > rows + PAD_BOTTOM:
+            break
+    return tuple(steps)
+
+
+def _aimed(stride, size, vx, vy):
+    """Arcs steering toward each column within JUMP_REACH."""
+    return [_template(stride, size, vx, vy, target=dx) for dx in range(-JUMP_REACH, JUMP_REACH + 1)]
+
+
+def _held(stride, size, vx, vy):
+    """Arcs holding left, nothing, or right."""
+    return [_template(stride, size, vx, vy, hold=hold) for hold in (-1, 0, 1)]
+
+
+@lru_cache(maxsize=None)
+def arc_templates(stride, size):
+    """
+    Every arc the search replays, for grids of this shape (made once per shape).
+
+    Returns:
+        dict: 'jump', 'bounce', 'steer', a node kind (wall and launch nodes) or
+              HUB_MOMENTUM + n (momentum hubs) -> list of templates
+    """
+    templates = {
+        'jump': _aimed(stride, size, 0, JUMP_VELOCITY),
+        'bounce': _aimed(stride, size, 0, -SPRING_HIGH_BOUNCE),
+        'steer': [_template(stride, size, 0, 0, hold=hold) for hold in (-1, 1)],
+        WALL_LEFT: _aimed(stride, size, WALL_JUMP_VELOCITY[0], WALL_JUMP_VELOCITY[1]),
+        WALL_RIGHT: _aimed(stride, size, -WALL_JUMP_VELOCITY[0], WALL_JUMP_VELOCITY[1]),
+        LAUNCH_LEFT: _held(stride, size, -LAUNCH_SPEED, 0),
+        LAUNCH_RIGHT: _held(stride, size, LAUNCH_SPEED, 0),
+    }
+    for n, (_, (dx, dy), speed, _) in enumerate(MOMENTUM_HUBS):
+        if dx:
+            # Keep moving the same way
+            templates[HUB_MOMENTUM + n] = [_template(stride, size, dx * speed, 0, hold=dx)]
+        else:
+            templates[HUB_MOMENTUM + n] = _held(stride, size, 0, dy * speed)
+    return templates
+
+
+def box_flags(cells, stride):
+    """
+    The flags of every player-box shape at every cell, as four blocks of len(cells):
+    the cell itself, it and the cell to its right, it and the cell below, and the 2x2
+    block it is the top-left of (cells past the end count as empty).
+    """
+    size = len(cells)
+    whole = int.from_bytes(cells, 'little')
+    # Bytewise OR of the grid with itself shifted by one cell / one row
+    wide = whole | (whole >> 8)
+    tall = whole | (whole >> (8 * stride))
+    block = wide | (wide >> (8 * stride))
+    return b''.join(value.to_bytes(size, 'little') for value in (whole, wide, tall, block))
+
+
+def fall_exit_speed(fall_px):
+    """Speed after falling `fall_px` and then through the bottom half of a portal locked on the way."""
+    return min(MAX_FALL_SPEED, math.sqrt(2 * GRAVITY * max(0, fall_px - PORTAL_SIZE // 4)))
+
+
+# -----------------------------
+# Graph search
+# -----------------------------
+class ReachabilityAnalyzer:
+    def __init__(self, grid):
+        self.grid = grid
+        self.cells = grid.cells
+        self.stride = grid.stride
+        self.size = len(grid.cells)
+        self.row0 = PAD_TOP * grid.stride  # Index of the first in-map row
+        self.boxes = box_flags(grid.cells, grid.stride)
+        self.box_array = np.frombuffer(self.boxes, dtype=np.uint8)
+        self.offsets = {}  # id(template) -> its step offsets as an array (see first_stops)
+        self.air_arcs_table = None  # See air_arcs
+        self.templates = arc_templates(grid.stride, self.size)
+        self.edge_cache = {}
+        self.placements = None
+        self.exits = None
+
+    def standable(self, i):
+        cells = self.cells
+        return i >= self.row0 and not cells[i] & (SOLID | DEADLY) and bool(cells[i + self.stride] & (SOLID | PLATFORM))
+
+    def node_at(self, i):
+        """Ground node if the player can stand in cell i, otherwise an air node."""
+        return (GROUND if self.standable(i) else AIR) * self.size + i
+
+    def cell_of(self, node):
+        """(x, y) tile of a node."""
+        i = node % self.size
+        return i % self.stride - PAD_X + self.grid.left, i // self.stride - PAD_TOP + self.grid.top
+
+    def follow(self, steps, base, ignore=0, start=0, touched=0):
+        """
+        Replay an arc template from cell index `base`.
+
+        Args:
+            start, touched: Step to resume at and the KEY/GOAL flags passed before it
+                (see first_stops)
+
+        Returns:
+            tuple: (node, touched) where node is where the arc ends up (-1 if the player
+                   dies, falls out or is stopped) and touched are the KEY/GOAL flags passed
+        """
+        cells = self.cells
+        boxes = self.boxes
+        stride = self.stride
+        size = self.size
+        keep = ~ignore
+        prev = steps[start - 1][1] if start else None
+        for offset, step in (islice(steps, start, None) if start else steps):
+            flags = boxes[base + offset] & keep
+            if flags & STOPS:
+                c0, c1, r0, r1, feet, dir_x, falling = step
+                if flags & SOLID:
+                    if prev is None:
+                        return -1, touched
+                    top, bottom = base + r0 * stride, base + r1 * stride
+                    vertical = (cells[top + prev[0]] | cells[top + prev[1]] |
+                                cells[bottom + prev[0]] | cells[bottom + prev[1]]) & SOLID
+                    if vertical and falling:
+                        return self._landing(base, prev), touched
+                    if vertical or not dir_x:
+                        return -1, touched  # Head bump (conservatively ends the arc)
+                    i = base + prev[3] * stride + prev[4]
+                    if self.standable(i):
+                        return GROUND * size + i, touched
+                    return (WALL_RIGHT if dir_x > 0 else WALL_LEFT) * size + i, touched
+                if flags & DEADLY:
+                    return -1, touched
+                if flags & PLATFORM and falling and prev is not None and r1 > prev[3]:
+                    return self._landing(base, prev), touched
+                if flags & SPRING and falling:
+                    for c in (c0, c1):
+                        i = base + r1 * stride + c
+                        if cells[i] & SPRING:
+                            return SPRING_NODE * size + i, touched | (flags & MARKS)
+                if flags & LAUNCHER:
+                    # Launched away from the side the player touched the launcher on
+                    kind = LAUNCH_LEFT if dir_x >= 0 else LAUNCH_RIGHT
+                    return kind * size + base + r1 * stride + feet, touched | (flags & MARKS)
+            touched |= flags & MARKS
+            prev = step
+        return -1, touched
+
+    def first_stops(self, steps, bases, ignore=0):
+        """
+        Where an arc template replayed from each of many cells first meets a STOPS
+        cell, in one NumPy pass instead of a Python loop per cell.
+
+        Returns:
+            tuple: (first stopping step per base, len(steps) if none; KEY/GOAL flags
+                    passed before it), as lists
+        """
+        offsets = self.offsets.get(id(steps))
+        if offsets is None:
+            offsets = self.offsets[id(steps)] = np.array([offset for offset, _ in steps], dtype=np.intp)
+        # Steps past the end of the grid come after the bottom padding stopped the arc
+        index = np.minimum(np.array(bases, dtype=np.intp)[:, None] + offsets, len(self.box_array) - 1)
+        flags = self.box_array[index]
+        if ignore:
+            flags &= ~ignore & 0xFF
+        stopping = (flags & STOPS) != 0
+        first = np.where(stopping.any(axis=1), stopping.argmax(axis=1), len(steps))
+        marks = np.bitwise_or.accumulate(flags & MARKS, axis=1)
+        before = np.where(first > 0, marks[np.arange(len(bases)), np.maximum(first - 1, 0)], 0)
+        return first.tolist(), before.tolist()
+
+    def follow_many(self, steps, bases, ignore=0):
+        """follow() from each of many cells (see first_stops): a list of (node, touched)."""
+        first, before = self.first_stops(steps, bases, ignore)
+        end = len(steps)
+        return [self.follow(steps, base, ignore, k, touched) if k < end else (-1, touched)
+                for base, k, touched in zip(bases, first, before)]
+
+    def air_arcs(self, i):
+        """
+        follow() of the 'steer' templates from air cell i. The first call finds the
+        first stops from every open cell at once (see first_stops), as most of them
+        are explored; each call then only replays from there.
+        """
+        templates = self.templates['steer']
+        if self.air_arcs_table is None:
+            cells = self.cells
+            row1 = self.row0 + self.grid.height * self.stride
+            open_cells = [j for j in range(self.row0, row1) if not cells[j] & (SOLID | DEADLY)]
+            rows = {cell: row for row, cell in enumerate(open_cells)}
+            self.air_arcs_table = (rows, [self.first_stops(steps, open_cells) for steps in templates])
+        rows, stops = self.air_arcs_table
+        row = rows.get(i)
+        if row is None:
+            return [self.follow(steps, i) for steps in templates]
+        results = []
+        for steps, (first, before) in zip(templates, stops):
+            if first[row] < len(steps):
+                results.append(self.follow(steps, i, 0, first[row], before[row]))
+            else:
+                results.append((-1, before[row]))
+        return results
+
+    def fall(self, i):
+        """
+        Fall straight down from cell i (the player is narrower than a tile, so only
+        this column matters).
+
+        Returns:
+            tuple: (node, touched) like follow()
+        """
+        cells = self.cells
+        stride = self.stride
+        touched = cells[i] & MARKS
+        while not cells[i + stride] & STOPS:
+            i += stride
+            touched |= cells[i] & MARKS
+        flags = cells[i + stride]
+        if flags & (SOLID | PLATFORM):
+            return GROUND * self.size + i, touched
+        if flags & SPRING:
+            return SPRING_NODE * self.size + i + stride, touched
+        if flags & LAUNCHER:
+            return LAUNCH_LEFT * self.size + i + stride, touched | (flags & MARKS)
+        return -1, touched
+
+    def _landing(self, base, step):
+        row = base + step[3] * self.stride
+        for c in (step[4], step[0], step[1]):
+            if self.standable(row + c):
+                return GROUND * self.size + row + c
+        return AIR * self.size + row + step[4]
+
+    def edges(self, node):
+        """
+        List of (target node or -1, touched flags, cost, packed counts) leaving a node
+        (cached). The touched flags include GOAL when the target cell is a door, and
+        LANDS_ON_KEY when it holds a key.
+        """
+        edges = self.edge_cache.get(node)
+        if edges is not None:
+            return edges
+        kind, i = divmod(node, self.size)
+        cells = self.cells
+        stride = self.stride
+        edges = []
+
+        def add_arcs(templates, base, cost, counts, ignore=0):
+            add_results([self.follow(steps, base, ignore) for steps in templates], cost, counts)
+
+        def add_results(results, cost, counts):
+            for target, touched in results:
+                if target >= 0 or touched & GOAL:
+                    edges.append((target, touched, cost, counts))
+
+        def add_hubs(source, max_speed):
+            for n, (_, _, speed, sources) in enumerate(MOMENTUM_HUBS):
+                if speed <= max_speed and source in sources:
+                    edges.append(((HUB_MOMENTUM + n) * self.size, 0, COST_PORTAL + COST_MOMENTUM, MOMENTUM_COUNTS))
+
+        if kind == GROUND:
+            for side in (-1, 1):
+                flags = cells[i + side]
+                if flags & (SOLID | DEADLY | SPRING):
+                    continue
+                if flags & LAUNCHER:
+                    launch = LAUNCH_LEFT if side > 0 else LAUNCH_RIGHT
+                    edges.append((launch * self.size + i + side, flags & MARKS, 0, NO_COUNTS))
+                else:
+                    edges.append((self.node_at(i + side), flags & MARKS, 0, NO_COUNTS))
+            add_arcs(self.templates['jump'], i, COST_JUMP, JUMP_COUNTS)
+            if self.can_exit_portal(i):
+                edges.append((HUB_WALK * self.size, 0, COST_PORTAL, PORTAL_COUNTS))
+            if not (cells[i - stride] | cells[i - 2 * stride]) & SOLID:
+                # Jump and lock the portal at the top: out of the top while rising,
+                # or out of the bottom on the way down
+                add_hubs('rise', -JUMP_VELOCITY * 0.7)
+                add_hubs('fall', fall_exit_speed(JUMP_VELOCITY ** 2 / (2 * GRAVITY)))
+        elif kind == AIR:
+            target, touched = self.fall(i)
+            if target >= 0 or touched & GOAL:
+                edges.append((target, touched, 0, NO_COUNTS))
+            add_results(self.air_arcs(i), 0, NO_COUNTS)
+            j = i
+            while not cells[j + stride] & STOPS:
+                j += stride
+            add_hubs('fall', fall_exit_speed((j - i) // stride * TILE_SIZE))
+        elif kind in (WALL_LEFT, WALL_RIGHT):
+            add_arcs(self.templates[kind], i, COST_WALL_JUMP, WALL_JUMP_COUNTS)
+            target, touched = self.fall(i)
+            if target >= 0 or touched & GOAL:
+                edges.append((target, touched, 0, NO_COUNTS))
+            add_hubs('side', WALL_JUMP_VELOCITY[0])
+        elif kind == SPRING_NODE:
+            # Bounced from on top of the spring: a normal-height or a high bounce
+            add_arcs(self.templates['jump'], i - stride, COST_SPRING, SPRING_COUNTS, ignore=SPRING)
+            add_arcs(self.templates['bounce'], i - stride, COST_SPRING, SPRING_COUNTS, ignore=SPRING)
+            add_hubs('rise', SPRING_HIGH_BOUNCE * 0.9)
+        elif kind in (LAUNCH_LEFT, LAUNCH_RIGHT):
+            add_arcs(self.templates[kind], i, COST_SPRING, SPRING_COUNTS, ignore=LAUNCHER)
+            add_hubs('side', LAUNCH_SPEED - 0.5)  # Friction until it leaves its portal
+        elif kind == HUB_WALK:
+            for exits in self.portal_exits().values():
+                for cell in exits:
+                    edges.append((self.node_at(cell), cells[cell] & MARKS, 0, NO_COUNTS))
+        else:
+            # Every exit cell at once, then the edges in the same order as cell by cell
+            cells_out = list(self.portal_exits()[MOMENTUM_HUBS[kind - HUB_MOMENTUM][0]])
+            if cells_out:
+                results = [self.follow_many(steps, cells_out) for steps in self.templates[kind]]
+                for per_cell in zip(*results):
+                    add_results(per_cell, 0, NO_COUNTS)
+
+        # What the target cell holds, so the search does not look it up per edge
+        ground_nodes = HUB_WALK * self.size
+        for n, (target, touched, cost, counts) in enumerate(edges):
+            if 0 <= target < ground_nodes:
+                flags = cells[target % self.size]
+                if flags & MARKS:
+                    edges[n] = (target, touched | (flags & GOAL) | (LANDS_ON_KEY if flags & KEY else 0), cost, counts)
+        self.edge_cache[node] = edges
+        return edges
+
+    def can_exit_portal(self, i):
+        """Whether the player can walk (left/right) or jump (up) out of a portal centered on them."""
+        cells = self.cells
+        for d in (-1, 1, -self.stride):
+            if not (cells[i + d] | cells[i + 2 * d]) & SOLID:
+                return True
+        return False
+
+    def portal_placements(self):
+        """Cells in view the cursor can lock the cursor portal on (same rules as Game.run)."""
+        if self.placements is not None:
+            return self.placements
+        grid = self.grid
+        w, h = grid.width, grid.height
+        left, top = grid.left, grid.top
+        # 2D prefix sums of noportalzone and solid cells (x, y from the map's top-left here)
+        noportal = [[0] * (w + 1) for _ in range(h + 1)]
+        solid = [[0] * (w + 1) for _ in range(h + 1)]
+        cells = self.cells
+        for y in range(h):
+            row = grid.index(left, top + y)
+            for x in range(w):
+                noportal[y + 1][x + 1] = noportal[y][x + 1] + noportal[y + 1][x] - noportal[y][x] + grid.noportal[y * w + x]
+                solid[y + 1][x + 1] = solid[y][x + 1] + solid[y + 1][x] - solid[y][x] + (cells[row + x] & SOLID)
+
+        def count(table, x0, y0, x1, y1):
+            x0, y0, x1, y1 = max(0, x0), max(0, y0), min(w - 1, x1), min(h - 1, y1)
+            if x0 > x1 or y0 > y1:
+                return 0
+            return table[y1 + 1][x1 + 1] - table[y0][x1 + 1] - table[y1 + 1][x0] + table[y0][x0]
+
+        # A 64x64 portal centered on a cell center overlaps a 5x5 block of cells
+        reach = PORTAL_SIZE // TILE_SIZE // 2
+        placements = []
+        view = grid.view  # Where the cursor can be
+        for my in range(view.top - top, view.bottom - top):
+            for mx in range(view.left - left, view.right - left):
+                if cells[grid.index(left + mx, top + my)] & SOLID or grid.noportal[my * w + mx]:
+                    continue
+                x0, y0, x1, y1 = mx - reach, my - reach, mx + reach, my + reach
+                if count(noportal, x0, y0, x1, y1):
+                    continue
+                inside = (x0 >= 0 and y0 >= 0 and x1 < w and y1 < h)
+                if inside and count(solid, x0, y0, x1, y1) == (2 * reach + 1) ** 2:
+                    continue
+                placements.append((left + mx, top + my))
+        self.placements = placements
+        return placements
+
+    def portal_exits(self):
+        """
+        Cells the player comes out in just inside each edge of every valid cursor portal.
+
+        Returns:
+            dict: {'left', 'right', 'top', 'bottom'} -> set of cell indices
+        """
+        if self.exits is not None:
+            return self.exits
+        width, height = PLAYER_SIZE
+        offset = PORTAL_INSIDE_OFFSET
+        # Where the player box comes out, relative to the portal's cell (the same for every
+        # cell, as portals are centered on cells): its box_flags offset and the exit cell's.
+        # Exits are at most two cells from the portal's cell, inside the grid's padding
+        left = TILE_SIZE // 2 - PORTAL_SIZE // 2
+        middle_x = left + PORTAL_SIZE // 2 - width // 2
+        middle_y = left + PORTAL_SIZE // 2 - height // 2
+        stride = self.stride
+        sides = []
+        for edge, px, py in (('right', left + PORTAL_SIZE - width - offset, middle_y),
+                             ('left', left + offset, middle_y),
+                             ('bottom', middle_x, left + PORTAL_SIZE - height - offset),
+                             ('top', middle_x, left + offset)):
+            c0, c1 = _cell_span(px, width)
+            r0, r1 = _cell_span(py, height)
+            shape = (c1 > c0) + 2 * (r1 > r0)
+            sides.append((edge, shape * self.size + r0 * stride + c0, r1 * stride + int((px + width / 2) // TILE_SIZE)))
+        boxes = self.boxes
+        index = self.grid.index
+        exits = {'left': set(), 'right': set(), 'top': set(), 'bottom': set()}
+        for mx, my in self.portal_placements():
+            i = index(mx, my)
+            for edge, box, cell in sides:
+                if not boxes[i + box] & (SOLID | DEADLY):
+                    exits[edge].add(i + cell)
+        self.exits = exits
+        return exits
+
+    def solve(self, start, has_key):
+        """
+        Easiest route (lowest difficulty score, see the edge costs) from `start` to a
+        door, collecting a key first when the level has one.
+
+        Returns:
+            tuple: (counts, explored) where counts is (portal_hops, momentum_hops, wall_jumps,
+                   spring_bounces, jumps) or None if no door is reachable
+        """
+        best = None
+        best_cost = None
+        dist = {start * 2 + has_key: 0}
+        heap = [(0, NO_COUNTS, start * 2 + has_key)]
+        explored = 0
+        edge_cache = self.edge_cache
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            cost, counts, state = heappop(heap)
+            if best_cost is not None and cost >= best_cost:
+                break
+            if dist[state] < cost:
+                continue
+            explored += 1
+            node, key = state >> 1, state & 1
+            edges = edge_cache.get(node)
+            if edges is None:
+                edges = self.edges(node)
+            for target, touched, edge_cost, edge_counts in edges:
+                new_key = key | (1 if touched & KEY else 0)
+                new_cost = cost + edge_cost
+                if touched & GOAL and new_key:
+                    if best_cost is None or new_cost < best_cost:
+                        best_cost = new_cost
+                        best = counts + edge_counts
+                    continue
+                if target < 0:
+                    continue
+                if touched & LANDS_ON_KEY:
+                    new_key = 1
+                new_state = target * 2 + new_key
+                if new_cost < dist.get(new_state, new_cost + 1):
+                    dist[new_state] = new_cost
+                    heappush(heap, (new_cost, counts + edge_counts, new_state))
+        return (None if best is None else unpack_counts(best)), explored
+
+
+def difficulty_score(portal_hops, momentum_hops, wall_jumps, spring_bounces):
+    """Difficulty of a route in portal hops (the search cost without jumps)."""
+    cost = portal_hops * COST_PORTAL + momentum_hops * COST_MOMENTUM + \
+        wall_jumps * COST_WALL_JUMP + spring_bounces * COST_SPRING
+    return cost / COST_PORTAL
+
+
+def rate_difficulty(score):
+    """Difficulty label for a difficulty_score."""
+    for bound, label in DIFFICULTY_LABELS:
+        if score <= bound:
+            return label
+    return 'hard'
+
+
+def analyze_level(map_data):
+    """
+    Check whether a level can be finished and estimate how hard it is.
+
+    Args:
+        map_data: Level data ({'tilemap', 'tile_size', 'offgrid'})
+
+    Returns:
+        dict: {'version', 'solvable', 'portal_hops', 'momentum_hops', 'wall_jumps',
+               'spring_bounces', 'jumps', 'portal_placements', 'explored', 'score',
+               'difficulty'} (counts and score are None when the level is not solvable)
+    """
+    grid = TileGrid.from_level(map_data)
+    analyzer = ReachabilityAnalyzer(grid)
+    report = {
+        'version': ANALYSIS_VERSION,
+        'solvable': False,
+        'portal_hops': None,
+        'momentum_hops': None,
+        'wall_jumps': None,
+        'spring_bounces': None,
+        'jumps': None,
+        'portal_placements': len(analyzer.portal_placements()),
+        'explored': 0,
+        'score': None,
+        'difficulty': 'unsolvable',
+    }
+    if grid.spawn is None:
+        return report
+
+    px, py = grid.spawn
+    width, height = PLAYER_SIZE
+    start = analyzer.node_at(grid.index(int(px + width / 2) // TILE_SIZE, int(py + height - 1) // TILE_SIZE))
+    has_key = 0 if any(flags & KEY for flags in grid.cells) else 1
+    counts, report['explored'] = analyzer.solve(start, has_key)
+    if counts is not None:
+        report['solvable'] = True
+        (report['portal_hops'], report['momentum_hops'], report['wall_jumps'],
+         report['spring_bounces'], report['jumps']) = counts
+        report['score'] = difficulty_score(*counts[:4])
+        report['difficulty'] = rate_difficulty(report['score'])
+    return report
@@ -0,0 +1,113 @@
+"""
+Rewind history.
+
+A ring buffer of per-frame game states (see Game.get_state), stored compactly.
+States are recorded into segments of KEYFRAME_INTERVAL frames: the first frame
+of a segment is its keyframe and every later frame is stored as its XOR against
+the keyframe, so everything that did not change since the keyframe - tiles,
+portal locks, resting crates - becomes zero bytes. Once a segment is full it is
+sealed with zlib, which squeezes out the zeros and the small oscillations
+(entities settling on the floor) that repeat from frame to frame.
+
+Rewinding pops frames off the newest segment, unsealing the previous segment
+when the current one runs out. A minute of play costs roughly 0.1-0.3 MB, so
+the default five minutes of history fits in a few MB.
+"""
+import zlib
+from array import array
+from collections import deque
+
+KEYFRAME_INTERVAL = 60  # Frames per segment (one keyframe per second at 60fps)
+DEFAULT_SECONDS = 300  # History kept by default (5 minutes)
+COMPRESSION_LEVEL = 6
+
+
+class RewindBuffer:
+    def __init__(self, seconds=DEFAULT_SECONDS, fps=60, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Args:
+            seconds: How much history to keep; the oldest segments are dropped first
+            fps: Frames recorded per second
+            keyframe_interval: Frames per segment
+        """
+        self.capacity = max(1, int(seconds * fps))
+        self.keyframe_interval = keyframe_interval
+        self.segments = deque()  # Sealed segments: (frame count, compressed bytes), oldest first
+        self.sealed_frames = 0
+        self.frames = []  # Open segment: raw rows (bytes of doubles), keyframe first
+        self.width = None
+
+    def __len__(self):
+        return self.sealed_frames + len(self.frames)
+
+    def clear(self):
+        self.segments.clear()
+        self.sealed_frames = 0
+        self.frames = []
+        self.width = None
+
+    def record(self, state):
+        """
+        Append a frame.
+
+        Args:
+            state: Flat sequence of numbers (Game.get_state); a different length than
+                the previous frames (another level) starts the history over
+        """
+        if len(state) != self.width:
+            self.clear()
+            self.width = len(state)
+        if len(self.frames) >= self.keyframe_interval:
+            self._seal()
+        self.frames.append(array('d', state).tobytes())
+
+    def pop(self):
+        """
+        Remove the most recent frame and return it.
+
+        Returns:
+            list: The state as recorded, or None when the history is empty
+        """
+        if not self.frames:
+            if not self.segments:
+                return None
+            self._unseal()
+        state = array('d')
+        state.frombytes(self.frames.pop())
+        return state.tolist()
+
+    def nbytes(self):
+        """Approximate memory used by the history."""
+        return sum(len(data) for _, data in self.segments) + sum(len(row) for row in self.frames)
+
+    def seconds(self, fps=60):
+        return len(self) / fps
+
+    def _seal(self):
+        """Compress the open segment and start a new one."""
+        keyframe = self.frames[0]
+        key = int.from_bytes(keyframe, 'little')
+        size = len(keyframe)
+        rows = [keyframe]
+        for row in self.frames[1:]:
+            rows.append((int.from_bytes(row, 'little') ^ key).to_bytes(size, 'little'))
+        self.segments.append((len(rows), zlib.compress(b''.join(rows), COMPRESSION_LEVEL)))
+        self.sealed_frames += len(rows)
+        self.frames = []
+
+        # Drop whole segments off the old end of the ring once over capacity
+        while self.segments and self.sealed_frames > self.capacity:
+            count, _ = self.segments.popleft()
+            self.sealed_frames -= count
+
+    def _unseal(self):
+        """Decompress the newest sealed segment back into the open segment."""
+        count, data = self.segments.pop()
+        self.sealed_frames -= count
+        data = zlib.decompress(data)
+        size = len(data) // count
+        keyframe = data[:size]
+        key = int.from_bytes(keyframe, 'little')
+        self.frames = [keyframe]
+        for offset in range(size, len(data), size):
+            self.frames.append((int.from_bytes(data[offset:offset + size], 'little') ^ key).to_bytes(size, 'little'))
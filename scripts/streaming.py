@@ -0,0 +1,195 @@
+"""
+Incremental parser for level JSON streamed back from Gemini.
+
+The model sends the level as a sequence of text chunks. Instead of waiting for
+the whole response, LevelStreamParser scans each chunk as it arrives, hands
+every tile / offgrid entry to the caller the moment its JSON object closes,
+and raises LevelStreamError as soon as the text stops looking like a level.
+That lets the loading screens draw a partial preview while the model is still
+writing, and lets a broken generation abort before anything touches disk.
+"""
+import json
+
+from scripts.validation import normalize_tile
+
+# Characters that may appear outside of strings in valid JSON
+JSON_BARE_CHARS = set(' \t\r\n,:-+.0123456789eEtruefalsn')
+
+
+class LevelStreamError(ValueError):
+    """Raised when streamed level output is malformed."""
+
+
+class LevelStreamParser:
+    def __init__(self, on_tile=None, on_offgrid=None):
+        """
+        Args:
+            on_tile: Optional callback(loc, tile) called as each tilemap entry completes
+            on_offgrid: Optional callback(tile) called as each offgrid entry completes
+        """
+        self.on_tile = on_tile
+        self.on_offgrid = on_offgrid
+
+        # Partial level built up as entries arrive (usable for previews)
+        self.tilemap = {}
+        self.offgrid = []
+        self.repairs = []  # Repairs applied to entries so far (see scripts/validation.py)
+
+        self.chunks = []  # Every chunk fed so far, joined only once in finish()
+        self.length = 0  # Characters fed so far
+        # The text still needed for slicing (the open entry or string), starting at offset window_start
+        self.window = ''
+        self.window_start = 0
+        self.prefix = ''  # Anything before the root object (e.g. a ``` fence)
+        self.root_start = None
+        self.root_end = None
+
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string = None  # Most recently closed string (candidate object key)
+        # One entry per open container: [bracket, key of the value being parsed, value start index]
+        self.stack = []
+
+    @property
+    def done(self):
+        return self.root_end is not None
+
+    def feed(self, chunk):
+        """Consume the next chunk of response text."""
+        self.chunks.append(chunk)
+        first = self.length
+        self.length += len(chunk)
+        # Only carry over the text an open entry or string still needs, so long
+        # responses are not copied again on every chunk
+        keep = self._keep_from()
+        if keep is None:
+            self.window = chunk
+            self.window_start = first
+        else:
+            self.window = self.window[keep - self.window_start:] + chunk
+            self.window_start = keep
+        text = self.window
+        offset = self.window_start
+        for i in range(first, self.length):
+            c = text[i - offset]
+            if self.root_start is None:
+                if c == '{':
+                    self.root_start = i
+                    self.stack.append(['{', None, i])
+                else:
+                    self.prefix += c
+                    self._check_prefix()
+            elif self.root_end is not None:
+                # Only whitespace or the closing code fence may follow the level
+                if not (c.isspace() or c == '`'):
+                    raise LevelStreamError(f"Unexpected text after level JSON: {text[i - offset:i - offset + 20]!r}")
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start - offset:i - offset + 1]
+            elif c == '"':
+                self.in_string = True
+                self.string_start = i
+            elif c == ':':
+                if self.stack[-1][0] != '{' or self.last_string is None:
+                    raise LevelStreamError(f"Unexpected ':' at offset {i}")
+                self.stack[-1][1] = json.loads(self.last_string)
+                self.last_string = None
+            elif c == ',':
+                self.last_string = None
+            elif c in '{[':
+                self.stack.append([c, None, i])
+                self.last_string = None
+            elif c in '}]':
+                opener = '{' if c == '}' else '['
+                if self.stack[-1][0] != opener:
+                    raise LevelStreamError(f"Mismatched '{c}' at offset {i}")
+                start = self.stack.pop()[2]
+                self.last_string = None
+                if not self.stack:
+                    self.root_end = i + 1
+                elif len(self.stack) == 2 and c == '}':
+                    self._entry_closed(text[start - offset:i - offset + 1])
+            elif c not in JSON_BARE_CHARS:
+                raise LevelStreamError(f"Unexpected character {c!r} at offset {i}")
+
+    def _keep_from(self):
+        """Offset of the oldest text still needed: the open string, or the open tilemap/offgrid entry."""
+        starts = []
+        if self.in_string:
+            starts.append(self.string_start)
+        if len(self.stack) > 2:
+            starts.append(self.stack[2][2])
+        return min(starts) if starts else None
+
+    def finish(self):
+        """
+        Parse the complete response once the stream has ended.
+
+        Returns:
+            dict: The level data ({'tilemap', 'tile_size', 'offgrid'})
+        """
+        if self.root_start is None:
+            raise LevelStreamError("Response did not contain a JSON object")
+        if self.root_end is None:
+            raise LevelStreamError("Response ended before the level JSON was complete")
+        try:
+            map_data = json.loads(''.join(self.chunks)[self.root_start:self.root_end])
+        except ValueError as e:
+            raise LevelStreamError(f"Invalid level JSON: {e}")
+        if not isinstance(map_data.get('tilemap'), dict):
+            raise LevelStreamError("Level is missing a 'tilemap' object")
+        if not isinstance(map_data.get('offgrid', []), list):
+            raise LevelStreamError("Level 'offgrid' is not a list")
+        map_data.setdefault('offgrid', [])
+        map_data.setdefault('tile_size', 16)
+        return map_data
+
+    def _check_prefix(self):
+        """Only a markdown code fence line may come before the root object."""
+        prefix = self.prefix.lstrip()
+        if not prefix:
+            return
+        if len(prefix) < 3:
+            if '```'.startswith(prefix):
+                return
+        elif prefix.startswith('```') and '\n' not in prefix.rstrip():
+            return
+        raise LevelStreamError(f"Response does not start with a JSON object: {prefix[:20]!r}")
+
+    def _entry_closed(self, entry_text):
+        """An object directly inside the root's 'tilemap' or 'offgrid' container just closed."""
+        section = self.stack[0][1]
+        try:
+            entry = json.loads(entry_text)
+        except ValueError as e:
+            raise LevelStreamError(f"Invalid {section} entry: {e}")
+
+        if section == 'tilemap':
+            loc = self.stack[1][1]
+            tile = self._normalize(entry, loc, ongrid=True)
+            if tile is None:
+                return
+            self.tilemap[loc] = tile
+            if self.on_tile:
+                self.on_tile(loc, tile)
+        elif section == 'offgrid':
+            tile = self._normalize(entry, ongrid=False)
+            if tile is None:
+                return
+            self.offgrid.append(tile)
+            if self.on_offgrid:
+                self.on_offgrid(tile)
+
+    def _normalize(self, entry, loc=None, ongrid=True):
+        """Repair the entry for the preview; abort on entries that are not tiles at all."""
+        if not isinstance(entry, dict) or not isinstance(entry.get('type'), str):
+            raise LevelStreamError(f"Level entry is not a tile: {entry!r}")
+        tile, repairs = normalize_tile(entry, loc, ongrid=ongrid)
+        self.repairs.extend(repairs)
+        return tile
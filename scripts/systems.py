@@ -0,0 +1,461 @@
+"""
+Systems: per-frame logic for the bodies stored in a World (see scripts/ecs.py).
+
+Each system updates a set of rows with whole-array NumPy operations instead of
+one Python call per body:
+
+    push_system      the player pushing crates and springs
+    crate_system     crate gravity, friction, tile collision and sleep
+    spring_system    spring gravity, friction, tile collision and sleep
+    teleport_system  portal checks for the bodies that moved
+    button_system    buttons pressed by the player
+    park_system      pausing the crates and springs far from the camera
+
+The results are the same, bit for bit, as the per-object code they replace
+(Crate.update, Spring.apply_physics, Game.check_portal_teleport), which is
+still there for single bodies. Tile collision uses the same swept test as
+PhysicsEntity.update, read from the tilemap's flag grid; the rare body that
+starts a move already inside a tile is resolved with the per-object loop,
+since the order tiles are visited in decides where it ends up.
+"""
+import numpy as np
+import pygame
+
+from scripts.ecs import KIND_CRATE, KIND_SPRING, KIND_BUTTON, SIDE_INDEX
+from scripts.entities import GRAVITY, MAX_FALL_SPEED, SLEEP_FRAMES, CRATE_FRICTION, SPRING_FRICTION, PUSH_SPEED
+from scripts.portal import teleport_between
+from scripts.tilemap import TILE_SOLID, TILE_NOT_LOADED
+
+UP, DOWN, RIGHT, LEFT = (SIDE_INDEX[side] for side in ('up', 'down', 'right', 'left'))
+
+
+def solid_grid(world, tilemap):
+    """
+    The tilemap's tile flags as a 2D array, cached on the world until the grid is rebuilt.
+
+    The array is a view of the flag grid's cells, so the cells a streamed chunk
+    changes in place (see Tilemap.update_grid) show up without copying the grid.
+
+    Returns:
+        tuple: (flags[y, x], min_x, min_y) in tile coordinates; a tile is solid
+            where flags & TILE_SOLID, and the tiles of a streamed chunk that is not
+            loaded (TILE_NOT_LOADED) count as solid, as in Tilemap.physics_rects_in
+    """
+    cells, width, height, min_x, min_y = tilemap.flag_grid()
+    cache = world.tile_cache
+    if cache is None or cache[0] is not cells:
+        flags = np.frombuffer(cells, np.uint8).reshape(height, width)
+        cache = (cells, (flags, min_x, min_y))
+        world.tile_cache = cache
+    return cache[1]
+
+
+def _solid_at(grid, tx, ty):
+    """Solid flags of tiles (tx, ty) (int arrays); tiles outside the grid are empty."""
+    flags, min_x, min_y = grid
+    gx = tx - min_x
+    gy = ty - min_y
+    inside = (gx >= 0) & (gx < flags.shape[1]) & (gy >= 0) & (gy < flags.shape[0])
+    result = np.zeros(tx.shape, np.bool_)
+    result[inside] = flags[gy[inside], gx[inside]] & (TILE_SOLID | TILE_NOT_LOADED)
+    return result
+
+
+def rects_hit_solid(grid, tile_size, x, y, w, h):
+    """Whether each rect (whole-pixel int arrays) overlaps a solid tile."""
+    tx0 = x // tile_size
+    ty0 = y // tile_size
+    tx1 = (x + w - 1) // tile_size
+    ty1 = (y + h - 1) // tile_size
+    hit = np.zeros(x.shape, np.bool_)
+    if not len(x):
+        return hit
+    for i in range(int((tx1 - tx0).max()) + 1):
+        for j in range(int((ty1 - ty0).max()) + 1):
+            hit |= (tx0 + i <= tx1) & (ty0 + j <= ty1) & _solid_at(grid, tx0 + i, ty0 + j)
+    return hit
+
+
+def _sweep_one(tilemap, pos, size, delta, axis):
+    """The per-object sweep from PhysicsEntity.update, for one body: (new coordinate, hit)."""
+    start_rect = pygame.Rect(pos[0], pos[1], size[0], size[1])
+    pos = [pos[0], pos[1]]
+    pos[axis] += delta
+    rect = pygame.Rect(pos[0], pos[1], size[0], size[1])
+    hit = False
+    for tile in tilemap.physics_rects_in(rect.union(start_rect)):
+        if rect.union(start_rect).colliderect(tile):
+            hit = True
+            if axis == 0:
+                if delta > 0:
+                    rect.right = tile.left
+                else:
+                    rect.left = tile.right
+                pos[0] = rect.x
+            else:
+                if delta > 0:
+                    rect.bottom = tile.top
+                else:
+                    rect.top = tile.bottom
+                pos[1] = rect.y
+    return pos[axis], hit
+
+
+def sweep(world, tilemap, indices, delta, axis):
+    """
+    Move bodies along one axis, stopping each at the first solid tile in its way.
+
+    Everything overlapping the area between the old and new rect is in the way (see
+    PhysicsEntity.update), so fast bodies do not tunnel. A body moving right stops
+    with its right edge on the nearest tile's left edge, and so on.
+
+    Args:
+        world: World holding the bodies
+        tilemap: Tilemap to collide with
+        indices: Rows to move
+        delta: Movement of each row along the axis (float array)
+        axis: 0 for x, 1 for y
+
+    Returns:
+        np.ndarray: True where the body hit a tile
+    """
+    tile_size = tilemap.tile_size
+    start_pos = world.pos[indices]
+    size = world.size[indices]
+    world.pos[indices, axis] = start_pos[:, axis] + delta
+    hit = np.zeros(len(indices), np.bool_)
+    moving = np.flatnonzero(delta != 0)
+    if not len(moving):
+        return hit
+
+    grid = solid_grid(world, tilemap)
+    start = np.trunc(start_pos[moving]).astype(np.int64)
+    end = np.trunc(start_pos[moving, axis] + delta[moving]).astype(np.int64)
+    along_size = size[moving, axis]
+    across_size = size[moving, 1 - axis]
+    across = start[:, 1 - axis]
+
+    # Bodies already overlapping a tile before moving go through _sweep_one
+    if axis == 0:
+        inside = rects_hit_solid(grid, tile_size, start[:, 0], start[:, 1], along_size, across_size)
+    else:
+        inside = rects_hit_solid(grid, tile_size, start[:, 0], start[:, 1], across_size, along_size)
+
+    # Tile rows/columns covered by the swept area
+    low = np.minimum(start[:, axis], end) // tile_size
+    high = (np.maximum(start[:, axis], end) + along_size - 1) // tile_size
+    across_low = across // tile_size
+    across_high = (across + across_size - 1) // tile_size
+
+    # Nearest blocked row/column on each side: the lowest one for bodies moving
+    # forward, the highest one for bodies moving back
+    found = np.zeros(len(moving), np.bool_)
+    first = np.zeros(len(moving), np.int64)
+    last = np.zeros(len(moving), np.int64)
+    for i in range(int((high - low).max()) + 1):
+        line = low + i
+        blocked = np.zeros(len(moving), np.bool_)
+        for j in range(int((across_high - across_low).max()) + 1):
+            cross = across_low + j
+            valid = (line <= high) & (cross <= across_high)
+            if axis == 0:
+                blocked |= valid & _solid_at(grid, line, cross)
+            else:
+                blocked |= valid & _solid_at(grid, cross, line)
+        first = np.where(blocked & ~found, line, first)
+        last = np.where(blocked, line, last)
+        found |= blocked
+
+    forward = delta[moving] > 0
+    resolved = np.where(forward, first * tile_size - along_size, (last + 1) * tile_size)
+    stopped = found & ~inside
+    world.pos[indices[moving[stopped]], axis] = resolved[stopped]
+    hit[moving[stopped]] = True
+
+    for k in np.flatnonzero(inside):
+        row = moving[k]
+        body_size = (int(size[row, 0]), int(size[row, 1]))
+        world.pos[indices[row], axis], hit[row] = _sweep_one(tilemap, start_pos[row], body_size, delta[row], axis)
+    return hit
+
+
+def _stepped(world, kind):
+    """
+    Rows of a kind that step this frame, and which of them are awake.
+
+    Bodies teleported last frame skip a frame (and lose the flag), parked bodies
+    skip every frame (see park_system); sleeping bodies given velocity since they
+    fell asleep wake up (Sleepable.woken_by_velocity).
+
+    Returns:
+        tuple: (stepped, active) index arrays
+    """
+    indices = world.indices(kind)
+    teleported = world.teleported[indices]
+    world.teleported[indices[teleported]] = False
+    stepped = indices[~teleported & ~world.parked[indices]]
+    velocity = world.velocity[stepped]
+    woken = stepped[world.sleeping[stepped] & ((velocity[:, 0] != 0) | (velocity[:, 1] != 0))]
+    world.sleeping[woken] = False
+    world.rest_frames[woken] = 0
+    return stepped, stepped[~world.sleeping[stepped]]
+
+
+def _friction(vx, amount):
+    return np.where(vx > 0, np.maximum(vx - amount, 0), np.minimum(vx + amount, 0))
+
+
+def _update_sleep(world, indices):
+    """Sleepable.update_sleep for many rows."""
+    pos = world.pos[indices]
+    last_pos = world.last_pos[indices]
+    velocity = world.velocity[indices]
+    at_rest = ((np.trunc(pos) == np.trunc(last_pos)).all(axis=1)
+               & (velocity[:, 0] == 0) & (np.abs(velocity[:, 1]) < 1))
+    rest_frames = np.where(at_rest, world.rest_frames[indices] + 1, 0)
+    world.rest_frames[indices] = rest_frames
+    asleep = indices[at_rest & (rest_frames >= SLEEP_FRAMES)]
+    world.sleeping[asleep] = True
+    world.velocity[asleep] = 0
+    world.last_pos[asleep] = world.pos[asleep]
+
+
+def crate_system(world, tilemap):
+    """
+    One frame of Crate.update for every crate.
+
+    Args:
+        world: World holding the crates
+        tilemap: Tilemap to collide with
+
+    Returns:
+        tuple: (stepped, active) index arrays: crates that were not skipped for a
+               teleport, and the ones among them that were awake and moved
+    """
+    stepped, active = _stepped(world, KIND_CRATE)
+    if not len(active):
+        return stepped, active
+
+    world.last_pos[active] = world.pos[active]
+    collisions = np.zeros((len(active), 4), np.bool_)
+    velocity = world.velocity[active]
+
+    hit_x = sweep(world, tilemap, active, velocity[:, 0], 0)
+    collisions[:, RIGHT] = hit_x & (velocity[:, 0] > 0)
+    collisions[:, LEFT] = hit_x & (velocity[:, 0] < 0)
+    hit_y = sweep(world, tilemap, active, velocity[:, 1], 1)
+    collisions[:, DOWN] = hit_y & (velocity[:, 1] > 0)
+    collisions[:, UP] = hit_y & (velocity[:, 1] < 0)
+    world.collisions[active] = collisions
+
+    # Gravity (stopped by floors and ceilings), then walls and friction
+    vy = np.where(hit_y, 0.0, np.minimum(MAX_FALL_SPEED, velocity[:, 1] + GRAVITY))
+    vx = _friction(np.where(hit_x, 0.0, velocity[:, 0]), CRATE_FRICTION)
+    world.velocity[active, 0] = vx
+    world.velocity[active, 1] = vy
+
+    _update_sleep(world, active)
+    return stepped, active
+
+
+def spring_system(world, tilemap):
+    """
+    One frame of Spring.apply_physics for every awake spring.
+
+    Contacts (launching entities) are per spring, see Spring.update_contacts.
+
+    Returns:
+        tuple: (stepped, active) index arrays, as for crate_system
+    """
+    stepped, active = _stepped(world, KIND_SPRING)
+    if not len(active):
+        return stepped, active
+
+    world.last_pos[active] = world.pos[active]
+    velocity = world.velocity[active]
+    vy = np.minimum(MAX_FALL_SPEED, velocity[:, 1] + GRAVITY)
+    vx = _friction(velocity[:, 0], SPRING_FRICTION)
+    world.velocity[active, 0] = vx
+    world.velocity[active, 1] = vy
+
+    hit_x = sweep(world, tilemap, active, vx, 0)
+    world.velocity[active[hit_x], 0] = 0
+    hit_y = sweep(world, tilemap, active, vy, 1)
+    world.velocity[active[hit_y], 1] = 0
+
+    _update_sleep(world, active)
+    return stepped, active
+
+
+def _overlapping(world, indices, rect):
+    """Which rows' rects (truncated like pygame.Rect) overlap a rect."""
+    pos = np.trunc(world.pos[indices]).astype(np.int64)
+    size = world.size[indices]
+    return ((pos[:, 0] < rect.right) & (rect.left < pos[:, 0] + size[:, 0])
+            & (pos[:, 1] < rect.bottom) & (rect.top < pos[:, 1] + size[:, 1]))
+
+
+def push_system(world, tilemap, indices, player_rect, direction):
+    """
+    The player walking into crates and springs pushes them.
+
+    A body the player overlaps and walks towards is pushed PUSH_SPEED pixels per
+    unit of movement unless that would put it into a wall: crates are moved
+    directly (and stopped at walls), springs are given the push as velocity.
+
+    Args:
+        world: World holding the bodies
+        tilemap: Tilemap for the wall test
+        indices: Candidate rows (the bodies near the player)
+        player_rect: The player's rect
+        direction: Horizontal movement input (-1, 0 or 1)
+
+    Returns:
+        np.ndarray: The rows that were pushed (or stopped)
+    """
+    indices = np.asarray(indices, np.int64)
+    if not direction or not len(indices):
+        return indices[:0]
+    size = world.size[indices]
+    center = np.trunc(world.pos[indices, 0]).astype(np.int64) + size[:, 0] // 2
+    if direction > 0:
+        towards = player_rect.centerx < center
+    else:
+        towards = player_rect.centerx > center
+    pushed = indices[_overlapping(world, indices, player_rect) & towards]
+    if not len(pushed):
+        return pushed
+
+    amount = abs(direction) * PUSH_SPEED
+    test_x = world.pos[pushed, 0] + (amount if direction > 0 else -amount)
+    test_pos = np.trunc(np.stack([test_x, world.pos[pushed, 1]], axis=1)).astype(np.int64)
+    size = world.size[pushed]
+    blocked = rects_hit_solid(solid_grid(world, tilemap), tilemap.tile_size,
+                              test_pos[:, 0], test_pos[:, 1], size[:, 0], size[:, 1])
+    crates = world.kind[pushed] == KIND_CRATE
+    world.pos[pushed[crates & ~blocked], 0] = test_x[crates & ~blocked]
+    world.velocity[pushed[crates & blocked], 0] = 0
+    springs = (world.kind[pushed] == KIND_SPRING) & ~blocked
+    world.velocity[pushed[springs], 0] = amount if direction > 0 else -amount
+    return pushed
+
+
+def teleport_system(game, world, indices):
+    """
+    Portal teleports for bodies that just moved (Game.check_portal_teleport for many rows).
+
+    Only a body whose last rect was centred inside a locked portal can be teleported;
+    those rows are checked and teleported against the portal pair at once (see
+    portal.teleport_between) and every other body simply has its last_pos caught up.
+
+    Returns:
+        list: Rows that were teleported
+    """
+    if not len(indices):
+        return []
+    candidates = np.zeros(len(indices), np.bool_)
+    portals = (game.player_portal, game.cursor_portal)
+    if all(portal.locked for portal in portals):
+        center = np.trunc(world.last_pos[indices]).astype(np.int64) + world.size[indices] // 2
+        for portal in portals:
+            rect = portal.get_bounds()
+            candidates |= ((center[:, 0] >= rect.left) & (center[:, 0] <= rect.right)
+                           & (center[:, 1] >= rect.top) & (center[:, 1] <= rect.bottom))
+    rows = indices[candidates]
+    if len(rows):
+        pos = world.pos[rows]
+        velocity = world.velocity[rows]
+        last_pos = world.last_pos[rows]
+        teleported = teleport_between(*portals, pos, velocity, last_pos, world.size[rows])
+        candidates[candidates] = teleported
+        rows = rows[teleported]
+        world.pos[rows] = pos[teleported]
+        world.velocity[rows] = velocity[teleported]
+        world.last_pos[rows] = last_pos[teleported]
+        world.teleported[rows] = True
+        if len(rows) and game.portal_travel_sound:
+            game.portal_travel_sound.play()
+    rest = indices[~candidates]
+    world.last_pos[rest] = world.pos[rest]
+    return rows.tolist()
+
+
+def _cell_keys(x0, y0, x1, y1, cell_size):
+    """Keys of the grid cells covered by boxes [x0, x1) x [y0, y1) (int arrays)."""
+    cx0 = x0 // cell_size
+    cy0 = y0 // cell_size
+    cx1 = (x1 - 1) // cell_size
+    cy1 = (y1 - 1) // cell_size
+    owners = []
+    keys = []
+    if not len(x0):
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    for i in range(int((cx1 - cx0).max()) + 1):
+        for j in range(int((cy1 - cy0).max()) + 1):
+            valid = np.flatnonzero((cx0 + i <= cx1) & (cy0 + j <= cy1))
+            owners.append(valid)
+            keys.append(((cx0[valid] + i) << 32) + ((cy0[valid] + j) & 0xFFFFFFFF))
+    return np.concatenate(owners), np.concatenate(keys)
+
+
+def rows_near(world, indices, boxes, cell_size=64):
+    """
+    Which rows might overlap any of a set of boxes (they share a grid cell).
+
+    A vectorised broadphase for many-against-many tests: never misses an overlap,
+    may report rows that only come close.
+
+    Args:
+        world: World holding the rows
+        indices: Rows to test
+        boxes: (x0, y0, x1, y1) int arrays of pixel boxes
+        cell_size: Grid cell size in pixels
+
+    Returns:
+        np.ndarray: True for rows sharing a cell with a box
+    """
+    near = np.zeros(len(indices), np.bool_)
+    if not len(indices) or not len(boxes[0]):
+        return near
+    _, box_keys = _cell_keys(*boxes, cell_size)
+    pos = np.trunc(world.pos[indices]).astype(np.int64)
+    size = world.size[indices]
+    owners, keys = _cell_keys(pos[:, 0], pos[:, 1], pos[:, 0] + size[:, 0], pos[:, 1] + size[:, 1], cell_size)
+    near[owners[np.isin(keys, box_keys)]] = True
+    return near
+
+
+def button_system(world, player_rect):
+    """
+    Press the buttons the player stands on.
+
+    Returns:
+        bool: True if the level has buttons and all of them are pressed
+    """
+    buttons = world.indices(KIND_BUTTON)
+    pressed = _overlapping(world, buttons, player_rect)
+    world.pressed[buttons] = pressed
+    return bool(len(buttons)) and bool(pressed.all())
+
+
+def park_system(world, rect):
+    """
+    Park the crates and springs outside a rect and unpark the ones inside.
+
+    A parked body is not stepped at all (not even woken by its velocity, unlike a
+    sleeping one): it keeps its position and velocity and carries on where it
+    stopped once the rect (the camera's view plus a margin) reaches it again.
+
+    Args:
+        world: World holding the bodies
+        rect: pygame.Rect of the area where bodies are simulated
+
+    Returns:
+        np.ndarray: Rows whose parked flag changed
+    """
+    count = world.count
+    bodies = np.flatnonzero(world.kind[:count] != KIND_BUTTON)
+    parked = ~_overlapping(world, bodies, rect)
+    changed = bodies[parked != world.parked[bodies]]
+    world.parked[bodies] = parked
+    return changed
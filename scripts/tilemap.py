@@ -1,4 +1,5 @@
 import json
+import math
 
 import pygame
 
@@ -18,12 +19,44 @@ NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1)
 PHYSICS_TILES = {'grass', 'stone'}
 AUTOTILE_TYPES = {'grass', 'stone'}
 
+# Tile classes for raycasts (bit flags, combine with |)
+TILE_SOLID = 1
+TILE_NOPORTAL = 2
+TILE_HAZARD = 4
+TILE_NOT_LOADED = 8  # A cell in a chunk of a streamed map that is not loaded (see flag_grid)
+TILE_FLAGS = dict({tile_type: TILE_SOLID for tile_type in PHYSICS_TILES}, noportalzone=TILE_NOPORTAL, spikes=TILE_HAZARD)
+
+# Pre-rendered tile layer (see Tilemap.render)
+CHUNK_SIZE = 16  # Tiles per side of a chunk
+CHUNK_PADDING = 48  # Pixels around a chunk for images larger than their tile (keys, large decor)
+
+# What tile_at returns in a chunk of a streamed map that is not loaded (see scripts/chunkstore.py)
+NOT_LOADED = object()
+
+# bytes.translate tables that set or clear TILE_NOT_LOADED in a run of flag grid cells
+MARK_NOT_LOADED = bytes(flag | TILE_NOT_LOADED for flag in range(256))
+CLEAR_NOT_LOADED = bytes(flag & ~TILE_NOT_LOADED for flag in range(256))
+
 class Tilemap:
     def __init__(self, game, tile_size=16):
         self.game = game
         self.tile_size = tile_size
         self.tilemap = {}
         self.offgrid_tiles = []
+        # Flat grid of TILE_FLAGS for raycasts, rebuilt when the tilemap changes (see flag_grid)
+        self.grid = None
+        self.grid_signature = None
+        # Pre-rendered chunks of the grid tiles, (cx, cy) -> render_chunk() result (see render)
+        self.chunks = {}
+        self.chunk_signature = None
+        # Offgrid draw list (images, world positions and rects), rebuilt when offgrid_tiles changes (see offgrid_draws)
+        self.offgrid_cache = None
+        self.offgrid_signature = None
+        # Tiles by type and chunk, rebuilt when the tilemap changes (see tiles_near)
+        self.type_index = {}
+        self.type_index_signature = None
+        # ChunkStreamer of a chunked map (see load_chunked), None when the whole map is loaded
+        self.streamer = None
         
     def extract(self, id_pairs, keep=False):
         matches = []
@@ -49,6 +82,9 @@ class Tilemap:
     def tiles_around(self, pos):
         tiles = []
         tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        # Only for loaded tiles: the game calls it around simulated bodies, which ChunkStreamer.ensure keeps loaded
+        assert self.streamer is None or self.area_loaded(pygame.Rect(
+            (tile_loc[0] - 1) * self.tile_size, (tile_loc[1] - 1) * self.tile_size, 3 * self.tile_size, 3 * self.tile_size))
         for offset in NEIGHBOR_OFFSETS:
             check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
             if check_loc in self.tilemap:
@@ -65,21 +101,315 @@ class Tilemap:
         map_data = json.load(f)
         f.close()
         
+        self.stop_streaming()
         self.tilemap = map_data['tilemap']
         self.tile_size = map_data['tile_size']
         self.offgrid_tiles = map_data['offgrid']
     
+        # Validated levels (see scripts/validation.py) are already normalised
+        if 'validation' in map_data:
+            return
+
         # Convert old red_box tiles to spring_horizontal for backwards compatibility
         for loc in self.tilemap:
             if self.tilemap[loc]['type'] == 'red_box':
                 self.tilemap[loc]['type'] = 'spring_horizontal'
+                self.invalidate_grid()
     
+    def load_chunked(self, streamer):
+        """
+        Load a chunked map: the pinned tiles and offgrid tiles now, the rest of the
+        grid as the streamer brings it in (see scripts/chunkstore.py).
+
+        Args:
+            streamer: chunkstore.ChunkStreamer of the map
+        """
+        self.stop_streaming()
+        manifest = streamer.manifest
+        self.streamer = streamer
+        self.tile_size = manifest['tile_size']
+        self.tilemap = dict(manifest['tilemap'])
+        self.offgrid_tiles = list(manifest['offgrid'])
+
+    def stop_streaming(self):
+        if self.streamer is not None:
+            self.streamer.close()
+            self.streamer = None
+
+    def chunk_loaded(self, key):
+        """Whether the tiles of a chunk are in self.tilemap (always, unless the map is streamed)."""
+        return self.streamer is None or self.streamer.is_loaded(key)
+
+    def area_loaded(self, rect):
+        """Whether every chunk overlapping a pixel rect is loaded (always, unless the map is streamed)."""
+        streamer = self.streamer
+        return streamer is None or all(streamer.is_loaded(key) for key in streamer.keys_in(self, rect))
+
+    def tile_at(self, pos):
+        """
+        The tile at a tile position.
+
+        Returns:
+            dict: The tile, None for an empty position, or NOT_LOADED when the
+                position is in a chunk of a streamed map that is not loaded
+        """
+        tile = self.tilemap.get(str(pos[0]) + ';' + str(pos[1]))
+        if tile is None and not self.chunk_loaded(self.chunk_key(pos)):
+            return NOT_LOADED
+        return tile
+
+    def add_chunk(self, key, tiles):
+        """Merge the tiles of a streamed chunk, redrawing only that chunk and updating only its grid cells."""
+        in_sync = self._chunks_in_sync()
+        grid_in_sync = self._grid_in_sync()
+        self.tilemap.update(tiles)
+        self.invalidate_chunk((key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE), in_sync)
+        self.update_grid(tiles.values(), grid_in_sync, chunk=key)
+
+    def drop_chunk(self, key, tiles):
+        """Remove the tiles of a streamed chunk (the ones add_chunk merged)."""
+        in_sync = self._chunks_in_sync()
+        grid_in_sync = self._grid_in_sync()
+        removed = [tile for tile in (self.tilemap.pop(loc, None) for loc in tiles) if tile is not None]
+        self.invalidate_chunk((key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE), in_sync)
+        self.update_grid(removed, grid_in_sync, removed=True, chunk=key)
+
+    def replace_tiles(self, tiles):
+        """
+        Swap in a new tile dict (level restart, rewind), keeping the chunks a
+        streamed map has loaded.
+        """
+        self.tilemap = tiles
+        if self.streamer is not None:
+            self.streamer.restore(self)
+
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
+        """
+        The physics tile at a pixel position, or None. In a chunk of a streamed map that
+        is not loaded it is NOT_LOADED, which is truthy: callers take it as solid.
+        """
+        tile = self.tile_at((int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)))
+        if tile is NOT_LOADED or (tile is not None and tile['type'] in PHYSICS_TILES):
+            return tile
     
+    def physics_rects_in(self, rect):
+        """
+        Rects of the physics tiles overlapping a pixel rect.
+
+        Unlike physics_rects_around (the 3x3 tiles around a point), this covers the
+        whole rect, so it can be given the area swept by a fast move (see PhysicsEntity.update).
+        Tiles of a streamed map that are not loaded yet (TILE_NOT_LOADED in the flag
+        grid) count as solid, so nothing falls through ground that is still on its way.
+        """
+        size = self.tile_size
+        streamed = self.streamer is not None
+        if streamed:
+            cells, width, height, min_x, min_y = self.flag_grid()
+        rects = []
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                tile = self.tilemap.get(str(x) + ';' + str(y))
+                if tile is not None:
+                    if tile['type'] in PHYSICS_TILES:
+                        rects.append(pygame.Rect(tile['pos'][0] * size, tile['pos'][1] * size, size, size))
+                elif (streamed and 0 <= x - min_x < width and 0 <= y - min_y < height and
+                      cells[(y - min_y) * width + x - min_x] & TILE_NOT_LOADED):
+                    rects.append(pygame.Rect(x * size, y * size, size, size))
+        return rects
+
+    def extent(self):
+        """
+        Pixel rect around every grid and offgrid tile (each offgrid tile counted as one
+        tile in size), or an empty rect at (0, 0) for an empty map. For a streamed
+        map, the extent of the whole map, loaded or not.
+        """
+        if self.streamer is not None:
+            return pygame.Rect(self.streamer.manifest['extent'])
+        size = self.tile_size
+        xs = [tile['pos'][0] * size for tile in self.tilemap.values()] + [tile['pos'][0] for tile in self.offgrid_tiles]
+        ys = [tile['pos'][1] * size for tile in self.tilemap.values()] + [tile['pos'][1] for tile in self.offgrid_tiles]
+        if not xs:
+            return pygame.Rect(0, 0, 0, 0)
+        left = int(min(xs) // 1)
+        top = int(min(ys) // 1)
+        return pygame.Rect(left, top, int(max(xs) + size) - left, int(max(ys) + size) - top)
+
+    def flag_grid(self):
+        """
+        The tilemap as a flat bytearray of TILE_FLAGS, for raycasts.
+
+        Rebuilt when self.tilemap is replaced or tiles are added or removed (the game
+        only ever removes tiles or swaps in a whole new dict); call invalidate_grid()
+        after editing tile types in place. The chunks of a streamed map are written
+        into the grid as they come and go instead (see update_grid), and the cells of
+        the chunks that are not loaded are marked TILE_NOT_LOADED.
+
+        Returns:
+            tuple: (bytearray, width, height, min_x, min_y) with cell (x, y) at
+                   (y - min_y) * width + (x - min_x)
+        """
+        signature = (id(self.tilemap), len(self.tilemap))
+        if self.grid is None or signature != self.grid_signature:
+            positions = [tile['pos'] for tile in self.tilemap.values()]
+            if self.streamer is not None:
+                # The whole map, loaded or not, so a chunk merge only rewrites its own cells (see update_grid)
+                extent = self.extent()
+                positions.append((extent.left // self.tile_size, extent.top // self.tile_size))
+                positions.append(((extent.right - 1) // self.tile_size, (extent.bottom - 1) // self.tile_size))
+            if positions:
+                min_x = min(pos[0] for pos in positions)
+                min_y = min(pos[1] for pos in positions)
+                width = max(pos[0] for pos in positions) - min_x + 1
+                height = max(pos[1] for pos in positions) - min_y + 1
+            else:
+                min_x = min_y = width = height = 0
+            cells = bytearray(width * height)
+            self.grid = (cells, width, height, min_x, min_y)
+            if self.streamer is not None:
+                for key in self.streamer.available:
+                    if not self.streamer.is_loaded(key):
+                        self._mark_chunk(key, MARK_NOT_LOADED)
+            for tile in self.tilemap.values():
+                flag = TILE_FLAGS.get(tile['type'])
+                if flag:
+                    cells[(tile['pos'][1] - min_y) * width + tile['pos'][0] - min_x] |= flag
+            self.grid_signature = signature
+        return self.grid
+
+    def invalidate_grid(self):
+        self.grid = None
+
+    def _grid_in_sync(self):
+        return self.grid is not None and self.grid_signature == (id(self.tilemap), len(self.tilemap))
+
+    def _mark_chunk(self, key, table):
+        """Translate the flag grid cells of a chunk (the part inside the grid) with MARK_NOT_LOADED or CLEAR_NOT_LOADED."""
+        cells, width, height, min_x, min_y = self.grid
+        x0 = max(key[0] * CHUNK_SIZE - min_x, 0)
+        x1 = min((key[0] + 1) * CHUNK_SIZE - min_x, width)
+        if x0 >= x1:
+            return
+        for y in range(max(key[1] * CHUNK_SIZE - min_y, 0), min((key[1] + 1) * CHUNK_SIZE - min_y, height)):
+            row = y * width
+            cells[row + x0:row + x1] = cells[row + x0:row + x1].translate(table)
+
+    def update_grid(self, tiles, in_sync, removed=False, chunk=None):
+        """
+        Write tiles that were just added to (or removed from) the tilemap into the flag grid,
+        instead of rebuilding all of it.
+
+        The cells are changed in place, in a new grid tuple so caches keyed on the grid
+        (the preview's) see the change; systems.solid_grid reads the same cells.
+
+        Args:
+            tiles: The tile dicts
+            in_sync: Whether the grid was up to date before the change; if not, or a
+                tile is outside the grid, the grid is rebuilt on the next flag_grid()
+            removed: True if the tiles were removed
+            chunk: Key of the streamed chunk the tiles came with (or went with), whose
+                cells are marked TILE_NOT_LOADED while it is not loaded
+        """
+        if not in_sync:
+            return
+        cells, width, height, min_x, min_y = self.grid
+        if chunk is not None and not removed:
+            self._mark_chunk(chunk, CLEAR_NOT_LOADED)
+        for tile in tiles:
+            x = tile['pos'][0] - min_x
+            y = tile['pos'][1] - min_y
+            if not (0 <= x < width and 0 <= y < height):
+                self.grid = None
+                return
+            cells[y * width + x] = 0 if removed else TILE_FLAGS.get(tile['type'], 0)
+        if chunk is not None and removed:
+            self._mark_chunk(chunk, MARK_NOT_LOADED)
+        self.grid = (cells, width, height, min_x, min_y)
+        self.grid_signature = (id(self.tilemap), len(self.tilemap))
+
+    def raycast(self, origin, direction, max_distance=1000.0, mask=TILE_SOLID):
+        """
+        First tile of the given classes along a ray (grid traversal, one cell at a time).
+
+        Args:
+            origin: Start point in pixels
+            direction: Ray direction (any length)
+            max_distance: Pixels to search
+            mask: TILE_SOLID, TILE_NOPORTAL and/or TILE_HAZARD
+
+        A ray also stops at the first cell of a chunk of a streamed map that is not
+        loaded (TILE_NOT_LOADED, whatever the mask): what lies there is not known yet.
+        tile_at() gives NOT_LOADED for that cell.
+
+        Returns:
+            tuple: (tile_x, tile_y, distance, normal) for the first matching tile, where
+                   normal is the (x, y) side of the tile the ray entered through ((0, 0)
+                   when the origin is inside it); None if nothing is hit
+        """
+        dx, dy = direction
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return None
+        dx /= length
+        dy /= length
+        cells, width, height, min_x, min_y = self.flag_grid()
+        mask |= TILE_NOT_LOADED
+        size = self.tile_size
+        ox, oy = origin
+        cx = math.floor(ox / size)
+        cy = math.floor(oy / size)
+
+        # Distance along the ray to the next vertical/horizontal grid line, and between lines
+        if dx > 0:
+            step_x, next_x, delta_x = 1, ((cx + 1) * size - ox) / dx, size / dx
+        elif dx < 0:
+            step_x, next_x, delta_x = -1, (cx * size - ox) / dx, -size / dx
+        else:
+            step_x, next_x, delta_x = 0, math.inf, math.inf
+        if dy > 0:
+            step_y, next_y, delta_y = 1, ((cy + 1) * size - oy) / dy, size / dy
+        elif dy < 0:
+            step_y, next_y, delta_y = -1, (cy * size - oy) / dy, -size / dy
+        else:
+            step_y, next_y, delta_y = 0, math.inf, math.inf
+
+        gx = cx - min_x
+        gy = cy - min_y
+        distance = 0.0
+        normal_x = normal_y = 0
+        while distance <= max_distance:
+            if 0 <= gx < width and 0 <= gy < height:
+                if cells[gy * width + gx] & mask:
+                    return gx + min_x, gy + min_y, distance, (normal_x, normal_y)
+            elif ((gx < 0 and step_x <= 0) or (gx >= width and step_x >= 0) or
+                  (gy < 0 and step_y <= 0) or (gy >= height and step_y >= 0)):
+                # Outside the map and moving away from it
+                return None
+            if next_x < next_y:
+                gx += step_x
+                distance = next_x
+                next_x += delta_x
+                normal_x, normal_y = -step_x, 0
+            else:
+                gy += step_y
+                distance = next_y
+                next_y += delta_y
+                normal_x, normal_y = 0, -step_y
+        return None
+
+    def segment_query(self, start, end, mask=TILE_SOLID):
+        """
+        First tile of the given classes between two points (see raycast).
+
+        Returns:
+            tuple: Same as raycast, or None when the segment is clear (line of sight)
+        """
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        if dx == 0 and dy == 0:
+            # A point: just the cell under it
+            return self.raycast(start, (1, 0), 0, mask)
+        return self.raycast(start, (dx, dy), math.hypot(dx, dy), mask)
+
     def physics_rects_around(self, pos):
         rects = []
         for tile in self.tiles_around(pos):
@@ -99,59 +429,246 @@ class Tilemap:
             neighbors = tuple(sorted(neighbors))
             if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
                 tile['variant'] = AUTOTILE_MAP[neighbors]
+        self.invalidate_chunks()
+
+    def tiles_near(self, rect, types):
+        """
+        Grid tiles of the given types in the chunks overlapping a pixel rect.
+
+        Lets per-frame checks against the player (spikes, keys, launchers) look at
+        the tiles around it instead of scanning the whole map. Like a broadphase, it
+        can return tiles outside the rect; callers still do their exact tests.
+        Within a chunk, tiles come in tilemap order. Only loaded tiles are returned,
+        so the rect must be in the area ChunkStreamer.ensure keeps loaded.
+
+        Args:
+            rect: pygame.Rect to search
+            types: Tile types to return
+
+        Returns:
+            list: Tile dicts
+        """
+        assert self.streamer is None or self.area_loaded(rect)
+        signature = (id(self.tilemap), len(self.tilemap))
+        if self.type_index_signature != signature:
+            index = {}
+            for tile in self.tilemap.values():
+                index.setdefault(tile['type'], {}).setdefault(self.chunk_key(tile['pos']), []).append(tile)
+            self.type_index = index
+            self.type_index_signature = signature
+        chunk_px = CHUNK_SIZE * self.tile_size
+        found = []
+        for tile_type in types:
+            chunks = self.type_index.get(tile_type)
+            if not chunks:
+                continue
+            for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+                for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                    tiles = chunks.get((cx, cy))
+                    if tiles:
+                        found.extend(tiles)
+        return found
+
+    def chunk_key(self, pos):
+        """The chunk a tile position (in tiles) belongs to."""
+        return (pos[0] // CHUNK_SIZE, pos[1] // CHUNK_SIZE)
+
+    def _chunks_in_sync(self):
+        return self.chunk_signature == (id(self.tilemap), len(self.tilemap))
+
+    def set_tile(self, pos, tile):
+        """
+        Put a tile on the grid (replacing any tile there), redrawing only its chunk.
+
+        Args:
+            pos: Tile position (x, y) in tiles
+            tile: Tile dict ({'type', 'variant', 'pos', ...})
+        """
+        loc = str(pos[0]) + ';' + str(pos[1])
+        if self.tilemap.get(loc) == tile:
+            return  # Editors paint the same tile every frame the mouse is held
+        in_sync = self._chunks_in_sync()
+        self.tilemap[loc] = tile
+        self.invalidate_chunk(pos, in_sync)
+
+    def remove_tile(self, loc):
+        """
+        Remove the tile at a 'x;y' location (if any), redrawing only its chunk.
+
+        Returns:
+            dict: The removed tile, or None
+        """
+        in_sync = self._chunks_in_sync()
+        tile = self.tilemap.pop(loc, None)
+        if tile is not None:
+            self.invalidate_chunk(tile['pos'], in_sync)
+        return tile
+
+    def invalidate_chunk(self, pos, in_sync=True):
+        """
+        Redraw the chunk of a tile position on the next render (after a tile changed).
+
+        Args:
+            pos: Tile position (x, y) in tiles
+            in_sync: Whether the cache was up to date before the change; if not, every
+                chunk is redrawn (tiles were changed without telling the cache)
+        """
+        self.chunks.pop(self.chunk_key(pos), None)
+        if in_sync:
+            self.chunk_signature = (id(self.tilemap), len(self.tilemap))
+
+    def invalidate_chunks(self):
+        """Redraw every chunk and the offgrid draw list on the next render (after editing tiles in place)."""
+        self.chunks = {}
+        self.offgrid_cache = None
+
+    def render_chunk(self, key):
+        """
+        Draw the tiles of one chunk into a new surface.
+
+        Tiles drawn with a surface alpha (noportalzone) are left out: blended into
+        a transparent chunk they would no longer blend with what is under them
+        the same way, so render() blits them on their own each frame.
+
+        Returns:
+            tuple: (Surface with CHUNK_PADDING around the chunk or None, list of
+                (image, world position) of the translucent tiles), or None if the
+                chunk has no tiles
+        """
+        size = self.tile_size
+        x0 = key[0] * CHUNK_SIZE
+        y0 = key[1] * CHUNK_SIZE
+        origin = (x0 * size - CHUNK_PADDING, y0 * size - CHUNK_PADDING)
+        surf = None
+        translucent = []
+        for x in range(x0, x0 + CHUNK_SIZE):
+            for y in range(y0, y0 + CHUNK_SIZE):
+                tile = self.tilemap.get(str(x) + ';' + str(y))
+                if tile is None:
+                    continue
+                images = self.game.assets.get(tile['type'])
+                if isinstance(images, list) and images[tile['variant']].get_alpha() not in (None, 255):
+                    translucent.append((images[tile['variant']], (x * size, y * size)))
+                    continue
+                if surf is None:
+                    side = CHUNK_SIZE * size + 2 * CHUNK_PADDING
+                    surf = pygame.Surface((side, side), pygame.SRCALPHA)
+                self.render_tile(surf, tile, origin)
+        if surf is None and not translucent:
+            return None
+        return surf, translucent
+
+    def render_tile(self, surf, tile, offset=(0, 0)):
+        """Draw one grid tile (spikes rotated, doors and keys centered on their tile)."""
+        if tile['type'] == 'spikes':
+            # Render spikes with rotation and positioning
+            spike_img = self.game.assets['spikes'][0].copy()
+            rotation = tile.get('rotation', 0)
+            if rotation != 0:
+                spike_img = pygame.transform.rotate(spike_img, -rotation)  # Negative for clockwise
+
+            # Position spike in the appropriate half of the tile based on rotation
+            # Spikes fill full width (16) and half height (8)
+            tile_x = tile['pos'][0] * self.tile_size - offset[0]
+            tile_y = tile['pos'][1] * self.tile_size - offset[1]
+
+            if rotation == 0:  # Pointing up (bottom half, full width)
+                spike_pos = (tile_x, tile_y + 8)
+            elif rotation == 90:  # Pointing right (left half, full height when rotated)
+                spike_pos = (tile_x, tile_y)
+            elif rotation == 180:  # Pointing down (top half, full width)
+                spike_pos = (tile_x, tile_y)
+            elif rotation == 270:  # Pointing left (right half, full height when rotated)
+                spike_pos = (tile_x + 8, tile_y)
+            else:
+                spike_pos = (tile_x, tile_y + 8)  # Default bottom half
+
+            surf.blit(spike_img, spike_pos)
+        elif tile['type'] == 'spring_horizontal' or tile['type'] == 'red_box':
+            # Render spring_horizontal tile (also handle old red_box tiles for backwards compatibility)
+            spring_horizontal_img = self.game.assets['spring_horizontal'][0]
+            surf.blit(spring_horizontal_img, (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+            # Convert old red_box to spring_horizontal
+            if tile['type'] == 'red_box':
+                tile['type'] = 'spring_horizontal'
+                self.invalidate_grid()
+        elif tile['type'] in ['door', 'key']:
+            # Center door and key on the tile (they're 48x48, tiles are 16x16)
+            tile_img = self.game.assets[tile['type']][0]
+            tile_x = tile['pos'][0] * self.tile_size - offset[0]
+            tile_y = tile['pos'][1] * self.tile_size - offset[1]
+            # Center the 48x48 image on the 16x16 tile
+            offset_x = (self.tile_size - tile_img.get_width()) // 2
+            offset_y = (self.tile_size - tile_img.get_height()) // 2
+            surf.blit(tile_img, (tile_x + offset_x, tile_y + offset_y))
+        else:
+            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+
+    def offgrid_draws(self):
+        """
+        The offgrid tiles render() draws, as parallel lists of images, world
+        positions and world rects, in offgrid_tiles order.
+
+        Cached until offgrid_tiles is replaced or changes length, or
+        invalidate_chunks() is called (for tiles edited in place).
+        """
+        if self.offgrid_cache is None or self.offgrid_signature[0] is not self.offgrid_tiles \
+                or self.offgrid_signature[1] != len(self.offgrid_tiles):
+            images, positions, rects = [], [], []
+            assets = self.game.assets
+            for tile in self.offgrid_tiles:
+                # Skip rendering spawner variants that are handled elsewhere (boxes=1, springs=3)
+                if tile['type'] == 'spawners' and tile['variant'] in [1, 3]:
+                    continue  # These are handled by game/editor rendering
+                # Door and key are already centered in their position, so render them directly
+                img = assets[tile['type']][tile['variant']]
+                images.append(img)
+                positions.append((tile['pos'][0], tile['pos'][1]))
+                rects.append(pygame.Rect(tile['pos'][0], tile['pos'][1], img.get_width(), img.get_height()))
+            self.offgrid_cache = (images, positions, rects)
+            self.offgrid_signature = (self.offgrid_tiles, len(self.offgrid_tiles))
+        return self.offgrid_cache
 
     def render(self, surf, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
-            # Skip rendering spawner variants that are handled elsewhere (boxes=1, springs=3)
-            if tile['type'] == 'spawners' and tile['variant'] in [1, 3]:
-                continue  # These are handled by game/editor rendering
-            # Door and key are already centered in their position, so render them directly
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-            
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    if tile['type'] == 'spikes':
-                        # Render spikes with rotation and positioning
-                        spike_img = self.game.assets['spikes'][0].copy()
-                        rotation = tile.get('rotation', 0)
-                        if rotation != 0:
-                            spike_img = pygame.transform.rotate(spike_img, -rotation)  # Negative for clockwise
-                        
-                        # Position spike in the appropriate half of the tile based on rotation
-                        # Spikes fill full width (16) and half height (8)
-                        tile_x = tile['pos'][0] * self.tile_size - offset[0]
-                        tile_y = tile['pos'][1] * self.tile_size - offset[1]
-                        
-                        if rotation == 0:  # Pointing up (bottom half, full width)
-                            spike_pos = (tile_x, tile_y + 8)
-                        elif rotation == 90:  # Pointing right (left half, full height when rotated)
-                            spike_pos = (tile_x, tile_y)
-                        elif rotation == 180:  # Pointing down (top half, full width)
-                            spike_pos = (tile_x, tile_y)
-                        elif rotation == 270:  # Pointing left (right half, full height when rotated)
-                            spike_pos = (tile_x + 8, tile_y)
-                        else:
-                            spike_pos = (tile_x, tile_y + 8)  # Default bottom half
-                        
-                        surf.blit(spike_img, spike_pos)
-                    elif tile['type'] == 'spring_horizontal' or tile['type'] == 'red_box':
-                        # Render spring_horizontal tile (also handle old red_box tiles for backwards compatibility)
-                        spring_horizontal_img = self.game.assets['spring_horizontal'][0]
-                        surf.blit(spring_horizontal_img, (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
-                        # Convert old red_box to spring_horizontal
-                        if tile['type'] == 'red_box':
-                            tile['type'] = 'spring_horizontal'
-                    elif tile['type'] in ['door', 'key']:
-                        # Center door and key on the tile (they're 48x48, tiles are 16x16)
-                        tile_img = self.game.assets[tile['type']][0]
-                        tile_x = tile['pos'][0] * self.tile_size - offset[0]
-                        tile_y = tile['pos'][1] * self.tile_size - offset[1]
-                        # Center the 48x48 image on the 16x16 tile
-                        offset_x = (self.tile_size - tile_img.get_width()) // 2
-                        offset_y = (self.tile_size - tile_img.get_height()) // 2
-                        surf.blit(tile_img, (tile_x + offset_x, tile_y + offset_y))
-                    else:
-                        surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+        """
+        Draw the offgrid tiles in view, then the grid tiles.
+
+        Each layer is one Surface.blits call. Offgrid tiles come from a cached draw
+        list (see offgrid_draws); grid tiles are drawn from pre-rendered chunks of
+        CHUNK_SIZE x CHUNK_SIZE tiles, so a frame is a handful of chunk blits
+        however dense the map is. A chunk is redrawn after a tile in it changes
+        through set_tile / remove_tile; replacing self.tilemap or adding/removing
+        tiles directly redraws them all, and so does invalidate_chunks() (for
+        tiles edited in place).
+
+        surf may be a presenter canvas (see scripts/presenter.py): chunk surfaces
+        are never drawn on once rendered, so the renderer backend uploads each one
+        as a texture once and reuses it until the chunk is redrawn.
+        """
+        view = surf.get_rect(topleft=offset)
+        images, positions, rects = self.offgrid_draws()
+        ox, oy = offset
+        # Offgrid tiles in view, in one blits call (collidelistall keeps their order)
+        surf.blits([(images[i], (positions[i][0] - ox, positions[i][1] - oy)) for i in view.collidelistall(rects)], doreturn=False)
+
+        if not self._chunks_in_sync():
+            self.chunks = {}
+            self.chunk_signature = (id(self.tilemap), len(self.tilemap))
+        chunk_px = CHUNK_SIZE * self.tile_size
+        chunks = self.chunks
+        # Chunks whose padded surface reaches into the view, each followed by its
+        # translucent tiles, all in one blits call
+        blits = []
+        for cx in range((ox - CHUNK_PADDING) // chunk_px, (ox + surf.get_width() + CHUNK_PADDING) // chunk_px + 1):
+            for cy in range((oy - CHUNK_PADDING) // chunk_px, (oy + surf.get_height() + CHUNK_PADDING) // chunk_px + 1):
+                key = (cx, cy)
+                if key not in chunks:
+                    chunks[key] = self.render_chunk(key)
+                chunk = chunks[key]
+                if chunk is not None:
+                    chunk_surf, translucent = chunk
+                    if chunk_surf is not None:
+                        blits.append((chunk_surf, (cx * chunk_px - CHUNK_PADDING - ox, cy * chunk_px - CHUNK_PADDING - oy)))
+                    if translucent:
+                        blits += [(img, (x - ox, y - oy)) for img, (x, y) in translucent]
+        surf.blits(blits, doreturn=False)
@@ -21,16 +21,27 @@ def load_images(path):
         images.append(load_image(os.path.join(path, img_name)))
     return images
 
+def asset_images(assets):
+    """Every Surface in an assets dict (Surfaces, lists of Surfaces and Animation frames)."""
+    for value in assets.values():
+        if isinstance(value, pygame.Surface):
+            yield value
+        elif isinstance(value, list):
+            yield from (image for image in value if isinstance(image, pygame.Surface))
+        elif isinstance(value, Animation):
+            yield from value.images
+
 class Animation:
-    def __init__(self, images, img_dur=5, loop=True):
+    def __init__(self, images, img_dur=5, loop=True, flipped=None):
         self.images = images
         self.loop = loop
         self.img_duration = img_dur
         self.done = False
         self.frame = 0
+        self.flipped = {} if flipped is None else flipped  # id(image) -> (image, mirrored copy), shared by copies
     
     def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
+        return Animation(self.images, self.img_duration, self.loop, self.flipped)
     
     def update(self):
         if self.loop:
@@ -40,5 +51,13 @@ class Animation:
             if self.frame >= self.img_duration * len(self.images) - 1:
                 self.done = True
     
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
+    def img(self, flip=False):
+        image = self.images[int(self.frame / self.img_duration)]
+        if not flip:
+            return image
+        # Mirrored once per frame image, so drawing makes no new Surface
+        entry = self.flipped.get(id(image))
+        if entry is None or entry[0] is not image:
+            entry = (image, pygame.transform.flip(image, True, False))
+            self.flipped[id(image)] = entry
+        return entry[1]
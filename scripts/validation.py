@@ -0,0 +1,290 @@
+"""
+Validation and auto-repair for generated levels.
+
+Gemini output is checked once, at generation time, and turned into a
+normalised level that Tilemap.load and Game.load_level can consume without
+any further checks:
+- every entry has a known type, an in-range variant and an integer [x, y] pos
+- grid tiles are keyed by their pos and clamped into the 34x24 map bounds
+- duplicate tiles (except offgrid spawners) are dropped and grass/stone
+  variants are re-autotiled
+- the level has exactly one player spawn and at least one door
+
+Everything that was changed is recorded in a validation report stored with
+the level. Levels that cannot be repaired raise LevelValidationError.
+"""
+import math
+
+from scripts.tilemap import Tilemap, PHYSICS_TILES
+
+# Level bounds used by every map (34x24 tiles = 544x384 pixels)
+MAP_WIDTH = 34
+MAP_HEIGHT = 24
+TILE_SIZE = 16
+
+# Number of variants for each tile type (matches data/images)
+TILE_VARIANTS = {
+    'grass': 9,
+    'stone': 9,
+    'decor': 4,
+    'large_decor': 4,
+    'noportalzone': 1,
+    'spikes': 1,
+    'spring_horizontal': 1,
+    'door': 1,
+    'key': 1,
+}
+SPAWNER_VARIANTS = {0, 1, 2, 3, 7}  # player, crate, button, spring, exit door
+
+# Offgrid door (17x32) and key (48x48) positions are the sprite's top-left,
+# centered on a 16x16 tile the same way the editor places them
+SPRITE_OFFSETS = {
+    'door': ((TILE_SIZE - 17) // 2, (TILE_SIZE - 32) // 2),
+    'key': ((TILE_SIZE - 48) // 2, (TILE_SIZE - 48) // 2),
+}
+
+VALIDATION_VERSION = 1
+
+
+class LevelValidationError(ValueError):
+    """Raised when a level is too broken to repair."""
+
+
+def _parse_pos(pos):
+    """Accept [x, y], (x, y), "x;y" or "x,y" and return [x, y] as numbers (or None)."""
+    if isinstance(pos, str):
+        for sep in (';', ','):
+            if sep in pos:
+                pos = pos.strip('[]() ').split(sep)
+                break
+        else:
+            return None
+    if not isinstance(pos, (list, tuple)) or len(pos) != 2:
+        return None
+    try:
+        return [float(pos[0]), float(pos[1])]
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_tile(tile, loc=None, ongrid=True):
+    """
+    Repair a single tilemap / offgrid entry.
+
+    Args:
+        tile: The raw entry
+        loc: The tilemap key the entry was stored under (used when pos is missing)
+        ongrid: True for tilemap entries (tile coordinates), False for offgrid (pixels)
+
+    Returns:
+        tuple: (tile, repairs) where tile is the normalised entry, or None if the
+               entry should be dropped, and repairs is a list of descriptions
+    """
+    repairs = []
+    if not isinstance(tile, dict) or not isinstance(tile.get('type'), str):
+        return None, [f"dropped entry without a type: {tile!r}"]
+
+    tile_type = tile['type']
+    if tile_type == 'red_box':
+        tile_type = 'spring_horizontal'
+        repairs.append("converted red_box to spring_horizontal")
+    if tile_type not in TILE_VARIANTS and tile_type != 'spawners':
+        return None, [f"dropped unknown tile type {tile_type!r}"]
+
+    pos = _parse_pos(tile.get('pos'))
+    if pos is None and ongrid and loc is not None:
+        pos = _parse_pos(loc)
+        if pos is not None:
+            repairs.append(f"restored missing pos of {loc} from its key")
+    if pos is None:
+        return None, [f"dropped {tile_type} with invalid pos {tile.get('pos')!r}"]
+    raw_pos = tile.get('pos')
+    if raw_pos is not None and not (isinstance(raw_pos, list) and all(isinstance(v, int) and not isinstance(v, bool) for v in raw_pos)):
+        repairs.append(f"normalised pos {raw_pos!r} of {tile_type}")
+    if ongrid:
+        pos = [math.floor(pos[0]), math.floor(pos[1])]
+    else:
+        pos = [int(round(pos[0])), int(round(pos[1]))]
+
+    variant = tile.get('variant', 0)
+    if not isinstance(variant, int) or isinstance(variant, bool):
+        try:
+            variant = int(variant)
+        except (TypeError, ValueError):
+            variant = 0
+        repairs.append(f"normalised variant of {tile_type} to {variant}")
+    if tile_type == 'spawners':
+        if variant not in SPAWNER_VARIANTS:
+            return None, [f"dropped spawner with unknown variant {variant}"]
+    elif not 0 <= variant < TILE_VARIANTS[tile_type]:
+        clamped = max(0, min(TILE_VARIANTS[tile_type] - 1, variant))
+        repairs.append(f"clamped {tile_type} variant {variant} to {clamped}")
+        variant = clamped
+
+    normalized = {'type': tile_type, 'variant': variant, 'pos': pos}
+    if tile_type == 'spikes':
+        rotation = tile.get('rotation', 0)
+        try:
+            snapped = int(round(float(rotation) / 90.0)) * 90 % 360
+        except (TypeError, ValueError):
+            snapped = 0
+        if snapped != rotation:
+            repairs.append(f"snapped spike rotation {rotation!r} to {snapped}")
+        normalized['rotation'] = snapped
+    return normalized, repairs
+
+
+def _clamp_grid(pos):
+    return [max(0, min(MAP_WIDTH - 1, pos[0])), max(0, min(MAP_HEIGHT - 1, pos[1]))]
+
+
+def _clamp_pixels(tile):
+    # Door and key positions are the top-left of a sprite centered on a tile
+    margin_x, margin_y = SPRITE_OFFSETS.get(tile['type'], (0, 0))
+    pos = tile['pos']
+    return [max(margin_x, min(MAP_WIDTH * TILE_SIZE - TILE_SIZE + margin_x, pos[0])),
+            max(margin_y, min(MAP_HEIGHT * TILE_SIZE - TILE_SIZE + margin_y, pos[1]))]
+
+
+def door_pos_on_floor(x, y):
+    """Pixel pos of a door standing on the floor below tile (x, y)."""
+    return [x * TILE_SIZE + SPRITE_OFFSETS['door'][0], (y + 1) * TILE_SIZE - 32]
+
+
+def key_pos_at(x, y):
+    """Pixel pos of a key centered on tile (x, y)."""
+    return [x * TILE_SIZE + SPRITE_OFFSETS['key'][0], y * TILE_SIZE + SPRITE_OFFSETS['key'][1]]
+
+
+def _standable_cells(tilemap):
+    """Empty cells with room for the player and solid ground directly below."""
+    cells = []
+    for y in range(1, MAP_HEIGHT - 1):
+        for x in range(MAP_WIDTH):
+            below = tilemap.get(str(x) + ';' + str(y + 1))
+            if below is None or below['type'] not in PHYSICS_TILES:
+                continue
+            if str(x) + ';' + str(y) in tilemap or str(x) + ';' + str(y - 1) in tilemap:
+                continue
+            cells.append((x, y))
+    return cells
+
+
+def validate_level(map_data):
+    """
+    Check, repair and compile a level.
+
+    Args:
+        map_data: Parsed level JSON ({'tilemap', 'tile_size', 'offgrid'})
+
+    Returns:
+        tuple: (level, report) where level is the normalised level (with the report
+               stored under 'validation') and report describes every repair
+    """
+    if not isinstance(map_data, dict):
+        raise LevelValidationError("Level is not a JSON object")
+    raw_tilemap = map_data.get('tilemap')
+    raw_offgrid = map_data.get('offgrid', [])
+    if not isinstance(raw_tilemap, dict):
+        raise LevelValidationError("Level is missing a 'tilemap' object")
+    if not isinstance(raw_offgrid, list):
+        raise LevelValidationError("Level 'offgrid' is not a list")
+
+    repairs = []
+    if map_data.get('tile_size', TILE_SIZE) != TILE_SIZE:
+        repairs.append(f"reset tile_size {map_data.get('tile_size')!r} to {TILE_SIZE}")
+
+    # Grid tiles: in-bounds tiles first so clamped tiles never overwrite them
+    in_bounds = []
+    clamped = []
+    for loc, raw_tile in raw_tilemap.items():
+        tile, tile_repairs = normalize_tile(raw_tile, loc, ongrid=True)
+        repairs.extend(tile_repairs)
+        if tile is None:
+            continue
+        bounded = _clamp_grid(tile['pos'])
+        if bounded != tile['pos']:
+            repairs.append(f"clamped {tile['type']} at {tile['pos']} into the map bounds")
+            tile['pos'] = bounded
+            clamped.append(tile)
+        else:
+            in_bounds.append(tile)
+
+    tilemap = {}
+    for tile in in_bounds + clamped:
+        loc = str(tile['pos'][0]) + ';' + str(tile['pos'][1])
+        if loc in tilemap:
+            repairs.append(f"dropped duplicate {tile['type']} at {loc}")
+            continue
+        tilemap[loc] = tile
+
+    offgrid = []
+    seen = set()
+    for raw_tile in raw_offgrid:
+        tile, tile_repairs = normalize_tile(raw_tile, ongrid=False)
+        repairs.extend(tile_repairs)
+        if tile is None:
+            continue
+        bounded = _clamp_pixels(tile)
+        if bounded != tile['pos']:
+            repairs.append(f"clamped offgrid {tile['type']} at {tile['pos']} into the map bounds")
+            tile['pos'] = bounded
+        # Spawners are left alone: several crates can spawn from the same spot on purpose
+        # (level2 stacks seven), and extra player spawns are handled below
+        ident = (tile['type'], tile['variant'], tuple(tile['pos']))
+        if tile['type'] != 'spawners' and ident in seen:
+            repairs.append(f"dropped duplicate offgrid {tile['type']} at {tile['pos']}")
+            continue
+        seen.add(ident)
+        offgrid.append(tile)
+
+    if not any(tile['type'] in PHYSICS_TILES for tile in tilemap.values()):
+        raise LevelValidationError("Level has no solid tiles")
+
+    # Exactly one player spawn
+    spawns = [(True, loc) for loc, tile in tilemap.items() if tile['type'] == 'spawners' and tile['variant'] == 0]
+    spawns += [(False, tile) for tile in offgrid if tile['type'] == 'spawners' and tile['variant'] == 0]
+    for ongrid, extra in spawns[1:]:
+        if ongrid:
+            del tilemap[extra]
+        else:
+            offgrid.remove(extra)
+        repairs.append("removed extra player spawn")
+
+    standable = _standable_cells(tilemap)
+    if not spawns:
+        if not standable:
+            raise LevelValidationError("Level has no player spawn and nowhere to place one")
+        x, y = standable[0]
+        tilemap[str(x) + ';' + str(y)] = {'type': 'spawners', 'variant': 0, 'pos': [x, y]}
+        repairs.append(f"added missing player spawn at {[x, y]}")
+        spawn_cell = (x, y)
+    elif spawns[0][0]:
+        spawn_cell = tuple(tilemap[spawns[0][1]]['pos'])
+    else:
+        spawn_cell = (spawns[0][1]['pos'][0] // TILE_SIZE, spawns[0][1]['pos'][1] // TILE_SIZE)
+
+    # At least one door (placed as far from the spawn as possible)
+    has_door = any(tile['type'] == 'door' for tile in tilemap.values()) or \
+               any(tile['type'] == 'door' for tile in offgrid)
+    if not has_door:
+        candidates = [cell for cell in standable if cell != spawn_cell]
+        if not candidates:
+            raise LevelValidationError("Level has no door and nowhere to place one")
+        x, y = max(candidates, key=lambda c: abs(c[0] - spawn_cell[0]) + abs(c[1] - spawn_cell[1]))
+        offgrid.append({'type': 'door', 'variant': 0, 'pos': door_pos_on_floor(x, y)})
+        repairs.append(f"added missing door at tile {[x, y]}")
+
+    # Fix grass/stone edge variants with the same autotiler the editor uses
+    autotiler = Tilemap(None, tile_size=TILE_SIZE)
+    autotiler.tilemap = tilemap
+    autotiler.autotile()
+
+    report = {
+        'version': VALIDATION_VERSION,
+        'tiles': len(tilemap),
+        'offgrid': len(offgrid),
+        'repairs': repairs,
+    }
+    level = {'tilemap': tilemap, 'tile_size': TILE_SIZE, 'offgrid': offgrid, 'validation': report}
+    return level, report
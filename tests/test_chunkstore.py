@@ -0,0 +1,67 @@
+import json
+import random
+
+from game import Game
+from scripts.chunkstore import split_map
+from scripts.tilemap import CHUNK_SIZE, NOT_LOADED, TILE_NOT_LOADED
+
+WIDTH = 400  # Tiles: many chunks beyond the loaded area
+
+
+def wide_map(path):
+    """A long floor with scattered walls, spikes and no-portal zones."""
+    rng = random.Random(5)
+    tilemap = {}
+    for x in range(WIDTH):
+        tilemap[str(x) + ';20'] = {'type': 'stone', 'variant': 1, 'pos': [x, 20]}
+        if rng.random() < 0.2:
+            y = rng.randrange(2, 18)
+            tilemap[str(x) + ';' + str(y)] = {'type': rng.choice(['grass', 'spikes', 'noportalzone', 'decor']),
+                                              'variant': 0, 'pos': [x, y]}
+    offgrid = [{'type': 'spawners', 'variant': 0, 'pos': [32, 288]}]
+    with open(path, 'w') as f:
+        json.dump({'tilemap': tilemap, 'tile_size': 16, 'offgrid': offgrid}, f)
+    return str(path)
+
+
+def test_chunk_merges_update_the_grid_in_place(tmp_path):
+    split_map(wide_map(tmp_path / 'wide.json'), str(tmp_path / 'wide.chunks'))
+    game = Game(str(tmp_path / 'wide.chunks'), headless=True)
+    tilemap = game.tilemap
+    streamer = tilemap.streamer
+    streamer.capacity = 6  # Chunks behind the camera are dropped again
+    cells = tilemap.flag_grid()[0]
+    game.movement = [False, True]
+    for frame in range(1200):
+        game.step()
+        if frame % 200 == 199:
+            # Chunks came and went without rebuilding the grid, and it matches a rebuild
+            assert tilemap.flag_grid()[0] is cells
+            merged = bytes(cells)
+            tilemap.invalidate_grid()
+            cells = tilemap.flag_grid()[0]
+            assert bytes(cells) == merged
+
+    tilemap.stop_streaming()
+    assert not streamer.thread.is_alive()
+
+
+def test_queries_stop_at_chunks_that_are_not_loaded(tmp_path):
+    split_map(wide_map(tmp_path / 'wide.json'), str(tmp_path / 'wide.chunks'))
+    game = Game(str(tmp_path / 'wide.chunks'), headless=True)
+    tilemap = game.tilemap
+    # Row 19 is empty all along, just above the floor
+    hit = tilemap.raycast((8, 19 * 16 + 8), (1, 0), WIDTH * 16)
+    assert hit is not None and hit[0] % CHUNK_SIZE == 0 and hit[:2] != (WIDTH, 19)
+    assert tilemap.tile_at(hit[:2]) is NOT_LOADED and tilemap.tile_at((hit[0] - 1, 19)) is None
+    assert tilemap.solid_check((hit[0] * 16, 19 * 16)) is NOT_LOADED
+
+    # Dropped chunks are marked again (the player starts in chunk (0, 1))
+    streamer = tilemap.streamer
+    assert (0, 1) in streamer.resident
+    cells, width, height, min_x, min_y = tilemap.flag_grid()
+    streamer.capacity = 0
+    streamer.evict(tilemap)
+    assert cells[(19 - min_y) * width - min_x] & TILE_NOT_LOADED
+    assert tilemap.segment_query((8, 19 * 16 + 8), (8, 19 * 16 + 8)) is not None
+    tilemap.stop_streaming()
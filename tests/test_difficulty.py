@@ -0,0 +1,30 @@
+import os
+
+from scripts import difficulty
+
+LEVEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps', 'level1.json')
+
+
+def fake_batch(jobs):
+    """Every other episode completes, without simulating."""
+    return [{'completed': seed % 2 == 0, 'frames': 100, 'frames_to_key': 50,
+             'frames_to_door': 100 if seed % 2 == 0 else None, 'death_cause': None if seed % 2 == 0 else 'fall'}
+            for _, _, seed in jobs]
+
+
+def test_cache_answers_only_the_same_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(difficulty, 'CACHE_PATH', str(tmp_path / 'cache.json'))
+    monkeypatch.setattr(difficulty, '_run_batch', fake_batch)
+
+    def estimate(**kwargs):
+        return difficulty.estimate_difficulty(LEVEL, processes=1, batch_size=10, tolerance=0.0, **kwargs)
+
+    quick = estimate(max_episodes=20, policies=('random',))
+    assert not quick['cached'] and quick['episodes'] == 20
+    assert estimate(max_episodes=20, policies=('random',))['cached']
+    # A bigger budget, other policies or another seed are not answered by the quick run
+    longer = estimate(max_episodes=40, policies=('random',))
+    assert not longer['cached'] and longer['episodes'] == 40
+    assert not estimate(max_episodes=20)['cached']
+    assert not estimate(max_episodes=20, policies=('random',), seed=1)['cached']
+    assert estimate(max_episodes=40, policies=('random',))['cached']
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from scripts import fixedpoint
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps')
+STEPS = 300
+
+
+@pytest.mark.parametrize('level', ['level1.json', 'level2.json'])
+@pytest.mark.parametrize('fixed_point', [True, False])
+def test_input_log_replays_to_the_same_hashes(level, fixed_point):
+    level_path = os.path.join(MAPS, level)
+    actions = fixedpoint.random_actions(STEPS, seed=7)
+    first = fixedpoint.replay_hashes(level_path, actions, fixed_point)
+    assert first
+    assert fixedpoint.replay_hashes(level_path, actions, fixed_point) == first
+
+
+def test_fixed_point_replay_matches_in_a_fresh_process():
+    actions = fixedpoint.random_actions(STEPS, seed=11)
+    hashes, repeatable = fixedpoint.check_replay(os.path.join(MAPS, 'level1.json'), actions, fixed_point=True)
+    assert hashes and repeatable
+
+
+def test_state_hash_only_sees_subpixel_state():
+    state = (1, 0.5, 3.25, 100.0)
+    assert fixedpoint.state_hash(state) == fixedpoint.state_hash([1, 0.5 + 1e-9, 3.25, 100.0])
+    assert fixedpoint.state_hash(state) != fixedpoint.state_hash((1, 0.5, 3.25 + 1 / fixedpoint.SUBPIXELS, 100.0))
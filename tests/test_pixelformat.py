@@ -0,0 +1,46 @@
+import glob
+import json
+import os
+
+import pygame
+
+from game import Game
+import level_select
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps')
+
+
+def frames(game, level):
+    """The game's frames while it runs right and jumps through a level."""
+    game.load_level(level)
+    game.movement = [False, True]
+    drawn = []
+    for frame in range(90):
+        game.step()
+        if frame == 30:
+            game.jump()
+        if frame % 15 == 0:
+            game.sim_accumulator = 0
+            game.render(game.interpolation_alpha())
+            drawn.append(pygame.image.tobytes(game.display_2, 'RGB'))
+    return drawn
+
+
+def test_optimised_assets_draw_the_same_frames():
+    level = os.path.join(MAPS, 'level1.json')
+    as_loaded = frames(Game(level, headless=True, optimise_formats=False), level)
+    game = Game(level, headless=True, optimise_formats=True)
+    assert game.assets['background'].get_flags() & pygame.RLEACCELOK
+    assert frames(game, level) == as_loaded
+
+
+def test_optimised_preview_assets_draw_the_same_previews():
+    as_loaded = level_select._load_level_preview_assets(None, optimise_formats=False)
+    optimised = level_select._load_level_preview_assets(None)
+    assert optimised['grass'][0].get_flags() & pygame.RLEACCELOK
+    for path in sorted(glob.glob(os.path.join(MAPS, 'level*.json'))):
+        with open(path) as f:
+            data = json.load(f)
+        expected = level_select._render_level_data(data, 270, 190, as_loaded)
+        drawn = level_select._render_level_data(data, 270, 190, optimised)
+        assert pygame.image.tobytes(drawn, 'RGB') == pygame.image.tobytes(expected, 'RGB'), path
@@ -0,0 +1,133 @@
+import random
+
+import numpy as np
+import pytest
+
+from scripts.portal import Portal, EDGES, LOCK_TYPES
+
+
+class Body:
+    def __init__(self, pos, velocity, size):
+        self.pos = list(pos)
+        self.velocity = list(velocity)
+        self.last_pos = list(pos)
+        self.size = size
+
+
+def branch_teleport(lock_type, exit_edge, relative_position, exit_rect, entity):
+    """Portal.teleport_entity as it was before TRANSFORMS: one branch per lock type and edge."""
+    old_velocity = entity.velocity.copy()
+    offset = 4
+    vx, vy = old_velocity
+
+    def along_vertical():
+        y = exit_rect.top + (relative_position * exit_rect.height) - entity.size[1] // 2
+        return max(exit_rect.top, min(exit_rect.bottom - entity.size[1], y))
+
+    def along_horizontal():
+        x = exit_rect.left + (relative_position * exit_rect.width) - entity.size[0] // 2
+        return max(exit_rect.left, min(exit_rect.right - entity.size[0], x))
+
+    if lock_type == 'left':
+        if exit_edge == 'left':
+            entity.pos[0] = exit_rect.right - entity.size[0] - offset
+            entity.pos[1] = along_vertical()
+            entity.velocity[0] = vx if vx < 0 else -abs(vx)
+            entity.velocity[1] = vy
+            entity.last_pos[0] = exit_rect.right + 1
+        elif exit_edge == 'right':
+            entity.pos[0] = exit_rect.left + offset
+            entity.pos[1] = along_vertical()
+            entity.velocity[0] = abs(vx) if vx != 0 else (abs(vy) if vy != 0 else 2.0)
+            entity.velocity[1] = vy
+            entity.last_pos[0] = exit_rect.left - entity.size[0] - 1
+        elif exit_edge == 'top':
+            entity.pos[0] = along_horizontal()
+            entity.pos[1] = exit_rect.bottom - entity.size[1] - offset
+            entity.velocity[0] = vx
+            entity.velocity[1] = vy if vy < 0 else -abs(vy)
+            entity.last_pos[1] = exit_rect.bottom + 1
+        elif exit_edge == 'bottom':
+            entity.pos[0] = along_horizontal()
+            entity.pos[1] = exit_rect.top + offset
+            entity.velocity[0] = vx
+            entity.velocity[1] = vy if vy > 0 else abs(vy)
+            entity.last_pos[1] = exit_rect.top - entity.size[1] - 1
+    elif lock_type == 'right':
+        if exit_edge == 'right':
+            entity.pos[0] = along_horizontal()
+            entity.pos[1] = exit_rect.bottom - entity.size[1] - offset
+            speed = abs(vx) or (abs(vy) if abs(vy) > 0 else 2.0)
+            entity.velocity[0] = 0
+            entity.velocity[1] = -speed
+            entity.last_pos[1] = exit_rect.bottom + 1
+        elif exit_edge == 'bottom':
+            entity.pos[0] = exit_rect.right - entity.size[0] - offset
+            entity.pos[1] = along_vertical()
+            speed = abs(vy) if vy > 0 else 0
+            entity.velocity[0] = -speed
+            entity.velocity[1] = 0
+            entity.last_pos[0] = exit_rect.right + 1
+        elif exit_edge == 'left':
+            entity.pos[0] = along_horizontal()
+            entity.pos[1] = exit_rect.top + offset
+            speed = abs(vx) or (abs(vy) if abs(vy) > 0 else 2.0)
+            entity.velocity[0] = 0
+            entity.velocity[1] = speed
+            entity.last_pos[1] = exit_rect.top - entity.size[1] - 1
+        elif exit_edge == 'top':
+            entity.pos[0] = exit_rect.left + offset
+            entity.pos[1] = along_vertical()
+            speed = abs(vy) or (abs(vx) if abs(vx) > 0 else 2.0)
+            entity.velocity[0] = speed
+            entity.velocity[1] = 0
+            entity.last_pos[0] = exit_rect.left - entity.size[0] - 1
+
+
+def random_velocity(rng):
+    return rng.choice([0, 0.0, -0.0, rng.uniform(-12, 12), rng.randint(-5, 5)])
+
+
+def portal_pair(lock_type, rng):
+    entry = Portal(None)
+    exit_portal = Portal(None)
+    entry.pos = [rng.randint(-200, 200), rng.randint(-200, 200)]
+    exit_portal.pos = [rng.randint(-200, 200), rng.randint(-200, 200)]
+    entry.lock(lock_type)
+    exit_portal.lock(lock_type)
+    return entry, exit_portal
+
+
+def same(a, b):
+    """Equal values, down to the type and the sign of zero."""
+    return [(type(x), x, np.copysign(1, x)) for x in a] == [(type(x), x, np.copysign(1, x)) for x in b]
+
+
+@pytest.mark.parametrize('lock_type', LOCK_TYPES[1:])
+@pytest.mark.parametrize('exit_edge', EDGES)
+def test_tables_match_the_old_branches(lock_type, exit_edge):
+    rng = random.Random(lock_type + exit_edge)
+    for _ in range(500):
+        entry, exit_portal = portal_pair(lock_type, rng)
+        size = (rng.randint(4, 20), rng.randint(4, 20))
+        pos = (rng.uniform(-300, 300), rng.uniform(-300, 300))
+        velocity = (random_velocity(rng), random_velocity(rng))
+        relative = rng.random()
+        expected = Body(pos, velocity, size)
+        branch_teleport(lock_type, exit_edge, relative, exit_portal.get_rect(), expected)
+        body = Body(pos, velocity, size)
+        assert entry.teleport_entity(body, exit_portal, exit_edge, relative)
+        assert body.pos == expected.pos
+        assert same(body.velocity, expected.velocity)
+        assert body.last_pos == expected.last_pos
+
+        # The batch path, value for value (its velocities are floats, so int 0 is 0.0)
+        expected = Body(pos, [float(v) for v in velocity], size)
+        branch_teleport(lock_type, exit_edge, relative, exit_portal.get_rect(), expected)
+        arrays = [np.array([value], float) for value in (pos, velocity, pos)]
+        entry.teleport_arrays(exit_portal, np.array([EDGES.index(exit_edge)]), np.array([relative]),
+                              arrays[0], arrays[1], arrays[2], np.array([size]))
+        assert arrays[0][0].tolist() == expected.pos
+        assert arrays[1][0].tolist() == expected.velocity
+        assert np.signbit(arrays[1][0]).tolist() == np.signbit(expected.velocity).tolist()
+        assert arrays[2][0].tolist() == expected.last_pos
@@ -0,0 +1,99 @@
+import numpy as np
+import pygame
+import pytest
+
+from scripts import presenter
+
+
+def assert_looks_the_same(expected, drawn):
+    """The same picture, allowing blending to round a channel differently."""
+    expected = np.frombuffer(expected, np.uint8).astype(np.int16)
+    drawn = np.frombuffer(drawn, np.uint8).astype(np.int16)
+    assert expected.shape == drawn.shape
+    assert np.abs(expected - drawn).max() <= 2
+
+
+def draw_screens(backend):
+    """The draw calls of a few screens in a row, and the window after each present."""
+    frame = pygame.Surface((540, 380))
+    cursor = pygame.Surface((16, 16), pygame.SRCALPHA)
+    cursor.fill((255, 255, 255, 255))
+    shade = pygame.Surface((960, 640), pygame.SRCALPHA)
+    shade.fill((0, 0, 0, 60))
+    # (draw a frame, what to draw on the overlay, draw the cursor): the game, its
+    # win screen, then a fade over the last frame, as the screens in main.py do
+    steps = [(True, None, True), (True, 'box', True), (True, None, False),
+             (False, 'fade', False), (False, 'fade', False), (True, None, True)]
+    pictures = []
+    for step, (new_frame, overlay, cursor_shown) in enumerate(steps):
+        if new_frame:
+            frame.fill((40 * step, 80, 120))
+            backend.draw_frame(frame)
+        if overlay == 'box':
+            backend.overlay().fill((200, 30, 30), (280, 220, 400, 200))
+        elif overlay == 'fade':
+            backend.overlay().blit(shade, (0, 0))
+        if cursor_shown:
+            backend.draw_image(cursor, (100 + step, 100))
+        backend.present()
+        if isinstance(backend, presenter.RendererPresenter):
+            window = backend.renderer.to_surface()
+        else:
+            window = backend.screen
+        pictures.append(pygame.image.tobytes(window, 'RGB'))
+    return pictures
+
+
+def test_renderer_shows_what_the_software_window_shows():
+    pygame.init()
+    expected = draw_screens(presenter.SoftwarePresenter((960, 640)))
+    try:
+        renderer = presenter.RendererPresenter((960, 640), accelerated=False)
+    except Exception as e:
+        pytest.skip('no SDL renderer: ' + str(e))
+    try:
+        # The overlay is blended by SDL rather than by pygame, so allow for rounding
+        for picture, expected_picture in zip(draw_screens(renderer), expected, strict=True):
+            assert_looks_the_same(expected_picture, picture)
+    finally:
+        renderer.window.destroy()
+
+
+def draw_scene(target):
+    """A frame drawn the way game.py draws one: background, chunks, sprites, UI."""
+    target.fill((30, 60, 90))
+    chunk = pygame.Surface((64, 64), pygame.SRCALPHA)
+    chunk.fill((120, 200, 80, 255), (0, 32, 64, 32))
+    keyed = pygame.Surface((16, 16))
+    keyed.fill((255, 0, 255))
+    keyed.fill((250, 220, 40), (4, 4, 8, 8))
+    keyed.set_colorkey((255, 0, 255))
+    faded = pygame.Surface((32, 32))
+    faded.fill((255, 255, 255))
+    faded.set_alpha(128)
+    target.blits([(chunk, (-10, 300)), (chunk, (54, 300)), (chunk, (118.7, 300))], doreturn=False)
+    target.blit(keyed, (200.5, 280))
+    target.blit(keyed, (240, 280), (0, 0, 8, 16))
+    target.blit(faded, (300, 260))
+    presenter.draw_rect(target, (220, 220, 220), (20, 20, 120, 40))
+    presenter.draw_rect(target, (0, 50, 120), (20, 20, 120, 40), 2)
+    presenter.draw_rect(target, (255, 220, 100), (160, 20, 120, 40), border_radius=4)
+    presenter.draw_lines(target, (255, 255, 255), False, [(10, 100), (60, 140), (200, 140)])
+
+
+def test_renderer_canvas_draws_what_a_surface_draws():
+    pygame.init()
+    expected = pygame.Surface((540, 380))
+    draw_scene(expected)
+    try:
+        renderer = presenter.RendererPresenter((960, 640), accelerated=False)
+    except Exception as e:
+        pytest.skip('no SDL renderer: ' + str(e))
+    try:
+        canvas = renderer.frame_canvas(pygame.Surface((540, 380)))
+        draw_scene(canvas)
+        drawn = canvas.to_surface()
+        assert drawn.get_size() == expected.get_size()
+        assert_looks_the_same(pygame.image.tobytes(expected, 'RGB'), pygame.image.tobytes(drawn, 'RGB'))
+    finally:
+        renderer.window.destroy()
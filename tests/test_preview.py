@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+from game import Game
+from scripts.preview import PREVIEW_FRAMES
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps')
+
+
+@pytest.mark.parametrize('level', ['level1.json', 'level2.json'])
+@pytest.mark.parametrize('movement', [[False, False], [False, True]], ids=['idle', 'walking'])
+def test_prediction_matches_the_game(level, movement):
+    game = Game(os.path.join(MAPS, level), headless=True)
+    for _ in range(60):
+        game.update()
+    game.movement = movement
+    player = game.player
+    predicted = [point for segment in game.preview.predict(player, (movement[1] - movement[0], 0))
+                 for point in segment]
+    assert len(predicted) == game.preview.frames
+    for point in predicted:
+        game.update()
+        assert (player.pos[0] + player.size[0] // 2, player.pos[1] + player.size[1] // 2) == point
+
+
+def aiming_game(level, movement):
+    """A game a second into a level, aiming with a portal pair locked: at the player and up ahead."""
+    game = Game(os.path.join(MAPS, level), headless=True)
+    for _ in range(60):
+        game.update()
+    game.movement = movement
+    game.player_portal.update(game.player.rect().center)
+    game.mouse_pos = (200, 100)
+    game.cursor_portal.update(game.mouse_pos)
+    game.portal_placement_blocked = False
+    game.enter_portal_mode()
+    return game
+
+
+def test_uncached_prediction_fits_the_frame_budget():
+    """A full prediction averages under 1 ms (best of a few rounds, as timings are noisy)."""
+    cases = []
+    for level in ('level1.json', 'level2.json'):
+        for movement in ([False, False], [False, True], [True, False]):
+            game = aiming_game(level, movement)
+            direction = (movement[1] - movement[0], 0)
+            prediction = game.preview.simulate(game.player, direction)  # Fills the per-level caches
+            assert len(prediction.points) == PREVIEW_FRAMES or prediction.finished
+            cases.append((game, direction))
+    best = [None] * len(cases)
+    for _ in range(8):
+        for i, (game, direction) in enumerate(cases):
+            start = time.perf_counter()
+            game.preview.simulate(game.player, direction)
+            cost = time.perf_counter() - start
+            best[i] = cost if best[i] is None else min(best[i], cost)
+    assert sum(best) / len(best) < 0.001, [f"{cost * 1000:.2f} ms" for cost in best]
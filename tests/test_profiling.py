@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from game import Game
+from scripts import profiling
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps')
+FRAMES = 30
+
+
+class Thing:
+    pass
+
+
+def make_garbage(count):
+    """Allocates `count` objects, all freed before it returns."""
+    for _ in range(count):
+        Thing()
+
+
+def test_counter_sees_objects_freed_in_the_same_call():
+    counter = profiling.AllocationCounter()
+    empty = counter.count(make_garbage, 0)  # The range iterator
+    assert empty <= 2
+    assert counter.count(make_garbage, 10) - empty == pytest.approx(10, abs=1)
+
+
+@pytest.mark.parametrize('level', ['level1.json', 'level5.json'])
+@pytest.mark.parametrize('movement', [[False, False], [False, True]], ids=['idle', 'walking'])
+def test_steady_state_frames_allocate_little(level, movement):
+    game = Game(os.path.join(MAPS, level), headless=True)
+    game.movement = movement
+    for _ in range(profiling.WARMUP_FRAMES):
+        game.update()
+    assert profiling.count_allocations(game, FRAMES) <= profiling.MAX_ALLOCATIONS_PER_FRAME
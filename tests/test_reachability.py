@@ -0,0 +1,64 @@
+import json
+import os
+
+import numpy as np
+
+from scripts.env import GameEnv, STATIC_CHANNELS
+from scripts.reachability import DEADLY, SOLID, TileGrid, analyze_level
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps')
+
+
+def load(name):
+    with open(os.path.join(MAPS, name)) as f:
+        return json.load(f)
+
+
+def shifted(map_data, dx, dy):
+    """The level moved by (dx, dy) tiles."""
+    tile_size = map_data.get('tile_size', 16)
+    tilemap = {}
+    for tile in map_data['tilemap'].values():
+        pos = [tile['pos'][0] + dx, tile['pos'][1] + dy]
+        tilemap[f"{pos[0]};{pos[1]}"] = dict(tile, pos=pos)
+    offgrid = [dict(tile, pos=[tile['pos'][0] + dx * tile_size, tile['pos'][1] + dy * tile_size])
+               for tile in map_data['offgrid']]
+    return dict(map_data, tilemap=tilemap, offgrid=offgrid)
+
+
+def test_grid_covers_the_level_extent():
+    map_data = {'tile_size': 16, 'offgrid': [], 'tilemap': {
+        '40;30': {'type': 'grass', 'variant': 0, 'pos': [40, 30]},
+        '-3;-2': {'type': 'grass', 'variant': 0, 'pos': [-3, -2]},
+    }}
+    grid = TileGrid.from_level(map_data)
+    assert (grid.left, grid.top, grid.width, grid.height) == (-3, -2, 44, 33)
+    assert grid.get(40, 30) & SOLID and grid.get(-3, -2) & SOLID
+    assert not grid.get(20, 10) & SOLID
+    # Past the bottom of the level is deadly
+    assert grid.get(40, 31) & DEADLY
+
+
+def test_moved_level_keeps_its_route():
+    level = load('level2.json')
+    report = analyze_level(level)
+    assert report['solvable']
+    for dx, dy in ((40, 0), (-40, 0), (0, 30)):
+        moved = analyze_level(shifted(level, dx, dy))
+        assert moved['solvable']
+        assert moved['score'] == report['score']
+
+
+def test_env_window_fits_the_largest_level(tmp_path):
+    level = load('level2.json')
+    path = str(tmp_path / 'moved.json')
+    with open(path, 'w') as f:
+        json.dump(shifted(level, -40, 0), f)
+    env = GameEnv(levels=[os.path.join(MAPS, 'level2.json'), path], seed=0)
+    assert env.grid.shape[2] >= 74
+    # Each level is drawn from its own top-left corner
+    env.reset(level=path)
+    moved = env.observation()['tiles'][:len(STATIC_CHANNELS)].copy()
+    env.reset(level=os.path.join(MAPS, 'level2.json'))
+    original = env.observation()['tiles'][:len(STATIC_CHANNELS)]
+    assert original.any() and np.array_equal(moved[:, :, :17], original[:, :, :17])
@@ -0,0 +1,40 @@
+import os
+
+from game import Game
+from scripts.tilemap import Tilemap, PHYSICS_TILES, TILE_SOLID, TILE_NOPORTAL
+
+MAPS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'maps')
+
+
+def make_tilemap(tiles):
+    tilemap = Tilemap(None)
+    tilemap.tilemap = {str(x) + ';' + str(y): {'type': tile_type, 'variant': 0, 'pos': [x, y]}
+                       for (x, y), tile_type in tiles.items()}
+    return tilemap
+
+
+def test_segment_query_stops_at_the_first_solid_tile():
+    tilemap = make_tilemap({(3, 0): 'stone', (5, 0): 'grass', (0, 2): 'noportalzone'})
+    hit = tilemap.segment_query((8, 8), (100, 8))
+    assert hit[:2] == (3, 0) and hit[3] == (-1, 0)
+    assert tilemap.segment_query((8, 8), (40, 8)) is None
+    assert tilemap.segment_query((8, 40), (8, 40), TILE_NOPORTAL)[:2] == (0, 2)
+    assert tilemap.segment_query((8, 40), (8, 40), TILE_SOLID) is None
+
+
+def test_invalidate_grid_sees_types_changed_in_place():
+    tilemap = make_tilemap({(0, 0): 'red_box', (1, 0): 'stone'})
+    assert tilemap.segment_query((8, 8), (8, 8)) is None
+    # Same dict, same length: only invalidate_grid tells the grid to rebuild
+    tilemap.tilemap['0;0']['type'] = 'grass'
+    tilemap.invalidate_grid()
+    assert tilemap.segment_query((8, 8), (8, 8))[:2] == (0, 0)
+
+
+def test_cursor_checks_match_the_tiles():
+    game = Game(os.path.join(MAPS, 'level1.json'), headless=True)
+    tilemap = game.tilemap
+    for tile in list(tilemap.tilemap.values())[::7]:
+        pos = (tile['pos'][0] * tilemap.tile_size + 3, tile['pos'][1] * tilemap.tile_size + 12)
+        assert game.cursor_over_solid_tile(pos) == (tile['type'] in PHYSICS_TILES)
+        assert game.is_in_noportalzone(pos) == (tile['type'] == 'noportalzone')